@@ -1,111 +1,156 @@
 import os
 import sys
-from openai import OpenAI
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from analytics.report_service import MockBackend, OpenAIBackend, ReportCache, ReportService
 
 # ==========================================
 # CONFIGURATION
 # ==========================================
 
-# Valitse palveluntarjoaja: "openrouter" (Oikea AI) tai "mock" (Simulaatio)
-PROVIDER = "openrouter" 
+# Valitse palveluntarjoaja: "openrouter" (Oikea AI), "local" (paikallinen testipalvelin,
+# ks. local_llm_server.py) tai "mock" (Simulaatio)
+PROVIDER = os.getenv("AI_PROVIDER", "openrouter")
 
 # Aseta OpenRouter API-avaimesi tähän (tai käytä ympäristömuuttujaa)
 # SUOSITUS: Älä jätä avainta koodiin jos laitat sen GitHubiin!
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "LIITA_SINUN_OPENROUTER_KEY_TAHAN")
+OPENROUTER_URL = "https://openrouter.ai/api/v1"
+
+# Paikallisen testipalvelimen osoite (PROVIDER = "local")
+LOCAL_LLM_URL = os.getenv("LOCAL_LLM_URL", "http://127.0.0.1:8765/v1")
 
 # Mallin valinta (Käytetään ilmaista/halpaa mallia)
 # "google/gemini-2.0-flash-exp:free" on usein ilmainen ja erittäin nopea
 MODEL_ID = "google/gemini-2.0-flash-exp:free" 
 
-# ==========================================
-# AI CLIENT FACTORY
-# ==========================================
-
-def get_ai_client():
-    """
-    Luo yhteyden OpenRouterin rajapintaan.
-    """
-    if PROVIDER == "openrouter":
-        if not OPENROUTER_API_KEY or "LIITA_SINUN" in OPENROUTER_API_KEY:
-            print("[ERROR] OpenRouter API key is missing!")
-            return None
-            
-        return OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=OPENROUTER_API_KEY,
-        )
-    return None
+# Vastausvälimuisti levylle (tyhjä = vain muistissa)
+REPORT_CACHE_FILE = os.getenv("REPORT_CACHE_FILE", "")
 
 # ==========================================
-# LOGIC
+# PROMPTS
 # ==========================================
 
-def generate_logistics_report(context):
-    """
-    Generates a professional logistics email based on sensor data.
-    
-    Args:
-        context (dict): Contains 'current_fill', 'trend', 'prediction_date'
-    Returns:
-        str: The generated email draft.
-    """
-    
-    # 1. Määritellään rooli ja tehtävä (System Prompt)
-    system_prompt = """
+# 1. Määritellään rooli ja tehtävä (System Prompt)
+SYSTEM_PROMPT = """
     You are 'EcoLogistics AI', an expert logistics coordinator for a circular economy company.
     Your job is to analyze sensor data from textile bins and write short, actionable emails to the driver team.
     Keep the tone professional, efficient, and operational.
     """
-    
-    # 2. Syötetään data ja ohjeet (User Prompt)
-    user_prompt = f"""
+
+def _bin_label(context):
+    if 'bin_id' not in context:
+        return "#TX-105 (Location: K-Market Loimaa)"
+    location = context.get('location')
+    return f"#{context['bin_id']}" + (f" (Location: {location})" if location else "")
+
+def build_user_prompt(context):
+    """
+    2. Syötetään data ja ohjeet (User Prompt)
+    """
+    # Optional 7-day exposure summary (environmental_risk.py); contexts
+    # without it give the same prompt (and cache key) as before
+    environment = context.get('environment')
+    env_line = f"\n    Environment:      {environment}" if environment else ""
+    env_rule = ("\n    - If the environment risk is high: Warn about mold risk and recommend airing."
+                if environment else "")
+    return f"""
     Please draft a status email based on this sensor data:
 
     --- SENSOR DATA ---
-    Bin ID:           #TX-105 (Location: K-Market Loimaa)
+    Bin ID:           {_bin_label(context)}
     Current Level:    {context.get('current_fill', 'N/A')}
     7-Day Trend:      {context.get('trend', 'Stable')}
     Est. Full Date:   {context.get('prediction_date', 'Unknown')}
-    Temperature:      {context.get('temperature', 'N/A')}
+    Temperature:      {context.get('temperature', 'N/A')}{env_line}
     -------------------
     
     INSTRUCTIONS:
     - If level > 80%: Mark subject as [URGENT].
     - If level < 50%: Mark subject as [LOW PRIORITY] and suggest skipping.
-    - If temperature > 25C: Warn about potential hygiene risks (mold/odors).
+    - If temperature > 25C: Warn about potential hygiene risks (mold/odors).{env_rule}
     - Clearly state the recommended action (Pickup tomorrow / Skip / Monitor).
     - Keep it under 100 words.
     """
-    
-    print(f"[AI AGENT] Connecting to OpenRouter ({MODEL_ID})...")
 
-    # 3. Mock Response (Varajärjestelmä, jos netti ei toimi)
-    if PROVIDER == "mock":
-        return f"""
+def build_messages(context):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_user_prompt(context)}
+    ]
+
+def mock_report(context):
+    """
+    3. Mock Response (Varajärjestelmä, jos netti ei toimi)
+    """
+    return f"""
         [MOCK RESPONSE]
-        Subject: Status Update Bin #TX-105
+        Subject: Status Update Bin {_bin_label(context).split(' ')[0]}
         Bin is at {context.get('current_fill')}. Trend is {context.get('trend')}.
         Recommended action: Pickup on {context.get('prediction_date')}.
         """
 
-    # 4. Oikea API-kutsu
-    client = get_ai_client()
-    if not client:
+# ==========================================
+# REPORT SERVICE
+# ==========================================
+
+_service = None
+
+def get_report_service():
+    """
+    Jaettu raporttipalvelu: yksi asiakasyhteys, välimuisti ja rinnakkaiset
+    kyselyt koko prosessille. Returns None if the API key is missing.
+    """
+    global _service
+    if _service is None:
+        if PROVIDER == "mock":
+            backend = MockBackend(mock_report)
+        elif PROVIDER == "local":
+            backend = OpenAIBackend(LOCAL_LLM_URL, "local", MODEL_ID)
+        else:
+            if not OPENROUTER_API_KEY or "LIITA_SINUN" in OPENROUTER_API_KEY:
+                print("[ERROR] OpenRouter API key is missing!")
+                return None
+            backend = OpenAIBackend(OPENROUTER_URL, OPENROUTER_API_KEY, MODEL_ID)
+        cache = ReportCache(path=REPORT_CACHE_FILE or None)
+        _service = ReportService(backend, build_messages, cache=cache)
+    return _service
+
+# ==========================================
+# LOGIC
+# ==========================================
+
+def generate_logistics_report(context):
+    """
+    Generates a professional logistics email based on sensor data.
+    
+    Args:
+        context (dict): Contains 'current_fill', 'trend', 'prediction_date',
+                        'temperature' (optional 'bin_id', 'location',
+                        'environment')
+    Returns:
+        str: The generated email draft.
+    """
+    service = get_report_service()
+    if not service:
         return "[ERROR] Could not initialize AI client. Check API Key."
+    return service.generate(context)
 
-    try:
-        response = client.chat.completions.create(
-            model=MODEL_ID,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            # headers={"HTTP-Referer": "http://localhost:8501", "X-Title": "Bioeconomy IoT"},
-        )
-        return response.choices[0].message.content
-        
-    except Exception as e:
-        return f"[ERROR] AI Generation failed: {e}"
+def generate_fleet_reports(contexts):
+    """
+    Reports for many bins at once (concurrent requests, cached per
+    quantized context). Returns the reports in the order of 'contexts'.
+    """
+    service = get_report_service()
+    if not service:
+        return ["[ERROR] Could not initialize AI client. Check API Key."] * len(contexts)
+    reports = service.generate_many(contexts)
+    service.cache.save()
+    return reports
 
 # ==========================================
 # TESTIAJO (Jos ajetaan suoraan tätä tiedostoa)
@@ -122,4 +167,4 @@ if __name__ == "__main__":
     print("--- TESTING AI AGENT ---")
     report = generate_logistics_report(test_context)
     print("\n--- GENERATED REPORT ---\n")
-    print(report)
\ No newline at end of file
+    print(report)
@@ -0,0 +1,399 @@
+"""
+Forecast Backtesting
+
+Replays the sensor history and measures how well the full-date forecasts
+would have done: every past fill cycle is cut at several points, each
+forecaster predicts the full date from the readings up to the cut only,
+and the prediction is compared with the time the bin actually became full.
+Errors are in days (positive = predicted too late).
+
+Cycles and "full" follow the emptying-event rules (emptying_events.py):
+    - A cycle starts at a confirmed-low reading (as in fleet_prediction);
+      the first, partial cycle of each bin is not scored.
+    - The cycle's actual full time is the first of CONFIRM_READINGS readings
+      in a row at or above FULL_PCT. Bins are emptied around 100 % and the
+      sensor is noisy, so a reading of exactly 100 % is rare; forecasters
+      are asked for the time to FULL_PCT instead. Cycles emptied before
+      they got full are not scored.
+    - Cuts at CUT_FRACTIONS of the time from cycle start to full (the last
+      reading at or before that time), if the cut sees MIN_CUT_POINTS readings.
+
+Forecasters (pluggable, see FORECASTERS):
+    linear    predict_emptying.analyze_data / predict_fleet: least squares
+              on the current cycle, fill_level_pct ~ intercept + rate * days
+    weekday   the same fit on an "effective time" axis in which each weekday
+              counts by the bin's own fill rate on that weekday in its
+              earlier cycles (e.g. weekends filling 2.5x faster); the fitted
+              full point is converted back to calendar time
+A forecaster is a function forecast(cuts, full_pct) -> days left at each
+cut (NaN = no prediction), reading only the rows each cut may see; see
+CycleCuts for its input and fit_at_cuts for the vectorized fit.
+
+The fleet is split into tasks of whole bins (about ROWS_PER_TASK readings
+each) that run in a process pool; within a task all bins, cycles and cuts
+are handled in one vectorized pass (prefix sums, no loop over bins).
+
+Usage:
+    python analytics/backtest.py                                  # data lake, all CPUs
+    python analytics/backtest.py --data-dir /tmp/fleet --workers 4 --output cuts.csv
+"""
+
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Pool
+import numpy as np
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from analytics.emptying_events import CONFIRM_READINGS, LOW_PCT, _fill_of, _run_counts, confirmed_lows
+from analytics.fleet_prediction import MIN_FILL_RATE, SECONDS_PER_DAY
+
+# --- CONFIGURATION ---
+DATA_DIR = os.path.join(parent_dir, "edge_gateway", "data")
+FULL_PCT = 95                # Confirmed reading at/above this = bin was full
+CUT_FRACTIONS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9)
+MIN_CUT_POINTS = 3           # Readings a cut must see before it is scored
+MIN_WEEKDAY_DAYS = 1.0       # Earlier-cycle coverage per weekday before the weekday model kicks in
+WEIGHT_FLOOR = 0.1           # Lowest relative weekday rate (keeps effective time increasing)
+ROWS_PER_TASK = 4_000_000    # Readings per pool task (whole bins)
+
+DAY_NS = SECONDS_PER_DAY * 10**9
+EPOCH_WEEKDAY = 3            # 1970-01-01 was a Thursday (Monday = 0)
+RESULT_COLUMNS = ["bin_id", "cycle_start", "full_time", "cut_time", "cut_fraction", "forecaster",
+                  "actual_days", "predicted_days", "error_days"]
+
+# ==========================================
+# CYCLES AND CUTS
+# ==========================================
+
+class CycleCuts:
+    """
+    The cycles and cut points of one group of bins (rows sorted by bin, time).
+
+    Per row:   ts (int64 ns), fill (%), code (bin), cycle, days (since the
+               row's cycle start)
+    Per cycle: first (row), full (row of the actual full time, -1 if none),
+               bin (code)
+    Per cut:   cycle, pos (last row the forecaster may use), fraction
+    """
+
+    def __init__(self, ts, fill, codes, full_pct=FULL_PCT, cut_fractions=CUT_FRACTIONS):
+        self.ts, self.fill, self.code = ts, fill, codes
+        n = len(ts)
+        group_start = np.r_[True, codes[1:] != codes[:-1]]
+        low = confirmed_lows(fill, group_start)
+
+        # 1. Cycles: a new one at every confirmed low (the last one of a low run is the real start)
+        starts = group_start | low
+        self.cycle = np.cumsum(starts) - 1
+        self.cycle_first = np.flatnonzero(starts)
+        self.cycle_bin = codes[self.cycle_first]
+        self.days = (ts - ts[self.cycle_first][self.cycle]) / DAY_NS
+
+        # 2. Actual full time: first reading of a confirmed run at/above full_pct
+        counts, run_start = _run_counts(fill >= full_pct, starts)
+        full_row = np.where(counts >= CONFIRM_READINGS, run_start, n)
+        full = np.minimum.reduceat(full_row, self.cycle_first) if n else np.zeros(0, dtype=np.int64)
+        scored = (full < n) & low[self.cycle_first]
+        self.cycle_full = np.where(full < n, full, -1)
+
+        # 3. Cuts: last reading at or before each fraction of start -> full
+        cycles = np.flatnonzero(scored)
+        first, full = self.cycle_first[cycles], self.cycle_full[cycles]
+        rel_s = (ts - ts[self.cycle_first][self.cycle]) // 10**9
+        span = int(rel_s.max()) + 1 if n else 1
+        key = self.cycle * span + rel_s                     # Increasing: cycles are contiguous
+        fractions = np.asarray(cut_fractions, dtype=np.float64)
+        target = (rel_s[full][:, None] * fractions[None, :]).astype(np.int64)
+        pos = np.searchsorted(key, (cycles * span)[:, None] + target, side='right') - 1
+        cut_cycle = np.broadcast_to(cycles[:, None], pos.shape).ravel()
+        cut_fraction = np.broadcast_to(fractions[None, :], pos.shape).ravel()
+        pos = pos.ravel()
+        keep = ((pos - np.repeat(first, len(fractions)) + 1 >= MIN_CUT_POINTS)
+                & (pos < np.repeat(full, len(fractions))))
+        self.cut_cycle, self.cut_pos, self.cut_fraction = cut_cycle[keep], pos[keep], cut_fraction[keep]
+
+    def __len__(self):
+        return len(self.cut_pos)
+
+    def actual_days(self):
+        """Days from each cut's last reading to the actual full time."""
+        return (self.ts[self.cycle_full[self.cut_cycle]] - self.ts[self.cut_pos]) / DAY_NS
+
+def fit_at_cuts(cuts, axis):
+    """
+    Least squares fill ~ intercept + slope * axis over the rows of each cut's
+    cycle up to the cut (prefix sums, one pass for all cuts).
+    'axis' is per row and must be 0 at each cycle's first row.
+
+    Returns:
+        (intercept, slope, n_points) per cut; slope 0 where it is undefined.
+    """
+    y = cuts.fill.astype(np.float64)
+
+    def window_sum(values):
+        total = np.r_[0.0, np.cumsum(values)]
+        return total[cuts.cut_pos + 1] - total[cuts.cycle_first[cuts.cut_cycle]]
+
+    n = (cuts.cut_pos - cuts.cycle_first[cuts.cut_cycle] + 1).astype(np.float64)
+    sx, sy = window_sum(axis), window_sum(y)
+    sxx = window_sum(axis * axis) - sx * sx / n
+    sxy = window_sum(axis * y) - sx * sy / n
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = np.where(sxx > 1e-12, sxy / sxx, 0.0)
+    return (sy - slope * sx) / n, slope, n
+
+def _days_to_target(intercept, slope, full_pct, min_fill_rate=MIN_FILL_RATE):
+    # Axis units from cycle start until the fitted line reaches full_pct (NaN if not filling)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(slope > min_fill_rate, (full_pct - intercept) / slope, np.nan)
+
+# ==========================================
+# FORECASTERS
+# ==========================================
+
+def linear_forecast(cuts, full_pct=FULL_PCT):
+    """
+    The dashboard's model: straight line through the current cycle.
+    """
+    intercept, slope, _ = fit_at_cuts(cuts, cuts.days)
+    return _days_to_target(intercept, slope, full_pct) - cuts.days[cuts.cut_pos]
+
+def weekday_weights(cuts):
+    """
+    Relative fill rate per weekday (mean 1) for every cycle, from the bin's
+    earlier cycles only; all ones where a weekday is not covered for
+    MIN_WEEKDAY_DAYS yet.
+
+    Returns:
+        np.ndarray (cycles x 7), Monday first.
+    """
+    n_cycles = len(cuts.cycle_first)
+    # Increments inside one cycle, not touching a low reading (the emptying drop, lost echoes)
+    above = cuts.fill >= LOW_PCT
+    rising = np.r_[False, (cuts.cycle[1:] == cuts.cycle[:-1]) & above[1:] & above[:-1]]
+    dy = np.where(rising, np.diff(cuts.fill.astype(np.float64), prepend=0.0), 0.0)
+    dt = np.where(rising, np.diff(cuts.ts // 10**9, prepend=0), 0)     # Whole seconds: exact sums
+    weekday = (cuts.ts // DAY_NS + EPOCH_WEEKDAY) % 7
+    slot = cuts.cycle * 7 + weekday
+    rise = np.bincount(slot, weights=dy, minlength=n_cycles * 7).reshape(n_cycles, 7)
+    time_ = np.bincount(slot, weights=dt, minlength=n_cycles * 7).reshape(n_cycles, 7)
+
+    # Sums over the bin's earlier cycles: running total minus own cycle minus other bins
+    def earlier(values):
+        before = np.cumsum(values, axis=0) - values
+        bin_first = np.r_[True, cuts.cycle_bin[1:] != cuts.cycle_bin[:-1]]
+        base = before[np.flatnonzero(bin_first)]
+        return before - base[np.cumsum(bin_first) - 1]
+
+    rise, time_ = earlier(rise), earlier(time_)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate = rise / time_
+        weights = rate / rate.mean(axis=1, keepdims=True)
+    known = (time_ >= MIN_WEEKDAY_DAYS * SECONDS_PER_DAY).all(axis=1) & (weights > 0).all(axis=1)
+    weights = np.where(known[:, None], np.maximum(weights, WEIGHT_FLOOR), 1.0)
+    return np.nan_to_num(weights, nan=1.0)
+
+def _effective_clock(ts, cycle, cumulative, weights):
+    """
+    Effective days since the epoch at 'ts': each calendar day counts by the
+    weekday weight of the row's cycle. 'cumulative' (cycles x 8) is the
+    weight sum of the first 0..7 days of a week starting on the epoch's weekday.
+    """
+    day = ts // DAY_NS
+    frac = (ts - day * DAY_NS) / DAY_NS
+    return ((day // 7) * cumulative[cycle, 7] + cumulative[cycle, day % 7]
+            + frac * weights[cycle, (day + EPOCH_WEEKDAY) % 7])
+
+def weekday_forecast(cuts, full_pct=FULL_PCT):
+    """
+    Linear fit on weekday-weighted time (see module docstring).
+    """
+    weights = weekday_weights(cuts)
+    week = (np.arange(7) + EPOCH_WEEKDAY) % 7
+    cumulative = np.concatenate([np.zeros((len(weights), 1)), np.cumsum(weights[:, week], axis=1)], axis=1)
+
+    # Per-row axis: effective days since the cycle start (weights of the row's cycle)
+    clock = _effective_clock(cuts.ts, cuts.cycle, cumulative, weights)
+    origin = _effective_clock(cuts.ts[cuts.cycle_first], np.arange(len(weights)), cumulative, weights)
+    intercept, slope, _ = fit_at_cuts(cuts, clock - origin[cuts.cycle])
+
+    # Full point in effective time -> calendar time (inverse of the clock, per cut)
+    k = cuts.cut_cycle
+    target = origin[k] + _days_to_target(intercept, slope, full_pct)
+    week_total = cumulative[k, 7]
+    weeks = np.floor(target / week_total)
+    rest = np.nan_to_num(target - weeks * week_total)
+    day_in_week = np.minimum((cumulative[k, 1:] <= rest[:, None]).sum(axis=1), 6)
+    frac = (rest - cumulative[k, day_in_week]) / weights[k, (day_in_week + EPOCH_WEEKDAY) % 7]
+    full_day = weeks * 7 + day_in_week + frac
+    return full_day - cuts.ts[cuts.cut_pos] / DAY_NS
+
+FORECASTERS = {
+    "linear": linear_forecast,
+    "weekday": weekday_forecast,
+}
+
+# ==========================================
+# BACKTEST
+# ==========================================
+
+def load_history(data_dir=DATA_DIR):
+    """
+    The whole lake as compact arrays sorted by (bin, time), read chunk by
+    chunk so only the arrays are held in memory. Readings without a
+    distance are left out.
+
+    Returns:
+        (ts int64 ns, fill float32, codes int32, bin_ids) or None if there is no data.
+    """
+    from edge_gateway.parquet_store import iter_sensor_data
+
+    ts, fill, codes, bin_codes = [], [], [], {}
+    for chunk in iter_sensor_data(data_dir, columns=['distance_cm', 'bin_id']):
+        local, uniques = pd.factorize(chunk['bin_id'])
+        mapping = np.array([bin_codes.setdefault(b, len(bin_codes)) for b in uniques], dtype=np.int32)
+        codes.append(mapping[local])
+        ts.append(chunk['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64))
+        fill.append(_fill_of(chunk).astype(np.float32))
+    if not ts:
+        return None
+
+    # Codes in bin_id order, then rows by (bin, time)
+    bin_ids = np.array(list(bin_codes), dtype=object)
+    rank = np.empty(len(bin_ids), dtype=np.int32)
+    rank[np.argsort(bin_ids, kind='stable')] = np.arange(len(bin_ids), dtype=np.int32)
+    ts, fill, codes = np.concatenate(ts), np.concatenate(fill), rank[np.concatenate(codes)]
+    # Missing distances: one NaN would poison the prefix sums of every later bin in its task
+    valid = ~np.isnan(fill)
+    if not valid.all():
+        ts, fill, codes = ts[valid], fill[valid], codes[valid]
+    if not len(ts):
+        return None
+    order = np.lexsort((ts, codes))
+    return ts[order], fill[order], codes[order], np.sort(bin_ids)
+
+def _split_tasks(codes, rows_per_task=ROWS_PER_TASK):
+    # Row ranges of whole bins with about rows_per_task rows each
+    bin_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    bounds = [0]
+    for start in bin_starts[1:]:
+        if start - bounds[-1] >= rows_per_task:
+            bounds.append(int(start))
+    bounds.append(len(codes))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def backtest_group(task):
+    """
+    Scores every forecaster on one group of bins (pool task).
+
+    Returns:
+        pd.DataFrame in RESULT_COLUMNS order, with bin codes in 'bin_id'.
+    """
+    ts, fill, codes, forecasters, full_pct, cut_fractions = task
+    cuts = CycleCuts(ts, fill, codes, full_pct, cut_fractions)
+    actual = cuts.actual_days()
+    frames = []
+    for name, forecast in forecasters.items():
+        predicted = np.asarray(forecast(cuts, full_pct), dtype=np.float64)
+        frames.append(pd.DataFrame({
+            "bin_id": cuts.cycle_bin[cuts.cut_cycle],
+            "cycle_start": ts[cuts.cycle_first[cuts.cut_cycle]],
+            "full_time": ts[cuts.cycle_full[cuts.cut_cycle]],
+            "cut_time": ts[cuts.cut_pos],
+            "cut_fraction": cuts.cut_fraction,
+            "forecaster": name,
+            "actual_days": actual,
+            "predicted_days": predicted,
+            "error_days": predicted - actual,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+def run_backtest(history, forecasters=None, workers=1, full_pct=FULL_PCT, cut_fractions=CUT_FRACTIONS,
+                 rows_per_task=ROWS_PER_TASK):
+    """
+    Backtests the forecasters on a history from load_history().
+
+    Args:
+        forecasters (dict): name -> forecast(cuts, full_pct); default FORECASTERS.
+            With workers > 1 they must be importable (module-level) functions.
+        workers (int): Processes; tasks are groups of whole bins.
+
+    Returns:
+        pd.DataFrame: one row per cut and forecaster (RESULT_COLUMNS).
+    """
+    ts, fill, codes, bin_ids = history
+    forecasters = forecasters or FORECASTERS
+    tasks = [(ts[a:b], fill[a:b], codes[a:b], forecasters, full_pct, cut_fractions)
+             for a, b in _split_tasks(codes, rows_per_task)]
+    if workers > 1 and len(tasks) > 1:
+        with Pool(min(workers, len(tasks))) as pool:
+            frames = pool.map(backtest_group, tasks, chunksize=1)
+    else:
+        frames = [backtest_group(task) for task in tasks]
+
+    # Forecaster by forecaster (tasks return theirs interleaved), bins in order
+    df = pd.concat(frames, ignore_index=True)
+    order = pd.Categorical(df['forecaster'], categories=list(forecasters)).codes
+    df = df.take(np.argsort(order, kind='stable')).reset_index(drop=True)
+    df['bin_id'] = bin_ids[df['bin_id'].to_numpy()]
+    for col in ("cycle_start", "full_time", "cut_time"):
+        df[col] = df[col].to_numpy().view('datetime64[ns]')
+    return df
+
+def score(results, by=("forecaster",)):
+    """
+    Error statistics in days per group: cuts, coverage (share with a
+    prediction), MAE, bias (mean error, + = late), median and 90th
+    percentile of the absolute error, share within one day.
+    """
+    df = results.assign(abs_error=results['error_days'].abs(),
+                        within_1d=results['error_days'].abs() <= 1,
+                        predicted=results['predicted_days'].notna())
+    grouped = df.groupby(list(by), sort=True)
+    return pd.DataFrame({
+        "cuts": grouped.size(),
+        "coverage": grouped['predicted'].mean(),
+        "mae_days": grouped['abs_error'].mean(),
+        "bias_days": grouped['error_days'].mean(),
+        "median_abs_days": grouped['abs_error'].median(),
+        "p90_abs_days": grouped['abs_error'].quantile(0.9),
+        "within_1d": grouped['within_1d'].sum() / grouped['predicted'].sum(),
+    })
+
+# ==========================================
+# MAIN PROGRAM
+# ==========================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the full-date forecasts on the sensor history")
+    parser.add_argument('--data-dir', default=os.getenv("SENSOR_DATA_DIR", DATA_DIR))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Parallel processes")
+    parser.add_argument('--forecasters', nargs='+', choices=list(FORECASTERS), default=list(FORECASTERS))
+    parser.add_argument('--full-pct', type=float, default=FULL_PCT, help="Fill level that counts as full")
+    parser.add_argument('--output', default=None, help="Write the per-cut results to this CSV file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    history = load_history(args.data_dir)
+    if history is None:
+        raise SystemExit("[ERROR] No data found.")
+    load_s = time.perf_counter() - start
+    forecasters = {name: FORECASTERS[name] for name in args.forecasters}
+    results = run_backtest(history, forecasters, args.workers, args.full_pct)
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] {len(history[0])} rows, {len(history[3])} bins, {len(results) // len(forecasters)} cuts "
+          f"in {elapsed:.1f} s (load {load_s:.1f} s, {args.workers} worker(s))")
+    print("--- BACKTEST (error in days, + = predicted too late) ---")
+    print(score(results).round(2).to_string())
+    print("--- MAE BY CUT (fraction of the cycle seen) ---")
+    print(score(results, ("cut_fraction", "forecaster"))['mae_days'].unstack().round(2).to_string())
+    if args.output:
+        results.to_csv(args.output, index=False)
+        print(f"[INFO] Per-cut results: {args.output}")
@@ -0,0 +1,189 @@
+"""
+Dashboard Compute Worker
+
+Runs the fleet-wide analytics in a process of its own and writes the
+results to a local cache that the dashboard reads, so opening the dashboard
+or clicking in it never waits for the history to load or the fleet to be
+recomputed:
+
+    fleet_summary.pkl   FleetSummary.table() (latest reading, deltas, fill
+                        rate, predicted full date, risk) per bin
+    risk.pkl            RiskEngine.ranking()
+    pickups.pkl         EmptyingEventIndex.interval_stats()
+    manifest.json       updated (epoch s), version, rows, files, compute_s
+
+'version' is the time (epoch ns) the tables were last written, so it never
+repeats when the worker restarts and readers keying on it never serve
+results of an earlier run.
+
+The worker keeps the same incremental state the dashboard would (loader +
+listeners), refreshes it every REFRESH_INTERVAL_S and rewrites the tables
+only when new rows arrived; the manifest is rewritten every cycle as a
+heartbeat. Each file is replaced atomically (temp file + rename), the
+manifest last.
+
+The dashboard reads the cache through ResultCache and falls back to
+computing in its own process when no worker has written it for
+CACHE_MAX_AGE_S (worker not started or stopped).
+
+Usage:
+    python analytics/compute_worker.py                  # until Ctrl+C
+    python analytics/compute_worker.py --once           # one refresh, prints the manifest
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+# --- CONFIGURATION ---
+DATA_DIR = os.path.join(parent_dir, "edge_gateway", "data")
+CACHE_SUBDIR = "cache"
+REFRESH_INTERVAL_S = 10
+CACHE_MAX_AGE_S = 6 * REFRESH_INTERVAL_S    # Older cache = worker gone, dashboard computes itself
+MANIFEST_FILE = "manifest.json"
+TABLES = ["fleet_summary", "risk", "pickups"]
+
+def get_cache_dir(data_dir=DATA_DIR):
+    return os.path.join(data_dir, CACHE_SUBDIR)
+
+def _replace(path, write):
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+# ==========================================
+# WORKER
+# ==========================================
+
+class ComputeWorker:
+    """
+    Incremental fleet analytics over one data lake, written to its cache.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, cache_dir=None):
+        from analytics.emptying_events import EmptyingEventIndex
+        from analytics.environmental_risk import RiskEngine
+        from analytics.fleet_summary import FleetSummary
+        from edge_gateway.incremental_loader import IncrementalLoader
+
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir or get_cache_dir(data_dir)
+        self.version = None
+        self.loader = IncrementalLoader(data_dir)
+        self.events = EmptyingEventIndex()
+        self.risk = RiskEngine()
+        self.summary = FleetSummary(self.risk)
+        for listener in (self.events.on_rows, self.risk.on_rows, self.summary.on_rows):
+            self.loader.add_listener(listener)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def run_once(self):
+        """
+        Refreshes the analytics; returns the manifest written (None while
+        the lake is empty).
+        """
+        start = time.perf_counter()
+        reloads = self.loader.full_reloads
+        df = self.loader.refresh()
+        if df is None:
+            return None
+        if self.loader.last_new_rows or self.loader.full_reloads != reloads or self.version is None:
+            tables = {
+                "fleet_summary": self.summary.table(),
+                "risk": self.risk.ranking(),
+                "pickups": self.events.interval_stats(),
+            }
+            for name, table in tables.items():
+                _replace(os.path.join(self.cache_dir, f"{name}.pkl"), table.to_pickle)
+            self.version = time.time_ns()
+        manifest = {
+            "updated": time.time(),
+            "version": self.version,
+            "rows": len(df),
+            "files": self.loader.file_count,
+            "compute_s": round(time.perf_counter() - start, 3),
+            "pid": os.getpid(),
+        }
+
+        def write_manifest(path):
+            with open(path, 'w') as f:
+                json.dump(manifest, f)
+        _replace(os.path.join(self.cache_dir, MANIFEST_FILE), write_manifest)
+        return manifest
+
+    def run(self, interval_s=REFRESH_INTERVAL_S):
+        print(f"[WORKER] {self.data_dir} -> {self.cache_dir}, every {interval_s} s (Ctrl+C to stop)")
+        try:
+            while True:
+                manifest = self.run_once()
+                if manifest is None:
+                    print("[WORKER] No data yet.")
+                elif manifest["compute_s"] > 0.5:
+                    print(f"[WORKER] {manifest['rows']} rows, v{manifest['version']} in {manifest['compute_s']} s")
+                time.sleep(interval_s)
+        except KeyboardInterrupt:
+            print("\n[WORKER] Stopped.")
+
+# ==========================================
+# READER (dashboard side)
+# ==========================================
+
+class ResultCache:
+    """
+    The dashboard's view of the worker cache: read() returns {table: frame}
+    plus 'manifest', or None if the cache is missing or older than
+    max_age_s. Tables are loaded again only when the worker wrote a new
+    version. Thread-safe: shared by all dashboard sessions.
+    """
+
+    def __init__(self, cache_dir, max_age_s=CACHE_MAX_AGE_S):
+        self.cache_dir = cache_dir
+        self.max_age_s = max_age_s
+        self._manifest_mtime = None
+        self._results = None
+        self._lock = threading.Lock()
+
+    def read(self):
+        path = os.path.join(self.cache_dir, MANIFEST_FILE)
+        with self._lock:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                if mtime != self._manifest_mtime:
+                    with open(path) as f:
+                        manifest = json.load(f)
+                    if self._results is None or manifest["version"] != self._results["manifest"]["version"]:
+                        self._results = {name: pd.read_pickle(os.path.join(self.cache_dir, f"{name}.pkl"))
+                                         for name in TABLES}
+                    self._results["manifest"] = manifest
+                    self._manifest_mtime = mtime
+            except (OSError, ValueError, KeyError):
+                return None                     # Not written yet (or mid-replace): compute locally
+            if time.time() - self._results["manifest"]["updated"] > self.max_age_s:
+                return None
+            return self._results
+
+# ==========================================
+# MAIN PROGRAM
+# ==========================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the dashboard's fleet analytics into a local cache")
+    parser.add_argument('--data-dir', default=os.getenv("SENSOR_DATA_DIR", DATA_DIR))
+    parser.add_argument('--interval', type=float, default=REFRESH_INTERVAL_S, help="Seconds between refreshes")
+    parser.add_argument('--once', action='store_true', help="Refresh once and exit")
+    args = parser.parse_args()
+
+    worker = ComputeWorker(args.data_dir)
+    if args.once:
+        print(f"[WORKER] {worker.run_once()}")
+    else:
+        worker.run(args.interval)
@@ -0,0 +1,267 @@
+"""
+Emptying-Event Detection
+
+Finds pickups (emptying events) in noisy fill-level data and keeps a small
+per-bin index of them, so consumers can jump straight to a bin's current
+cycle instead of scanning its whole history.
+
+Rules (robust against single bad ultrasonic readings):
+    - A reading below LOW_PCT only counts once CONFIRM_READINGS consecutive
+      readings are low ("confirmed low"). The current cycle starts at the
+      last confirmed-low reading (or at the first reading of the bin).
+    - Hysteresis: an emptying event is recorded when a low run is confirmed
+      *and* the bin was confirmed above REARM_PCT since the previous low run.
+      A bin hovering around the low threshold therefore yields one event,
+      and the drop is always at least REARM_PCT - LOW_PCT.
+
+The same code does the full-history pass and the incremental update: the
+per-bin state (run counters, armed flag, cycle start) is carried between
+batches, and each batch is processed in one vectorized NumPy pass.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+# --- CONFIGURATION ---
+BIN_DEPTH_CM = 100
+LOW_PCT = 5              # Below this the bin counts as empty
+REARM_PCT = 30           # Bin must exceed this before the next event counts
+CONFIRM_READINGS = 2     # Consecutive readings needed to confirm low/high
+
+EVENTS_FILE = "emptying_events.csv"
+STATE_FILE = "emptying_state.csv"
+
+STATE_COLUMNS = ["low_count", "high_count", "armed", "low_start", "fill_before",
+                 "last_fill", "last_timestamp", "cycle_start"]
+EVENT_COLUMNS = ["bin_id", "timestamp", "fill_before", "drop_pct"]
+
+# ==========================================
+# VECTORIZED HELPERS
+# ==========================================
+
+def _run_counts(flag, group_start, init=None):
+    """
+    For each row, the length of the run of True values ending there (0 where
+    False). Runs restart at group starts; 'init' (per row) continues runs that
+    were already open at the start of the group (previous batch).
+
+    Returns:
+        (counts, run_start): run_start is the row where each row's run began.
+    """
+    idx = np.arange(len(flag))
+    boundary = group_start | np.r_[True, flag[1:] != flag[:-1]]
+    run_start = np.maximum.accumulate(np.where(boundary, idx, 0))
+    counts = np.where(flag, idx - run_start + 1, 0)
+    if init is not None:
+        counts = np.where(flag & group_start[run_start], counts + init, counts)
+    return counts, run_start
+
+def confirmed_lows(fill, group_start=None):
+    """
+    Boolean mask of confirmed-low readings (see module rules).
+    'group_start' marks the first row of each bin; default: one bin.
+    """
+    fill = np.asarray(fill, dtype=np.float64)
+    if group_start is None:
+        group_start = np.zeros(len(fill), dtype=bool)
+        group_start[:1] = True
+    counts, _ = _run_counts(fill < LOW_PCT, group_start)
+    return counts >= CONFIRM_READINGS
+
+def _ns(series):
+    # datetime column -> int64 nanoseconds (NaT -> int64 min)
+    return pd.to_datetime(series).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+def _fill_of(df):
+    if 'fill_level_pct' in df:
+        return df['fill_level_pct'].to_numpy(dtype=np.float64)
+    distance = df['distance_cm'].to_numpy(dtype=np.float64)
+    return np.clip((BIN_DEPTH_CM - distance) / BIN_DEPTH_CM * 100, 0, 100)
+
+# ==========================================
+# EVENT INDEX
+# ==========================================
+
+class EmptyingEventIndex:
+    """
+    Emptying events and current-cycle starts of every bin, maintained
+    incrementally with update(new_rows).
+    """
+
+    def __init__(self):
+        self.state = pd.DataFrame(columns=STATE_COLUMNS).rename_axis('bin_id')
+        self.events = pd.DataFrame(columns=EVENT_COLUMNS)
+
+    # --- queries ---
+
+    def cycle_start(self, bin_id):
+        """Start of the bin's current cycle, or None if the bin is unknown."""
+        if bin_id not in self.state.index:
+            return None
+        return self.state.at[bin_id, 'cycle_start']
+
+    def cycle_starts(self):
+        """Series bin_id -> current cycle start."""
+        return self.state['cycle_start']
+
+    @property
+    def last_timestamp(self):
+        return self.state['last_timestamp'].max() if len(self.state) else None
+
+    def events_for(self, bin_id):
+        return self.events[self.events['bin_id'] == bin_id]
+
+    def interval_stats(self):
+        """
+        Pickup statistics per bin: number of pickups, interval between
+        pickups (days: mean/median/min/max) and the last pickup.
+        """
+        ev = self.events.sort_values(['bin_id', 'timestamp'])
+        interval = ev.groupby('bin_id')['timestamp'].diff().dt.total_seconds() / (24 * 3600)
+        stats = interval.groupby(ev['bin_id']).agg(['mean', 'median', 'min', 'max'])
+        stats.columns = [f"{c}_interval_days" for c in stats.columns]
+        stats.insert(0, 'pickups', ev.groupby('bin_id').size())
+        stats['last_pickup'] = ev.groupby('bin_id')['timestamp'].max()
+        return stats
+
+    # --- maintenance ---
+
+    def reset(self):
+        self.__init__()
+
+    def on_rows(self, new_rows, reloaded):
+        """IncrementalLoader listener: keep the index in step with the loader."""
+        if reloaded:
+            self.reset()
+        self.update(new_rows)
+
+    def new_rows_only(self, df):
+        """
+        Drops rows the index has already seen (per bin, by timestamp).
+        """
+        if not len(self.state):
+            return df
+        seen_until = self.state['last_timestamp'].reindex(df['bin_id']).to_numpy(dtype='datetime64[ns]')
+        ts = df['timestamp'].to_numpy(dtype='datetime64[ns]')
+        return df[np.isnat(seen_until) | (ts > seen_until)]
+
+    def update(self, df):
+        """
+        Processes new readings (any number of bins, in any order; each bin's
+        rows must be newer than what the index has already seen).
+
+        Returns:
+            pd.DataFrame: The emptying events found in this batch.
+        """
+        if df is None or not len(df):
+            return self.events.iloc[:0]
+
+        fill = _fill_of(df)
+        ts = _ns(df['timestamp'])
+        codes, bin_ids = pd.factorize(df['bin_id'].astype(str), sort=True)
+        order = np.lexsort((ts, codes))
+        codes, ts, fill = codes[order], ts[order], fill[order]
+
+        n = len(codes)
+        pos = np.arange(n)
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends = np.r_[starts[1:], n] - 1
+        group_start = np.zeros(n, dtype=bool)
+        group_start[starts] = True
+
+        # Previous state of every bin in the batch (defaults for new bins)
+        prev = self.state.reindex(bin_ids)
+        known = prev['last_timestamp'].notna().to_numpy()
+        p_low = prev['low_count'].fillna(0).to_numpy(dtype=np.int64)
+        p_high = prev['high_count'].fillna(0).to_numpy(dtype=np.int64)
+        p_armed = prev['armed'].fillna(False).to_numpy(dtype=bool)
+        p_low_start = _ns(prev['low_start'])
+        p_fill_before = prev['fill_before'].to_numpy(dtype=np.float64)
+        p_last_fill = prev['last_fill'].to_numpy(dtype=np.float64)
+        p_cycle_start = _ns(prev['cycle_start'])
+
+        # 1. Run lengths of low and high readings (continuing open runs)
+        low = fill < LOW_PCT
+        high = fill > REARM_PCT
+        low_count, low_run_start = _run_counts(low, group_start, p_low[codes])
+        high_count, _ = _run_counts(high, group_start, p_high[codes])
+        continued = group_start[low_run_start] & (p_low[codes] > 0)  # low run began in an earlier batch
+
+        # Time the low run began and the fill level just before it
+        run_ts = np.where(continued, p_low_start[codes], ts[low_run_start])
+        before = np.where(low_run_start > 0, fill[np.maximum(low_run_start - 1, 0)], np.nan)
+        before = np.where(group_start[low_run_start], p_last_fill[codes], before)
+        run_fill_before = np.where(continued, p_fill_before[codes], before)
+
+        # 2. Hysteresis: +1 when a high run is confirmed, -1 when a low run is
+        arm = high_count == CONFIRM_READINGS
+        disarm = low_count == CONFIRM_READINGS
+        marker_pos = np.flatnonzero(arm | disarm)
+        marker_val = np.where(arm[marker_pos], 1, -1)
+        marker_bin = codes[marker_pos]
+        same_bin = np.r_[False, marker_bin[1:] == marker_bin[:-1]]
+        prev_armed = np.where(same_bin, np.r_[0, marker_val[:-1]] == 1, p_armed[marker_bin])
+        event_pos = marker_pos[(marker_val == -1) & prev_armed]
+
+        events = pd.DataFrame({
+            'bin_id': bin_ids[codes[event_pos]],
+            'timestamp': pd.to_datetime(run_ts[event_pos]),
+            'fill_before': run_fill_before[event_pos],
+            'drop_pct': run_fill_before[event_pos] - fill[event_pos],
+        })
+
+        # 3. Current cycle start: last confirmed-low reading of each bin
+        last_confirmed = np.maximum.reduceat(np.where(low_count >= CONFIRM_READINGS, pos, -1), starts)
+        cycle_start = np.where(last_confirmed >= 0, ts[np.maximum(last_confirmed, 0)],
+                               np.where(known, p_cycle_start, ts[starts]))
+
+        # 4. New per-bin state (as of each bin's last row)
+        last_marker = np.maximum.reduceat(np.where(arm | disarm, pos, -1), starts)
+        armed = np.where(last_marker >= 0, arm[np.maximum(last_marker, 0)], p_armed)
+        open_low = low[ends]
+        new_state = pd.DataFrame({
+            'low_count': low_count[ends],
+            'high_count': high_count[ends],
+            'armed': armed,
+            'low_start': pd.to_datetime(np.where(open_low, run_ts[ends], np.iinfo(np.int64).min)),
+            'fill_before': np.where(open_low, run_fill_before[ends], np.nan),
+            'last_fill': fill[ends],
+            'last_timestamp': pd.to_datetime(ts[ends]),
+            'cycle_start': pd.to_datetime(cycle_start),
+        }, index=pd.Index(bin_ids, name='bin_id'))
+
+        untouched = self.state[~self.state.index.isin(bin_ids)]
+        self.state = pd.concat([untouched, new_state]) if len(untouched) else new_state
+        if len(events):
+            self.events = pd.concat([self.events, events], ignore_index=True) if len(self.events) else events
+        return events
+
+    # --- persistence ---
+
+    def save(self, data_dir):
+        self.state.to_csv(os.path.join(data_dir, STATE_FILE))
+        self.events.to_csv(os.path.join(data_dir, EVENTS_FILE), index=False)
+
+    @classmethod
+    def load(cls, data_dir):
+        """
+        Loads a saved index (an empty one if nothing has been saved yet).
+        """
+        index = cls()
+        state_path = os.path.join(data_dir, STATE_FILE)
+        events_path = os.path.join(data_dir, EVENTS_FILE)
+        if os.path.isfile(state_path):
+            index.state = pd.read_csv(state_path, index_col='bin_id', dtype={'bin_id': str},
+                                      parse_dates=['low_start', 'last_timestamp', 'cycle_start'])
+        if os.path.isfile(events_path):
+            index.events = pd.read_csv(events_path, dtype={'bin_id': str}, parse_dates=['timestamp'])
+        return index
+
+def build_event_index(df):
+    """
+    Full-history pass: returns an EmptyingEventIndex built from 'df'.
+    """
+    index = EmptyingEventIndex()
+    index.update(df)
+    return index
@@ -0,0 +1,320 @@
+"""
+Environmental Risk Engine
+
+Textiles kept warm and damp start to smell and mold. For every bin the
+engine tracks, on an hourly grid (hourly means of the readings):
+
+    hot_hours          hours above TEMP_LIMIT_C in the last WINDOW_HOURS
+    humid_hours        hours above HUMIDITY_LIMIT_PCT in the last WINDOW_HOURS
+    sustained_humid_h  how long the smoothed humidity (EWM, half-life
+                       HUMIDITY_HALFLIFE_H) has stayed above the limit, up to now
+    mold_index         0-100: EWM (half-life MOLD_HALFLIFE_H) of an hourly
+                       growth factor that rises with humidity above the limit
+                       and with warmth up to MOLD_T_OPT_C
+
+All bins are processed together: new rows are aggregated into an hours x
+bins matrix with one bincount, the EWMs run down the matrix with pandas
+ewm (one column per bin) continuing from the saved per-bin state, and only
+those states, the open (current) hour and the last WINDOW_HOURS hourly
+sums are kept. The first pass over years of history and every later
+refresh are the same code; a refresh costs in proportion to the new data.
+Rows arriving for hours already folded in still count towards the window
+figures, but not the EWMs.
+
+Register RiskEngine.on_rows as an IncrementalLoader listener; ranking()
+lists the bins worst first.
+
+Usage:
+    python analytics/environmental_risk.py      # ranked list for the data lake
+"""
+
+import os
+import sys
+import threading
+import numpy as np
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+# --- CONFIGURATION ---
+TEMP_LIMIT_C = 25            # Samat rajat kuin dashboardin kaavioissa
+HUMIDITY_LIMIT_PCT = 60
+WINDOW_HOURS = 7 * 24
+HUMIDITY_HALFLIFE_H = 6      # Smoothing: a single damp reading is not "sustained"
+MOLD_HALFLIFE_H = 72         # Mold needs days of exposure, and dries out slowly
+MOLD_RH_FULL_PCT = 90        # Growth factor 1 at/above this humidity...
+MOLD_T_MIN_C = 5             # ...scaled by warmth: 0 below MOLD_T_MIN_C,
+MOLD_T_OPT_C = 25            # 1 from MOLD_T_OPT_C on
+CHUNK_HOURS = 24 * 30        # Hours per matrix when catching up on history
+
+# Risk levels (ranking order: high, elevated, ok)
+MOLD_HIGH = 50
+MOLD_ELEVATED = 20
+SUSTAINED_HIGH_H = 24
+SUSTAINED_ELEVATED_H = 6
+HOT_HOURS_ELEVATED = 12
+RISK_LEVELS = ["ok", "elevated", "high"]
+RISK_REASONS = ["mold_index", "sustained_humidity", "heat"]
+
+HOUR_NS = 3600 * 10**9
+_NAT = np.datetime64('NaT').view(np.int64)
+
+# ==========================================
+# VECTORIZED HELPERS
+# ==========================================
+
+def _alpha(halflife_hours):
+    return 1 - 0.5 ** (1 / halflife_hours)
+
+def mold_factor(temperature, humidity):
+    """
+    Hourly mold-growth factor 0-1 (NaN where a value is missing).
+    """
+    damp = np.clip((humidity - HUMIDITY_LIMIT_PCT) / (MOLD_RH_FULL_PCT - HUMIDITY_LIMIT_PCT), 0, 1)
+    warm = np.clip((temperature - MOLD_T_MIN_C) / (MOLD_T_OPT_C - MOLD_T_MIN_C), 0, 1)
+    return damp * warm
+
+def _ewm(state, values, alpha):
+    """
+    Continues an EWM from 'state' (one value per column) down the rows of
+    'values', all columns at once. NaN = no reading that hour: the previous
+    value is kept (pandas ewm(adjust=False, ignore_na=True)).
+
+    Closed form of s[t] = (1 - a[t]) * s[t-1] + a[t] * x[t] with a[t] = 0
+    on missing hours: s[t] = P[t] * (s0 + cumsum(a * x / P)[t]), P[t] =
+    prod(1 - a[:t+1]). CHUNK_HOURS keeps P well inside float64 range.
+    """
+    missing = np.isnan(values)
+    weight = np.where(missing, 0.0, alpha)
+    first = values[np.argmax(~missing, axis=0), np.arange(values.shape[1])]
+    start = np.where(np.isnan(state), first, state)           # First reading starts the average
+    decay = np.exp(np.cumsum(np.log1p(-weight), axis=0))
+    with np.errstate(invalid='ignore'):
+        return decay * (start + np.cumsum(weight * np.where(missing, 0.0, values) / decay, axis=0))
+
+def _last_run(flag, carry):
+    """
+    Length of the run of True values ending at the last row, per column;
+    runs that started before the matrix continue from 'carry'.
+    """
+    rows = np.arange(1, len(flag) + 1)[:, None]
+    last_false = np.maximum.accumulate(np.where(flag, 0, rows), axis=0)[-1]
+    return np.where(last_false == 0, carry + len(flag), len(flag) - last_false)
+
+def _hourly_means(sums):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums[0] / sums[1], sums[2] / sums[3]
+
+# ==========================================
+# RISK ENGINE
+# ==========================================
+
+class RiskEngine:
+    """
+    Incrementally maintained environmental exposure of every bin.
+    Thread-safe: shared by all dashboard sessions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.bin_ids = []
+        self._codes = {}
+        self.late_rows = 0                       # Rows too old for the window (ignored)
+        self._open_hour = None                   # Hour still being filled, not folded yet
+        self._open = np.zeros((4, 0))            # temp sum/count, humidity sum/count per bin
+        self._window = np.zeros((4, 0, 0))       # Same, for the closed hours before _open_hour
+        self._humidity = np.empty(0)             # EWM states as of _open_hour
+        self._mold = np.empty(0)
+        self._humid_run = np.empty(0)
+        self._last_ts = np.empty(0, dtype=np.int64)   # Latest reading per bin (ns)
+        self._last = np.empty((0, 2))                 # ...and its temperature, humidity
+
+    def on_rows(self, new_rows, reloaded):
+        """IncrementalLoader listener."""
+        with self._lock:
+            if reloaded:
+                self.reset()
+            if new_rows is not None and len(new_rows):
+                self._update(new_rows)
+
+    # --- update ---
+
+    def _grow(self, n_bins):
+        extra = n_bins - len(self._humidity)
+        if extra <= 0:
+            return
+        self._open = np.pad(self._open, ((0, 0), (0, extra)))
+        self._window = np.pad(self._window, ((0, 0), (0, 0), (0, extra)))
+        self._humidity = np.r_[self._humidity, np.full(extra, np.nan)]
+        self._mold = np.r_[self._mold, np.full(extra, np.nan)]
+        self._humid_run = np.r_[self._humid_run, np.zeros(extra)]
+        self._last_ts = np.r_[self._last_ts, np.full(extra, _NAT)]
+        self._last = np.vstack([self._last, np.full((extra, 2), np.nan)])
+
+    def _update(self, df):
+        ts = df['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        codes, names = pd.factorize(df['bin_id'])
+        mapping = np.array([self._codes.setdefault(b, len(self._codes)) for b in names], dtype=np.int64)
+        self.bin_ids = list(self._codes)
+        self._grow(len(self._codes))
+
+        col = mapping[codes]
+        temp = df['temperature_c'].to_numpy(dtype=np.float64)
+        hum = df['humidity_pct'].to_numpy(dtype=np.float64)
+        if len(ts) > 1 and (np.diff(ts) < 0).any():
+            order = np.argsort(ts, kind='stable')
+            ts, col, temp, hum = ts[order], col[order], temp[order], hum[order]
+        hours = ts // HOUR_NS
+
+        # Latest reading per bin (rows are time-sorted: last occurrence wins)
+        last_pos = pd.Series(col).drop_duplicates(keep='last').index.to_numpy()
+        last_pos = last_pos[ts[last_pos] >= self._last_ts[col[last_pos]]]
+        self._last_ts[col[last_pos]] = ts[last_pos]
+        self._last[col[last_pos]] = np.c_[temp[last_pos], hum[last_pos]]
+
+        if self._open_hour is None:
+            self._open_hour = int(hours[0])
+        late = np.searchsorted(hours, self._open_hour)
+        if late:
+            self._add_late(hours[:late], col[:late], temp[:late], hum[:late])
+            hours, col, temp, hum = hours[late:], col[late:], temp[late:], hum[late:]
+        if not len(hours):
+            return
+
+        last_hour = int(hours[-1])
+        start = self._open_hour
+        while True:
+            end = min(start + CHUNK_HOURS, last_hour + 1)
+            lo, hi = np.searchsorted(hours, [start, end])
+            sums = self._aggregate(hours[lo:hi] - start, col[lo:hi], temp[lo:hi], hum[lo:hi], end - start)
+            sums[:, 0] += self._open
+            if end == last_hour + 1:
+                self._fold(sums[:, :-1])
+                self._open = sums[:, -1]
+                self._open_hour = last_hour
+                return
+            self._fold(sums)
+            self._open = np.zeros_like(self._open)
+            start = end
+
+    def _aggregate(self, row, col, temp, hum, n_hours):
+        """(4, n_hours, bins) sums/counts of temperature and humidity."""
+        n_bins = len(self.bin_ids)
+        key = row * n_bins + col
+        out = np.empty((4, n_hours, n_bins))
+        for i, values in enumerate((temp, hum)):
+            valid = ~np.isnan(values)
+            out[2 * i] = np.bincount(key[valid], values[valid], minlength=n_hours * n_bins).reshape(n_hours, n_bins)
+            out[2 * i + 1] = np.bincount(key[valid], minlength=n_hours * n_bins).reshape(n_hours, n_bins)
+        return out
+
+    def _fold(self, closed):
+        """Advances the EWM states over closed hours and appends them to the window."""
+        if not closed.shape[1]:
+            return
+        temp, hum = _hourly_means(closed)
+        smoothed = _ewm(self._humidity, hum, _alpha(HUMIDITY_HALFLIFE_H))
+        with np.errstate(invalid='ignore'):
+            self._humid_run = _last_run(smoothed > HUMIDITY_LIMIT_PCT, self._humid_run)
+        self._humidity = smoothed[-1]
+        self._mold = _ewm(self._mold, mold_factor(temp, hum), _alpha(MOLD_HALFLIFE_H))[-1]
+        self._window = np.concatenate([self._window, closed[:, -WINDOW_HOURS:]], axis=1)[:, -WINDOW_HOURS:]
+
+    def _add_late(self, hours, col, temp, hum):
+        row = hours - (self._open_hour - self._window.shape[1])
+        inside = row >= 0
+        self.late_rows += int((~inside).sum())
+        row, col = row[inside], col[inside]
+        for i, values in enumerate((temp[inside], hum[inside])):
+            valid = ~np.isnan(values)
+            np.add.at(self._window[2 * i], (row[valid], col[valid]), values[valid])
+            np.add.at(self._window[2 * i + 1], (row[valid], col[valid]), 1)
+
+    # --- query ---
+
+    def ranking(self, at_risk_only=False):
+        """
+        Risk figures of every bin, worst first.
+
+        Returns:
+            pd.DataFrame indexed by bin_id: last_reading, temperature_c,
+            humidity_pct, hot_hours, humid_hours, sustained_humid_h,
+            mold_index, risk (RISK_LEVELS) and reason (RISK_REASONS, "" if ok).
+        """
+        with self._lock:
+            if not self.bin_ids:
+                return pd.DataFrame(columns=["last_reading", "temperature_c", "humidity_pct", "hot_hours",
+                                             "humid_hours", "sustained_humid_h", "mold_index", "risk", "reason"])
+            # The open hour counts provisionally, so the figures include the latest readings
+            temp_now, hum_now = _hourly_means(self._open)
+            humidity = _ewm(self._humidity, hum_now[None, :], _alpha(HUMIDITY_HALFLIFE_H))
+            mold = _ewm(self._mold, mold_factor(temp_now, hum_now)[None, :], _alpha(MOLD_HALFLIFE_H))[0]
+            with np.errstate(invalid='ignore'):
+                run = _last_run(humidity > HUMIDITY_LIMIT_PCT, self._humid_run)
+                window = np.concatenate([self._window, self._open[:, None]], axis=1)[:, -WINDOW_HOURS:]
+                temp, hum = _hourly_means(window)
+                hot_hours = (temp > TEMP_LIMIT_C).sum(axis=0)
+                humid_hours = (hum > HUMIDITY_LIMIT_PCT).sum(axis=0)
+            mold_index = np.nan_to_num(mold * 100)
+            last_ts, last = self._last_ts.copy(), self._last.copy()
+
+        high = [mold_index >= MOLD_HIGH, run >= SUSTAINED_HIGH_H]
+        elevated = [mold_index >= MOLD_ELEVATED, run >= SUSTAINED_ELEVATED_H, hot_hours >= HOT_HOURS_ELEVATED]
+        level = np.select([np.any(high, axis=0), np.any(elevated, axis=0)], [2, 1], 0)
+        result = pd.DataFrame({
+            'last_reading': last_ts.view('datetime64[ns]'),
+            'temperature_c': last[:, 0],
+            'humidity_pct': last[:, 1],
+            'hot_hours': hot_hours,
+            'humid_hours': humid_hours,
+            'sustained_humid_h': run.astype(np.int64),
+            'mold_index': mold_index.round(1),
+            'risk': np.array(RISK_LEVELS)[level],
+            'reason': np.select(high + elevated, RISK_REASONS[:2] + RISK_REASONS, ""),
+            '_level': level,
+        }, index=pd.Index(self.bin_ids[:len(level)], name='bin_id'))
+        result = result.sort_values(['_level', 'mold_index', 'sustained_humid_h', 'hot_hours'], ascending=False,
+                                    kind='stable').drop(columns='_level')
+        if at_risk_only:
+            result = result[result['risk'] != "ok"]
+        return result
+
+    def report_columns(self):
+        """
+        Per-bin columns for the report rules and the AI prompt (join onto the
+        fleet frame): see report_columns().
+        """
+        return report_columns(self.ranking())
+
+def report_columns(ranking):
+    """
+    env_risk (level) and environment (one-line summary) per bin, from a
+    ranking() frame (also one read from the compute worker's cache).
+    """
+    summary = (ranking['risk'] + " (mold index " + ranking['mold_index'].map("{:.0f}".format) + "/100, "
+               + ranking['hot_hours'].astype(str) + f" h > {TEMP_LIMIT_C} C and "
+               + ranking['humid_hours'].astype(str) + f" h > {HUMIDITY_LIMIT_PCT}% humidity in "
+               + f"{WINDOW_HOURS // 24} days, humid for " + ranking['sustained_humid_h'].astype(str) + " h now)")
+    return pd.DataFrame({'env_risk': ranking['risk'], 'environment': summary})
+
+# ==========================================
+# MAIN PROGRAM
+# ==========================================
+
+if __name__ == "__main__":
+    from edge_gateway.lake_query import query
+
+    df = query(columns=["temperature_c", "humidity_pct", "bin_id"])
+    if df is None:
+        raise SystemExit("[ERROR] No data found.")
+    engine = RiskEngine()
+    engine.on_rows(df, True)
+    ranking = engine.ranking()
+    print(f"--- ENVIRONMENTAL RISK ({len(ranking)} bins, {int((ranking['risk'] != 'ok').sum())} at risk) ---")
+    print(ranking.head(20).to_string())
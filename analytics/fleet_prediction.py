@@ -0,0 +1,118 @@
+"""
+Fleet-wide Fill-Rate Prediction
+
+Vectorized version of predict_emptying.analyze_data for many bins at once.
+Takes a long-format frame (one row per reading, any number of bins) and in
+one NumPy pass per step finds each bin's current cycle, fits the fill rate
+with closed-form least squares (grouped sums via np.bincount) and returns
+the predicted full date per bin. No Python loop over bins.
+
+Same model as analyze_data:
+    - Cycle starts at the last confirmed-low reading, i.e. below CYCLE_RESET_PCT
+      for CONFIRM_READINGS readings in a row (else at the first reading), so a
+      single bad ultrasonic reading does not restart the cycle (see emptying_events).
+    - fill_level_pct ~ intercept + fill_rate * days_since_cycle_start
+    - days_left = (100 - intercept) / fill_rate - days_elapsed, if fill_rate > MIN_FILL_RATE
+"""
+
+import numpy as np
+import pandas as pd
+
+from analytics.emptying_events import LOW_PCT, confirmed_lows
+
+# --- CONFIGURATION ---
+BIN_DEPTH_CM = 100
+CYCLE_RESET_PCT = LOW_PCT  # Confirmed reading below this = bin was emptied
+MIN_FILL_RATE = 0.1      # % / day; slower bins are reported as "not filling up"
+SECONDS_PER_DAY = 24 * 3600
+NAT = np.iinfo(np.int64).min
+
+def compute_fill_level(distance_cm, bin_depth_cm=BIN_DEPTH_CM):
+    """
+    Converts ultrasonic distance (cm) to fill level (%), clipped to 0..100.
+    """
+    return (((bin_depth_cm - distance_cm) / bin_depth_cm) * 100).clip(0, 100)
+
+def _group_starts(codes):
+    """
+    Index of the first row of each run of equal codes (codes must be sorted).
+    """
+    return np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+def predict_fleet(df, min_fill_rate=MIN_FILL_RATE):
+    """
+    Predicts the full date of every bin in one vectorized pass.
+
+    Args:
+        df (pd.DataFrame): Long format with 'bin_id', 'timestamp' and either
+            'fill_level_pct' or 'distance_cm'. Rows may be in any order;
+            rows without a value or timestamp are ignored.
+        min_fill_rate (float): Bins filling slower get no prediction.
+
+    Returns:
+        pd.DataFrame indexed by bin_id: cycle_start, n_points, current_fill,
+        fill_rate (% / day), intercept, days_elapsed, days_left, predicted_full.
+    """
+    if 'fill_level_pct' in df:
+        fill = df['fill_level_pct'].to_numpy(dtype=np.float64)
+    else:
+        fill = compute_fill_level(df['distance_cm'].to_numpy(dtype=np.float64))
+    ts = df['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    bins = df['bin_id']
+
+    # 0. Readings stored without a distance (or time) would turn the sums
+    # of their whole bin into NaN: leave them out
+    valid = np.isfinite(fill) & (ts != NAT)
+    if not valid.all():
+        fill, ts, bins = fill[valid], ts[valid], bins[valid]
+    codes, bin_ids = pd.factorize(bins, sort=True)
+
+    # 1. Sort by (bin, time) so every bin is one contiguous, ordered block
+    # (skipped when the frame already is, e.g. straight from the data lake)
+    ordered = (codes[1:] > codes[:-1]) | ((codes[1:] == codes[:-1]) & (ts[1:] >= ts[:-1]))
+    if not ordered.all():
+        order = np.lexsort((ts, codes))
+        codes, ts, fill = codes[order], ts[order], fill[order]
+    starts = _group_starts(codes)
+    n_bins = len(starts)
+
+    # 2. Current cycle start per bin: last confirmed-low reading
+    pos = np.arange(len(codes))
+    group_start = np.zeros(len(codes), dtype=bool)
+    group_start[starts] = True
+    low_pos = np.where(confirmed_lows(fill, group_start), pos, -1)
+    cycle_pos = np.maximum(np.maximum.reduceat(low_pos, starts), starts)
+    mask = pos >= cycle_pos[codes]
+
+    # 3. Closed-form least squares on the cycle rows (centered for stability)
+    c = codes[mask]
+    x = (ts[mask] - ts[cycle_pos][c]) / (SECONDS_PER_DAY * 1e9)
+    y = fill[mask]
+    n = np.bincount(c, minlength=n_bins).astype(np.float64)
+    mean_x = np.bincount(c, weights=x, minlength=n_bins) / n
+    mean_y = np.bincount(c, weights=y, minlength=n_bins) / n
+    dx = x - mean_x[c]
+    sxx = np.bincount(c, weights=dx * dx, minlength=n_bins)
+    sxy = np.bincount(c, weights=dx * (y - mean_y[c]), minlength=n_bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fill_rate = np.where(sxx > 0, sxy / sxx, 0.0)
+    intercept = mean_y - fill_rate * mean_x
+
+    # 4. Prediction
+    ends = np.r_[starts[1:], len(codes)] - 1
+    days_elapsed = (ts[ends] - ts[cycle_pos]) / (SECONDS_PER_DAY * 1e9)
+    filling = fill_rate > min_fill_rate
+    with np.errstate(invalid='ignore', divide='ignore'):
+        days_to_full = np.where(filling, (100 - intercept) / fill_rate, np.nan)
+    cycle_start = pd.to_datetime(ts[cycle_pos])
+
+    return pd.DataFrame({
+        'cycle_start': cycle_start,
+        'n_points': n.astype(np.int64),
+        'current_fill': fill[ends],
+        'fill_rate': fill_rate,
+        'intercept': intercept,
+        'days_elapsed': days_elapsed,
+        'days_left': days_to_full - days_elapsed,
+        'predicted_full': cycle_start + pd.to_timedelta(days_to_full, unit='D'),
+    }, index=pd.Index(bin_ids, name='bin_id'))
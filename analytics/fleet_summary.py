@@ -0,0 +1,262 @@
+"""
+Fleet Summary Table
+
+One row per bin with everything the fleet overview shows, kept up to date
+from the loader's new rows (register FleetSummary.on_rows as an
+IncrementalLoader listener), so the overview costs the same whether the
+lake holds a week or years:
+
+    latest reading     fill level, temperature, humidity and its timestamp
+    24 h deltas        fill level and temperature now vs. 24 h earlier
+    fill rate          least-squares fit over the current cycle, as in
+                       fleet_prediction.predict_fleet: days_left, predicted_full
+    status / risk      CRITICAL above CRITICAL_FILL_PCT; risk level, reason
+                       and mold index from the RiskEngine, if one is given
+
+Per bin the state is a fixed handful of numbers, updated for all bins of a
+batch at once (no Python loop over bins):
+
+    - cycle fit: count, means and co-moments of (days since cycle start,
+      fill level), merged batch by batch (Chan et al.) and restarted at a
+      confirmed-low reading, the same rule as emptying_events
+    - 24 h reference: the last reading of each of the last DELTA_SLOTS
+      hours in a ring. The delta compares with the newest of those taken
+      more than 24 h before the latest reading: exact to the hour (the
+      original frame scan used the very last reading before that instant),
+      NaN if the bin sent nothing in the few hours before it
+
+Rows older than a bin's latest reading are counted in late_rows and left
+out (the gateway and loader deliver each bin's readings in order).
+
+Usage:
+    python analytics/fleet_summary.py      # summary of the data lake
+"""
+
+import os
+import sys
+import threading
+import numpy as np
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from analytics.emptying_events import CONFIRM_READINGS, _fill_of, _run_counts
+from analytics.fleet_prediction import CYCLE_RESET_PCT, MIN_FILL_RATE
+
+# --- CONFIGURATION ---
+CRITICAL_FILL_PCT = 80       # Sama raja kuin dashboardin "CRITICAL"-tila
+DELTA_SLOTS = 28             # Hours kept for the 24 h delta: 24 + up to 3 h before the reference instant
+
+HOUR_NS = 3600 * 10**9
+DAY_NS = 24 * HOUR_NS
+_NAT = np.datetime64('NaT').view(np.int64)
+
+SUMMARY_COLUMNS = ["last_reading", "fill_level_pct", "fill_delta_24h", "temperature_c", "temp_delta_24h",
+                   "humidity_pct", "status", "cycle_start", "n_points", "fill_rate", "intercept", "days_left",
+                   "predicted_full"]
+RISK_COLUMNS = ["risk", "reason", "mold_index"]
+
+# ==========================================
+# SUMMARY TABLE
+# ==========================================
+
+class FleetSummary:
+    """
+    Incrementally maintained per-bin summary of the whole fleet.
+    Thread-safe: shared by all dashboard sessions.
+
+    Args:
+        risk_engine (RiskEngine): Optional; its risk columns are joined
+            onto table().
+    """
+
+    def __init__(self, risk_engine=None):
+        self.risk_engine = risk_engine
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.bin_ids = []
+        self._codes = {}
+        self.late_rows = 0
+        self._last_ts = np.empty(0, dtype=np.int64)        # Latest reading per bin (ns)
+        self._last = np.empty((0, 3))                      # ...fill, temperature, humidity
+        self._slot_ts = np.empty((0, DELTA_SLOTS), dtype=np.int64)   # Last reading of hour h at h % DELTA_SLOTS
+        self._slot = np.empty((0, DELTA_SLOTS, 2))                   # ...its fill, temperature
+        self._low_count = np.empty(0, dtype=np.int64)      # Open run of low readings
+        self._cycle_start = np.empty(0, dtype=np.int64)
+        self._fit = np.zeros((5, 0))                       # n, mean_x, mean_y, m2_x, c_xy of the cycle
+
+    def on_rows(self, new_rows, reloaded):
+        """IncrementalLoader listener."""
+        with self._lock:
+            if reloaded:
+                self.reset()
+            if new_rows is not None and len(new_rows):
+                self._update(new_rows)
+
+    # --- update ---
+
+    def _grow(self, n_bins):
+        extra = n_bins - len(self._last_ts)
+        if extra <= 0:
+            return
+        self._last_ts = np.r_[self._last_ts, np.full(extra, _NAT)]
+        self._last = np.vstack([self._last, np.full((extra, 3), np.nan)])
+        self._slot_ts = np.vstack([self._slot_ts, np.full((extra, DELTA_SLOTS), _NAT)])
+        self._slot = np.concatenate([self._slot, np.full((extra, DELTA_SLOTS, 2), np.nan)])
+        self._low_count = np.r_[self._low_count, np.zeros(extra, dtype=np.int64)]
+        self._cycle_start = np.r_[self._cycle_start, np.full(extra, _NAT)]
+        self._fit = np.pad(self._fit, ((0, 0), (0, extra)))
+
+    def _update(self, df):
+        ts = df['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        codes, names = pd.factorize(df['bin_id'])
+        mapping = np.array([self._codes.setdefault(b, len(self._codes)) for b in names], dtype=np.int64)
+        self.bin_ids = list(self._codes)
+        self._grow(len(self._codes))
+
+        # Every bin one contiguous, time-ordered block; drop rows the table is already past
+        col = mapping[codes]
+        order = np.lexsort((ts, col))
+        col, ts = col[order], ts[order]
+        fresh = ts > self._last_ts[col]
+        self.late_rows += int((~fresh).sum())
+        if not fresh.all():
+            order, col, ts = order[fresh], col[fresh], ts[fresh]
+        if not len(ts):
+            return
+        fill = _fill_of(df)[order]
+        temp = df['temperature_c'].to_numpy(dtype=np.float64)[order]
+        hum = df['humidity_pct'].to_numpy(dtype=np.float64)[order]
+
+        n = len(col)
+        pos = np.arange(n)
+        group_start = np.r_[True, col[1:] != col[:-1]]
+        starts = np.flatnonzero(group_start)
+        ends = np.r_[starts[1:], n] - 1
+        bins = col[starts]
+
+        # 1. Latest reading
+        self._last_ts[bins] = ts[ends]
+        self._last[bins] = np.c_[fill[ends], temp[ends], hum[ends]]
+
+        # 2. Hour ring: last reading of each hour, only the hours the ring still covers
+        hours = ts // HOUR_NS
+        last_of_hour = np.r_[(col[1:] != col[:-1]) | (hours[1:] != hours[:-1]), True]
+        last_hour = np.repeat(hours[ends], ends - starts + 1)
+        keep = np.flatnonzero(last_of_hour & (hours > last_hour - DELTA_SLOTS))
+        slot = hours[keep] % DELTA_SLOTS
+        self._slot_ts[col[keep], slot] = ts[keep]
+        self._slot[col[keep], slot] = np.c_[fill[keep], temp[keep]]
+
+        # 3. Cycle: restarts at the last confirmed-low reading of the batch
+        low_count, _ = _run_counts(fill < CYCLE_RESET_PCT, group_start, self._low_count[col])
+        self._low_count[bins] = low_count[ends]
+        last_low = np.maximum.reduceat(np.where(low_count >= CONFIRM_READINGS, pos, -1), starts)
+        new_bin = self._cycle_start[bins] == _NAT
+        restart = (last_low >= 0) | new_bin
+        cycle_pos = np.where(last_low >= 0, last_low, starts)
+        self._cycle_start[bins[restart]] = ts[cycle_pos[restart]]
+        self._fit[:, bins[restart]] = 0.0
+
+        # 4. Fit: batch moments of the cycle rows, merged into the running ones
+        group = np.cumsum(group_start) - 1
+        rows = (pos >= np.where(restart, cycle_pos, starts)[group]) & ~np.isnan(fill)
+        c = col[rows]
+        x = (ts[rows] - self._cycle_start[c]) / DAY_NS
+        y = fill[rows]
+        n_bins = len(self.bin_ids)
+        nb = np.bincount(c, minlength=n_bins).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mx = np.bincount(c, weights=x, minlength=n_bins) / nb
+            my = np.bincount(c, weights=y, minlength=n_bins) / nb
+        dx, dy = x - mx[c], y - my[c]
+        m2 = np.bincount(c, weights=dx * dx, minlength=n_bins)
+        cxy = np.bincount(c, weights=dx * dy, minlength=n_bins)
+        self._merge_fit(np.flatnonzero(nb), nb, mx, my, m2, cxy)
+
+    def _merge_fit(self, idx, nb, mx, my, m2, cxy):
+        na, ma_x, ma_y, m2a, ca = self._fit[:, idx]
+        nb, mx, my, m2, cxy = nb[idx], mx[idx], my[idx], m2[idx], cxy[idx]
+        total = na + nb
+        dx, dy = mx - ma_x, my - ma_y
+        w = na * nb / total
+        self._fit[:, idx] = [total, ma_x + dx * nb / total, ma_y + dy * nb / total,
+                             m2a + m2 + dx * dx * w, ca + cxy + dx * dy * w]
+
+    # --- query ---
+
+    def table(self):
+        """
+        Summary of every bin (sorted by bin_id).
+
+        Returns:
+            pd.DataFrame indexed by bin_id: last_reading, fill_level_pct,
+            fill_delta_24h, temperature_c, temp_delta_24h, humidity_pct,
+            status ("CRITICAL"/"Optimal"), cycle_start, n_points, fill_rate
+            (% / day), intercept, days_left, predicted_full (NaN/NaT if not
+            filling up),
+            plus risk, reason and mold_index with a risk engine.
+        """
+        with self._lock:
+            if not self.bin_ids:
+                return pd.DataFrame(columns=SUMMARY_COLUMNS + (RISK_COLUMNS if self.risk_engine else []))
+            last_ts, last = self._last_ts.copy(), self._last.copy()
+            slot_ts, slot = self._slot_ts.copy(), self._slot.copy()
+            cycle_start, fit = self._cycle_start.copy(), self._fit.copy()
+            bin_ids = list(self.bin_ids)
+
+        # 24 h reference: newest ring entry older than (latest - 24 h); entries
+        # from before the hours the ring covers are stale (slot not rewritten)
+        rows = np.arange(len(last_ts))
+        covered = (last_ts // HOUR_NS - DELTA_SLOTS + 1) * HOUR_NS
+        older = np.where((slot_ts < (last_ts - DAY_NS)[:, None]) & (slot_ts >= covered[:, None]), slot_ts, _NAT)
+        ref = older.argmax(axis=1)
+        has_ref = older[rows, ref] != _NAT
+        delta = np.where(has_ref[:, None], last[:, :2] - slot[rows, ref], np.nan)
+
+        n, mean_x, mean_y, m2_x, c_xy = fit
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fill_rate = np.where(m2_x > 0, c_xy / m2_x, 0.0)
+            intercept = mean_y - fill_rate * mean_x
+            days_to_full = np.where(fill_rate > MIN_FILL_RATE, (100 - intercept) / fill_rate, np.nan)
+        start = pd.to_datetime(cycle_start.view('datetime64[ns]'))
+
+        result = pd.DataFrame({
+            'last_reading': last_ts.view('datetime64[ns]'),
+            'fill_level_pct': last[:, 0],
+            'fill_delta_24h': delta[:, 0],
+            'temperature_c': last[:, 1],
+            'temp_delta_24h': delta[:, 1],
+            'humidity_pct': last[:, 2],
+            'status': np.where(last[:, 0] > CRITICAL_FILL_PCT, "CRITICAL", "Optimal"),
+            'cycle_start': start,
+            'n_points': n.astype(np.int64),
+            'fill_rate': fill_rate,
+            'intercept': intercept,
+            'days_left': days_to_full - (last_ts - cycle_start) / DAY_NS,
+            'predicted_full': start + pd.to_timedelta(days_to_full, unit='D'),
+        }, index=pd.Index(bin_ids, name='bin_id')).sort_index()
+        if self.risk_engine is not None:
+            result = result.join(self.risk_engine.ranking()[RISK_COLUMNS])
+        return result
+
+# ==========================================
+# MAIN PROGRAM
+# ==========================================
+
+if __name__ == "__main__":
+    from edge_gateway.lake_query import query
+
+    df = query()
+    if df is None:
+        raise SystemExit("[ERROR] No data found.")
+    summary = FleetSummary()
+    summary.on_rows(df, True)
+    table = summary.table()
+    print(f"--- FLEET SUMMARY ({len(table)} bins, {int((table['status'] == 'CRITICAL').sum())} critical) ---")
+    print(table.sort_values('days_left').head(20).to_string())
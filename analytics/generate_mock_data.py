@@ -1,79 +1,327 @@
+"""
+Mock Sensor Data Generator
+
+Generates synthetic sensor history for any number of bins, fully vectorized:
+every chunk is a (bins x time steps) matrix, the fill level is a cumulative
+sum of deposits that resets when the bin is emptied, and the whole chunk is
+written in one go (pyarrow CSV writer when available). Output is streamed
+chunk by chunk, so memory stays bounded regardless of the size of the run.
+
+Patterns: weekly (more deposits at weekends), seasonal (fill rate and
+temperature), daily temperature cycle, humidity following temperature.
+Anomalies: ultrasonic glitches (0 cm / lost echo), temperature spikes and
+dropped readings.
+
+Usage:
+    python generate_mock_data.py                                  # 1 bin, 90 days, hourly (as before)
+    python generate_mock_data.py --bins 1000 --days 365 --interval 1 --workers 4
+    python generate_mock_data.py --format parquet
+"""
+
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
+from multiprocessing import Pool
+import argparse
+import io
 import os
+import shutil
+import sys
+import time
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from edge_gateway.csv_writer import CSV_FIELDS, DEFAULT_BIN_ID
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
 
 # --- CONFIGURATION ---
 # Generoidaan dataa tähän kansioon, jotta dashboard löytää sen helposti
-OUTPUT_DIR = "../edge_gateway/data" 
+OUTPUT_DIR = "../edge_gateway/data"
 FILE_PREFIX = "sensor_data_" # Käytetään samaa etuliitettä kuin oikea gateway
 DAYS_TO_SIMULATE = 90 # Simuloidaan 3 kuukautta (tulee useampi tiedosto)
 BIN_DEPTH_CM = 100
+OUTPUT_FORMAT = "csv" # "csv" (kuten gateway) tai "parquet" (tiivistetty data lake)
+NUM_BINS = 1 # Yksi astia = DEFAULT_BIN_ID, useampi = TX-00000, TX-00001, ...
+INTERVAL_MINUTES = 60 # Mittausväli
+SEASONAL_AMPLITUDE = 0.2 # Täyttönopeuden vuodenaikavaihtelu (+-20 %)
+ANOMALY_RATE = 0.001 # Osuus lukemista, joissa anturivirhe
+DROPOUT_RATE = 0.0 # Osuus lukemista, jotka puuttuvat kokonaan
+MAX_RANGE_CM = 400 # Ultraäänianturin lukema, kun kaiku katoaa
+CHUNK_ROWS = 2_000_000 # Rivejä per kirjoitettava pala (rajoittaa muistinkäyttöä)
+BINS_PER_GROUP = 256 # Astiat jaetaan ryhmiin (rinnakkaistuksen yksikkö)
+SEED = 42
+
+TMP_SUBDIR = ".mock_tmp"
 
 def ensure_directory_exists(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
         print(f"[INFO] Created directory: {directory}")
 
-def generate_synthetic_data():
+def make_bin_ids(num_bins):
+    if num_bins == 1:
+        return [DEFAULT_BIN_ID]
+    return [f"TX-{i:05d}" for i in range(num_bins)]
+
+def make_timeline(days, interval_minutes, end=None):
+    """
+    Timestamps (datetime64[s]) ending at 'end' (default: now), one per interval.
+    """
+    step = np.timedelta64(int(round(interval_minutes * 60)), 's')
+    end = np.datetime64(end or datetime.now(), 's')
+    end -= (end - np.datetime64(0, 's')) % step
+    n_steps = int(days * 24 * 60 // interval_minutes)
+    return end - step * np.arange(n_steps - 1, -1, -1)
+
+def _chunk_ranges(timestamps, steps_per_chunk):
+    """
+    Splits the timeline into [start, stop) step ranges that never cross a
+    month boundary (one output file per month, one Parquet partition per chunk).
+    """
+    months = timestamps.astype('datetime64[M]')
+    bounds = np.r_[0, np.flatnonzero(months[1:] != months[:-1]) + 1, len(timestamps)]
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        for start in range(a, b, steps_per_chunk):
+            yield start, min(start + steps_per_chunk, b)
+
+# ==========================================
+# VECTORIZED SIMULATION
+# ==========================================
+
+def fill_with_resets(start_fill, deposits):
+    """
+    Cumulative fill level per bin (rows) that drops to 0 whenever it reaches
+    100 % (the bin is emptied), continuing from 'start_fill'.
+    One vectorized pass per emptying, not per reading.
+    """
+    fill = start_fill[:, None] + np.cumsum(deposits, axis=1)
+    cols = np.arange(fill.shape[1])
+    rows = np.arange(fill.shape[0])
+    while len(rows):
+        over = fill[rows] >= 100
+        has_over = over.any(axis=1)
+        rows = rows[has_over]
+        if not len(rows):
+            break
+        first = over[has_over].argmax(axis=1)
+        level = fill[rows, first]
+        fill[rows] -= np.where(cols >= first[:, None], level[:, None], 0.0)
+    return fill
+
+class _GroupSimulator:
+    """
+    State of one group of bins, carried from chunk to chunk.
+    """
+
+    def __init__(self, bin_ids, group_index, seed, interval_minutes, anomaly_rate, dropout_rate):
+        self.bin_ids = np.asarray(bin_ids)
+        self.rng = np.random.default_rng([seed, group_index])
+        n = len(bin_ids)
+        self.step_hours = interval_minutes / 60
+        self.anomaly_rate = anomaly_rate
+        self.dropout_rate = dropout_rate
+        self.rate_factor = self.rng.uniform(0.5, 1.5, n) if n > 1 else np.ones(1)
+        self.temp_offset = self.rng.normal(0, 1.5, n) if n > 1 else np.zeros(1)
+        self.fill = self.rng.uniform(0, 100, n) if n > 1 else np.zeros(1)
+
+    def simulate(self, timestamps):
+        """
+        Returns the columns (timestamp, measurements, bin_code = index into
+        the group's bin IDs) of one chunk of the timeline in time-major
+        order, like the gateway receives them.
+        """
+        rng = self.rng
+        n_bins, n_steps = len(self.bin_ids), len(timestamps)
+        days = (timestamps - np.datetime64(0, 's')) / np.timedelta64(1, 'D')
+        year_frac = (timestamps - timestamps.astype('datetime64[Y]')) / np.timedelta64(1, 'D') / 365.25
+        season = np.sin(2 * np.pi * (year_frac - 0.3))          # peaks in late July
+        daily = np.sin(2 * np.pi * (days % 1 - 0.375))          # peaks at 15:00
+        weekend = ((np.floor(days).astype(np.int64) + 3) % 7) >= 5  # 1970-01-01 was a Thursday
+
+        # 1. Fill level: deposits -> cumulative sum with reset at 100 %
+        per_step = np.where(weekend, 2.5, 1.0) * (1 + SEASONAL_AMPLITUDE * season) * self.step_hours
+        deposits = rng.uniform(0.1, 0.3, (n_bins, n_steps)) * self.rate_factor[:, None] * per_step
+        fill = fill_with_resets(self.fill, deposits)
+        self.fill = fill[:, -1].copy()
+
+        distance = BIN_DEPTH_CM - fill / 100 * BIN_DEPTH_CM + rng.uniform(-1, 1, fill.shape)
+
+        # 2. Environment
+        temperature = (18 + self.temp_offset[:, None] + 6 * season + 3 * daily
+                       + rng.normal(0, 0.7, fill.shape))
+        humidity = np.clip(55 - 1.2 * (temperature - 18) + rng.normal(0, 3, fill.shape), 20, 100)
+
+        # 3. Anomalies
+        if self.anomaly_rate > 0:
+            glitch = rng.random(fill.shape) < self.anomaly_rate
+            distance[glitch] = np.where(rng.random(glitch.sum()) < 0.5, 0.0, MAX_RANGE_CM)
+            spike = rng.random(fill.shape) < self.anomaly_rate
+            temperature[spike] += rng.uniform(10, 25, spike.sum())
+
+        # Time-major order: all bins of a timestamp, then the next timestamp
+        columns = {
+            'timestamp': np.repeat(timestamps, n_bins),
+            'distance_cm': distance.T.ravel().round(1),
+            'temperature_c': temperature.T.ravel().round(1),
+            'humidity_pct': humidity.T.ravel().round(1),
+            'bin_code': np.tile(np.arange(n_bins, dtype=np.int32), n_steps),
+        }
+        if self.dropout_rate > 0:
+            keep = rng.random(len(columns['timestamp'])) >= self.dropout_rate
+            columns = {c: v[keep] for c, v in columns.items()}
+        return columns
+
+# ==========================================
+# OUTPUT
+# ==========================================
+
+def to_frame(columns, bin_ids):
+    df = pd.DataFrame({c: columns[c] for c in CSV_FIELDS if c != 'bin_id'})
+    df['bin_id'] = np.asarray(bin_ids)[columns['bin_code']]
+    return df
+
+def format_csv_rows(columns, bin_ids):
+    """
+    CSV bytes of a chunk (no header) in the gateway's format.
+    With pyarrow the columns go straight to its C++ writer: measurements as
+    1-decimal decimals and bin IDs dictionary-encoded (no Python strings per row).
+    """
+    if not HAS_PYARROW:
+        return to_frame(columns, bin_ids).to_csv(index=False, header=False, date_format='%Y-%m-%d %H:%M:%S').encode('utf-8')
+    arrays = {'timestamp': pa.array(columns['timestamp'])}
+    for c in ['distance_cm', 'temperature_c', 'humidity_pct']:
+        arrays[c] = pa.array(columns[c]).cast(pa.decimal128(7, 1))
+    arrays['bin_id'] = pa.DictionaryArray.from_arrays(pa.array(columns['bin_code']), pa.array(list(bin_ids)))
+    buffer = io.BytesIO()
+    pa_csv.write_csv(pa.table(arrays), buffer, pa_csv.WriteOptions(include_header=False, quoting_style='none'))
+    return buffer.getvalue()
+
+def month_csv_name(month):
+    return f"{FILE_PREFIX}{month}.csv"
+
+def generate_group(task):
+    """
+    Simulates one group of bins over the whole timeline, chunk by chunk.
+    CSV chunks are appended to '<out_dir>/sensor_data_YYYY-MM.csv' (headerless);
+    Parquet chunks go straight into the bin/month partitions.
+
+    Returns:
+        (rows, bytes_written)
+    """
+    (group_index, bin_ids, timestamps, out_dir, output_format,
+     seed, interval_minutes, anomaly_rate, dropout_rate) = task
+    sim = _GroupSimulator(bin_ids, group_index, seed, interval_minutes, anomaly_rate, dropout_rate)
+    steps_per_chunk = max(1, CHUNK_ROWS // len(bin_ids))
+    rows = size = 0
+    months_started = set()
+
+    for start, stop in _chunk_ranges(timestamps, steps_per_chunk):
+        columns = sim.simulate(timestamps[start:stop])
+        month = str(timestamps[start].astype('datetime64[M]'))
+        if output_format == "parquet":
+            from edge_gateway.parquet_store import write_partitions
+            # First chunk of a month replaces old files of these partitions, the rest add to them
+            write_partitions(to_frame(columns, bin_ids), out_dir, basename=f"mock-{group_index}-{start}-{{i}}.parquet",
+                             replace=month not in months_started)
+        else:
+            data = format_csv_rows(columns, bin_ids)
+            with open(os.path.join(out_dir, month_csv_name(month)), 'ab') as f:
+                f.write(data)
+            size += len(data)
+        months_started.add(month)
+        rows += len(columns['timestamp'])
+    return rows, size
+
+def generate_synthetic_data(output_format=OUTPUT_FORMAT, num_bins=NUM_BINS, days=DAYS_TO_SIMULATE,
+                            interval_minutes=INTERVAL_MINUTES, anomaly_rate=ANOMALY_RATE,
+                            dropout_rate=DROPOUT_RATE, workers=1, seed=SEED, output_dir=OUTPUT_DIR):
     """
     Generates synthetic sensor data spanning multiple months.
-    Saves data into separate monthly CSV files (just like the real Gateway).
+    Saves data into separate monthly CSV files (just like the real Gateway),
+    or directly into the bin/month partitioned Parquet lake.
+
+    Args:
+        workers (int): Processes simulating bin groups in parallel. The output
+            does not depend on it (every group has its own random stream).
     """
-    np.random.seed(42)
-    ensure_directory_exists(OUTPUT_DIR)
-    
-    # 1. Generate timestamps
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=DAYS_TO_SIMULATE)
-    timestamps = [start_date + timedelta(hours=i) for i in range(DAYS_TO_SIMULATE * 24)]
-    
-    # 2. Generate data points
-    data = []
-    current_fill_pct = 0
-    
-    print(f"[INFO] Generating {len(timestamps)} data points...")
-
-    for ts in timestamps:
-        # Simulation logic (same as before)
-        hourly_deposit = np.random.uniform(0.1, 0.3) 
-        if ts.weekday() >= 5: 
-            hourly_deposit *= 2.5
-            
-        current_fill_pct += hourly_deposit
-        
-        if current_fill_pct >= 100:
-            current_fill_pct = 0 
-            
-        distance_cm = BIN_DEPTH_CM - (current_fill_pct / 100 * BIN_DEPTH_CM)
-        distance_cm += np.random.uniform(-1, 1)
-        
-        data.append({
-            "timestamp": ts, # Keep as object for grouping
-            "distance_cm": round(distance_cm, 1),
-            "temperature_c": round(np.random.uniform(15, 25), 1), 
-            "humidity_pct": round(np.random.uniform(40, 60), 1)
-        })
-        
-    # 3. Split into monthly files
-    df_all = pd.DataFrame(data)
-    
-    # Create a grouping key (Year-Month)
-    df_all['month_group'] = df_all['timestamp'].dt.strftime('%Y-%m')
-    
-    # Loop through groups and save files
-    for month, group_df in df_all.groupby('month_group'):
-        # Drop helper column
-        save_df = group_df.drop(columns=['month_group'])
-        
-        # Format timestamp back to string for CSV
-        save_df['timestamp'] = save_df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        filename = f"{FILE_PREFIX}{month}.csv"
-        filepath = os.path.join(OUTPUT_DIR, filename)
-        
-        save_df.to_csv(filepath, index=False)
-        print(f"[SUCCESS] Saved {len(save_df)} rows to: {filepath}")
+    ensure_directory_exists(output_dir)
+    start_time = time.perf_counter()
+
+    timestamps = make_timeline(days, interval_minutes)
+    bin_ids = make_bin_ids(num_bins)
+    groups = [bin_ids[i:i + BINS_PER_GROUP] for i in range(0, len(bin_ids), BINS_PER_GROUP)]
+    months = sorted({str(m) for m in np.unique(timestamps.astype('datetime64[M]'))})
+    print(f"[INFO] Generating {len(timestamps) * len(bin_ids)} data points "
+          f"({len(bin_ids)} bins x {len(timestamps)} readings, {workers} worker(s))...")
+
+    if output_format == "csv":
+        # Fresh monthly files with the gateway header; groups append to them
+        for month in months:
+            with open(os.path.join(output_dir, month_csv_name(month)), 'w') as f:
+                f.write(",".join(CSV_FIELDS) + "\n")
+
+    parallel_csv = workers > 1 and output_format == "csv"
+    tmp_root = os.path.join(output_dir, TMP_SUBDIR)
+
+    def group_dir(i):
+        # Parallel CSV: each group writes its own part files, merged in order below
+        if not parallel_csv:
+            return output_dir
+        path = os.path.join(tmp_root, f"group-{i}")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    tasks = [(i, g, timestamps, group_dir(i), output_format, seed, interval_minutes, anomaly_rate, dropout_rate)
+             for i, g in enumerate(groups)]
+
+    rows = size = 0
+    if workers > 1:
+        with Pool(workers) as pool:
+            for i, (group_rows, group_size) in enumerate(pool.imap(generate_group, tasks)):
+                rows, size = rows + group_rows, size + group_size
+                if parallel_csv:
+                    _merge_group_parts(tasks[i][3], output_dir, months)
+        if parallel_csv:
+            shutil.rmtree(tmp_root, ignore_errors=True)
+    else:
+        for task in tasks:
+            group_rows, group_size = generate_group(task)
+            rows, size = rows + group_rows, size + group_size
+
+    elapsed = time.perf_counter() - start_time
+    target = "Parquet lake in" if output_format == "parquet" else f"{len(months)} monthly CSV files in"
+    print(f"[SUCCESS] Saved {rows} rows ({size / 1e6:.0f} MB) to {target}: {output_dir}")
+    print(f"[INFO] {elapsed:.1f} s, {rows / elapsed:,.0f} rows/s")
+    return rows
+
+def _merge_group_parts(part_dir, output_dir, months):
+    for month in months:
+        part = os.path.join(part_dir, month_csv_name(month))
+        if os.path.isfile(part):
+            with open(part, 'rb') as src, open(os.path.join(output_dir, month_csv_name(month)), 'ab') as dst:
+                shutil.copyfileobj(src, dst, 16 * 1024 * 1024)
+    shutil.rmtree(part_dir, ignore_errors=True)
 
 if __name__ == "__main__":
-    generate_synthetic_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate synthetic textile bin sensor history")
+    parser.add_argument('--format', choices=["csv", "parquet"], default=OUTPUT_FORMAT, help="Output format")
+    parser.add_argument('--bins', type=int, default=NUM_BINS, help="Number of bins")
+    parser.add_argument('--days', type=float, default=DAYS_TO_SIMULATE, help="Days of history")
+    parser.add_argument('--interval', type=float, default=INTERVAL_MINUTES, help="Minutes between readings")
+    parser.add_argument('--anomaly-rate', type=float, default=ANOMALY_RATE, help="Share of glitched readings")
+    parser.add_argument('--dropout-rate', type=float, default=DROPOUT_RATE, help="Share of missing readings")
+    parser.add_argument('--workers', type=int, default=1, help="Parallel processes (bin groups)")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args()
+    generate_synthetic_data(args.format, args.bins, args.days, args.interval, args.anomaly_rate,
+                            args.dropout_rate, args.workers, args.seed, args.output_dir)
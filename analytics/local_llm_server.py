@@ -0,0 +1,143 @@
+"""
+Local LLM Stand-in Server
+
+A minimal OpenAI-compatible endpoint (POST /v1/chat/completions) built on
+the standard library, for testing the report service offline: no API key,
+no network, deterministic answers and a configurable latency, so latency
+and throughput of the real code path (same client, same requests) can be
+measured reproducibly.
+
+The reply follows the rules of the logistics prompt (URGENT > 80 %,
+LOW PRIORITY < 50 %, hygiene warning > 25 C), read from the prompt text.
+
+Usage:
+    python analytics/local_llm_server.py --port 8765 --latency-ms 300
+    # then: AI_PROVIDER=local streamlit run dashboard/dashboard_app.py
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- CONFIGURATION ---
+HOST = "127.0.0.1"
+PORT = 8765
+LATENCY_MS = 300
+
+# ==========================================
+# DETERMINISTIC REPLY
+# ==========================================
+
+def _field(prompt, label):
+    match = re.search(rf"{label}:\s*(.+)", prompt)
+    return match.group(1).strip() if match else "N/A"
+
+def _number(text):
+    match = re.search(r"[-+]?\d+(?:\.\d+)?", text)
+    return float(match.group()) if match else None
+
+def draft_reply(prompt):
+    """
+    Rule-based email draft for a logistics prompt (same input -> same output).
+    """
+    bin_id = _field(prompt, "Bin ID")
+    level_text = _field(prompt, "Current Level")
+    temp_text = _field(prompt, "Temperature")
+    full_date = _field(prompt, "Est. Full Date")
+    level, temp = _number(level_text), _number(temp_text)
+
+    if level is not None and level > 80:
+        subject, action = "[URGENT] Pickup required", "Pickup tomorrow."
+    elif level is not None and level < 50:
+        subject, action = "[LOW PRIORITY] Status update", "Skip this round."
+    else:
+        subject, action = "Status update", f"Monitor, expected full {full_date}."
+    lines = [f"Subject: {subject} - Bin {bin_id}", "",
+             f"Bin {bin_id} is at {level_text} (trend {_field(prompt, '7-Day Trend')}).",
+             f"Recommended action: {action}"]
+    if temp is not None and temp > 25:
+        lines.append(f"Note: temperature {temp_text} - hygiene risk (mold/odors), prioritize airing.")
+    return "\n".join(lines)
+
+# ==========================================
+# HTTP SERVER
+# ==========================================
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive: clients reuse connections
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.latency_s)
+            prompt = "\n".join(m.get('content', '') for m in body.get('messages', []) if m.get('role') == 'user')
+            content = draft_reply(prompt)
+            payload = json.dumps({
+                "id": f"local-{server.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get('model', 'local'),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split()),
+                          "total_tokens": len(prompt.split()) + len(content.split())},
+            }).encode('utf-8')
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass   # one line per request would drown the benchmark output
+
+class LocalLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host=HOST, port=PORT, latency_ms=LATENCY_MS):
+        super().__init__((host, port), _Handler)
+        self.latency_s = latency_ms / 1000
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+def start_local_server(port=0, latency_ms=LATENCY_MS):
+    """
+    Starts the stand-in in a background thread (port 0 = any free port).
+    Returns the server; use server.base_url and server.shutdown().
+    """
+    server = LocalLLMServer(port=port, latency_ms=latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic OpenAI-compatible stand-in for offline testing")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--latency-ms', type=float, default=LATENCY_MS, help="Simulated model latency per request")
+    args = parser.parse_args()
+    server = LocalLLMServer(port=args.port, latency_ms=args.latency_ms)
+    print(f"[LOCAL LLM] Serving {server.base_url}/chat/completions (latency {args.latency_ms:.0f} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n[LOCAL LLM] Stopped after {server.requests} requests.")
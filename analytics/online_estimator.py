@@ -0,0 +1,181 @@
+"""
+Online (Streaming) Fill-Rate Estimator
+
+Updates the fill-rate regression of predict_emptying.analyze_data in O(1)
+per reading instead of refitting the whole cycle: every bin keeps running
+means and co-moments (Welford's algorithm) of days-since-cycle-start and
+fill level, and resets them when the bin is emptied. The predicted full date
+is therefore available instantly, and the whole state of a bin is eight
+numbers, cheap to persist.
+
+Same cycle rule and model as analyze_data / fleet_prediction.predict_fleet:
+a confirmed-low reading (CONFIRM_READINGS in a row below CYCLE_RESET_PCT)
+starts a new cycle at that reading.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+import pandas as pd
+
+from analytics.emptying_events import CONFIRM_READINGS
+from analytics.fleet_prediction import BIN_DEPTH_CM, CYCLE_RESET_PCT, MIN_FILL_RATE
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+EPOCH = datetime(1970, 1, 1) # Naive, like the gateway timestamps (no DST jumps)
+STATE_FIELDS = ["t0", "n", "mean_x", "mean_y", "m2_x", "c_xy", "last_x", "last_y", "low_count"]
+
+_last_parsed = (None, None)
+
+def _to_seconds(timestamp):
+    global _last_parsed
+    if isinstance(timestamp, str):
+        # Gateway timestamps have 1 s resolution, so consecutive readings
+        # usually share the string: skip re-parsing it.
+        if _last_parsed[0] == timestamp:
+            return _last_parsed[1]
+        seconds = (datetime.strptime(timestamp, TIMESTAMP_FORMAT) - EPOCH).total_seconds()
+        _last_parsed = (timestamp, seconds)
+        return seconds
+    if not isinstance(timestamp, datetime):
+        timestamp = pd.Timestamp(timestamp) # e.g. numpy.datetime64
+    return (timestamp - EPOCH).total_seconds()
+
+# ==========================================
+# PER-BIN ESTIMATOR
+# ==========================================
+
+class OnlineFillEstimator:
+    """
+    Running least-squares fit of fill level vs. days since cycle start for one bin.
+    """
+
+    def __init__(self):
+        self.t0 = None        # Cycle start (seconds since EPOCH)
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2_x = 0.0       # sum((x - mean_x)^2)
+        self.c_xy = 0.0       # sum((x - mean_x) * (y - mean_y))
+        self.last_x = 0.0
+        self.last_y = None
+        self.low_count = 0    # Consecutive readings below CYCLE_RESET_PCT
+
+    def update(self, timestamp, fill_level_pct):
+        """
+        Adds one reading. 'timestamp' is a datetime/Timestamp or a gateway
+        timestamp string ('YYYY-MM-DD HH:MM:SS').
+        """
+        t = _to_seconds(timestamp)
+        self.low_count = self.low_count + 1 if fill_level_pct < CYCLE_RESET_PCT else 0
+        if self.t0 is None or self.low_count >= CONFIRM_READINGS:
+            self._start_cycle(t)
+
+        x = (t - self.t0) / (24 * 3600)
+        y = float(fill_level_pct)
+        self.n += 1
+        dx = x - self.mean_x
+        self.mean_x += dx / self.n
+        self.mean_y += (y - self.mean_y) / self.n
+        self.m2_x += dx * (x - self.mean_x)
+        self.c_xy += dx * (y - self.mean_y)
+        self.last_x, self.last_y = x, y
+
+    def update_distance(self, timestamp, distance_cm, bin_depth_cm=BIN_DEPTH_CM):
+        fill = min(max((bin_depth_cm - distance_cm) / bin_depth_cm * 100, 0.0), 100.0)
+        self.update(timestamp, fill)
+
+    def _start_cycle(self, t):
+        self.t0 = t
+        self.n = 0
+        self.mean_x = self.mean_y = self.m2_x = self.c_xy = 0.0
+
+    @property
+    def fill_rate(self):
+        """% per day (0 until the cycle has two distinct timestamps)."""
+        return self.c_xy / self.m2_x if self.m2_x > 0 else 0.0
+
+    @property
+    def intercept(self):
+        return self.mean_y - self.fill_rate * self.mean_x
+
+    def prediction(self, min_fill_rate=MIN_FILL_RATE):
+        """
+        Returns:
+            dict: cycle_start, n_points, current_fill, fill_rate, intercept,
+            days_left and predicted_full (None if not filling up).
+        """
+        if self.t0 is None:
+            return None
+        cycle_start = EPOCH + timedelta(seconds=self.t0)
+        fill_rate, intercept = self.fill_rate, self.intercept
+        days_left = predicted_full = None
+        if fill_rate > min_fill_rate:
+            days_to_full = (100 - intercept) / fill_rate
+            days_left = days_to_full - self.last_x
+            predicted_full = cycle_start + timedelta(days=days_to_full)
+        return {
+            "cycle_start": cycle_start,
+            "n_points": self.n,
+            "current_fill": self.last_y,
+            "fill_rate": fill_rate,
+            "intercept": intercept,
+            "days_left": days_left,
+            "predicted_full": predicted_full,
+        }
+
+    def to_state(self):
+        return [getattr(self, f) for f in STATE_FIELDS]
+
+    @classmethod
+    def from_state(cls, state):
+        estimator = cls()
+        for field, value in zip(STATE_FIELDS, state):
+            setattr(estimator, field, value)
+        return estimator
+
+# ==========================================
+# FLEET STATE
+# ==========================================
+
+class FleetEstimator:
+    """
+    One OnlineFillEstimator per bin, persisted as a compact JSON file
+    ({bin_id: [t0, n, mean_x, mean_y, m2_x, c_xy, last_x, last_y, low_count]}).
+    """
+
+    def __init__(self, state_path=None):
+        self.state_path = state_path
+        self.bins = {}
+        if state_path and os.path.isfile(state_path):
+            with open(state_path) as f:
+                self.bins = {b: OnlineFillEstimator.from_state(s) for b, s in json.load(f).items()}
+
+    def update(self, bin_id, timestamp, distance_cm):
+        if distance_cm is None:
+            return
+        estimator = self.bins.get(bin_id)
+        if estimator is None:
+            estimator = self.bins[bin_id] = OnlineFillEstimator()
+        estimator.update_distance(timestamp, float(distance_cm))
+
+    def prediction(self, bin_id):
+        estimator = self.bins.get(bin_id)
+        return estimator.prediction() if estimator else None
+
+    def predictions(self):
+        """
+        Current prediction of every bin as a DataFrame indexed by bin_id.
+        """
+        rows = {b: e.prediction() for b, e in self.bins.items() if e.t0 is not None}
+        return pd.DataFrame.from_dict(rows, orient='index').rename_axis('bin_id')
+
+    def save(self, state_path=None):
+        """
+        Writes the state atomically (temp file + rename).
+        """
+        path = state_path or self.state_path
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({b: e.to_state() for b, e in self.bins.items()}, f)
+        os.replace(tmp_path, path)
@@ -3,33 +3,36 @@ import numpy as np
 import matplotlib.pyplot as plt
 from sklearn.linear_model import LinearRegression
 from datetime import datetime
-import glob
 import os
+import sys
 
 # --- CONFIGURATION ---
 # Paths relative to this script
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(BASE_DIR, "..")))
+
+from edge_gateway.lake_query import query
+from analytics.fleet_prediction import predict_fleet
+from analytics.emptying_events import EmptyingEventIndex, confirmed_lows
+
 REAL_DATA_DIR = os.path.join(BASE_DIR, "..", "edge_gateway", "data")
 MOCK_FILE = os.path.join(BASE_DIR, "mock_sensor_history.csv")
 BIN_DEPTH_CM = 100 
+INDEX_OVERLAP_HOURS = 1 # Re-read this much before the newest indexed row (late CSV flushes)
 
-def load_data_smart():
+def load_data_smart(start=None):
     """
     Smart loader: Tries to find real data folder first, then falls back to mock file.
+    'start' limits real data to rows from that time on (e.g. current cycles only).
     """
-    # 1. Try Real Data (Merge all CSVs in folder)
-    real_files = glob.glob(os.path.join(REAL_DATA_DIR, "sensor_data_*.csv"))
-    
-    if real_files:
-        print(f"[INFO] Found {len(real_files)} real data files. Merging...")
-        try:
-            df_list = [pd.read_csv(f) for f in real_files]
-            df = pd.concat(df_list, ignore_index=True)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.sort_values('timestamp')
+    # 1. Try Real Data (Parquet lake + monthly CSVs in folder)
+    try:
+        df = query(REAL_DATA_DIR, start=start)
+        if df is not None:
+            print(f"[INFO] Loaded {len(df)} rows of real data.")
             return df
-        except Exception as e:
-            print(f"[ERROR] Failed to read real data: {e}")
+    except Exception as e:
+        print(f"[ERROR] Failed to read real data: {e}")
 
     # 2. Fallback to Mock
     if os.path.exists(MOCK_FILE):
@@ -40,14 +43,51 @@ def load_data_smart():
     
     return None
 
-def analyze_data(df):
+def update_event_index(data_dir=REAL_DATA_DIR):
+    """
+    Brings the saved emptying-event index up to date, reading only the rows
+    newer than what it has already seen (the first run reads everything).
+
+    Returns:
+        EmptyingEventIndex or None if there is no real data.
+    """
+    index = EmptyingEventIndex.load(data_dir)
+    since = index.last_timestamp
+    if since is not None:
+        since -= pd.Timedelta(hours=INDEX_OVERLAP_HOURS)
+    try:
+        df = query(data_dir, start=since, columns=['distance_cm', 'bin_id'])
+    except Exception as e:
+        print(f"[ERROR] Failed to read real data: {e}")
+        df = None
+    if df is not None:
+        events = index.update(index.new_rows_only(df))
+        index.save(data_dir)
+        print(f"[INFO] Event index: {len(df)} rows scanned, {len(events)} new emptying events.")
+    return index if len(index.state) else None
+
+def analyze_data(df, cycle_start=None):
+    """
+    Fits the fill rate of one bin's current cycle (reference implementation;
+    see fleet_prediction.predict_fleet for many bins at once).
+
+    Args:
+        cycle_start: Known start of the current cycle (from the event index).
+            If None it is detected: last confirmed-low reading.
+
+    Returns:
+        dict: cycle_start, current_fill, fill_rate, intercept, days_left (None if not filling).
+    """
     # Calculate Fill %
     df['fill_level_pct'] = ((BIN_DEPTH_CM - df['distance_cm']) / BIN_DEPTH_CM) * 100
     df['fill_level_pct'] = df['fill_level_pct'].clip(0, 100)
     
-    # Identify Current Cycle (Last time < 5%)
-    emptied_indices = df[df['fill_level_pct'] < 5].index
-    start_idx = emptied_indices[-1] if len(emptied_indices) > 0 else 0
+    # Identify Current Cycle (last confirmed reading < 5%; single glitches are ignored)
+    if cycle_start is not None:
+        start_idx = df['timestamp'].searchsorted(pd.Timestamp(cycle_start))
+    else:
+        emptied_positions = np.flatnonzero(confirmed_lows(df['fill_level_pct'].values))
+        start_idx = emptied_positions[-1] if len(emptied_positions) > 0 else 0
     cycle_data = df.iloc[start_idx:].copy()
     
     # Regression
@@ -61,6 +101,7 @@ def analyze_data(df):
     model.fit(X, y)
     
     fill_rate = model.coef_[0][0]
+    days_left = None
     
     print(f"--- ANALYSIS RESULT ---")
     print(f"Current Fill: {y[-1][0]:.1f} %")
@@ -73,9 +114,47 @@ def analyze_data(df):
     else:
         print("Status:       Not filling up.")
 
+    return {
+        "cycle_start": start_time,
+        "current_fill": y[-1][0],
+        "fill_rate": fill_rate,
+        "intercept": model.intercept_[0],
+        "days_left": days_left,
+    }
+
+def analyze_fleet(df, cycle_starts=None):
+    """
+    Prints the prediction of every bin (vectorized, one pass for the whole fleet).
+    'cycle_starts' (bin_id -> start, from the event index) skips the cycle search;
+    bins without an indexed start keep all their rows and get it searched.
+    """
+    if cycle_starts is not None:
+        starts = cycle_starts.reindex(df['bin_id']).to_numpy(dtype='datetime64[ns]')
+        df = df[np.isnat(starts) | (df['timestamp'].to_numpy() >= starts)]
+    result = predict_fleet(df)
+    print(f"--- FLEET ANALYSIS ({len(result)} bins) ---")
+    print(result[['current_fill', 'fill_rate', 'days_left', 'predicted_full']]
+          .round({'current_fill': 1, 'fill_rate': 1, 'days_left': 1}).to_string())
+    return result
+
+def print_pickup_stats(index):
+    stats = index.interval_stats()
+    if len(stats):
+        print("--- PICKUPS ---")
+        print(stats[['pickups', 'mean_interval_days', 'last_pickup']].round({'mean_interval_days': 1}).to_string())
+
 if __name__ == "__main__":
-    df = load_data_smart()
-    if df is not None:
-        analyze_data(df)
+    # Real data: only the current cycles are loaded, found via the event index
+    index = update_event_index()
+    cycle_starts = index.cycle_starts() if index is not None else None
+    df = load_data_smart(start=cycle_starts.min() if cycle_starts is not None else None)
+
+    if df is not None and 'bin_id' in df and df['bin_id'].nunique() > 1:
+        analyze_fleet(df, cycle_starts)
+    elif df is not None:
+        bin_start = cycle_starts.iloc[0] if cycle_starts is not None else None
+        analyze_data(df, cycle_start=bin_start)
     else:
-        print("[ERROR] No data found.")
\ No newline at end of file
+        print("[ERROR] No data found.")
+    if index is not None:
+        print_pickup_stats(index)
\ No newline at end of file
@@ -0,0 +1,236 @@
+"""
+Rule-based Fleet Reports
+
+The logistics prompt already spells out deterministic rules:
+
+    - level > 80 %       -> [URGENT], pickup tomorrow
+    - level < 50 %       -> [LOW PRIORITY], skip this round
+    - otherwise          -> monitor until the predicted full date
+    - temperature > 25 C -> hygiene warning (mold/odors); also when the
+                            optional env_risk column (environmental_risk.py)
+                            is "high"
+
+evaluate_rules() applies them to the whole fleet (output of
+fleet_prediction.predict_fleet) in one vectorized pass and render_reports()
+fills the email template, so routine bins need no model call at all. Only
+bins where the rules are not enough are escalated to the LLM:
+
+    - ambiguous:  fill level within AMBIGUOUS_MARGIN_PCT of a threshold,
+                  or predicted full within FULL_SOON_DAYS while below URGENT
+    - anomalous:  missing values, too few readings in the cycle, sensor
+                  values out of range, negative or implausibly fast filling,
+                  predicted full date long past while the bin is not full
+
+fleet_reports() returns the report of every bin together with metrics on
+how many bins took each path.
+
+Usage:
+    python analytics/report_rules.py            # reports for the data lake
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from analytics.fleet_prediction import MIN_FILL_RATE
+
+# --- CONFIGURATION ---
+URGENT_PCT = 80              # Samat säännöt kuin AI-agentin promptissa
+LOW_PRIORITY_PCT = 50
+HYGIENE_TEMP_C = 25
+
+AMBIGUOUS_MARGIN_PCT = 2     # Näin lähellä rajaa -> AI päättää
+FULL_SOON_DAYS = 1
+MIN_POINTS = 6               # Fewer readings in the cycle: trend not reliable
+MAX_FILL_RATE = 50           # % / day
+MIN_FILL_RATE_ERROR = -1     # % / day; clearly emptying without a pickup
+OVERDUE_DAYS = 2             # Predicted full this long ago but still below URGENT
+TEMP_RANGE_C = (-40, 60)     # Plausible sensor readings
+
+PRIORITIES = ["URGENT", "LOW PRIORITY", "MONITOR"]
+ESCALATION_REASONS = ["missing_data", "few_points", "sensor_range", "erratic_rate",
+                      "overdue", "full_soon", "near_threshold"]
+
+# ==========================================
+# RULES
+# ==========================================
+
+def latest_values(df, columns=("temperature_c",)):
+    """
+    Latest reading of 'columns' per bin (long-format frame), for joining
+    onto the predict_fleet() result.
+    """
+    last = df.loc[df.groupby('bin_id', sort=False)['timestamp'].idxmax()]
+    return last.set_index('bin_id')[list(columns)]
+
+def evaluate_rules(fleet):
+    """
+    Applies the report rules to every bin at once.
+
+    Args:
+        fleet (pd.DataFrame): predict_fleet() result (current_fill, fill_rate,
+            days_left, n_points) plus a 'temperature_c' column and optionally
+            the RiskEngine.report_columns() columns.
+
+    Returns:
+        pd.DataFrame (same index): priority, hygiene_warning, escalate and
+        reason (first matching ESCALATION_REASONS entry, "" if routine).
+    """
+    fill = fleet['current_fill'].to_numpy(dtype=np.float64)
+    rate = fleet['fill_rate'].to_numpy(dtype=np.float64)
+    days_left = fleet['days_left'].to_numpy(dtype=np.float64)
+    temp = fleet['temperature_c'].to_numpy(dtype=np.float64)
+    points = fleet['n_points'].to_numpy()
+
+    priority = np.select([fill > URGENT_PCT, fill < LOW_PRIORITY_PCT], PRIORITIES[:2], PRIORITIES[2])
+    with np.errstate(invalid='ignore'):
+        conditions = [
+            np.isnan(fill) | np.isnan(temp) | np.isnan(rate),
+            points < MIN_POINTS,
+            (temp < TEMP_RANGE_C[0]) | (temp > TEMP_RANGE_C[1]),
+            (rate < MIN_FILL_RATE_ERROR) | (rate > MAX_FILL_RATE),
+            (days_left < -OVERDUE_DAYS) & (fill <= URGENT_PCT),
+            (days_left < FULL_SOON_DAYS) & (fill <= URGENT_PCT),
+            (np.abs(fill - URGENT_PCT) <= AMBIGUOUS_MARGIN_PCT)
+            | (np.abs(fill - LOW_PRIORITY_PCT) <= AMBIGUOUS_MARGIN_PCT),
+        ]
+    reason = np.select(conditions, ESCALATION_REASONS, "")
+
+    hygiene = temp > HYGIENE_TEMP_C
+    if 'env_risk' in fleet:
+        hygiene |= (fleet['env_risk'] == "high").to_numpy()
+
+    return pd.DataFrame({
+        'priority': priority,
+        'hygiene_warning': hygiene,
+        'escalate': reason != "",
+        'reason': reason,
+    }, index=fleet.index)
+
+def _prediction_dates(fleet):
+    dates = fleet['predicted_full'].dt.strftime('%Y-%m-%d')
+    return dates.where(fleet['fill_rate'] > MIN_FILL_RATE, "Stable").fillna("Stable")
+
+def render_reports(fleet, rules):
+    """
+    Email drafts from the template (vectorized string operations).
+    """
+    bin_label = "Bin #" + fleet.index.astype(str).to_series(index=fleet.index)
+    fill = fleet['current_fill'].map("{:.1f}%".format)
+    trend = fleet['fill_rate'].map("{:+.1f}% / day".format)
+    dates = _prediction_dates(fleet)
+
+    subject = rules['priority'].map({
+        "URGENT": "[URGENT] Pickup required",
+        "LOW PRIORITY": "[LOW PRIORITY] Status update",
+        "MONITOR": "Status update",
+    })
+    action = rules['priority'].map({
+        "URGENT": "Pickup tomorrow.",
+        "LOW PRIORITY": "Skip this round.",
+        "MONITOR": "Monitor",
+    })
+    action = action.where(rules['priority'] != "MONITOR", "Monitor, expected full " + dates + ".")
+    temp = fleet['temperature_c'].map("{:.1f} C".format)
+    hygiene = ("\nNote: temperature " + temp + " - hygiene risk (mold/odors), prioritize airing.")
+    if 'environment' in fleet:
+        hygiene = hygiene.where(fleet['env_risk'] != "high",
+                                "\nNote: environment " + fleet['environment'].astype(str)
+                                + " - hygiene risk (mold/odors), prioritize airing.")
+
+    return ("Subject: " + subject + " - " + bin_label + "\n\n"
+            + bin_label + " is at " + fill + " (trend " + trend + ", est. full " + dates + ").\n"
+            + "Recommended action: " + action
+            + hygiene.where(rules['hygiene_warning'], ""))
+
+def llm_contexts(fleet):
+    """
+    AI-agent contexts (same fields as the dashboard's) for the given bins.
+    """
+    dates = _prediction_dates(fleet)
+    return [{
+        "bin_id": str(bin_id),
+        "current_fill": f"{row.current_fill:.1f}%",
+        "trend": f"{row.fill_rate:+.1f}% / day",
+        "prediction_date": dates[bin_id],
+        "temperature": f"{row.temperature_c:.1f} C",
+        **({"environment": row.environment} if isinstance(getattr(row, 'environment', None), str) else {}),
+    } for bin_id, row in zip(fleet.index, fleet.itertuples())]
+
+# ==========================================
+# TIERED FLEET REPORTS
+# ==========================================
+
+def fleet_reports(fleet, generate_llm_reports=None):
+    """
+    Reports for every bin: rule template for routine bins, LLM for the
+    escalated ones.
+
+    Args:
+        fleet (pd.DataFrame): See evaluate_rules().
+        generate_llm_reports (callable): contexts -> reports; default:
+            ai_logistics_agent.generate_fleet_reports.
+
+    Returns:
+        (pd.DataFrame, dict): Per bin priority, hygiene_warning, reason,
+        path ("rules"/"llm") and report; metrics of the run.
+    """
+    start = time.perf_counter()
+    rules = evaluate_rules(fleet)
+    routine = ~rules['escalate']
+    reports = pd.Series("", index=fleet.index, dtype=object)
+    reports[routine] = render_reports(fleet[routine], rules[routine])
+    rules_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    escalated = fleet[~routine]
+    if len(escalated):
+        if generate_llm_reports is None:
+            from analytics.ai_logistics_agent import generate_fleet_reports as generate_llm_reports
+        reports[~routine] = generate_llm_reports(llm_contexts(escalated))
+    llm_s = time.perf_counter() - start
+
+    result = rules.drop(columns='escalate')
+    result['path'] = np.where(routine, "rules", "llm")
+    result['report'] = reports
+    errors = int(reports[~routine].str.startswith("[ERROR]").sum())
+
+    metrics = {
+        "bins": len(fleet),
+        "rules_path": int(routine.sum()),
+        "llm_path": int((~routine).sum()),
+        "llm_errors": errors,
+        "rules_share_pct": round(100 * routine.mean(), 1) if len(fleet) else 0.0,
+        "rules_s": round(rules_s, 4),
+        "rules_us_per_bin": round(1e6 * rules_s / max(int(routine.sum()), 1), 2),
+        "llm_s": round(llm_s, 2),
+        "priority": rules['priority'].value_counts().to_dict(),
+        "escalation_reasons": rules.loc[~routine, 'reason'].value_counts().to_dict(),
+    }
+    return result, metrics
+
+def print_metrics(metrics):
+    print("\n--- REPORT PATHS ---")
+    for key, value in metrics.items():
+        print(f"{key + ':':20}{value}")
+
+if __name__ == "__main__":
+    from analytics.fleet_prediction import predict_fleet
+    from analytics.predict_emptying import load_data_smart
+
+    df = load_data_smart()
+    if df is None:
+        print("[ERROR] No data found.")
+        sys.exit(1)
+    fleet = predict_fleet(df).join(latest_values(df))
+    result, metrics = fleet_reports(fleet)
+    for bin_id, row in result.head(3).iterrows():
+        print(f"\n--- BIN {bin_id} ({row['path']}) ---\n{row['report']}")
+    print_metrics(metrics)
@@ -0,0 +1,268 @@
+"""
+LLM Report Service
+
+Generates logistics reports for one bin or a whole fleet:
+
+    - One backend client for the life of the process (connection pool reused).
+    - Fleet requests fan out asynchronously with bounded concurrency.
+    - Responses are cached by the *quantized* sensor context (fill level to
+      2 %, trend to 0.5 %/day, temperature to 1 C, never across a threshold
+      of the prompt's rules), so bins whose situation has not changed do not
+      query the model again. The model itself always gets the exact values.
+      Identical requests that are in flight at the same time share one
+      backend call.
+    - Backends are pluggable: OpenAIBackend (OpenRouter, or the deterministic
+      local stand-in in local_llm_server.py) and MockBackend.
+
+The service runs its own event loop in a background thread, so synchronous
+callers (dashboard, scripts) reuse the same async client across calls.
+"""
+
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# --- CONFIGURATION ---
+MAX_CONCURRENCY = 8
+CACHE_MAX_ENTRIES = 10000
+CACHE_TTL_S = 6 * 3600       # Reports are about "now": re-query after this even if unchanged
+REQUEST_TIMEOUT_S = 60
+QUANTIZATION = {             # Context field -> rounding step of its number
+    "current_fill": 2.0,
+    "trend": 0.5,
+    "temperature": 1.0,
+}
+THRESHOLDS = {               # Context field -> thresholds of the prompt's rules (ai_logistics_agent.py)
+    "current_fill": (50.0, 80.0),   # < 50 %: low priority, > 80 %: urgent
+    "temperature": (25.0,),         # > 25 C: hygiene warning
+}
+
+_NUMBER = re.compile(r"[-+]?\d+(?:\.\d+)?")
+
+# ==========================================
+# CACHE
+# ==========================================
+
+def quantize_context(context):
+    """
+    Rounds the number in each QUANTIZATION field to its step, keeping the
+    surrounding text ("85.5%" -> "86%", "+12.3% / day" -> "+12.5% / day").
+    Fields with THRESHOLDS also get the side of each threshold the exact
+    value is on ("25.4 C" -> "25 C >", "24.6 C" -> "25 C <"), so one
+    bucket never spans a rule. Other fields are kept as they are.
+
+    Only used for cache keys: the model is sent the original context.
+    """
+    quantized = {}
+    for field, value in context.items():
+        step = QUANTIZATION.get(field)
+        number = None
+        if step is not None and isinstance(value, (int, float)):
+            number = float(value)
+            value = f"{round(value / step) * step:g}"
+        elif step is not None and isinstance(value, str):
+            match = _NUMBER.search(value)
+            number = float(match.group()) if match else None
+            sign = "+" if value.lstrip().startswith("+") else ""
+            value = _NUMBER.sub(lambda m: f"{sign}{round(float(m.group()) / step) * step:g}", value, count=1)
+        if number is not None and field in THRESHOLDS:
+            value += " " + "".join("<" if number < t else ">" if number > t else "=" for t in THRESHOLDS[field])
+        quantized[field] = value
+    return quantized
+
+def cache_key(context):
+    return json.dumps(context, sort_keys=True, default=str)
+
+class ReportCache:
+    """
+    LRU cache with expiry, optionally persisted as JSON ({key: [time, report]}).
+    Thread-safe.
+    """
+
+    def __init__(self, path=None, max_entries=CACHE_MAX_ENTRIES, ttl_s=CACHE_TTL_S):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if path and os.path.isfile(path):
+            with open(path) as f:
+                self._entries.update(json.load(f))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl_s:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, report):
+        with self._lock:
+            self._entries[key] = [time.time(), report]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def save(self, path=None):
+        """
+        Writes the cache atomically (temp file + rename).
+        """
+        path = path or self.path
+        if not path:
+            return
+        tmp_path = path + ".tmp"
+        with self._lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(self._entries, f)
+        os.replace(tmp_path, path)
+
+# ==========================================
+# BACKENDS
+# ==========================================
+
+class OpenAIBackend:
+    """
+    OpenAI-compatible chat completions (OpenRouter, local stand-in, ...).
+    The async client is created once and reused for every request.
+    """
+
+    def __init__(self, base_url, api_key, model, timeout_s=REQUEST_TIMEOUT_S):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.timeout_s = timeout_s
+        self._client = None
+
+    @property
+    def name(self):
+        return f"{self.base_url} ({self.model})"
+
+    async def complete(self, messages, context):
+        if self._client is None:
+            from openai import AsyncOpenAI
+            print(f"[AI AGENT] Connecting to {self.name}...")
+            self._client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key,
+                                       timeout=self.timeout_s, max_retries=2)
+        response = await self._client.chat.completions.create(model=self.model, messages=messages)
+        return response.choices[0].message.content
+
+class MockBackend:
+    """
+    Offline template answer (no model at all).
+    """
+
+    name = "mock"
+
+    def __init__(self, render):
+        self.render = render
+
+    async def complete(self, messages, context):
+        return self.render(context)
+
+# ==========================================
+# SERVICE
+# ==========================================
+
+class ReportService:
+    """
+    Cached, concurrent report generation on top of a backend.
+
+    Args:
+        backend: Object with 'async complete(messages, context) -> str'.
+        build_messages (callable): context -> chat messages.
+        cache (ReportCache): Shared response cache (default: in-memory).
+        concurrency (int): Max. backend requests in flight.
+    """
+
+    def __init__(self, backend, build_messages, cache=None, concurrency=MAX_CONCURRENCY):
+        self.backend = backend
+        self.build_messages = build_messages
+        self.cache = cache if cache is not None else ReportCache()
+        self.concurrency = concurrency
+        self.stats = {"requests": 0, "cache_hits": 0, "backend_calls": 0, "errors": 0, "backend_time_s": 0.0}
+        self._loop = None
+        self._semaphore = None
+        self._in_flight = {}
+        self._start_lock = threading.Lock()
+
+    # --- sync API (runs on the service's event loop) ---
+
+    def generate(self, context):
+        """
+        Report for one context (dict of sensor values); cached.
+        """
+        return self._submit(self._generate(context)).result()
+
+    def generate_many(self, contexts):
+        """
+        Reports for many contexts (e.g. one per bin), in the same order.
+        """
+        return self._submit(self._generate_many(contexts)).result()
+
+    async def agenerate_many(self, contexts):
+        """
+        Awaitable version of generate_many() for callers with their own event loop.
+        """
+        return await asyncio.wrap_future(self._submit(self._generate_many(contexts)))
+
+    def _submit(self, coro):
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="report-service", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    # --- event loop side ---
+
+    async def _generate_many(self, contexts):
+        return await asyncio.gather(*(self._generate(c) for c in contexts))
+
+    async def _generate(self, context):
+        self.stats["requests"] += 1
+        key = cache_key(quantize_context(context))
+        report = self.cache.get(key)
+        if report is not None:
+            self.stats["cache_hits"] += 1
+            return report
+
+        # Same context already being generated: wait for that answer
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.stats["cache_hits"] += 1
+            return await pending
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            report = await self._call_backend(context)
+            if not report.startswith("[ERROR]"):
+                self.cache.put(key, report)
+            future.set_result(report)
+            return report
+        finally:
+            del self._in_flight[key]
+
+    async def _call_backend(self, context):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            self.stats["backend_calls"] += 1
+            start = time.perf_counter()
+            try:
+                return await self.backend.complete(self.build_messages(context), context)
+            except Exception as e:
+                self.stats["errors"] += 1
+                return f"[ERROR] AI Generation failed: {e}"
+            finally:
+                self.stats["backend_time_s"] += time.perf_counter() - start
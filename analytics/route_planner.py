@@ -0,0 +1,346 @@
+"""
+Pickup Route Planner
+
+Turns the per-bin predicted full dates into truck tours for a given day:
+
+    1. Selection: bins predicted full before the next run (day + HORIZON_DAYS)
+       or already above URGENT_PCT. Load = expected fill on the day x bin
+       capacity.
+    2. Construction: Clarke-Wright savings, computed only for each stop's
+       KNN_NEIGHBORS nearest neighbours (KD-tree), merged under the truck
+       capacity. Memory and time grow ~linearly with the number of stops.
+    3. Improvement: 2-opt and or-opt (move segments of 1-3 stops, also
+       reversed) on every tour, using a precomputed distance matrix per tour
+       and evaluating all moves of a stop in one NumPy operation.
+
+Distances are straight-line km x ROAD_FACTOR (bins are located by lat/lon in
+bin_locations.csv, projected around the depot).
+
+Usage:
+    python analytics/route_planner.py --day 2025-10-25
+    python analytics/route_planner.py --random-locations   # demo locations for the current bins
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+# --- CONFIGURATION ---
+DATA_DIR = os.path.join(parent_dir, "edge_gateway", "data")
+LOCATIONS_FILE = "bin_locations.csv"      # bin_id, lat, lon
+
+DEPOT_LAT, DEPOT_LON = 60.849, 23.056    # Terminaali (Loimaa)
+BIN_CAPACITY_KG = 250                    # Täyden keräysastian paino
+TRUCK_CAPACITY_KG = 4000
+HORIZON_DAYS = 1                         # Kerätään astiat jotka täyttyvät ennen seuraavaa ajoa
+URGENT_PCT = 80
+ROAD_FACTOR = 1.3                        # Tieverkon mutkaisuus vs. linnuntie
+KNN_NEIGHBORS = 25
+EARTH_RADIUS_KM = 6371.0
+
+# ==========================================
+# SELECTION
+# ==========================================
+
+def select_bins(fleet, day, horizon_days=HORIZON_DAYS, urgent_pct=URGENT_PCT):
+    """
+    Bins to collect on 'day'.
+
+    Args:
+        fleet (pd.DataFrame): predict_fleet() result (indexed by bin_id).
+
+    Returns:
+        pd.DataFrame: Selected rows of 'fleet' plus expected_fill (% on the
+        day) and load_kg.
+    """
+    day = pd.Timestamp(day).normalize()
+    days_ahead = (day - fleet['cycle_start']).dt.total_seconds() / (24 * 3600) - fleet['days_elapsed']
+    expected = (fleet['current_fill'] + fleet['fill_rate'].clip(lower=0) * days_ahead.clip(lower=0)).clip(0, 100)
+    due = fleet['predicted_full'] < day + pd.Timedelta(days=1 + horizon_days)
+    selected = fleet[due.fillna(False) | (expected > urgent_pct)].copy()
+    selected['expected_fill'] = expected[selected.index]
+    selected['load_kg'] = selected['expected_fill'] / 100 * BIN_CAPACITY_KG
+    return selected
+
+# ==========================================
+# GEOMETRY
+# ==========================================
+
+def project_km(lat, lon, ref_lat=DEPOT_LAT, ref_lon=DEPOT_LON):
+    """
+    Lat/lon -> local x/y in km around the reference point (equirectangular;
+    accurate to well under 1 % within a city region).
+    """
+    lat, lon = np.radians(np.asarray(lat, dtype=np.float64)), np.radians(np.asarray(lon, dtype=np.float64))
+    x = (lon - np.radians(ref_lon)) * np.cos(np.radians(ref_lat)) * EARTH_RADIUS_KM
+    y = (lat - np.radians(ref_lat)) * EARTH_RADIUS_KM
+    return np.column_stack([x, y])
+
+def distance_matrix(points):
+    """
+    Road distance (km) between all points (m x 2 array).
+    """
+    diff = points[:, None, :] - points[None, :, :]
+    return np.sqrt((diff ** 2).sum(axis=2)) * ROAD_FACTOR
+
+def tour_length(tour, dist):
+    return float(dist[tour[:-1], tour[1:]].sum())
+
+# ==========================================
+# CONSTRUCTION: CLARKE-WRIGHT SAVINGS
+# ==========================================
+
+def savings_routes(xy, depot, demand, capacity, k=KNN_NEIGHBORS):
+    """
+    Clarke-Wright savings limited to the k nearest neighbours of each stop.
+
+    Returns:
+        list of np.ndarray: Stop indices of each route (depot not included).
+    """
+    n = len(xy)
+    if n == 0:
+        return []
+    d0 = np.sqrt(((xy - depot) ** 2).sum(axis=1)) * ROAD_FACTOR
+    k = min(k, n - 1)
+    if k > 0:
+        dist, nbr = cKDTree(xy).query(xy, k=k + 1)
+        i = np.repeat(np.arange(n), k)
+        j = nbr[:, 1:].ravel()
+        dij = dist[:, 1:].ravel() * ROAD_FACTOR
+        keep = i < j
+        i, j, dij = i[keep], j[keep], dij[keep]
+        saving = d0[i] + d0[j] - dij
+        order = np.argsort(-saving, kind='stable')
+        order = order[saving[order] > 0]
+        pairs = zip(i[order].tolist(), j[order].tolist())
+    else:
+        pairs = iter(())
+
+    demand = np.minimum(np.asarray(demand, dtype=np.float64), capacity)
+    routes = {r: [r] for r in range(n)}       # route id -> stops
+    route_of = list(range(n))
+    load = demand.tolist()
+
+    for a, b in pairs:
+        ra, rb = route_of[a], route_of[b]
+        if ra == rb or load[ra] + load[rb] > capacity:
+            continue
+        route_a, route_b = routes[ra], routes[rb]
+        # Both must be route ends; orient so that route_a ends with a and route_b starts with b
+        if route_a[-1] != a:
+            if route_a[0] != a:
+                continue
+            route_a.reverse()
+        if route_b[0] != b:
+            if route_b[-1] != b:
+                continue
+            route_b.reverse()
+        route_a.extend(route_b)
+        load[ra] += load[rb]
+        for s in route_b:
+            route_of[s] = ra
+        del routes[rb]
+
+    return [np.array(r) for r in routes.values()]
+
+# ==========================================
+# IMPROVEMENT: 2-OPT / OR-OPT
+# ==========================================
+
+def two_opt(tour, dist, eps=1e-9):
+    """
+    2-opt on a closed tour (first and last entry = depot), in place on a copy.
+    For each edge, all reversals are evaluated at once; repeats until no move
+    shortens the tour.
+    """
+    tour = tour.copy()
+    n = len(tour)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 2):
+            a, b = tour[i - 1], tour[i]
+            c, d = tour[i + 1:n - 1], tour[i + 2:n]
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+            j = int(delta.argmin())
+            if delta[j] < -eps:
+                tour[i:i + j + 2] = tour[i:i + j + 2][::-1]
+                improved = True
+    return tour
+
+def or_opt(tour, dist, max_segment=3, eps=1e-9):
+    """
+    Or-opt: moves segments of 1..max_segment stops (optionally reversed) to
+    the best other position of the tour. Repeats until no move helps.
+    """
+    tour = tour.copy()
+    improved = True
+    while improved:
+        improved = False
+        for length in range(1, max_segment + 1):
+            i = 1
+            while i + length < len(tour):
+                seg = tour[i:i + length]
+                prev, nxt = tour[i - 1], tour[i + length]
+                removal_gain = dist[prev, seg[0]] + dist[seg[-1], nxt] - dist[prev, nxt]
+                rest = np.r_[tour[:i], tour[i + length:]]
+                a, b = rest[:-1], rest[1:]
+                forward = dist[a, seg[0]] + dist[seg[-1], b] - dist[a, b]
+                backward = dist[a, seg[-1]] + dist[seg[0], b] - dist[a, b]
+                forward[i - 1] = backward[i - 1] = np.inf       # original position
+                best_f, best_b = int(forward.argmin()), int(backward.argmin())
+                use_backward = backward[best_b] < forward[best_f]
+                pos = best_b if use_backward else best_f
+                cost = backward[pos] if use_backward else forward[pos]
+                if cost < removal_gain - eps:
+                    moved = seg[::-1] if use_backward else seg
+                    tour = np.r_[rest[:pos + 1], moved, rest[pos + 1:]]
+                    improved = True
+                i += 1
+    return tour
+
+def improve_route(stops, xy, depot):
+    """
+    2-opt + or-opt on one route. Returns (stops in new order, length km).
+    """
+    points = np.vstack([depot, xy[stops]])
+    dist = distance_matrix(points)
+    tour = np.r_[0, np.arange(1, len(stops) + 1), 0]
+    if len(stops) > 2:
+        while True:
+            length = tour_length(tour, dist)
+            tour = or_opt(two_opt(tour, dist), dist)
+            if tour_length(tour, dist) > length - 1e-9:
+                break
+    return stops[tour[1:-1] - 1], tour_length(tour, dist)
+
+def plan_routes(xy, demand, depot=(0.0, 0.0), capacity=TRUCK_CAPACITY_KG, k=KNN_NEIGHBORS, improve=True):
+    """
+    Capacitated tours for stops at 'xy' (km, n x 2) with 'demand' (kg).
+
+    Returns:
+        (routes, lengths): list of stop-index arrays in driving order and
+        their lengths in km (depot -> stops -> depot).
+    """
+    xy = np.asarray(xy, dtype=np.float64)
+    depot = np.asarray(depot, dtype=np.float64)
+    routes = savings_routes(xy, depot, demand, capacity, k)
+    if not improve:
+        lengths = [tour_length(np.r_[0, np.arange(1, len(r) + 1), 0], distance_matrix(np.vstack([depot, xy[r]])))
+                   for r in routes]
+        return routes, lengths
+    improved = [improve_route(r, xy, depot) for r in routes]
+    return [r for r, _ in improved], [length for _, length in improved]
+
+# ==========================================
+# PICKUP PLAN
+# ==========================================
+
+def load_locations(data_dir=DATA_DIR):
+    """
+    Bin locations (bin_id -> lat, lon), or None if the file is missing.
+    """
+    path = os.path.join(data_dir, LOCATIONS_FILE)
+    if not os.path.isfile(path):
+        return None
+    return pd.read_csv(path, dtype={'bin_id': str}).set_index('bin_id')
+
+def random_locations(bin_ids, radius_km=15, seed=42):
+    """
+    Demo locations: bins scattered around the depot.
+    """
+    rng = np.random.default_rng(seed)
+    r = radius_km * np.sqrt(rng.uniform(0, 1, len(bin_ids)))
+    angle = rng.uniform(0, 2 * np.pi, len(bin_ids))
+    return pd.DataFrame({
+        'lat': DEPOT_LAT + np.degrees(r * np.sin(angle) / EARTH_RADIUS_KM),
+        'lon': DEPOT_LON + np.degrees(r * np.cos(angle) / (EARTH_RADIUS_KM * np.cos(np.radians(DEPOT_LAT)))),
+    }, index=pd.Index(bin_ids, name='bin_id')).round(6)
+
+def plan_pickups(fleet, locations, day, capacity=TRUCK_CAPACITY_KG, depot=(DEPOT_LAT, DEPOT_LON)):
+    """
+    Selects the bins to collect on 'day' and plans the truck tours.
+
+    Returns:
+        (pd.DataFrame, dict): One row per stop (tour, stop, bin_id, lat, lon,
+        expected_fill, load_kg) in driving order; summary of the plan.
+    """
+    start = time.perf_counter()
+    selected = select_bins(fleet, day)
+    located = selected.index.intersection(locations.index)
+    missing = len(selected) - len(located)
+    if missing:
+        print(f"[WARNING] {missing} selected bins have no location and are left out.")
+    selected = selected.loc[located]
+
+    coords = locations.loc[located, ['lat', 'lon']]
+    xy = project_km(coords['lat'], coords['lon'], *depot)
+    routes, lengths = plan_routes(xy, selected['load_kg'].to_numpy(), capacity=capacity)
+
+    order = np.concatenate(routes) if routes else np.empty(0, dtype=np.int64)
+    stops = pd.DataFrame({
+        'tour': np.repeat(np.arange(1, len(routes) + 1), [len(r) for r in routes]),
+        'stop': np.concatenate([np.arange(1, len(r) + 1) for r in routes]) if routes else [],
+        'bin_id': located[order],
+        'lat': coords['lat'].to_numpy()[order],
+        'lon': coords['lon'].to_numpy()[order],
+        'expected_fill': selected['expected_fill'].to_numpy()[order].round(1),
+        'load_kg': selected['load_kg'].to_numpy()[order].round(1),
+    })
+    summary = {
+        "day": str(pd.Timestamp(day).date()),
+        "bins_selected": len(selected),
+        "bins_total": len(fleet),
+        "tours": len(routes),
+        "total_km": round(float(np.sum(lengths)), 1),
+        "total_load_kg": round(float(stops['load_kg'].sum()), 1),
+        "solve_s": round(time.perf_counter() - start, 3),
+    }
+    return stops, summary
+
+if __name__ == "__main__":
+    from analytics.fleet_prediction import predict_fleet
+    from analytics.predict_emptying import load_data_smart
+
+    parser = argparse.ArgumentParser(description="Plan pickup tours from predicted full dates")
+    parser.add_argument('--day', default=None, help="Pickup day (YYYY-MM-DD), default: tomorrow")
+    parser.add_argument('--capacity-kg', type=float, default=TRUCK_CAPACITY_KG)
+    parser.add_argument('--random-locations', action='store_true',
+                        help=f"Write demo locations for the current bins to {LOCATIONS_FILE}")
+    args = parser.parse_args()
+
+    df = load_data_smart()
+    if df is None:
+        print("[ERROR] No data found.")
+        sys.exit(1)
+    if 'bin_id' not in df:
+        df['bin_id'] = "1"
+    fleet = predict_fleet(df)
+
+    locations = load_locations()
+    if args.random_locations:
+        locations = random_locations(fleet.index)
+        locations.to_csv(os.path.join(DATA_DIR, LOCATIONS_FILE))
+        print(f"[SUCCESS] Wrote demo locations of {len(locations)} bins to {LOCATIONS_FILE}")
+    if locations is None:
+        print(f"[ERROR] {LOCATIONS_FILE} not found in {DATA_DIR} (columns: bin_id, lat, lon). "
+              f"Use --random-locations for a demo.")
+        sys.exit(1)
+
+    day = args.day or (pd.Timestamp.now().normalize() + pd.Timedelta(days=1))
+    stops, summary = plan_pickups(fleet, locations, day, capacity=args.capacity_kg)
+    for tour, tour_stops in stops.groupby('tour'):
+        print(f"\nTour {tour}: {len(tour_stops)} bins, {tour_stops['load_kg'].sum():.0f} kg")
+        print("  depot -> " + " -> ".join(tour_stops['bin_id']) + " -> depot")
+    print("\n--- PLAN ---")
+    for key, value in summary.items():
+        print(f"{key + ':':16}{value}")
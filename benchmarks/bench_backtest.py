@@ -0,0 +1,120 @@
+"""
+Backtest Benchmark: per-cut replay vs. vectorized process-pool backtest
+
+Generates a synthetic fleet (mock generator: weekend and seasonal fill
+patterns, anomalies) and times:
+
+    load           analytics/backtest.load_history() (lake -> sorted arrays)
+    replay_loop    predict_emptying.analyze_data() on the bin's history up to
+                   each cut (measured on a sample of cuts, extrapolated)
+    backtest       run_backtest() with both forecasters, in this process
+                   (serial) and in a pool of --workers processes (pool)
+
+It also checks that the vectorized linear forecaster agrees with
+analyze_data on the sampled cuts, and reports the error of both forecasters.
+
+Usage:
+    python benchmarks/bench_backtest.py --bins 2000 --days 365 --workers 4
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from analytics.backtest import CycleCuts, linear_forecast, load_history, run_backtest, score
+from analytics.generate_mock_data import generate_synthetic_data
+from analytics.predict_emptying import analyze_data
+
+def replay_loop(history, sample):
+    """
+    analyze_data() per sampled cut on the readings up to it (days left to 100 %).
+    Returns (seconds, predictions, reference predictions of linear_forecast).
+    """
+    ts, fill, codes, _ = history
+    cuts = CycleCuts(ts, fill, codes)
+    rng = np.random.default_rng(0)
+    picked = np.sort(rng.choice(len(cuts), min(sample, len(cuts)), replace=False))
+    bin_starts = np.searchsorted(codes, np.arange(codes.max() + 1))
+    frames = {}
+    predictions = []
+    start = time.perf_counter()
+    for i in picked:
+        code = codes[cuts.cut_pos[i]]
+        if code not in frames:
+            rows = slice(bin_starts[code], np.searchsorted(codes, code, side='right'))
+            frames[code] = pd.DataFrame({'timestamp': pd.to_datetime(ts[rows]),
+                                         'distance_cm': 100 - fill[rows].astype(np.float64)})
+        df = frames[code].iloc[:cuts.cut_pos[i] - bin_starts[code] + 1].copy()
+        with contextlib.redirect_stdout(io.StringIO()):
+            days_left = analyze_data(df)["days_left"]
+        predictions.append(np.nan if days_left is None else days_left)
+    elapsed = time.perf_counter() - start
+
+    reference = linear_forecast(cuts, full_pct=100)[picked]
+    return elapsed * len(cuts) / len(picked), np.array(predictions), reference
+
+def run_benchmark(data_dir, workers=2, sample=200):
+    start = time.perf_counter()
+    history = load_history(data_dir)
+    if history is None:
+        raise SystemExit("[ERROR] No data found.")
+    load_s = time.perf_counter() - start
+    print(f"[BENCH] {len(history[0])} rows, {len(history[3])} bins")
+
+    start = time.perf_counter()
+    serial = run_backtest(history, workers=1)
+    serial_s = time.perf_counter() - start
+    start = time.perf_counter()
+    parallel = run_backtest(history, workers=workers)
+    parallel_s = time.perf_counter() - start
+
+    loop_s, replayed, reference = replay_loop(history, sample)
+    scores = score(parallel)
+    agree = bool(np.allclose(replayed, reference, rtol=1e-6, atol=1e-6, equal_nan=True)
+                 and parallel.equals(serial))
+
+    result = {
+        "bins": len(history[3]),
+        "rows": len(history[0]),
+        "cuts": int(scores['cuts'].iloc[0]),
+        "load_s": round(load_s, 2),
+        "replay_loop_s": round(loop_s, 1),
+        "workers": workers,
+        "backtest_serial_s": round(serial_s, 2),
+        "backtest_pool_s": round(parallel_s, 2),
+        "speedup": round(loop_s / parallel_s, 1),
+    }
+    for name, row in scores.iterrows():
+        result[f"{name}_mae_days"] = round(row['mae_days'], 2)
+        result[f"{name}_p90_days"] = round(row['p90_abs_days'], 2)
+    result["results_agree"] = agree
+    for key, value in result.items():
+        print(f"{key + ':':24}{value}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the forecast backtest")
+    parser.add_argument('--bins', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--interval', type=int, default=60, help="Minutes between readings of a bin")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--sample', type=int, default=200, help="Cuts replayed with analyze_data")
+    parser.add_argument('--data-dir', default=None, help="Existing lake (default: generate one in a temp folder)")
+    args = parser.parse_args()
+    if args.data_dir:
+        run_benchmark(args.data_dir, args.workers, args.sample)
+    else:
+        with tempfile.TemporaryDirectory(prefix="bench_backtest_") as tmp:
+            generate_synthetic_data("csv", args.bins, args.days, args.interval, output_dir=tmp)
+            run_benchmark(tmp, args.workers, args.sample)
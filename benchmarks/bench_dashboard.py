@@ -0,0 +1,128 @@
+"""
+Dashboard Startup & Interaction Benchmark
+
+Runs the Streamlit dashboard headless (AppTest) in a fresh Python process
+per scenario, so the cold start includes importing the app's modules and
+loading the data, and times a fixed sequence of interactions:
+
+    cold_start       first run in a new process (fleet overview)
+    overview_rerun   rerun of the overview
+    detail_first     switch to one bin's detail view (Logistics tab)
+    detail_rerun     rerun of the detail view
+    tab_environment  switch to the Environmental tab
+    tab_raw_data     switch to the Raw Data tab
+
+Scenarios:
+
+    in_process   no compute worker: the dashboard loads the lake and
+                 computes the fleet tables itself
+    worker       analytics/compute_worker.py has written its cache first
+
+--script runs another version of the app (e.g. an older dashboard_app.py
+copied into dashboard/) through the same sequence, for before/after
+figures; apps without the view switch or tab state just rerun.
+
+Usage:
+    python benchmarks/bench_dashboard.py --bins 500 --days 90
+    python benchmarks/bench_dashboard.py --data-dir edge_gateway/data
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from analytics.compute_worker import ComputeWorker, get_cache_dir
+
+DASHBOARD_SCRIPT = os.path.join(parent_dir, "dashboard", "dashboard_app.py")
+TABS = {"tab_environment": "🌡️ Environmental Conditions", "tab_raw_data": "📄 Raw Data"}
+
+# ==========================================
+# CHILD: one scenario in a fresh process
+# ==========================================
+
+def run_interactions(script, data_dir):
+    os.environ["SENSOR_DATA_DIR"] = data_dir
+    os.environ.setdefault("AI_PROVIDER", "mock")
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(script, default_timeout=600)
+    timings = {}
+
+    def timed(name, action=None):
+        start = time.perf_counter()
+        (action or app.run)()
+        timings[name] = round(time.perf_counter() - start, 3)
+        if app.exception:
+            raise RuntimeError(f"{name}: {app.exception[0].message}")
+
+    timed("cold_start")
+    timed("overview_rerun")
+    views = app.sidebar.radio
+    if views:
+        timed("detail_first", views[0].set_value(views[0].options[1]).run)
+    else:
+        timed("detail_first")                 # One bin (or no overview): the detail view already shows
+    timed("detail_rerun")
+    for name, label in TABS.items():
+        app.session_state["tab"] = label
+        timed(name)
+    return timings
+
+# ==========================================
+# BENCHMARK
+# ==========================================
+
+def run_scenario(script, data_dir):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', '--script', script,
+                          '--data-dir', data_dir], capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def run_benchmark(data_dir, script=DASHBOARD_SCRIPT):
+    cache_dir = get_cache_dir(data_dir)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    result = {"in_process": run_scenario(script, data_dir)}
+
+    start = time.perf_counter()
+    manifest = ComputeWorker(data_dir).run_once()
+    worker_s = time.perf_counter() - start
+    result["worker"] = dict(run_scenario(script, data_dir), worker_refresh_s=round(worker_s, 2))
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f"[BENCH] {manifest['rows']} rows, {os.path.relpath(script, parent_dir)}")
+    print(f"{'':18}{'in_process':>12}{'worker':>12}")
+    for key in result["in_process"]:
+        print(f"{key:18}{result['in_process'][key]:>12}{result['worker'][key]:>12}")
+    print(f"{'worker_refresh_s':18}{'':>12}{result['worker']['worker_refresh_s']:>12}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the dashboard's cold start and interactions")
+    parser.add_argument('--bins', type=int, default=500)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--interval', type=int, default=60, help="Minutes between readings of a bin")
+    parser.add_argument('--data-dir', default=None, help="Existing lake (default: generate one in a temp folder)")
+    parser.add_argument('--script', default=DASHBOARD_SCRIPT, help="Dashboard version to run")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_interactions(args.script, args.data_dir)))
+    elif args.data_dir:
+        run_benchmark(args.data_dir, os.path.abspath(args.script))
+    else:
+        from analytics.generate_mock_data import generate_synthetic_data
+        with tempfile.TemporaryDirectory(prefix="bench_dashboard_") as tmp:
+            generate_synthetic_data("csv", args.bins, args.days, args.interval, output_dir=tmp)
+            run_benchmark(tmp, os.path.abspath(args.script))
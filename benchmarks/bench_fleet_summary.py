@@ -0,0 +1,135 @@
+"""
+Fleet Overview Benchmark: frame scans vs. the per-bin summary table
+
+Loads a fleet lake with the dashboard's IncrementalLoader and times what a
+dashboard rerun costs before and after the summary table:
+
+    overview_scan      latest reading per bin + predict_fleet over the whole
+                       frame (what a fleet overview would recompute per rerun)
+    overview_table     FleetSummary.table() (maintained by the loader listener)
+    summary_build      the listener's pass over the full history (first load)
+    summary_update     one more reading for every bin (a refresh)
+    drilldown_filter   df[df['bin_id'] == bin] + the 24 h delta filter, the old
+                       per-rerun single-bin path
+    drilldown_index    IncrementalLoader.bin_frame(bin) (first call builds the
+                       per-bin row index: bin_index_build)
+
+It also checks that the table agrees with predict_fleet.
+
+Usage:
+    python benchmarks/bench_fleet_summary.py --bins 2000 --days 90
+    python benchmarks/bench_fleet_summary.py --data-dir edge_gateway/data
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from analytics.fleet_prediction import compute_fill_level, predict_fleet
+from analytics.fleet_summary import FleetSummary
+from analytics.generate_mock_data import generate_synthetic_data
+from edge_gateway.incremental_loader import IncrementalLoader
+
+REPEATS = 3
+
+def add_fill_level(df):
+    df['fill_level_pct'] = compute_fill_level(df['distance_cm'])
+    return df
+
+def best_of(fn, repeats=REPEATS):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def overview_scan(df):
+    latest = df.groupby('bin_id', sort=True).tail(1).set_index('bin_id')
+    return latest.join(predict_fleet(df)[['fill_rate', 'days_left', 'predicted_full']])
+
+def drilldown_filter(df, bin_id):
+    bin_df = df[df['bin_id'] == bin_id].reset_index(drop=True)
+    latest = bin_df.iloc[-1]
+    before = bin_df[bin_df['timestamp'] < (latest['timestamp'] - timedelta(hours=24))]
+    return bin_df, latest['fill_level_pct'] - before['fill_level_pct'].iloc[-1]
+
+def run_benchmark(data_dir, interval_min=60):
+    loader = IncrementalLoader(data_dir, derive=add_fill_level)
+    df = loader.refresh()
+    if df is None:
+        raise SystemExit("[ERROR] No data found.")
+    print(f"[BENCH] {len(df)} rows")
+
+    summary = FleetSummary()
+    start = time.perf_counter()
+    loader.add_listener(summary.on_rows)
+    build_s = time.perf_counter() - start
+
+    # One more reading for every bin, delivered like a refresh
+    last = df.groupby('bin_id', sort=False).tail(1).copy()
+    last['timestamp'] = last['timestamp'] + pd.Timedelta(minutes=interval_min)
+    start = time.perf_counter()
+    summary.on_rows(last, False)
+    update_s = time.perf_counter() - start
+
+    scan_s, _ = best_of(lambda: overview_scan(df))
+    table_s, table = best_of(summary.table)
+
+    bin_id = table.index[len(table) // 2]
+    filter_s, (bin_df, _) = best_of(lambda: drilldown_filter(df, bin_id))
+    start = time.perf_counter()
+    loader.bin_frame(bin_id)
+    index_build_s = time.perf_counter() - start
+    index_s, indexed = best_of(lambda: loader.bin_frame(bin_id))
+
+    # Agreement with the full-frame prediction (table includes the extra reading: compare before it)
+    check = FleetSummary()
+    check.on_rows(df, True)
+    expected = predict_fleet(df)
+    got = check.table().loc[expected.index]
+    agree = bool(np.allclose(got['fill_rate'], expected['fill_rate'], rtol=1e-6, atol=1e-9)
+                 and np.allclose(got['days_left'], expected['days_left'], rtol=1e-6, atol=1e-6, equal_nan=True)
+                 and indexed.equals(bin_df))
+
+    result = {
+        "bins": len(table),
+        "rows": len(df),
+        "overview_scan_ms": round(scan_s * 1000, 1),
+        "overview_table_ms": round(table_s * 1000, 2),
+        "summary_build_s": round(build_s, 2),
+        "summary_update_ms": round(update_s * 1000, 1),
+        "drilldown_filter_ms": round(filter_s * 1000, 1),
+        "bin_index_build_ms": round(index_build_s * 1000, 1),
+        "drilldown_index_ms": round(index_s * 1000, 2),
+        "bin_rows": len(indexed),
+        "results_agree": agree,
+    }
+    for key, value in result.items():
+        print(f"{key + ':':22}{value}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the fleet summary table and per-bin drill-down")
+    parser.add_argument('--bins', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--interval', type=int, default=60, help="Minutes between readings of a bin")
+    parser.add_argument('--data-dir', default=None, help="Existing lake (default: generate one in a temp folder)")
+    args = parser.parse_args()
+    if args.data_dir:
+        run_benchmark(args.data_dir, args.interval)
+    else:
+        with tempfile.TemporaryDirectory(prefix="bench_summary_") as tmp:
+            generate_synthetic_data("csv", args.bins, args.days, args.interval, output_dir=tmp)
+            run_benchmark(tmp, args.interval)
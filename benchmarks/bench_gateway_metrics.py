@@ -0,0 +1,120 @@
+"""
+Gateway Instrumentation Overhead Benchmark
+
+Feeds firmware JSON lines through the async gateway's read path
+(SerialPortReader.feed -> decode -> CSV writer, no serial port, no MQTT)
+and compares:
+
+    bare           histograms replaced by no-ops, no flush hook
+    instrumented   the shipped metrics (read/flush latency histograms;
+                   counters are read at scrape time and cost nothing)
+
+at two read sizes: one reading per serial read (a quiet port, the worst
+case for per-read instrumentation) and 4 kB reads (a busy port). It also
+times one scrape of the endpoint's text and the per-message logging the
+gateway used to do (print of every reading) against a disabled DEBUG log.
+
+Usage:
+    python benchmarks/bench_gateway_metrics.py --readings 200000
+"""
+
+import argparse
+import io
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from edge_gateway.async_gateway import READ_CHUNK_BYTES, AsyncGateway, SerialPortReader
+from edge_gateway.csv_writer import BufferedCsvWriter
+from edge_gateway.load_generator import firmware_line
+
+REPEATS = 3
+
+def make_chunks(lines, chunk_bytes):
+    if not chunk_bytes:
+        return lines
+    stream = b''.join(lines)
+    return [stream[i:i + chunk_bytes] for i in range(0, len(stream), chunk_bytes)]
+
+def feed_all(chunks, instrumented):
+    """Seconds to push every chunk through the read path (best of REPEATS)."""
+    best = None
+    for _ in range(REPEATS):
+        with tempfile.TemporaryDirectory() as data_dir:
+            storage = BufferedCsvWriter(data_dir, fsync="never")
+            gateway = AsyncGateway({}, data_dir=data_dir, storage=storage)
+            if not instrumented:
+                gateway.metrics.read_seconds.observe = lambda value: None
+                storage.on_flush = None
+            reader = SerialPortReader(gateway, "TX-00001", "/dev/null")
+            start = time.perf_counter()
+            for chunk in chunks:
+                reader.feed(chunk)
+            storage.flush()
+            elapsed = time.perf_counter() - start
+            storage.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, gateway
+
+def time_logging(readings):
+    data = {"distance_cm": 42.0, "temperature_c": 20.5, "humidity_pct": 50.1,
+            "timestamp": "2026-01-01 12:00:00", "bin_id": "TX-00001"}
+    sink = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(sink):
+        for _ in range(readings):
+            print(f"Received: {data}")
+    print_s = time.perf_counter() - start
+
+    log = logging.getLogger("bench_gateway_metrics")
+    log.setLevel(logging.INFO)
+    start = time.perf_counter()
+    for _ in range(readings):
+        log.debug("Received: %s", data)
+    debug_off_s = time.perf_counter() - start
+    return print_s, debug_off_s
+
+def run_benchmark(readings, seed=42):
+    rng = random.Random(seed)
+    lines = [firmware_line(rng) for _ in range(readings)]
+    result = {"readings": readings}
+
+    for name, chunk_bytes in (("per_line", 0), ("chunked", READ_CHUNK_BYTES)):
+        chunks = make_chunks(lines, chunk_bytes)
+        bare_s, _ = feed_all(chunks, instrumented=False)
+        inst_s, gateway = feed_all(chunks, instrumented=True)
+        assert gateway.messages == readings, f"{gateway.messages} of {readings} readings handled"
+        result[f"{name}_reads"] = len(chunks)
+        result[f"{name}_bare_msg_s"] = round(readings / bare_s)
+        result[f"{name}_instrumented_msg_s"] = round(readings / inst_s)
+        result[f"{name}_overhead_ns_per_msg"] = round((inst_s - bare_s) / readings * 1e9)
+        result[f"{name}_overhead_pct"] = round(100 * (inst_s - bare_s) / bare_s, 2)
+
+    registry = gateway.metrics.registry
+    start = time.perf_counter()
+    for _ in range(100):
+        registry.render_prometheus()
+    result["scrape_ms"] = round((time.perf_counter() - start) * 10, 3)
+
+    print_s, debug_off_s = time_logging(readings)
+    result["print_per_msg_us"] = round(print_s / readings * 1e6, 2)
+    result["debug_log_off_per_msg_us"] = round(debug_off_s / readings * 1e6, 3)
+
+    for key, value in result.items():
+        print(f"{key + ':':34}{value}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the gateway's instrumentation overhead")
+    parser.add_argument('--readings', type=int, default=200000)
+    args = parser.parse_args()
+    run_benchmark(args.readings)
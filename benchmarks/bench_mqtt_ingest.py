@@ -0,0 +1,163 @@
+"""
+MQTT Ingest Benchmark
+
+Runs the whole central path locally: local_broker.py in its own process,
+one or more publisher processes acting as field gateways (pre-encoded
+PUBLISH packets over a raw socket, as fast as the broker accepts them or at
+a target rate) and MqttIngest writing to a temporary data lake.
+
+Reports ingest throughput, queue depth, lag and time spent in backpressure,
+and checks that every message reached the CSV files.
+
+Usage:
+    python benchmarks/bench_mqtt_ingest.py --messages 200000 --bins 1000
+    python benchmarks/bench_mqtt_ingest.py --messages 100000 --rate 20000
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import multiprocessing as mp
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from edge_gateway.gateway import get_topic
+from edge_gateway.local_broker import LocalBroker, encode_length, publish_packet
+from edge_gateway.mqtt_ingest import MqttIngest
+
+SEND_CHUNK_MESSAGES = 500
+DRAIN_TIMEOUT_S = 120
+
+# ==========================================
+# PROCESSES
+# ==========================================
+
+def run_broker(port_queue):
+    async def serve():
+        broker = await LocalBroker(port=0).start()
+        port_queue.put(broker.port)
+        await asyncio.Event().wait()
+    asyncio.run(serve())
+
+def run_publisher(port, gateway_index, bin_ids, messages, rate, ready, go):
+    """
+    One field gateway: publishes 'messages' readings round-robin over its bins
+    (packets are encoded before the clock starts).
+    """
+    rng = np.random.default_rng(gateway_index)
+    packets = []
+    for i in range(messages):
+        bin_id = bin_ids[i % len(bin_ids)]
+        data = {"distance_cm": round(rng.uniform(5, 100), 2), "temperature_c": round(rng.uniform(15, 25), 2),
+                "humidity_pct": round(rng.uniform(40, 60), 2), "timestamp": time.strftime('%Y-%m-%d %H:%M:%S'),
+                "bin_id": bin_id}
+        packets.append(publish_packet(get_topic(bin_id), json.dumps(data).encode('utf-8')))
+
+    sock = socket.create_connection(("127.0.0.1", port))
+    body = b'\x00\x04MQTT\x04\x02\x00\x3c' + len(f"gw{gateway_index}").to_bytes(2, 'big') + f"gw{gateway_index}".encode()
+    sock.sendall(b'\x10' + encode_length(len(body)) + body)
+    sock.recv(4)                                             # CONNACK
+    ready.release()
+    go.wait()
+    start = time.perf_counter()
+    for i in range(0, messages, SEND_CHUNK_MESSAGES):
+        sock.sendall(b''.join(packets[i:i + SEND_CHUNK_MESSAGES]))
+        if rate:
+            ahead = (i + SEND_CHUNK_MESSAGES) / rate - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+    sock.sendall(b'\xe0\x00')                                # DISCONNECT
+    sock.close()
+
+def count_rows(data_dir):
+    rows = 0
+    for path in glob.glob(os.path.join(data_dir, "sensor_data_*.csv")):
+        with open(path, 'rb') as f:
+            rows += max(sum(1 for _ in f) - 1, 0)
+    return rows
+
+# ==========================================
+# BENCHMARK
+# ==========================================
+
+def run_benchmark(messages, bins, gateways, rate, queue_max):
+    ctx = mp.get_context('spawn')
+    port_queue = ctx.Queue()
+    broker = ctx.Process(target=run_broker, args=(port_queue,), daemon=True)
+    broker.start()
+    port = port_queue.get(timeout=30)
+    ready, go = ctx.Semaphore(0), ctx.Event()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        ingest = MqttIngest("127.0.0.1", port, data_dir, queue_max=queue_max)
+        ingest.start()
+        stop_event = threading.Event()
+        worker = threading.Thread(target=ingest.run, args=(stop_event,))
+        worker.start()
+        time.sleep(1)                                        # connect + subscribe
+
+        bin_ids = [f"TX-{i:05d}" for i in range(bins)]
+        per_gateway = messages // gateways
+        publishers = [ctx.Process(target=run_publisher,
+                                  args=(port, g, bin_ids[g::gateways], per_gateway, rate / gateways if rate else 0,
+                                        ready, go))
+                      for g in range(gateways)]
+        for p in publishers:
+            p.start()
+        for _ in publishers:
+            ready.acquire()
+        start = time.perf_counter()
+        go.set()
+
+        expected = per_gateway * gateways
+        deadline = time.monotonic() + DRAIN_TIMEOUT_S
+        while ingest.messages < expected and time.monotonic() < deadline:
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        for p in publishers:
+            p.join()
+
+        stop_event.set()
+        worker.join()
+        persisted = count_rows(data_dir)
+    broker.terminate()
+
+    result = {
+        "messages": expected,
+        "bins": bins,
+        "gateways": gateways,
+        "target_rate": rate or "max",
+        "elapsed_s": round(elapsed, 2),
+        "throughput_msg_s": round(ingest.messages / elapsed),
+        "batches": ingest.batches,
+        "max_queue": ingest.max_queue,
+        "max_lag_ms": round(ingest.max_lag_s * 1000),
+        "backpressure_s": round(ingest.backpressure_s, 2),
+        "decode_errors": ingest.decode_errors,
+        "persisted_rows": persisted,
+        "complete": persisted == expected,
+    }
+    for key, value in result.items():
+        print(f"{key + ':':20}{value}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the MQTT ingest service against the local broker")
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--bins', type=int, default=1000)
+    parser.add_argument('--gateways', type=int, default=4, help="Publisher processes")
+    parser.add_argument('--rate', type=float, default=0, help="Total publish rate (msg/s), 0 = as fast as possible")
+    parser.add_argument('--queue-max', type=int, default=50000)
+    args = parser.parse_args()
+    run_benchmark(args.messages, args.bins, args.gateways, args.rate, args.queue_max)
@@ -0,0 +1,181 @@
+"""
+Outbox Benchmark: draining a backlog after a broker outage
+
+Scenario (all local, broker = edge_gateway/local_broker.py in its own process):
+
+    1. write     - N readings are appended to the on-disk outbox while the
+                   broker is down (the sender keeps retrying with backoff)
+    2. outage    - the broker comes up; time until the whole backlog has been
+                   published and acknowledged (QoS 1)
+    3. restart   - a second backlog is half drained, the sender is stopped and
+                   a new one resumes from the saved cursor
+
+A subscriber counts what actually arrives at the broker, so lost and
+duplicated messages are reported.
+
+Usage:
+    python benchmarks/bench_outbox.py --messages 200000
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import paho.mqtt.client as mqtt
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from edge_gateway.gateway import get_topic
+from edge_gateway.local_broker import LocalBroker, encode_length, split_packets
+from edge_gateway.outbox import BATCH_MAX_MESSAGES, Outbox, OutboxSender, list_segments
+
+DRAIN_TIMEOUT_S = 300
+
+# ==========================================
+# HELPERS
+# ==========================================
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def run_broker(port):
+    async def serve():
+        await LocalBroker(port=port).start()
+        await asyncio.Event().wait()
+    asyncio.run(serve())
+
+class CountingSubscriber(threading.Thread):
+    """Raw-socket subscriber counting the PUBLISH packets it receives."""
+
+    def __init__(self, port):
+        super().__init__(daemon=True)
+        self.port = port
+        self.received = 0
+        self.ready = threading.Event()
+
+    def run(self):
+        sock = socket.create_connection(("127.0.0.1", self.port))
+        body = b'\x00\x04MQTT\x04\x02\x00\x3c\x00\x03sub'
+        sock.sendall(b'\x10' + encode_length(len(body)) + body)
+        topic = b'bioeconomy/textile_bin/#'
+        body = b'\x00\x01' + len(topic).to_bytes(2, 'big') + topic + b'\x00'
+        sock.sendall(b'\x82' + encode_length(len(body)) + body)
+        buffer = b''
+        while True:
+            chunk = sock.recv(1 << 16)
+            if not chunk:
+                return
+            packets, buffer = split_packets(buffer + chunk)
+            for kind, _, _ in packets:
+                if kind == 9:                       # SUBACK
+                    self.ready.set()
+                elif kind == 3:
+                    self.received += 1
+
+def make_client(port, batch_max):
+    client = mqtt.Client()
+    client.max_inflight_messages_set(batch_max)
+    client.reconnect_delay_set(min_delay=1, max_delay=2)
+    client.connect_async("127.0.0.1", port, 60)
+    client.loop_start()
+    return client
+
+def fill_outbox(outbox, messages, offset=0):
+    start = time.perf_counter()
+    for i in range(offset, offset + messages):
+        bin_id = f"TX-{i % 1000:05d}"
+        outbox.append(get_topic(bin_id), json.dumps({
+            "distance_cm": 50.0, "temperature_c": 20.0, "humidity_pct": 50.0,
+            "timestamp": "2025-10-25 12:00:00", "bin_id": bin_id, "seq": i}))
+    outbox.flush()
+    return time.perf_counter() - start
+
+def wait_for(condition, timeout=DRAIN_TIMEOUT_S):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+# ==========================================
+# BENCHMARK
+# ==========================================
+
+def run_benchmark(messages, batch_max):
+    ctx = mp.get_context('spawn')
+    port = free_port()
+    result = {"messages": messages, "batch_max": batch_max}
+
+    with tempfile.TemporaryDirectory() as outbox_dir:
+        # 1. Broker down: readings go to disk, sender retries
+        outbox = Outbox(outbox_dir, max_messages=5000)
+        client = make_client(port, batch_max)
+        sender = OutboxSender(outbox_dir, client, batch_max=batch_max, wake_event=outbox.flushed).start()
+        write_s = fill_outbox(outbox, messages)
+        result["write_msg_s"] = round(messages / write_s)
+        result["backlog_mb"] = round(sender.backlog_bytes() / 1e6, 1)
+        result["published_during_outage"] = sender.published
+
+        # 2. Broker comes up: drain the backlog
+        broker = ctx.Process(target=run_broker, args=(port,), daemon=True)
+        broker.start()
+        subscriber = None
+        while subscriber is None:
+            try:
+                subscriber = CountingSubscriber(port)
+                socket.create_connection(("127.0.0.1", port)).close()
+            except OSError:
+                subscriber = None
+                time.sleep(0.05)
+        subscriber.start()
+        subscriber.ready.wait(10)
+        up = time.perf_counter()
+        wait_for(lambda: client.is_connected())
+        connected = time.perf_counter()
+        wait_for(lambda: sender.published >= messages)
+        drained = time.perf_counter()
+        result["reconnect_s"] = round(connected - up, 2)
+        result["drain_s"] = round(drained - connected, 2)
+        result["drain_msg_s"] = round(messages / (drained - connected))
+        result["retries_during_outage"] = sender.retries
+
+        # 3. Restart: stop half way through a second backlog, resume from the cursor
+        fill_outbox(outbox, messages, offset=messages)
+        wait_for(lambda: sender.published >= messages + messages // 2)
+        sender.stop()
+        first_run = sender.published
+        resumed = OutboxSender(outbox_dir, client, batch_max=batch_max, wake_event=outbox.flushed).start()
+        wait_for(lambda: first_run + resumed.published >= 2 * messages)
+        resumed.stop()
+        outbox.close()
+        wait_for(lambda: subscriber.received >= 2 * messages, timeout=10)
+
+        result["resumed_published"] = resumed.published
+        result["received"] = subscriber.received
+        result["lost"] = max(2 * messages - subscriber.received, 0)
+        result["duplicates"] = max(subscriber.received - 2 * messages, 0)
+        result["segments_left"] = len(list_segments(outbox_dir))
+        result["backlog_left_bytes"] = resumed.backlog_bytes()
+
+        client.loop_stop()
+        broker.terminate()
+
+    for key, value in result.items():
+        print(f"{key + ':':26}{value}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark draining the MQTT outbox after an outage")
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--batch-max', type=int, default=BATCH_MAX_MESSAGES)
+    args = parser.parse_args()
+    run_benchmark(args.messages, args.batch_max)
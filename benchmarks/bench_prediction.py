@@ -0,0 +1,112 @@
+"""
+Prediction Benchmark: per-bin scikit-learn loop vs. vectorized fleet engine
+
+Generates a synthetic fleet (hourly readings, random fill rates and pickup
+times) and times:
+
+    sklearn_loop   - predict_emptying.analyze_data() called once per bin
+                     (measured on a sample of bins, extrapolated to the fleet)
+    vectorized     - fleet_prediction.predict_fleet() on the whole fleet
+
+It also checks that both give the same fill rate and days left.
+
+Usage:
+    python benchmarks/bench_prediction.py --bins 10000 --days 30
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from analytics.fleet_prediction import BIN_DEPTH_CM, predict_fleet
+from analytics.predict_emptying import analyze_data
+
+# ==========================================
+# SYNTHETIC FLEET
+# ==========================================
+
+def make_fleet(bins, days, seed=42):
+    """
+    Long-format frame (bin_id, timestamp, distance_cm) with 'days' of hourly
+    readings per bin. Each bin fills at its own rate and is emptied when full.
+    """
+    rng = np.random.default_rng(seed)
+    hours = days * 24
+    timestamps = pd.date_range(end=pd.Timestamp.now().floor('h'), periods=hours, freq='h')
+
+    rate = rng.uniform(0.05, 0.6, size=(bins, 1))                 # % per hour
+    deposits = rate * rng.uniform(0.5, 1.5, size=(bins, hours))
+    offset = rng.uniform(0, 100, size=(bins, 1))                  # different phase per bin
+    fill = (offset + np.cumsum(deposits, axis=1)) % 100
+    distance = BIN_DEPTH_CM - fill + rng.uniform(-1, 1, size=(bins, hours))
+
+    return pd.DataFrame({
+        'bin_id': np.repeat([f"TX-{i:05d}" for i in range(bins)], hours),
+        'timestamp': np.tile(timestamps.to_numpy(), bins),
+        'distance_cm': distance.ravel().round(1),
+    })
+
+# ==========================================
+# BENCHMARK
+# ==========================================
+
+def run_sklearn_loop(df, sample_bins):
+    results = {}
+    sample = df[df['bin_id'].isin(sample_bins)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for bin_id, bin_df in sample.groupby('bin_id', sort=False):
+            results[bin_id] = analyze_data(bin_df.reset_index(drop=True))
+    return results
+
+def run_benchmark(bins, days, sklearn_bins):
+    print(f"[BENCH] Generating {bins} bins x {days} days (hourly)...")
+    df = make_fleet(bins, days)
+    print(f"[BENCH] {len(df)} rows")
+
+    start = time.perf_counter()
+    fleet = predict_fleet(df)
+    vectorized_s = time.perf_counter() - start
+
+    sample_bins = fleet.index[:min(sklearn_bins, bins)]
+    start = time.perf_counter()
+    reference = run_sklearn_loop(df, sample_bins)
+    sample_s = time.perf_counter() - start
+    loop_s = sample_s * bins / len(sample_bins)
+
+    ref = pd.DataFrame(reference).T
+    rate_err = np.abs(ref['fill_rate'].astype(float) - fleet.loc[ref.index, 'fill_rate']).max()
+    left_ref = ref['days_left'].astype(float)
+    left_err = np.nanmax(np.abs(left_ref - fleet.loc[ref.index, 'days_left']))
+
+    result = {
+        "bins": bins,
+        "rows": len(df),
+        "vectorized_s": round(vectorized_s, 3),
+        "sklearn_loop_s": round(loop_s, 2),
+        "sklearn_measured_bins": len(sample_bins),
+        "speedup": round(loop_s / vectorized_s, 1),
+        "max_fill_rate_diff": float(rate_err),
+        "max_days_left_diff": float(left_err),
+    }
+    for key, value in result.items():
+        print(f"{key + ':':24}{value}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-bin sklearn vs vectorized fleet prediction")
+    parser.add_argument('--bins', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--sklearn-bins', type=int, default=500,
+                        help="Bins actually run through the sklearn loop (time is extrapolated)")
+    args = parser.parse_args()
+    run_benchmark(args.bins, args.days, args.sklearn_bins)
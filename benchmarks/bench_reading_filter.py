@@ -0,0 +1,144 @@
+"""
+Gateway Reading Filter Benchmark: storage and MQTT volume with and without
+validation, duplicate removal and deadband compression
+
+Generates a synthetic fleet (mock generator: sensor noise, glitches and
+dropped readings), adds re-sent duplicate lines, replays every reading
+through edge_gateway/reading_filter.ReadingFilter in time order, as the
+gateway would, and measures:
+
+    row/csv/mqtt reduction   readings, CSV bytes and MQTT payload bytes of
+                             all readings vs. the kept ones
+    filter_us_per_reading    cost of ReadingFilter.check()
+    max_error_*              largest difference between a valid reading
+                             and the kept reading held in its place
+                             (must be within the deadband)
+    reconstructed            rows after HoldReconstructor vs. valid readings
+
+Scenarios: 'validate' (validation and duplicates only, no deadband) and
+'deadband' (the gateway default).
+
+Usage:
+    python benchmarks/bench_reading_filter.py --bins 200 --days 90
+    python benchmarks/bench_reading_filter.py --heartbeat 21600
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from analytics.generate_mock_data import generate_synthetic_data
+from edge_gateway.csv_writer import CSV_FIELDS
+from edge_gateway.lake_query import query
+from edge_gateway.reading_filter import DEADBAND, HEARTBEAT_S, KEEP, ReadingFilter, reconstruct
+
+VALUES = ["distance_cm", "temperature_c", "humidity_pct"]
+
+def make_readings(data_dir, duplicate_rate, seed=42):
+    """
+    The lake's rows in arrival order as the gateway's reading dicts, with
+    a share of them sent twice.
+    """
+    df = query(data_dir)
+    rng = np.random.default_rng(seed)
+    repeat = np.where(rng.random(len(df)) < duplicate_rate, 2, 1)
+    df = df.loc[df.index.repeat(repeat)].reset_index(drop=True)
+    stamps = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
+    now = (df['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64) / 1e9).tolist()
+    columns = [df[c].astype(np.float64).round(2).tolist() for c in VALUES]
+    readings = [{"distance_cm": d, "temperature_c": t, "humidity_pct": h, "timestamp": ts, "bin_id": b}
+                for d, t, h, ts, b in zip(*columns, stamps, df['bin_id'].tolist())]
+    return readings, now
+
+def payload_bytes(readings):
+    csv_bytes = sum(len(",".join("" if r.get(c) is None else str(r[c]) for c in CSV_FIELDS)) + 1 for r in readings)
+    mqtt_bytes = sum(len(json.dumps(r)) for r in readings)
+    return csv_bytes, mqtt_bytes
+
+def held_errors(valid, kept):
+    """
+    Largest |valid reading - kept reading in force at its time| per column.
+    """
+    valid = valid.sort_values('timestamp', kind='stable')
+    kept = kept.sort_values('timestamp', kind='stable')
+    held = pd.merge_asof(valid, kept, on='timestamp', by='bin_id', suffixes=('', '_held'))
+    errors = {c: float(np.nanmax(np.abs(held[c] - held[f"{c}_held"]))) for c in VALUES}
+    env_mismatch = int((held['temperature_c'].isna() != held['temperature_c_held'].isna()).sum())
+    return errors, env_mismatch
+
+def run_scenario(readings, now, deadband, heartbeat_s, interval_s):
+    reading_filter = ReadingFilter(deadband, heartbeat_s)
+    batch = [dict(r) for r in readings]
+    check = reading_filter.check
+    start = time.perf_counter()
+    statuses = [check(r['bin_id'], r, t) for r, t in zip(batch, now)]
+    filter_s = time.perf_counter() - start
+
+    kept = [r for r, s in zip(batch, statuses) if s == KEEP]
+    valid = [r for r, s in zip(batch, statuses) if s != "drop"]
+    csv_all, mqtt_all = payload_bytes(readings)
+    csv_kept, mqtt_kept = payload_bytes(kept)
+
+    to_frame = lambda rows: pd.DataFrame(rows).assign(timestamp=lambda d: pd.to_datetime(d['timestamp']))
+    kept_df, valid_df = to_frame(kept), to_frame(valid)
+    errors, env_mismatch = held_errors(valid_df, kept_df)
+    rebuilt = reconstruct(kept_df, interval_s, heartbeat_s)
+    limits = deadband or {c: 0.0 for c in VALUES}
+
+    return {
+        "kept": len(kept),
+        "invalid": reading_filter.invalid,
+        "duplicates": reading_filter.duplicates,
+        "env_cleared": reading_filter.env_cleared,
+        "suppressed": reading_filter.suppressed,
+        "heartbeats": reading_filter.heartbeats,
+        "row_reduction": round(len(readings) / len(kept), 2),
+        "csv_reduction": round(csv_all / csv_kept, 2),
+        "mqtt_reduction": round(mqtt_all / mqtt_kept, 2),
+        "filter_us_per_reading": round(filter_s * 1e6 / len(readings), 2),
+        **{f"max_error_{c}": round(errors[c], 3) for c in VALUES},
+        "reconstructed_rows": len(rebuilt),
+        "valid_rows": len(valid),
+        "within_tolerance": bool(env_mismatch == 0 and all(errors[c] <= limits[c] + 1e-9 for c in VALUES)),
+    }
+
+def run_benchmark(data_dir, interval_min=60, heartbeat_s=HEARTBEAT_S, duplicate_rate=0.01):
+    readings, now = make_readings(data_dir, duplicate_rate)
+    csv_all, mqtt_all = payload_bytes(readings)
+    print(f"[BENCH] {len(readings)} readings ({duplicate_rate:.0%} sent twice), "
+          f"CSV {csv_all / 1e6:.1f} MB, MQTT {mqtt_all / 1e6:.1f} MB")
+
+    result = {"readings": len(readings)}
+    for name, deadband in (("validate", None), ("deadband", DEADBAND)):
+        scenario = run_scenario(readings, now, deadband, heartbeat_s, interval_min * 60)
+        result.update({f"{name}_{key}": value for key, value in scenario.items()})
+    result["results_agree"] = result["validate_within_tolerance"] and result["deadband_within_tolerance"]
+    for key, value in result.items():
+        print(f"{key + ':':36}{value}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the gateway reading filter's reduction and accuracy")
+    parser.add_argument('--bins', type=int, default=200)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--interval', type=int, default=60, help="Minutes between readings of a bin")
+    parser.add_argument('--heartbeat', type=float, default=HEARTBEAT_S, help="Seconds between kept readings at most")
+    parser.add_argument('--duplicate-rate', type=float, default=0.01, help="Share of readings sent twice")
+    parser.add_argument('--data-dir', default=None, help="Existing lake (default: generate one in a temp folder)")
+    args = parser.parse_args()
+    if args.data_dir:
+        run_benchmark(args.data_dir, args.interval, args.heartbeat, args.duplicate_rate)
+    else:
+        with tempfile.TemporaryDirectory(prefix="bench_filter_") as tmp:
+            generate_synthetic_data("csv", args.bins, args.days, args.interval, output_dir=tmp)
+            run_benchmark(tmp, args.interval, args.heartbeat, args.duplicate_rate)
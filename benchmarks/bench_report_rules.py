@@ -0,0 +1,75 @@
+"""
+Report Path Benchmark: every bin through the LLM vs. rules first
+
+Builds a synthetic fleet (bench_prediction.make_fleet plus temperatures),
+starts the local LLM stand-in and times fleet reports:
+
+    llm_only   - every bin through the report service (cold cache)
+    tiered     - report_rules.fleet_reports(): rule template for routine
+                 bins, report service only for escalated ones (cold cache)
+
+Usage:
+    python benchmarks/bench_report_rules.py --bins 1000 --latency-ms 300
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+sys.path.append(current_dir)
+
+from bench_prediction import make_fleet
+from analytics.ai_logistics_agent import MODEL_ID, build_messages
+from analytics.fleet_prediction import predict_fleet
+from analytics.local_llm_server import start_local_server
+from analytics.report_rules import fleet_reports, latest_values, llm_contexts, print_metrics
+from analytics.report_service import OpenAIBackend, ReportService
+
+def run_benchmark(bins, days, latency_ms):
+    df = make_fleet(bins, days)
+    df['temperature_c'] = np.random.default_rng(1).normal(18, 5, len(df)).round(1)
+    fleet = predict_fleet(df).join(latest_values(df))
+
+    server = start_local_server(latency_ms=latency_ms)
+    print(f"[BENCH] {bins} bins, local LLM latency {latency_ms:.0f} ms")
+
+    def new_service():
+        return ReportService(OpenAIBackend(server.base_url, "local", MODEL_ID), build_messages)
+
+    service = new_service()
+    start = time.perf_counter()
+    service.generate_many(llm_contexts(fleet))
+    llm_only_s = time.perf_counter() - start
+
+    service = new_service()
+    start = time.perf_counter()
+    _, metrics = fleet_reports(fleet, service.generate_many)
+    tiered_s = time.perf_counter() - start
+    server.shutdown()
+
+    print_metrics(metrics)
+    result = {
+        "llm_only_s": round(llm_only_s, 2),
+        "llm_only_calls": bins,
+        "tiered_s": round(tiered_s, 2),
+        "tiered_calls": service.stats["backend_calls"],
+        "speedup": round(llm_only_s / tiered_s, 1),
+    }
+    print()
+    for key, value in result.items():
+        print(f"{key + ':':20}{value}")
+    return dict(metrics, **result)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark LLM-only vs rule-first fleet reports")
+    parser.add_argument('--bins', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--latency-ms', type=float, default=300)
+    args = parser.parse_args()
+    run_benchmark(args.bins, args.days, args.latency_ms)
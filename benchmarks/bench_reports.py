@@ -0,0 +1,128 @@
+"""
+Report Benchmark: one blocking request per bin vs. the report service
+
+Starts the deterministic local LLM stand-in (analytics/local_llm_server.py)
+with a fixed latency and times fleet reports:
+
+    sequential     - old path: new OpenAI client + one blocking request per
+                     bin (measured on a sample of bins, extrapolated)
+    service_cold   - ReportService, empty cache: concurrent fan-out
+    service_warm   - same contexts again: all answered from the cache
+    service_delta  - ~10 % of the bins changed (new fill level)
+
+Usage:
+    python benchmarks/bench_reports.py --bins 1000 --latency-ms 300
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from openai import OpenAI
+from analytics.ai_logistics_agent import MODEL_ID, build_messages
+from analytics.local_llm_server import start_local_server
+from analytics.report_service import MAX_CONCURRENCY, OpenAIBackend, ReportService
+
+# ==========================================
+# SYNTHETIC CONTEXTS
+# ==========================================
+
+def make_contexts(bins, seed=42):
+    """
+    One report context per bin, formatted like the dashboard's.
+    """
+    rng = np.random.default_rng(seed)
+    fill = rng.uniform(0, 100, bins)
+    rate = rng.uniform(0.5, 15, bins)
+    temp = rng.normal(18, 5, bins)
+    return [{
+        "bin_id": f"TX-{i:05d}",
+        "current_fill": f"{fill[i]:.1f}%",
+        "trend": f"+{rate[i]:.1f}% / day",
+        "prediction_date": f"{int((100 - fill[i]) / rate[i])} days",
+        "temperature": f"{temp[i]:.1f} C",
+    } for i in range(bins)]
+
+def change_some(contexts, share, seed=7):
+    rng = np.random.default_rng(seed)
+    changed = list(contexts)
+    for i in rng.choice(len(contexts), int(len(contexts) * share), replace=False):
+        fill = float(changed[i]["current_fill"].rstrip('%'))
+        changed[i] = dict(changed[i], current_fill=f"{min(fill + 10, 100):.1f}%")
+    return changed
+
+# ==========================================
+# BENCHMARK
+# ==========================================
+
+def run_sequential(base_url, contexts):
+    reports = []
+    for context in contexts:
+        client = OpenAI(base_url=base_url, api_key="local")   # as get_ai_client() did
+        response = client.chat.completions.create(model=MODEL_ID, messages=build_messages(context))
+        reports.append(response.choices[0].message.content)
+    return reports
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def run_benchmark(bins, latency_ms, sequential_bins, concurrency):
+    server = start_local_server(latency_ms=latency_ms)
+    print(f"[BENCH] Local LLM at {server.base_url} (latency {latency_ms:.0f} ms), {bins} bins")
+    contexts = make_contexts(bins)
+
+    sample = contexts[:min(sequential_bins, bins)]
+    _, sample_s = timed(run_sequential, server.base_url, sample)
+    sequential_s = sample_s * bins / len(sample)
+
+    service = ReportService(OpenAIBackend(server.base_url, "local", MODEL_ID), build_messages,
+                            concurrency=concurrency)
+    server.max_in_flight = 0
+    cold, cold_s = timed(service.generate_many, contexts)
+    max_in_flight = server.max_in_flight
+    calls_cold = service.stats["backend_calls"]
+    _, warm_s = timed(service.generate_many, contexts)
+    calls_warm = service.stats["backend_calls"] - calls_cold
+    _, delta_s = timed(service.generate_many, change_some(contexts, 0.1))
+    calls_delta = service.stats["backend_calls"] - calls_cold - calls_warm
+    server.shutdown()
+
+    result = {
+        "bins": bins,
+        "latency_ms": latency_ms,
+        "sequential_s": round(sequential_s, 2),
+        "sequential_measured_bins": len(sample),
+        "service_cold_s": round(cold_s, 2),
+        "service_cold_calls": calls_cold,
+        "service_warm_s": round(warm_s, 4),
+        "service_warm_calls": calls_warm,
+        "service_delta_s": round(delta_s, 2),
+        "service_delta_calls": calls_delta,
+        "speedup_cold": round(sequential_s / cold_s, 1),
+        "max_in_flight": max_in_flight,
+        "concurrency_limit": concurrency,
+        "reports": sum(1 for r in cold if r and not r.startswith("[ERROR]")),
+        "errors": service.stats["errors"],
+    }
+    for key, value in result.items():
+        print(f"{key + ':':28}{value}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs cached concurrent report generation")
+    parser.add_argument('--bins', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=300)
+    parser.add_argument('--sequential-bins', type=int, default=20,
+                        help="Bins actually run through the sequential path (time is extrapolated)")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY)
+    args = parser.parse_args()
+    run_benchmark(args.bins, args.latency_ms, args.sequential_bins, args.concurrency)
@@ -0,0 +1,146 @@
+"""
+Environmental Risk Benchmark: per-bin pandas loop vs. vectorized engine
+
+Generates a synthetic fleet (time-ordered readings like the data lake, each
+bin with its own climate and some bins turning damp) and times:
+
+    per_bin_loop   - resample/ewm/rolling per bin with groupby (measured on a
+                     sample of bins, extrapolated to the fleet)
+    engine_build   - RiskEngine over the whole history in one batch (what the
+                     dashboard does on its first load)
+    engine_update  - one more hour of readings for every bin (a refresh)
+    ranking        - RiskEngine.ranking() for the whole fleet
+
+It also checks that the loop and the engine agree on the sample bins.
+
+Usage:
+    python benchmarks/bench_risk.py --bins 2000 --days 365
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from analytics.environmental_risk import (HUMIDITY_HALFLIFE_H, HUMIDITY_LIMIT_PCT, MOLD_HALFLIFE_H, TEMP_LIMIT_C,
+                                          WINDOW_HOURS, RiskEngine, mold_factor)
+
+# ==========================================
+# SYNTHETIC FLEET
+# ==========================================
+
+def make_fleet(bins, days, interval_min, seed=42):
+    """
+    Long-format frame (timestamp, temperature_c, humidity_pct, bin_id) sorted
+    by time: one reading per bin every 'interval_min' minutes.
+    """
+    rng = np.random.default_rng(seed)
+    steps = days * 24 * 60 // interval_min
+    start = pd.Timestamp.now().floor('h') - pd.Timedelta(days=days)
+    t = np.arange(steps)[:, None] * interval_min / (24 * 60)                # days
+
+    base_temp = rng.uniform(8, 22, size=bins)
+    base_hum = rng.uniform(40, 62, size=bins)
+    damp = rng.random(bins) < 0.05                                        # leaking bins
+    temp = base_temp + 6 * np.sin(2 * np.pi * (t - 100) / 365) + 3 * np.sin(2 * np.pi * t) \
+        + rng.normal(0, 1, size=(steps, bins))
+    hum = base_hum + np.where(damp, 25, 0) * (t > days * 0.8) + rng.normal(0, 4, size=(steps, bins))
+    # Offsets inside the interval so bins do not report at the same instant
+    offset = rng.uniform(0, interval_min * 60e9, size=bins).astype(np.int64)
+    ts = start.value + (np.arange(steps)[:, None] * interval_min * 60e9).astype(np.int64) + offset
+    order = np.argsort(ts.ravel(), kind='stable')
+
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(ts.ravel()[order]),
+        'temperature_c': temp.ravel()[order].round(1),
+        'humidity_pct': hum.ravel()[order].round(1),
+        'bin_id': pd.Categorical.from_codes(np.tile(np.arange(bins), steps)[order],
+                                            [f"TX-{i:05d}" for i in range(bins)]),
+    })
+
+# ==========================================
+# BENCHMARK
+# ==========================================
+
+def per_bin_loop(df, end):
+    """
+    The straightforward version: one resample + ewm + rolling per bin, on an
+    hourly grid up to 'end' (the latest hour of the fleet, as in the engine).
+    """
+    results = {}
+    for bin_id, bin_df in df.groupby('bin_id', sort=False, observed=True):
+        hourly = bin_df.set_index('timestamp')[['temperature_c', 'humidity_pct']].resample('h').mean()
+        hourly = hourly.reindex(pd.date_range(hourly.index[0], end, freq='h'))
+        smoothed = hourly['humidity_pct'].ewm(halflife=HUMIDITY_HALFLIFE_H, adjust=False, ignore_na=True).mean()
+        humid = smoothed > HUMIDITY_LIMIT_PCT
+        run = int((~humid[::-1]).cumsum().eq(0).sum())
+        mold = pd.Series(mold_factor(hourly['temperature_c'], hourly['humidity_pct'])).ewm(
+            halflife=MOLD_HALFLIFE_H, adjust=False, ignore_na=True).mean().iloc[-1]
+        recent = hourly.iloc[-WINDOW_HOURS:]
+        results[bin_id] = {
+            'hot_hours': int((recent['temperature_c'] > TEMP_LIMIT_C).sum()),
+            'humid_hours': int((recent['humidity_pct'] > HUMIDITY_LIMIT_PCT).sum()),
+            'sustained_humid_h': run,
+            'mold_index': round(float(np.nan_to_num(mold)) * 100, 1),
+        }
+    return pd.DataFrame.from_dict(results, orient='index')
+
+def run_benchmark(bins, days, interval_min, loop_bins):
+    print(f"[BENCH] Generating {bins} bins x {days} days (every {interval_min} min)...")
+    df = make_fleet(bins, days, interval_min)
+    last_hour = df['timestamp'].iloc[-1].floor('h')
+    history, new_hour = df[df['timestamp'] < last_hour], df[df['timestamp'] >= last_hour]
+    print(f"[BENCH] {len(df)} rows")
+
+    engine = RiskEngine()
+    start = time.perf_counter()
+    engine.on_rows(history, True)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine.on_rows(new_hour, False)
+    update_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ranking = engine.ranking()
+    ranking_s = time.perf_counter() - start
+
+    sample_bins = df['bin_id'].cat.categories[:min(loop_bins, bins)]
+    sample = df[df['bin_id'].isin(sample_bins)]
+    start = time.perf_counter()
+    loop = per_bin_loop(sample, last_hour)
+    loop_s = (time.perf_counter() - start) * bins / len(sample_bins)
+
+    check = ranking.loc[loop.index, loop.columns]
+    agree = bool(np.allclose(check.to_numpy(dtype=float), loop.to_numpy(dtype=float), atol=0.11))
+
+    result = {
+        "bins": bins,
+        "rows": len(df),
+        "per_bin_loop_s": round(loop_s, 2),
+        "engine_build_s": round(build_s, 2),
+        "speedup": round(loop_s / build_s, 1),
+        "engine_update_ms": round(update_s * 1000, 1),
+        "ranking_ms": round(ranking_s * 1000, 1),
+        "bins_at_risk": int((ranking['risk'] != "ok").sum()),
+        "results_agree": agree,
+    }
+    for key, value in result.items():
+        print(f"{key + ':':20}{value}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the environmental risk engine")
+    parser.add_argument('--bins', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--interval-min', type=int, default=60, help="Minutes between readings of a bin")
+    parser.add_argument('--loop-bins', type=int, default=50, help="Bins timed in the per-bin loop")
+    args = parser.parse_args()
+    run_benchmark(args.bins, args.days, args.interval_min, args.loop_bins)
@@ -0,0 +1,113 @@
+"""
+Route Planner Benchmark on Synthetic Cities
+
+For each city layout and number of stops, times and compares:
+
+    nearest_neighbour - greedy baseline: drive to the nearest unvisited stop
+                        until the truck is full, then back to the depot
+    savings           - route_planner.savings_routes() (KNN Clarke-Wright)
+    savings_local     - savings + 2-opt/or-opt (route_planner.plan_routes)
+
+Layouts (km, depot in the middle of the area):
+    uniform   - stops spread evenly over a 30 x 30 km square
+    clustered - a few towns with dense centres and sparse outskirts
+    radial    - stops along roads leaving the centre (ring-road city)
+
+Usage:
+    python benchmarks/bench_routes.py --stops 500 2000 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from analytics.route_planner import BIN_CAPACITY_KG, ROAD_FACTOR, TRUCK_CAPACITY_KG, plan_routes
+
+LAYOUTS = ["uniform", "clustered", "radial"]
+
+# ==========================================
+# SYNTHETIC CITIES
+# ==========================================
+
+def make_city(layout, stops, seed=42):
+    rng = np.random.default_rng(seed)
+    if layout == "uniform":
+        xy = rng.uniform(-15, 15, size=(stops, 2))
+    elif layout == "clustered":
+        centres = rng.uniform(-20, 20, size=(6, 2))
+        town = rng.integers(0, len(centres), stops)
+        xy = centres[town] + rng.normal(0, 1, size=(stops, 2)) * rng.exponential(1.5, size=(stops, 1))
+    else:
+        angle = rng.integers(0, 12, stops) * (2 * np.pi / 12) + rng.normal(0, 0.02, stops)
+        r = rng.uniform(0.5, 20, stops)
+        xy = np.column_stack([r * np.cos(angle), r * np.sin(angle)])
+    demand = rng.uniform(0.6, 1.0, stops) * BIN_CAPACITY_KG
+    return xy, demand
+
+def nearest_neighbour_length(xy, demand, capacity):
+    remaining = np.ones(len(xy), dtype=bool)
+    total = 0.0
+    while remaining.any():
+        pos, load = np.zeros(2), 0.0
+        while True:
+            d = np.sqrt(((xy - pos) ** 2).sum(axis=1))
+            d[~remaining | (load + demand > capacity)] = np.inf
+            nxt = int(d.argmin())
+            if not np.isfinite(d[nxt]):
+                break
+            total += d[nxt]
+            pos, load = xy[nxt], load + demand[nxt]
+            remaining[nxt] = False
+        total += np.sqrt((pos ** 2).sum())
+    return total * ROAD_FACTOR
+
+# ==========================================
+# BENCHMARK
+# ==========================================
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def run_benchmark(stop_counts, capacity):
+    results = []
+    print(f"{'layout':10}{'stops':>7}{'tours':>7}{'nn_km':>10}{'sav_km':>10}{'opt_km':>10}"
+          f"{'vs_nn':>8}{'nn_s':>8}{'sav_s':>8}{'opt_s':>8}")
+    for layout in LAYOUTS:
+        for stops in stop_counts:
+            xy, demand = make_city(layout, stops)
+            nn_km, nn_s = timed(nearest_neighbour_length, xy, demand, capacity)
+            (routes, sav_lengths), sav_s = timed(plan_routes, xy, demand, capacity=capacity, improve=False)
+            (routes, opt_lengths), opt_s = timed(plan_routes, xy, demand, capacity=capacity)
+            assert sorted(np.concatenate(routes).tolist()) == list(range(stops))
+            assert all(demand[r].sum() <= capacity + 1e-9 for r in routes)
+
+            row = {
+                "layout": layout, "stops": stops, "tours": len(routes),
+                "nearest_neighbour_km": round(nn_km, 1),
+                "savings_km": round(sum(sav_lengths), 1),
+                "savings_local_km": round(sum(opt_lengths), 1),
+                "improvement_vs_nn_pct": round(100 * (1 - sum(opt_lengths) / nn_km), 1),
+                "nearest_neighbour_s": round(nn_s, 3),
+                "savings_s": round(sav_s, 3),
+                "savings_local_s": round(opt_s, 3),
+            }
+            results.append(row)
+            print(f"{layout:10}{stops:7}{len(routes):7}{row['nearest_neighbour_km']:10}{row['savings_km']:10}"
+                  f"{row['savings_local_km']:10}{row['improvement_vs_nn_pct']:7}%{nn_s:8.2f}{sav_s:8.2f}{opt_s:8.2f}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pickup route planner on synthetic cities")
+    parser.add_argument('--stops', type=int, nargs='+', default=[500, 2000, 5000])
+    parser.add_argument('--capacity-kg', type=float, default=TRUCK_CAPACITY_KG)
+    args = parser.parse_args()
+    run_benchmark(args.stops, args.capacity_kg)
@@ -0,0 +1,162 @@
+"""
+Storage Benchmark: CSV vs. partitioned Parquet
+
+Builds a multi-year, multi-bin data lake in the gateway's CSV format,
+compacts it into Parquet and compares load time and peak memory of:
+
+    csv_full        - the original loader: glob + read_csv + to_datetime + sort
+    parquet_full    - lake_query.query() over the whole Parquet lake
+    csv_window      - original loader, then filter one bin / last 30 days
+    parquet_window  - query(bins=[...], start=...) with pushdown
+    csv_index_cold  - query(bins=[...], start=...) on the CSVs, index built first
+    csv_index_warm  - the same query again with the in-process index in place
+
+Every case runs in a fresh Python process so peak RSS is not polluted by
+the previous case.
+
+Usage:
+    python benchmarks/bench_storage.py --bins 100 --years 3
+"""
+
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from edge_gateway.lake_query import get_lake_index, query
+from edge_gateway.parquet_store import compact_closed_months
+
+CASES = ["csv_full", "parquet_full", "csv_window", "parquet_window", "csv_index_cold", "csv_index_warm"]
+WINDOW_DAYS = 30
+
+# ==========================================
+# DATASET
+# ==========================================
+
+def build_dataset(data_dir, bins, years, seed=42):
+    """
+    Writes hourly readings of 'bins' bins over 'years' years as monthly CSV
+    files (gateway format), then copies them into the Parquet lake.
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp.now().floor('h') - pd.DateOffset(months=1)
+    timestamps = pd.date_range(end=end, periods=int(years * 365 * 24), freq='h')
+    csv_dir = os.path.join(data_dir, "csv")
+    lake_dir = os.path.join(data_dir, "lake")
+    os.makedirs(csv_dir, exist_ok=True)
+
+    ts_text = timestamps.strftime('%Y-%m-%d %H:%M:%S')
+    months = ts_text.str[:7]
+    for b in range(bins):
+        fill = np.cumsum(rng.uniform(0.1, 0.3, len(timestamps))) % 100
+        df = pd.DataFrame({
+            "timestamp": ts_text,
+            "distance_cm": np.round(100 - fill + rng.uniform(-1, 1, len(timestamps)), 1),
+            "temperature_c": np.round(rng.uniform(15, 25, len(timestamps)), 1),
+            "humidity_pct": np.round(rng.uniform(40, 60, len(timestamps)), 1),
+            "bin_id": f"TX-{b:04d}",
+        })
+        for month, group in df.groupby(months):
+            path = os.path.join(csv_dir, f"sensor_data_{month}.csv")
+            group.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+    # Compact a copy so the CSV source stays intact for the baseline
+    os.makedirs(lake_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(csv_dir, "sensor_data_*.csv")):
+        os.link(path, os.path.join(lake_dir, os.path.basename(path)))
+    compact_closed_months(lake_dir, delete_csv=True)
+    with open(os.path.join(data_dir, "meta.json"), 'w') as f:
+        json.dump({"bins": bins, "years": years, "end": str(timestamps[-1])}, f)
+    return len(timestamps) * bins
+
+# ==========================================
+# CASES (run in a child process)
+# ==========================================
+
+def load_csv_original(csv_dir):
+    csv_files = glob.glob(os.path.join(csv_dir, "sensor_data_*.csv"))
+    df = pd.concat([pd.read_csv(f) for f in csv_files], ignore_index=True)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df.sort_values('timestamp')
+
+def run_case(case, data_dir):
+    csv_dir = os.path.join(data_dir, "csv")
+    lake_dir = os.path.join(data_dir, "lake")
+    with open(os.path.join(data_dir, "meta.json")) as f:
+        window_start = pd.Timestamp(json.load(f)["end"]) - pd.Timedelta(days=WINDOW_DAYS)
+    if case == "csv_index_warm":
+        get_lake_index(csv_dir).refresh()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    if case == "csv_full":
+        df = load_csv_original(csv_dir)
+    elif case == "parquet_full":
+        df = query(lake_dir)
+    elif case == "csv_window":
+        df = load_csv_original(csv_dir)
+        df = df[(df['bin_id'] == "TX-0000") & (df['timestamp'] >= df['timestamp'].max() - pd.Timedelta(days=WINDOW_DAYS))]
+    elif case == "parquet_window":
+        df = query(lake_dir, bins=["TX-0000"], start=window_start, columns=["distance_cm", "bin_id"])
+    elif case in ("csv_index_cold", "csv_index_warm"):
+        df = query(csv_dir, bins=["TX-0000"], start=window_start, columns=["distance_cm", "bin_id"])
+    else:
+        raise ValueError(case)
+    elapsed = time.perf_counter() - start
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "case": case,
+        "rows": len(df),
+        "seconds": round(elapsed, 3),
+        "frame_mb": round(df.memory_usage(deep=True).sum() / 1e6, 1),
+        "peak_rss_delta_mb": round((rss_after - rss_before) / 1024, 1), # ru_maxrss is in KiB on Linux
+    }
+
+# ==========================================
+# MAIN PROGRAM
+# ==========================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CSV vs Parquet data lake loading")
+    parser.add_argument('--bins', type=int, default=100)
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--data-dir', default=None, help="Reuse/build the dataset here (default: temp folder)")
+    parser.add_argument('--case', choices=CASES, help=argparse.SUPPRESS) # internal: child process mode
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.data_dir)))
+        return
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="bench_storage_")
+    if not os.path.isdir(os.path.join(data_dir, "lake")):
+        print(f"[BENCH] Building {args.bins} bins x {args.years} years of hourly data in {data_dir}...")
+        rows = build_dataset(data_dir, args.bins, args.years)
+        print(f"[BENCH] {rows} rows written.")
+
+    results = []
+    for case in CASES:
+        out = subprocess.run([sys.executable, __file__, '--case', case, '--data-dir', data_dir],
+                             capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{'case':16}{'rows':>10}{'seconds':>10}{'frame MB':>10}{'peak RSS MB':>13}")
+    for r in results:
+        print(f"{r['case']:16}{r['rows']:>10}{r['seconds']:>10}{r['frame_mb']:>10}{r['peak_rss_delta_mb']:>13}")
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Telemetry Format Benchmark: JSON lines vs binary frames
+
+Compares the firmware's two serial formats:
+
+    - size         bytes per reading and time on the wire at the serial baud
+                   rate (10 bits per byte: start + 8 data + stop)
+    - decode       gateway-side decoding throughput (TelemetryDecoder +
+                   decode_items, i.e. what SerialPortReader.feed runs)
+    - loss         a binary stream with randomly dropped and corrupted frames:
+                   are the losses detected?
+
+Usage:
+    python benchmarks/bench_telemetry.py --readings 200000 --drop 0.01
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from edge_gateway.gateway import BAUD_RATE, decode_items
+from edge_gateway.load_generator import firmware_frame, firmware_line
+from edge_gateway.telemetry_frame import TelemetryDecoder
+
+CHUNK_BYTES = 4096          # Same as async_gateway.READ_CHUNK_BYTES
+
+def decode_stream(stream):
+    decoder = TelemetryDecoder()
+    readings = 0
+    start = time.perf_counter()
+    for i in range(0, len(stream), CHUNK_BYTES):
+        readings += len(decode_items(decoder.feed(stream[i:i + CHUNK_BYTES]))[0])
+    return readings, time.perf_counter() - start, decoder
+
+def run_benchmark(readings, drop, corrupt, seed=42):
+    rng = random.Random(seed)
+    json_stream = b''.join(firmware_line(rng) for _ in range(readings))
+    frames = [firmware_frame(rng, 105, seq) for seq in range(readings)]
+    binary_stream = b''.join(frames)
+    result = {"readings": readings, "baud_rate": BAUD_RATE}
+
+    # 1. Size on the wire
+    for name, stream in (("json", json_stream), ("binary", binary_stream)):
+        size = len(stream) / readings
+        result[f"{name}_bytes"] = round(size, 1)
+        result[f"{name}_airtime_ms"] = round(size * 10 / BAUD_RATE * 1000, 1)
+    result["size_reduction"] = round(len(json_stream) / len(binary_stream), 2)
+
+    # 2. Gateway decoding
+    for name, stream in (("json", json_stream), ("binary", binary_stream)):
+        decoded, elapsed, _ = decode_stream(stream)
+        assert decoded == readings, f"{name}: decoded {decoded} of {readings}"
+        result[f"{name}_decode_per_s"] = round(readings / elapsed)
+
+    # 3. Lossy link: drop and corrupt frames, compare with what the decoder reports
+    dropped = corrupted = 0
+    damaged = []
+    for frame in frames:
+        roll = rng.random()
+        if roll < drop:
+            dropped += 1
+            continue
+        if roll < drop + corrupt:
+            frame = bytearray(frame)
+            frame[rng.randrange(2, len(frame))] ^= 1 << rng.randrange(8)
+            corrupted += 1
+        damaged.append(bytes(frame))
+    decoded, _, decoder = decode_stream(b''.join(damaged))
+    result["dropped"] = dropped
+    result["corrupted"] = corrupted
+    result["crc_errors"] = decoder.crc_errors
+    result["lost_detected"] = decoder.lost_frames
+    result["readings_kept"] = decoded
+    result["all_losses_detected"] = decoder.lost_frames == dropped + corrupted
+
+    for key, value in result.items():
+        print(f"{key + ':':22}{value}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark JSON vs binary telemetry frames")
+    parser.add_argument('--readings', type=int, default=200000)
+    parser.add_argument('--drop', type=float, default=0.01, help="Share of frames dropped on the link")
+    parser.add_argument('--corrupt', type=float, default=0.01, help="Share of frames with a flipped bit")
+    args = parser.parse_args()
+    run_benchmark(args.readings, args.drop, args.corrupt)
@@ -0,0 +1,393 @@
+"""
+Pipeline Benchmark Harness
+
+Runs the whole pipeline on a synthetic fleet of configurable size, one
+stage per fresh Python process (so peak memory of a stage is not polluted
+by the previous one), and stores the results as JSON for regression
+comparison:
+
+    generate        generate_mock_data.py writing the fleet's CSV history (rows/s)
+    gateway_decode  serial decoding in the gateway, JSON lines vs binary frames
+                    (bench_telemetry.py)
+    filter          gateway reading filter on the generated fleet: storage and
+                    MQTT reduction of the deadband, error of the held readings
+                    (bench_reading_filter.py)
+    ingest_serial   async_gateway.py fed over pseudo-terminals by
+                    load_generator.py (msgs/s end to end, CPU), MQTT off
+    ingest_mqtt     MqttIngest behind local_broker.py (bench_mqtt_ingest.py)
+    load            the dashboard loader on the generated fleet: cold load,
+                    refresh with nothing new, refresh after an append, and a
+                    one-bin window through lake_query
+    predict         fleet_prediction vs. analyze_data per bin (bench_prediction.py)
+    risk            environmental risk engine (bench_risk.py)
+    summary         fleet summary table and per-bin drill-down on the
+                    generated fleet (bench_fleet_summary.py)
+    backtest        forecast backtest of the generated fleet vs. replaying
+                    analyze_data per cut (bench_backtest.py)
+    render          the Streamlit dashboard on the generated fleet (AppTest):
+                    first run and rerun of the fleet overview, rerun of a
+                    bin's detail view
+
+Everything runs offline: serial ports are pseudo-terminals, the MQTT broker
+is local_broker.py and no LLM is called. Stages whose requirements are
+missing (no pseudo-terminals, no Streamlit) are recorded as skipped.
+
+Every stage reports its own figures plus wall time and peak RSS (its own
+process and, separately, the processes it started). --compare prints the
+change against an earlier result file and exits with 1 on regressions
+beyond --tolerance.
+
+Usage:
+    python benchmarks/run_all.py                                   # small fleet, all stages
+    python benchmarks/run_all.py --bins 1000 --days 365 --stages generate load predict
+    python benchmarks/run_all.py --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:                 # Windows: no peak RSS figures
+    resource = None
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+STAGES = ["generate", "gateway_decode", "filter", "ingest_serial", "ingest_mqtt", "load", "predict", "risk", "summary",
+          "backtest", "render"]
+RESULTS_DIR = os.path.join(current_dir, "results")
+DASHBOARD_SCRIPT = os.path.join(parent_dir, "dashboard", "dashboard_app.py")
+WINDOW_DAYS = 30
+
+# Metric direction for --compare, by key name
+HIGHER_IS_BETTER = ("per_s", "msg_s", "rows_s", "throughput", "speedup", "reduction")
+LOWER_IS_BETTER = ("_s", "_ms", "_seconds", "_mb", "_us_per_bin", "_ms_per_bin", "_us_per_reading")
+NOISE_FLOOR_S = 0.05         # Shorter timings are shown but never flagged
+
+class Skipped(Exception):
+    """Stage requirement missing in this environment."""
+
+# ==========================================
+# STAGES (run in a child process)
+# ==========================================
+
+def lake_files(data_dir):
+    return glob.glob(os.path.join(data_dir, "sensor_data_*.csv"))
+
+def stage_generate(args):
+    from analytics.generate_mock_data import generate_synthetic_data
+
+    for path in lake_files(args.data_dir):
+        os.remove(path)
+    start = time.perf_counter()
+    rows = generate_synthetic_data("csv", args.bins, args.days, args.interval, output_dir=args.data_dir)
+    elapsed = time.perf_counter() - start
+    size = sum(os.path.getsize(p) for p in lake_files(args.data_dir))
+    return {"rows": rows, "generate_s": round(elapsed, 2), "rows_per_s": round(rows / elapsed),
+            "lake_mb": round(size / 1e6, 1)}
+
+def stage_gateway_decode(args):
+    from benchmarks.bench_telemetry import run_benchmark
+    return run_benchmark(args.messages, drop=0.01, corrupt=0.01)
+
+def stage_filter(args):
+    if not lake_files(args.data_dir):
+        raise Skipped("no data; run the generate stage first")
+    from benchmarks.bench_reading_filter import run_benchmark
+    return run_benchmark(args.data_dir, args.interval)
+
+def stage_ingest_serial(args):
+    if not hasattr(os, 'openpty'):
+        raise Skipped("no pseudo-terminals on this platform")
+    from edge_gateway.load_generator import run_load_test
+
+    bins = min(args.bins, args.serial_bins)
+    with tempfile.TemporaryDirectory(prefix="bench_ingest_") as data_dir:
+        result = run_load_test(bins, max(1, args.messages // bins), data_dir=data_dir)
+    result.pop("data_dir")
+    if result["messages_persisted"] < result["messages_sent"]:
+        raise RuntimeError(f"only {result['messages_persisted']} of {result['messages_sent']} messages persisted")
+    return result
+
+def stage_ingest_mqtt(args):
+    from benchmarks.bench_mqtt_ingest import run_benchmark
+    return run_benchmark(args.messages, args.bins, gateways=2, rate=0, queue_max=50000)
+
+def stage_load(args):
+    import pandas as pd
+    from edge_gateway.incremental_loader import IncrementalLoader
+    from edge_gateway.lake_query import query
+
+    loader = IncrementalLoader(args.data_dir)
+    start = time.perf_counter()
+    df = loader.refresh()
+    cold_s = time.perf_counter() - start
+    if df is None:
+        raise Skipped("no data; run the generate stage first")
+    frame_mb = df.memory_usage(deep=True).sum() / 1e6
+
+    start = time.perf_counter()
+    loader.refresh()
+    unchanged_s = time.perf_counter() - start
+
+    # One more reading for every bin, appended like the gateway does
+    last = df.groupby('bin_id', sort=False).tail(1).copy()
+    last['timestamp'] = last['timestamp'] + pd.Timedelta(minutes=args.interval)
+    path = os.path.join(args.data_dir, f"sensor_data_{last['timestamp'].max():%Y-%m}.csv")
+    columns = ["timestamp", "distance_cm", "temperature_c", "humidity_pct", "bin_id"]
+    last[columns].to_csv(path, mode='a', header=not os.path.exists(path), index=False,
+                         date_format='%Y-%m-%d %H:%M:%S')
+    start = time.perf_counter()
+    appended = len(loader.refresh()) - len(df)
+    append_s = time.perf_counter() - start
+
+    window_start = df['timestamp'].max() - pd.Timedelta(days=WINDOW_DAYS)
+    start = time.perf_counter()
+    window = query(args.data_dir, bins=[df['bin_id'].iloc[0]], start=window_start)
+    window_s = time.perf_counter() - start
+
+    return {
+        "rows": len(df),
+        "cold_load_s": round(cold_s, 3),
+        "load_rows_per_s": round(len(df) / cold_s),
+        "frame_mb": round(frame_mb, 1),
+        "refresh_unchanged_ms": round(unchanged_s * 1000, 1),
+        "refresh_append_ms": round(append_s * 1000, 1),
+        "appended_rows": appended,
+        "one_bin_window_ms": round(window_s * 1000, 1),
+        "one_bin_window_rows": len(window),
+    }
+
+def stage_predict(args):
+    from benchmarks.bench_prediction import run_benchmark
+
+    result = run_benchmark(args.bins, args.days, min(args.bins, 200))
+    result["vectorized_us_per_bin"] = round(result["vectorized_s"] * 1e6 / args.bins, 1)
+    result["sklearn_ms_per_bin"] = round(result["sklearn_loop_s"] * 1e3 / args.bins, 2)
+    return result
+
+def stage_risk(args):
+    from benchmarks.bench_risk import run_benchmark
+    return run_benchmark(args.bins, args.days, args.interval, min(args.bins, 50))
+
+def stage_summary(args):
+    if not lake_files(args.data_dir):
+        raise Skipped("no data; run the generate stage first")
+    from benchmarks.bench_fleet_summary import run_benchmark
+    return run_benchmark(args.data_dir, args.interval)
+
+def stage_backtest(args):
+    if not lake_files(args.data_dir):
+        raise Skipped("no data; run the generate stage first")
+    from benchmarks.bench_backtest import run_benchmark
+    return run_benchmark(args.data_dir, os.cpu_count() or 1)
+
+def stage_render(args):
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        raise Skipped("streamlit not installed")
+    if not lake_files(args.data_dir):
+        raise Skipped("no data; run the generate stage first")
+
+    os.environ["SENSOR_DATA_DIR"] = args.data_dir
+    os.environ.setdefault("AI_PROVIDER", "mock")
+    app = AppTest.from_file(DASHBOARD_SCRIPT, default_timeout=600)
+    start = time.perf_counter()
+    app.run()
+    first_s = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+
+    start = time.perf_counter()
+    app.run()
+    rerun_s = time.perf_counter() - start
+    result = {"first_run_s": round(first_s, 2), "rerun_s": round(rerun_s, 2)}
+
+    if app.sidebar.radio:                       # Several bins: overview first, then one bin's detail
+        app.sidebar.radio[0].set_value(app.sidebar.radio[0].options[1]).run()
+        start = time.perf_counter()
+        app.run()
+        result["detail_rerun_s"] = round(time.perf_counter() - start, 2)
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+    return result
+
+def run_stage(stage, args):
+    """Runs one stage in this process; returns its result record."""
+    before = time.perf_counter()
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            result = globals()[f"stage_{stage}"](args)
+        status = "ok"
+    except Skipped as e:
+        result, status = {"reason": str(e)}, "skipped"
+    record = {
+        "stage": stage,
+        "status": status,
+        "wall_s": round(time.perf_counter() - before, 2),
+        "result": result,
+    }
+    if resource is not None:
+        # ru_maxrss is in KiB on Linux, bytes on macOS
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        record["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+        record["children_peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)
+    return record, log.getvalue()
+
+# ==========================================
+# REGRESSION COMPARISON
+# ==========================================
+
+def _direction(key):
+    if any(part in key for part in HIGHER_IS_BETTER):
+        return 1
+    if key.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+def flatten(report):
+    """{ 'stage.key': number } of every numeric figure in a result file."""
+    values = {}
+    for record in report["stages"]:
+        if record["status"] != "ok":
+            continue
+        figures = dict(record["result"], wall_s=record["wall_s"], peak_rss_mb=record.get("peak_rss_mb"))
+        for key, value in figures.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[f"{record['stage']}.{key}"] = value
+    return values
+
+def _too_short(key, *values):
+    unit = 1e-3 if key.endswith("_ms") else 1 if key.endswith(("_s", "_seconds")) else None
+    return unit is not None and max(values) * unit < NOISE_FLOOR_S
+
+def compare(current, baseline, tolerance):
+    """
+    Prints the change of every directional figure; returns the regressions
+    (worse than the baseline by more than 'tolerance'; timings under
+    NOISE_FLOOR_S are not counted).
+    """
+    old, new = flatten(baseline), flatten(current)
+    regressions = []
+    print(f"\n--- COMPARED WITH {baseline['started']} ---")
+    print(f"{'figure':40}{'baseline':>14}{'current':>14}{'change':>10}")
+    for key in new:
+        direction = _direction(key.split('.', 1)[1])
+        if key not in old or not direction or not old[key]:
+            continue
+        change = new[key] / old[key] - 1
+        worse = -direction * change > tolerance and not _too_short(key, old[key], new[key])
+        if worse:
+            regressions.append(key)
+        print(f"{key:40}{old[key]:>14.6g}{new[key]:>14.6g}{change:>+10.0%}" + ("  REGRESSION" if worse else ""))
+    return regressions
+
+# ==========================================
+# MAIN PROGRAM
+# ==========================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage and store the results as JSON")
+    parser.add_argument('--bins', type=int, default=100, help="Fleet size")
+    parser.add_argument('--days', type=int, default=30, help="Days of history")
+    parser.add_argument('--interval', type=int, default=60, help="Minutes between readings of a bin")
+    parser.add_argument('--messages', type=int, default=50000, help="Messages for the ingest/decode stages")
+    parser.add_argument('--serial-bins', type=int, default=100, help="Max pseudo-terminals in ingest_serial")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--data-dir', default=None, help="Fleet data folder (default: temp folder, removed)")
+    parser.add_argument('--output', default=None, help="Result file (default: benchmarks/results/<time>.json)")
+    parser.add_argument('--compare', default=None, help="Earlier result file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown before a regression")
+    parser.add_argument('--stage', choices=STAGES, help=argparse.SUPPRESS) # internal: child process mode
+    args = parser.parse_args()
+
+    if args.stage:
+        record, log = run_stage(args.stage, args)
+        sys.stderr.write(log)
+        print(json.dumps(record))
+        return
+
+    keep_data = args.data_dir is not None
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="bench_fleet_")
+    os.makedirs(data_dir, exist_ok=True)
+    stages = [s for s in STAGES if s in args.stages]
+    if {"filter", "load", "summary", "backtest", "render"} & set(stages) and "generate" not in stages and not lake_files(data_dir):
+        stages.insert(0, "generate")
+
+    report = {
+        "started": datetime.now().isoformat(timespec='seconds'),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {k: getattr(args, k) for k in ("bins", "days", "interval", "messages", "serial_bins")},
+        "stages": [],
+    }
+    print(f"[BENCH] {args.bins} bins x {args.days} days, stages: {' '.join(stages)}")
+    try:
+        for stage in stages:
+            command = [sys.executable, os.path.abspath(__file__), '--stage', stage, '--data-dir', data_dir,
+                       '--bins', str(args.bins), '--days', str(args.days), '--interval', str(args.interval),
+                       '--messages', str(args.messages), '--serial-bins', str(args.serial_bins)]
+            out = subprocess.run(command, capture_output=True, text=True)
+            if out.returncode != 0:
+                record = {"stage": stage, "status": "error", "error": out.stderr.strip().splitlines()[-1:]}
+            else:
+                record = json.loads(out.stdout.strip().splitlines()[-1])
+            report["stages"].append(record)
+            _print_record(record)
+    finally:
+        if not keep_data:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[SUCCESS] Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"[ERROR] {len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+    if any(r["status"] == "error" for r in report["stages"]):
+        sys.exit(1)
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=parent_dir,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def _print_record(record):
+    print(f"\n--- {record['stage'].upper()} ({record['status']}) ---")
+    if record["status"] == "error":
+        print(f"[ERROR] {' '.join(record['error'])}")
+        return
+    for key, value in record["result"].items():
+        print(f"{key + ':':26}{value}")
+    if record["status"] == "ok":
+        print(f"{'wall_s:':26}{record['wall_s']}")
+        print(f"{'peak_rss_mb:':26}{record.get('peak_rss_mb')} (started processes: {record.get('children_peak_rss_mb')})")
+
+if __name__ == "__main__":
+    main()
@@ -1,134 +1,262 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
-from datetime import datetime, timedelta
+from datetime import timedelta
+import math
 import os
 import sys
-import glob
+import tempfile
+import time
 
 # --- PATH CONFIGURATION ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.append(parent_dir)
 
-try:
-    from analytics.ai_logistics_agent import generate_logistics_report
-except ImportError:
-    st.error("Could not import AI Agent. Check folder structure.")
-    def generate_logistics_report(ctx): return "Error: Module not found."
+# matplotlib, the AI agent and the CSV export are imported where they are
+# used: the first page does not wait for modules it does not need
+from edge_gateway.incremental_loader import IncrementalLoader
+from analytics.compute_worker import ResultCache, get_cache_dir
+from analytics.emptying_events import EmptyingEventIndex
+from analytics.environmental_risk import HUMIDITY_LIMIT_PCT, TEMP_LIMIT_C, WINDOW_HOURS, RiskEngine, report_columns
+from analytics.fleet_summary import CRITICAL_FILL_PCT, FleetSummary
+from edge_gateway.rollups import MAX_CHART_POINTS, RollupStore, choose_resolution, lttb_indices
 
 # --- APP SETTINGS ---
 st.set_page_config(page_title="Bioeconomy IoT Dashboard", layout="wide", page_icon="♻️")
-DATA_FOLDER = os.path.join(parent_dir, "edge_gateway", "data")
+DATA_FOLDER = os.getenv("SENSOR_DATA_DIR", os.path.join(parent_dir, "edge_gateway", "data"))
 BIN_DEPTH_CM = 100
+DUE_SOON_DAYS = 2  # Overview: bins predicted full within this many days
+PREDICTION_COLUMNS = ['cycle_start', 'n_points', 'fill_level_pct', 'fill_rate', 'intercept', 'days_left',
+                      'predicted_full', 'temperature_c']  # Fleet summary -> report rules
 
 # --- DATA LOADING ENGINE ---
 
-@st.cache_data(ttl=60)
+def add_fill_level(df):
+    # Calculate Fill Level %
+    df['fill_level_pct'] = ((BIN_DEPTH_CM - df['distance_cm']) / BIN_DEPTH_CM) * 100
+    df['fill_level_pct'] = df['fill_level_pct'].clip(0, 100)
+    return df
+
+@st.cache_resource
+def get_data_loader():
+    # Shared by all sessions: keeps the history in memory and only parses
+    # rows appended since the previous run. Readings the gateway's deadband
+    # did not store are refilled (if it wrote its filter settings).
+    return IncrementalLoader(DATA_FOLDER, derive=add_fill_level)
+
+@st.cache_resource
+def get_event_index():
+    # Emptying events / current cycle per bin, updated with each batch of new rows
+    index = EmptyingEventIndex()
+    get_data_loader().add_listener(index.on_rows)
+    return index
+
+@st.cache_resource
+def get_rollups():
+    # Hourly/daily min/mean/max per bin for the charts, updated with each batch of new rows
+    rollups = RollupStore()
+    get_data_loader().add_listener(rollups.on_rows)
+    return rollups
+
+@st.cache_resource
+def get_risk_engine():
+    # Heat/humidity exposure and mold index of every bin, updated with each batch of new rows
+    engine = RiskEngine()
+    get_data_loader().add_listener(engine.on_rows)
+    return engine
+
+@st.cache_resource
+def get_fleet_summary():
+    # One row per bin (latest reading, 24h delta, fill rate, risk), updated with each batch of new rows
+    summary = FleetSummary(get_risk_engine())
+    get_data_loader().add_listener(summary.on_rows)
+    return summary
+
+@st.cache_resource
+def get_result_cache():
+    # Fleet tables precomputed by analytics/compute_worker.py, if it is running
+    return ResultCache(get_cache_dir(DATA_FOLDER))
+
 def load_data():
-    search_pattern = os.path.join(DATA_FOLDER, "sensor_data_*.csv")
-    csv_files = glob.glob(search_pattern)
-    
-    if not csv_files:
-        return None, "No Data Found"
-    
     try:
-        df_list = []
-        for file in csv_files:
-            df_chunk = pd.read_csv(file)
-            df_list.append(df_chunk)
-            
-        df = pd.concat(df_list, ignore_index=True)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values('timestamp')
-        
-        # Calculate Fill Level %
-        df['fill_level_pct'] = ((BIN_DEPTH_CM - df['distance_cm']) / BIN_DEPTH_CM) * 100
-        df['fill_level_pct'] = df['fill_level_pct'].clip(0, 100)
+        loader = get_data_loader()
+        get_event_index()
+        get_rollups()
+        get_risk_engine()
+        get_fleet_summary()
+        df = loader.refresh()
+        if df is None:
+            return None, "No Data Found"
         
-        return df, f"Real/Simulated Data ({len(csv_files)} files)"
+        return df, f"Real/Simulated Data ({len(df)} rows, {loader.file_count} files)"
         
     except Exception as e:
         st.error(f"Error reading data: {e}")
         return None, "Error"
 
+def load_fleet():
+    """
+    Fleet tables (fleet_summary, risk, pickups): from the compute worker's
+    cache while it is up to date, otherwise computed in this process.
+    """
+    cached = get_result_cache().read()
+    if cached is not None:
+        manifest = cached['manifest']
+        return cached, (f"Compute worker ({manifest['rows']} rows, {manifest['files']} files, "
+                        f"updated {time.time() - manifest['updated']:.0f} s ago)")
+    df, source_name = load_data()
+    if df is None:
+        return None, source_name
+    return {"fleet_summary": get_fleet_summary().table(), "risk": get_risk_engine().ranking(),
+            "pickups": get_event_index().interval_stats()}, source_name
+
+@st.cache_resource(max_entries=32)
+def get_bin_history(bin_id, version):
+    # Worker mode: this process holds no full history, one bin is read from
+    # the lake (again when the worker publishes a new version)
+    from edge_gateway.lake_query import query
+    df = add_fill_level(query(DATA_FOLDER, bins=[bin_id]).sort_values('timestamp', kind='stable')
+                        .reset_index(drop=True))
+    rollups = RollupStore()
+    rollups.on_rows(df, True)
+    return df, rollups
+
+def load_bin_data(bin_id, bins, results):
+    """
+    History of one bin for the detail view (only its rows) and the rollups
+    for its charts.
+    """
+    if 'manifest' in results:
+        return get_bin_history(bin_id, results['manifest']['version'])
+    loader = get_data_loader()
+    return (loader.refresh() if bins == 1 else loader.bin_frame(bin_id)), get_rollups()
+
+def generate_report(context):
+    try:
+        from analytics.ai_logistics_agent import generate_logistics_report
+    except ImportError:
+        st.error("Could not import AI Agent. Check folder structure.")
+        return "Error: Module not found."
+    return generate_logistics_report(context)
+
+# --- FLEET OVERVIEW ---
+
+def show_fleet_overview(fleet):
+    st.subheader("Fleet Overview")
+    critical = fleet['status'] == "CRITICAL"
+    due_soon = fleet['days_left'] <= DUE_SOON_DAYS
+    at_risk = fleet['risk'] != "ok"
+    f1, f2, f3, f4 = st.columns(4)
+    f1.metric("Bins", len(fleet))
+    f2.metric(f"Critical (> {CRITICAL_FILL_PCT} %)", int(critical.sum()))
+    f3.metric(f"Full within {DUE_SOON_DAYS} days", int(due_soon.sum()))
+    f4.metric("Environmental risk", int(at_risk.sum()))
+
+    filters = {"All bins": pd.Series(True, index=fleet.index), "Critical": critical,
+               f"Full within {DUE_SOON_DAYS} days": due_soon, "At risk": at_risk}
+    shown = fleet[filters[st.radio("Show:", list(filters), horizontal=True)]]
+    st.dataframe(
+        shown.sort_values(['days_left', 'fill_level_pct'], ascending=[True, False], na_position='last'),
+        column_config={
+            'fill_level_pct': st.column_config.ProgressColumn("Fill level", format="%.0f %%", min_value=0, max_value=100),
+            'fill_delta_24h': st.column_config.NumberColumn("Δ fill 24h", format="%+.1f"),
+            'temp_delta_24h': st.column_config.NumberColumn("Δ temp 24h", format="%+.1f"),
+            'fill_rate': st.column_config.NumberColumn("Fill rate (%/day)", format="%.1f"),
+            'days_left': st.column_config.NumberColumn("Days left", format="%.1f"),
+            'intercept': None,
+        },
+    )
+    st.caption(f"{len(shown)} of {len(fleet)} bins · select a bin and 'Bin Detail' in the sidebar to drill down")
+
 # --- MAIN DASHBOARD UI ---
 
 st.title("♻️ Smart Bioeconomy Logistics Center")
 st.markdown("**System Status:** Monitoring textile collection points via IoT & GenAI.")
 
-# 1. Load Data
-df, source_name = load_data()
+# 1. Load Data (fleet tables first: the overview needs nothing else)
+results, source_name = load_fleet()
 
-if df is None:
+if results is None:
     st.warning("⚠️ No data found. Run 'analytics/generate_mock_data.py' first.")
     st.stop()
 
 st.sidebar.success(f"Connected: {source_name}")
 
+# Fleet summary: one row per bin, no scan of the history
+fleet = results['fleet_summary']
+
+# Monitored bin (the data lake may hold many): drill-down loads only its partition
+bin_ids = list(fleet.index)
+selected_bin = bin_ids[0]
+if len(bin_ids) > 1:
+    view = st.sidebar.radio("View:", ["🗺️ Fleet Overview", "🔍 Bin Detail"])
+    selected_bin = st.sidebar.selectbox("Bin:", bin_ids)
+    if view == "🗺️ Fleet Overview":
+        show_fleet_overview(fleet)
+        st.stop()
+df, rollups = load_bin_data(selected_bin, len(bin_ids), results)
+
 # 2. Global Metrics (Top Row)
-# Haetaan viimeisimmät arvot
-latest = df.iloc[-1]
+# Haetaan viimeisimmät arvot ja muutos 24h taaksepäin koostetaulusta
+latest = fleet.loc[selected_bin]
 current_fill = latest['fill_level_pct']
 current_temp = latest['temperature_c']
 current_hum = latest['humidity_pct']
-
-# Lasketaan muutos (verrattuna 24h taaksepäin, jos mahdollista)
-try:
-    yesterday_idx = df[df['timestamp'] < (latest['timestamp'] - timedelta(hours=24))].index[-1]
-    fill_delta = current_fill - df.iloc[yesterday_idx]['fill_level_pct']
-    temp_delta = current_temp - df.iloc[yesterday_idx]['temperature_c']
-except IndexError:
-    fill_delta = 0
-    temp_delta = 0
+fill_delta = np.nan_to_num(latest['fill_delta_24h'])
+temp_delta = np.nan_to_num(latest['temp_delta_24h'])
 
 # Mittarit ylös
 m1, m2, m3, m4 = st.columns(4)
 m1.metric("Current Fill Level", f"{current_fill:.1f} %", f"{fill_delta:+.1f}% (24h)")
-m2.metric("Status", "CRITICAL" if current_fill > 80 else "Optimal", delta_color="inverse")
+m2.metric("Status", latest['status'], delta_color="inverse")
 m3.metric("Temperature", f"{current_temp:.1f} °C", f"{temp_delta:+.1f} °C (24h)")
 m4.metric("Humidity", f"{current_hum:.1f} %")
 
 st.divider()
 
 # --- TABS FOR DIFFERENT VIEWS ---
-tab1, tab2, tab3 = st.tabs(["🚛 Logistics & Prediction", "🌡️ Environmental Conditions", "📄 Raw Data"])
+# Only the selected tab runs (the others are rendered when opened)
+tab1, tab2, tab3 = st.tabs(["🚛 Logistics & Prediction", "🌡️ Environmental Conditions", "📄 Raw Data"],
+                           key="tab", on_change="rerun")
 
 # === TAB 1: LOGISTICS (Täyttöaste ja Ennuste) ===
-with tab1:
+def logistics_tab():
+    import matplotlib.pyplot as plt
     st.subheader("Fill Level Optimization")
     
-    # Regression Logic
-    emptied_indices = df[df['fill_level_pct'] < 5].index
-    start_idx = emptied_indices[-1] if len(emptied_indices) > 0 else 0
-    cycle_data = df.iloc[start_idx:].copy()
+    # Current cycle and its fill-rate fit straight from the fleet summary
+    # (same model as analytics/fleet_prediction.py, no refit per rerun)
+    prediction = latest
+    start_time = prediction['cycle_start']
+    cycle_data = df.iloc[df['timestamp'].searchsorted(start_time):]
+
+    pickups = results['pickups']
+    if selected_bin in pickups.index:
+        bin_pickups = pickups.loc[selected_bin]
+        interval = bin_pickups['mean_interval_days']
+        st.caption(f"Pickups detected: {bin_pickups['pickups']} · last: {bin_pickups['last_pickup']:%Y-%m-%d %H:%M}"
+                   + (f" · avg interval: {interval:.1f} days" if pd.notna(interval) else ""))
     
-    if len(cycle_data) > 5:
-        start_time = cycle_data['timestamp'].iloc[0]
-        cycle_data['days_elapsed'] = (cycle_data['timestamp'] - start_time).dt.total_seconds() / (24 * 3600)
-        
-        X = cycle_data['days_elapsed'].values.reshape(-1, 1)
-        y = cycle_data['fill_level_pct'].values.reshape(-1, 1)
-        
-        model = LinearRegression()
-        model.fit(X, y)
-        fill_rate = model.coef_[0][0]
+    if prediction['n_points'] > 5:
+        fill_rate = prediction['fill_rate']
+        intercept = prediction['intercept']
         
         # Plotting
         col_chart, col_ai = st.columns([2, 1])
         
         with col_chart:
+            # Long cycles at high sampling rates: plot a shape-preserving subset
+            shown = cycle_data.iloc[lttb_indices(cycle_data['timestamp'].values, cycle_data['fill_level_pct'].values)]
             fig, ax = plt.subplots(figsize=(8, 4))
-            ax.scatter(cycle_data['timestamp'], cycle_data['fill_level_pct'], 
+            ax.scatter(shown['timestamp'], shown['fill_level_pct'], 
                        color='#1f77b4', s=15, label='Sensor Data', alpha=0.6)
             
             if fill_rate > 0.5:
-                days_to_full = (100 - model.intercept_[0]) / fill_rate
+                days_to_full = (100 - intercept) / fill_rate
                 future_days = np.linspace(0, days_to_full + 1, 10)
                 future_dates = [start_time + timedelta(days=d) for d in future_days]
-                future_fill = model.predict(future_days.reshape(-1, 1))
+                future_fill = intercept + fill_rate * future_days
                 ax.plot(future_dates, future_fill, color='#2ca02c', linestyle='--', linewidth=2, label='AI Forecast')
                 
                 pickup_date = start_time + timedelta(days=days_to_full)
@@ -143,68 +271,135 @@ with tab1:
         with col_ai:
             st.markdown("#### 🤖 AI Analysis")
             if st.button("Generate Report", key="btn_logistics"):
+                # Routine cases come straight from the rule template, only
+                # ambiguous/anomalous ones are sent to the AI
+                from analytics.report_rules import fleet_reports
                 with st.spinner("Consulting AI..."):
-                    context = {
-                        "current_fill": f"{current_fill:.1f}%",
-                        "trend": f"+{fill_rate:.1f}% / day",
-                        "prediction_date": pickup_date.strftime('%Y-%m-%d') if fill_rate > 0.5 else "Stable",
-                        "temperature": f"{current_temp} C"
-                    }
-                    report = generate_logistics_report(context)
-                    st.session_state['report'] = report
+                    bin_prediction = fleet.loc[[selected_bin], PREDICTION_COLUMNS].rename(
+                        columns={'fill_level_pct': 'current_fill'})
+                    result, _ = fleet_reports(bin_prediction.join(report_columns(results['risk'])),
+                                              lambda contexts: [generate_report(c) for c in contexts])
+                    st.session_state['report'] = result.iloc[0]['report']
+                    st.session_state['report_source'] = ("Rule-based (no AI call)" if result.iloc[0]['path'] == "rules"
+                                                         else f"AI ({result.iloc[0]['reason'].replace('_', ' ')})")
             
             if 'report' in st.session_state:
                 st.text_area("Draft:", value=st.session_state['report'], height=250)
+                st.caption(st.session_state.get('report_source', ''))
 
 # === TAB 2: ENVIRONMENTAL CONDITIONS (Lämpö ja Kosteus) ===
-with tab2:
+def environment_tab():
+    import matplotlib.pyplot as plt
     st.subheader("Condition Monitoring History")
     
     # Valitaan kuinka paljon historiaa näytetään
     days_to_show = st.slider("Show history (days):", 7, 90, 30)
     
-    # Suodatetaan data
+    # Suodatetaan data: raakadata jos pisteitä on vähän, muuten tunti-/päivätason koosteet
     cutoff_date = df['timestamp'].max() - timedelta(days=days_to_show)
-    hist_data = df[df['timestamp'] > cutoff_date]
+    raw_points = len(df) - df['timestamp'].searchsorted(cutoff_date, side='right')
+    resolution = choose_resolution(timedelta(days=days_to_show), raw_points)
+    if resolution == "raw":
+        hist_data = df[df['timestamp'] > cutoff_date]
+        hist_data = hist_data.rename(columns={c: f"{c}_mean" for c in ['temperature_c', 'humidity_pct']})
+    else:
+        hist_data = rollups.query(selected_bin, resolution, start=cutoff_date)
     
     # Luodaan kaksi graafia allekkain
     fig2, (ax1, ax2) = plt.subplots(2, 1, sharex=True, figsize=(10, 8))
     
     # Temperature
-    ax1.plot(hist_data['timestamp'], hist_data['temperature_c'], color='#ff7f0e', label='Temperature')
+    ax1.plot(hist_data['timestamp'], hist_data['temperature_c_mean'], color='#ff7f0e', label='Temperature')
+    if resolution != "raw":
+        ax1.fill_between(hist_data['timestamp'], hist_data['temperature_c_min'], hist_data['temperature_c_max'],
+                         alpha=0.2, color='#ff7f0e', label=f'Min-Max ({resolution})')
     ax1.set_ylabel("Temperature (°C)")
-    ax1.axhline(y=25, color='red', linestyle=':', label='Risk Limit (25°C)')
+    ax1.axhline(y=TEMP_LIMIT_C, color='red', linestyle=':', label=f'Risk Limit ({TEMP_LIMIT_C}°C)')
     ax1.legend(loc='upper left')
     ax1.grid(True, alpha=0.3)
     
     # Humidity
-    ax2.plot(hist_data['timestamp'], hist_data['humidity_pct'], color='#17becf', label='Humidity')
+    ax2.plot(hist_data['timestamp'], hist_data['humidity_pct_mean'], color='#17becf', label='Humidity')
     ax2.set_ylabel("Humidity (%)")
-    ax2.axhline(y=60, color='orange', linestyle=':', label='Risk Limit (60%)')
-    ax2.fill_between(hist_data['timestamp'], hist_data['humidity_pct'], alpha=0.1, color='#17becf')
+    ax2.axhline(y=HUMIDITY_LIMIT_PCT, color='orange', linestyle=':', label=f'Risk Limit ({HUMIDITY_LIMIT_PCT}%)')
+    if resolution != "raw":
+        ax2.fill_between(hist_data['timestamp'], hist_data['humidity_pct_min'], hist_data['humidity_pct_max'],
+                         alpha=0.2, color='#17becf', label=f'Min-Max ({resolution})')
+    else:
+        ax2.fill_between(hist_data['timestamp'], hist_data['humidity_pct_mean'], alpha=0.1, color='#17becf')
     ax2.legend(loc='upper left')
     ax2.grid(True, alpha=0.3)
     
     plt.xticks(rotation=45)
     st.pyplot(fig2)
+    st.caption(f"Resolution: {resolution} ({len(hist_data)} points, max {MAX_CHART_POINTS})")
     
-    # Analyysi
-    avg_hum = hist_data['humidity_pct'].mean()
-    if avg_hum > 50:
-        st.warning(f"⚠️ High average humidity ({avg_hum:.1f}%) detected. Risk of mold growth in textiles.")
-    else:
-        st.success("✅ Environmental conditions are optimal for textile storage.")
+    # Analyysi: altistus viimeisen viikon ajalta (koko laivasto lasketaan kerralla)
+    risk = results['risk']
+    window_days = WINDOW_HOURS // 24
+    if selected_bin in risk.index:
+        bin_risk = risk.loc[selected_bin]
+        r1, r2, r3 = st.columns(3)
+        r1.metric(f"Hours > {TEMP_LIMIT_C}°C ({window_days} d)", f"{bin_risk['hot_hours']} h")
+        r2.metric(f"Humidity > {HUMIDITY_LIMIT_PCT}% (sustained)", f"{bin_risk['sustained_humid_h']} h",
+                  f"{bin_risk['humid_hours']} h in {window_days} d", delta_color="off")
+        r3.metric("Mold Risk Index", f"{bin_risk['mold_index']:.0f} / 100")
+        if bin_risk['risk'] == "high":
+            st.error(f"🍄 High mold risk ({bin_risk['reason'].replace('_', ' ')}). Air the bin or prioritize pickup.")
+        elif bin_risk['risk'] == "elevated":
+            st.warning(f"⚠️ Elevated environmental risk ({bin_risk['reason'].replace('_', ' ')}). Risk of mold growth in textiles.")
+        else:
+            st.success("✅ Environmental conditions are optimal for textile storage.")
+
+    at_risk = risk[risk['risk'] != "ok"]
+    if len(risk) > 1:
+        st.markdown(f"#### Bins at Risk ({len(at_risk)} / {len(risk)})")
+        if len(at_risk):
+            st.dataframe(at_risk)
+        else:
+            st.caption("No bin exceeds the heat/humidity limits.")
 
 # === TAB 3: RAW DATA ===
-with tab3:
+def raw_data_tab():
     st.subheader("Sensor Data Lake")
-    st.dataframe(df.sort_values('timestamp', ascending=False))
+    
+    # Suodattimet: aikaväli ja sivun koko (astia valitaan sivupalkista)
+    first_day, last_day = df['timestamp'].iloc[0].date(), df['timestamp'].iloc[-1].date()
+    col_from, col_to, col_size = st.columns(3)
+    date_from = col_from.date_input("From:", first_day, min_value=first_day, max_value=last_day)
+    date_to = col_to.date_input("To:", last_day, min_value=first_day, max_value=last_day)
+    page_size = col_size.selectbox("Rows per page:", [50, 100, 500, 1000], index=1)
+    range_start = pd.Timestamp(date_from)
+    range_end = pd.Timestamp(date_to) + timedelta(days=1)
+    
+    # Only the visible page is materialized (df is time-ordered: binary search, newest first)
+    lo, hi = df['timestamp'].searchsorted([range_start, range_end])
+    n_rows = max(hi - lo, 0)
+    n_pages = max(1, math.ceil(n_rows / page_size))
+    page = st.number_input(f"Page (1-{n_pages}):", min_value=1, max_value=n_pages, value=1)
+    stop = hi - (page - 1) * page_size
+    page_data = df.iloc[max(lo, stop - page_size):stop].iloc[::-1]
+    st.dataframe(page_data)
+    st.caption(f"{n_rows} rows in range, showing {len(page_data)} (page {page} of {n_pages}, newest first)")
+    
+    def build_export(bin_id=selected_bin, start=range_start, end=range_end):
+        # Runs only when the button is clicked: streamed from the data lake
+        # chunk by chunk into a temporary file, never one big string in memory
+        from edge_gateway.parquet_store import export_csv
+        export_file = tempfile.TemporaryFile()
+        export_csv(export_file, DATA_FOLDER, bins=[bin_id], start=start, end=end)
+        export_file.seek(0)
+        return export_file
     
     # Download button
-    csv = df.to_csv(index=False).encode('utf-8')
     st.download_button(
         label="📥 Download Data as CSV",
-        data=csv,
-        file_name='bioeconomy_sensor_data.csv',
+        data=build_export,
+        file_name=f"bioeconomy_sensor_data_{selected_bin}_{date_from}_{date_to}.csv",
         mime='text/csv',
-    )
\ No newline at end of file
+    )
+
+for tab, show_tab in ((tab1, logistics_tab), (tab2, environment_tab), (tab3, raw_data_tab)):
+    if tab.open:
+        with tab:
+            show_tab()
@@ -0,0 +1,404 @@
+"""
+Multi-bin Edge Gateway (asyncio)
+
+Serves many bins from one gateway host: every serial port is read
+concurrently on a single event loop and every reading is tagged with the
+bin ID configured for its port. Ports are watched with the OS selector
+(no polling), so an idle gateway sleeps until a device actually sends data.
+
+Usage:
+    python edge_gateway/async_gateway.py --port TX-105=/dev/ttyUSB0 --port TX-106=/dev/ttyUSB1
+    python edge_gateway/async_gateway.py --ports-file ports.json   # {"TX-105": "/dev/ttyUSB0", ...}
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+import serial
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from edge_gateway.csv_writer import BufferedCsvWriter, FLUSH_MAX_DELAY_S, FLUSH_MAX_ROWS, FSYNC_POLICIES, FSYNC_POLICY
+from edge_gateway.parquet_store import HAS_PYARROW, compact_closed_months, compact_month
+from edge_gateway.reading_filter import (
+    DEADBAND, DROP, HEARTBEAT_S, HOLD, SAMPLE_INTERVAL_S, ReadingFilter, gateway_settings, record_settings,
+)
+from analytics.online_estimator import FleetEstimator
+from edge_gateway.gateway import (
+    BAUD_RATE, DATA_DIR, DEFAULT_BIN_ID, LOG_LEVEL, METRICS_PORT, METRICS_PUBLISH_INTERVAL_S, SERIAL_PORT,
+    GatewayMetrics, create_metrics_publisher, create_mqtt_client, create_outbox, decode_items, get_topic,
+    setup_logging, start_metrics_server,
+)
+from edge_gateway.telemetry_frame import TelemetryDecoder
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+
+# Bin ID -> serial port. Overridden by --port / --ports-file.
+PORTS = {DEFAULT_BIN_ID: SERIAL_PORT}
+
+READ_CHUNK_BYTES = 4096
+RECONNECT_DELAY_S = 5        # Retry interval for unplugged/missing ports
+OPEN_TIMEOUT_S = 5           # How long startup waits for ports before reporting ready
+STATS_INTERVAL_S = 60
+COMPACT_INTERVAL_S = 6 * 3600  # --compact: late rows of finished months are compacted this often
+
+# Streaming fill-rate estimates per bin (see analytics/online_estimator.py)
+ESTIMATOR_STATE_FILE = "fill_estimators.json"
+ESTIMATOR_SAVE_INTERVAL_S = 60
+
+# Windows event loops cannot watch serial handles, so ports fall back to
+# one blocking reader thread each.
+USE_SELECTOR = os.name == 'posix'
+
+log = logging.getLogger(__name__)
+
+# ==========================================
+# SERIAL PORT READER
+# ==========================================
+
+class SerialPortReader:
+    """
+    Reads one serial port and hands every complete reading (JSON line or
+    binary frame, auto-detected) to the gateway. Reconnects if the device
+    goes away.
+    """
+
+    def __init__(self, gateway, bin_id, port, baud_rate=BAUD_RATE):
+        self.gateway = gateway
+        self.bin_id = bin_id
+        self.port = port
+        self.baud_rate = baud_rate
+        self.opened = asyncio.Event()
+        self.decoder = TelemetryDecoder()
+
+    async def run(self):
+        while True:
+            try:
+                # timeout=0 puts the port in non-blocking mode for the selector
+                ser = serial.Serial(self.port, self.baud_rate, timeout=0 if USE_SELECTOR else 1)
+            except serial.SerialException as e:
+                log.warning("[SERIAL] %s: cannot open %s (%s), retrying in %ss", self.bin_id, self.port, e,
+                            RECONNECT_DELAY_S)
+                await asyncio.sleep(RECONNECT_DELAY_S)
+                continue
+
+            self.opened.set()
+            try:
+                if USE_SELECTOR:
+                    await self._read_with_selector(ser)
+                else:
+                    await self._read_with_thread(ser)
+            finally:
+                ser.close()
+                self.opened.clear()
+
+            log.warning("[SERIAL] %s: %s closed, reconnecting in %ss", self.bin_id, self.port, RECONNECT_DELAY_S)
+            await asyncio.sleep(RECONNECT_DELAY_S)
+
+    async def _read_with_selector(self, ser):
+        loop = asyncio.get_running_loop()
+        closed = loop.create_future()
+        fd = ser.fileno()
+
+        def on_readable():
+            try:
+                chunk = os.read(fd, READ_CHUNK_BYTES)
+            except BlockingIOError:
+                return
+            except OSError:
+                chunk = b''
+            if not chunk:
+                # EOF / hang-up: stop watching until the port is reopened
+                loop.remove_reader(fd)
+                if not closed.done():
+                    closed.set_result(None)
+                return
+            self.feed(chunk)
+
+        loop.add_reader(fd, on_readable)
+        try:
+            await closed
+        finally:
+            loop.remove_reader(fd)
+
+    async def _read_with_thread(self, ser):
+        while True:
+            try:
+                chunk = await asyncio.to_thread(lambda: ser.read(max(1, ser.in_waiting)))
+            except serial.SerialException:
+                return
+            if chunk:
+                self.feed(chunk)
+
+    def feed(self, chunk):
+        """
+        Decodes received bytes; a trailing partial line or frame is kept
+        until the rest of it arrives.
+        """
+        gateway = self.gateway
+        start = time.perf_counter()
+        gateway.bytes_read += len(chunk)
+        try:
+            readings, errors = decode_items(self.decoder.feed(chunk), self.bin_id)
+            gateway.parse_errors += errors
+            for data in readings:
+                gateway.handle_reading(self.bin_id, data)
+        except Exception as e:
+            gateway.errors += 1
+            log.error("[ERROR] %s: %s", self.bin_id, e, exc_info=log.isEnabledFor(logging.DEBUG))
+        gateway.metrics.read_seconds.observe(time.perf_counter() - start)
+
+# ==========================================
+# GATEWAY
+# ==========================================
+
+class AsyncGateway:
+    """
+    Runs one SerialPortReader per bin on a shared event loop and forwards
+    every reading to MQTT (through the on-disk outbox) and the local CSV
+    data lake (through a BufferedCsvWriter); both are flushed by size and
+    by a timer. Each reading also
+    updates the bin's online fill-rate estimator, whose state is saved
+    periodically so predictions survive restarts.
+
+    'reading_filter' (optional, see reading_filter.py) drops invalid and
+    duplicate readings before any of that, and keeps readings within the
+    deadband out of MQTT and the CSV files (the estimator still sees them).
+
+    Runtime metrics (see gateway.GatewayMetrics) are kept in self.metrics;
+    'metrics_publisher' (optional) sends them over MQTT from the flush timer.
+
+    'compact' compacts each month into Parquet when the CSV writer moves
+    on to the next month, and late rows of finished months every
+    COMPACT_INTERVAL_S.
+    """
+
+    def __init__(self, ports, data_dir=DATA_DIR, outbox=None, sender=None, storage=None, estimator=None,
+                 reading_filter=None, compact=False):
+        self.ports = dict(ports)
+        self.data_dir = data_dir
+        self.outbox = outbox
+        self.sender = sender
+        self.storage = storage or BufferedCsvWriter(data_dir)
+        self.estimator = estimator
+        self.reading_filter = reading_filter
+        self.readers = []
+        self.messages = 0
+        self.parse_errors = 0
+        self.errors = 0
+        self.bytes_read = 0
+        self.metrics = GatewayMetrics(self, self.storage, outbox, sender,
+                                      decoders=lambda: [r.decoder for r in self.readers],
+                                      reading_filter=reading_filter)
+        self.metrics_publisher = None
+        self.compact = compact
+        self._compacted_months = set()
+        if compact:
+            self.storage.on_rotate = self.compact_closed_month
+
+    def handle_reading(self, bin_id, data):
+        self.messages += 1
+
+        status = None
+        if self.reading_filter is not None:
+            status = self.reading_filter.check(bin_id, data)
+            if status == DROP:
+                return
+
+        if self.estimator is not None:
+            self.estimator.update(bin_id, data['timestamp'], data.get('distance_cm'))
+
+        if status == HOLD:
+            return
+
+        if self.outbox is not None:
+            self.outbox.append(get_topic(bin_id), json.dumps(data))
+
+        self.storage.write(data)
+
+    async def save_estimator(self):
+        while True:
+            await asyncio.sleep(ESTIMATOR_SAVE_INTERVAL_S)
+            self.estimator.save()
+
+    def compact_closed_month(self, closed_month, new_month):
+        """
+        BufferedCsvWriter rotation hook: compacts the finished month into
+        Parquet in a worker thread, keeping the event loop free. The writer
+        has already closed the month; late rows for it wait for the
+        compaction and then start a new file. Only the first move past a
+        month compacts it: switching back from such a late row (e.g. a
+        device with a slow clock) does not, the next compact_late_rows()
+        pass picks those rows up.
+        """
+        if new_month > closed_month and closed_month not in self._compacted_months:
+            self._compacted_months.add(closed_month)
+            asyncio.get_running_loop().run_in_executor(None, compact_month, self.data_dir, closed_month)
+
+    async def compact_late_rows(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(COMPACT_INTERVAL_S)
+            try:
+                await loop.run_in_executor(None, compact_closed_months, self.data_dir)
+            except Exception as e:
+                log.error("[DATA] Compaction failed: %s", e)
+
+    async def flush_storage(self):
+        # Ticks at half the flush delay, so no row waits much longer than
+        # max_delay_s; an idle gateway wakes up only this often.
+        while True:
+            await asyncio.sleep(self.storage.max_delay_s / 2)
+            self.storage.flush_if_due()
+            if self.outbox is not None:
+                self.outbox.flush_if_due()
+            if self.metrics_publisher is not None:
+                self.metrics_publisher.publish_if_due()
+
+    async def report_stats(self):
+        last_count, last_time = self.messages, time.monotonic()
+        while True:
+            await asyncio.sleep(STATS_INTERVAL_S)
+            now = time.monotonic()
+            rate = (self.messages - last_count) / (now - last_time)
+            outbox = ""
+            if self.sender is not None:
+                outbox = f", outbox backlog {self.sender.backlog_bytes() / 1024:.0f} kB ({self.sender.published} sent)"
+            frames = ""
+            decoders = [r.decoder for r in self.readers if r.decoder.frames]
+            if decoders:
+                frames = (f", {sum(d.frames for d in decoders)} binary frames "
+                          f"({sum(d.lost_frames for d in decoders)} lost, {sum(d.crc_errors for d in decoders)} CRC errors)")
+            filtered = ""
+            f = self.reading_filter
+            if f is not None:
+                filtered = (f", {f.kept} stored ({f.invalid} invalid, {f.duplicates} duplicates, "
+                            f"{f.suppressed} within deadband)")
+            log.info("[STATS] %d messages (%.1f msg/s), %d parse errors%s%s%s", self.messages, rate, self.parse_errors,
+                     filtered, frames, outbox)
+            last_count, last_time = self.messages, now
+
+    async def run(self, stop_event):
+        readers = self.readers = [SerialPortReader(self, bin_id, port) for bin_id, port in self.ports.items()]
+        tasks = [asyncio.create_task(r.run()) for r in readers]
+        tasks.append(asyncio.create_task(self.report_stats()))
+        tasks.append(asyncio.create_task(self.flush_storage()))
+        if self.estimator is not None:
+            tasks.append(asyncio.create_task(self.save_estimator()))
+        if self.compact:
+            tasks.append(asyncio.create_task(self.compact_late_rows()))
+
+        await asyncio.wait([asyncio.create_task(r.opened.wait()) for r in readers], timeout=OPEN_TIMEOUT_S)
+        opened = sum(r.opened.is_set() for r in readers)
+        log.info("[GATEWAY] Ready: %d/%d ports open", opened, len(readers))
+        log.info("[DATA] Saving data to folder: %s", self.data_dir)
+
+        await stop_event.wait()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.storage.close()
+        if self.outbox is not None:
+            self.outbox.close()
+        if self.estimator is not None:
+            self.estimator.save()
+        log.info("[SYSTEM] Gateway stopped after %d messages", self.messages)
+
+# ==========================================
+# MAIN PROGRAM
+# ==========================================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Multi-bin asyncio edge gateway")
+    parser.add_argument('--port', action='append', default=[], metavar='BIN=PATH',
+                        help="Map a bin ID to a serial port (repeatable)")
+    parser.add_argument('--ports-file', help="JSON file mapping bin IDs to serial ports")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Folder for the monthly CSV files")
+    parser.add_argument('--no-mqtt', action='store_true', help="Do not publish readings to MQTT")
+    parser.add_argument('--flush-rows', type=int, default=FLUSH_MAX_ROWS, help="Flush the CSV buffer at this many rows")
+    parser.add_argument('--flush-delay', type=float, default=FLUSH_MAX_DELAY_S, help="Flush rows older than this (seconds)")
+    parser.add_argument('--no-estimator', action='store_true', help="Do not maintain online fill-rate estimates")
+    parser.add_argument('--no-filter', action='store_true',
+                        help="Store every reading as received (no validation, duplicate removal or deadband)")
+    parser.add_argument('--no-deadband', action='store_true',
+                        help="Validate and drop duplicates, but store every valid reading")
+    parser.add_argument('--heartbeat', type=float, default=HEARTBEAT_S,
+                        help="Store a reading of each bin at least this often (seconds)")
+    parser.add_argument('--sample-interval', type=float, default=SAMPLE_INTERVAL_S,
+                        help="Seconds between the devices' readings (for refilling suppressed readings)")
+    parser.add_argument('--compact', action='store_true', help="Compact each finished month into Parquet")
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default=FSYNC_POLICY, help="When to fsync the CSV files")
+    parser.add_argument('--log-level', default=LOG_LEVEL, choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="DEBUG logs every reading")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT, help="Local HTTP metrics port (0 = off)")
+    parser.add_argument('--metrics-publish', type=float, default=METRICS_PUBLISH_INTERVAL_S, metavar='SECONDS',
+                        help="Also publish the metrics over MQTT at this interval (0 = off)")
+    return parser.parse_args()
+
+def load_ports(args):
+    ports = {}
+    if args.ports_file:
+        with open(args.ports_file) as f:
+            ports.update(json.load(f))
+    for mapping in args.port:
+        bin_id, _, path = mapping.partition('=')
+        if not path:
+            raise SystemExit(f"[ERROR] Invalid --port '{mapping}', expected BIN=PATH")
+        ports[bin_id] = path
+    return ports or PORTS
+
+async def main():
+    args = parse_args()
+    setup_logging(args.log_level)
+    ports = load_ports(args)
+    reading_filter = None
+    if not args.no_filter:
+        reading_filter = ReadingFilter(None if args.no_deadband else DEADBAND, args.heartbeat)
+    # Also without the deadband: ends the period of an earlier filtering run
+    filter_settings = gateway_settings(ports, reading_filter and reading_filter.deadband, args.heartbeat,
+                                       args.sample_interval)
+    record_settings(args.data_dir, filter_settings)
+    client = None if args.no_mqtt else create_mqtt_client(filter_settings)
+    outbox, sender = create_outbox(client, args.data_dir) if client is not None else (None, None)
+    storage = BufferedCsvWriter(args.data_dir, max_rows=args.flush_rows, max_delay_s=args.flush_delay, fsync=args.fsync)
+    estimator = None if args.no_estimator else FleetEstimator(os.path.join(args.data_dir, ESTIMATOR_STATE_FILE))
+    if args.compact and not HAS_PYARROW:
+        raise SystemExit("[ERROR] --compact needs pyarrow (pip install pyarrow)")
+    gateway = AsyncGateway(ports, data_dir=args.data_dir, outbox=outbox, sender=sender, storage=storage, estimator=estimator,
+                           reading_filter=reading_filter, compact=args.compact)
+    gateway.metrics_publisher = create_metrics_publisher(gateway.metrics.registry, client, args.metrics_publish)
+    metrics_server = start_metrics_server(gateway.metrics.registry, port=args.metrics_port)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, AttributeError):
+            pass # Windows: Ctrl+C surfaces as KeyboardInterrupt instead
+
+    log.info("[SERIAL] Serving %d bins...", len(ports))
+    try:
+        await gateway.run(stop_event)
+    finally:
+        if metrics_server is not None:
+            metrics_server.stop()
+        if client is not None:
+            sender.stop()
+            client.loop_stop()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        log.info("[SYSTEM] Stopping gateway...")
@@ -0,0 +1,295 @@
+"""
+Buffered CSV Data Lake Writer
+
+Keeps the current month's 'sensor_data_YYYY-MM.csv' open, collects rows in
+memory and writes them in batches instead of opening, appending and closing
+the file for every reading.
+
+Crash safety:
+    Rows are flushed when 'max_rows' are buffered or the oldest buffered row
+    is 'max_delay_s' old (checked by flush_if_due(), which the gateways call
+    from their timers). A crash of the gateway process therefore loses at
+    most 'max_rows' rows and never rows older than 'max_delay_s' (+ one
+    timer tick), with two exceptions: late rows of a month being compacted
+    stay buffered until the compaction has finished, and rows of a failed
+    write stay buffered until a write succeeds (both are retried every
+    'max_delay_s'). Rows already flushed survive a process crash; whether they
+    also survive a power loss depends on the fsync policy:
+
+    'always' - fsync after every batch: power loss loses at most one batch.
+    'rotate' - fsync when a month file is closed (default): the OS decides
+               when the open month reaches the disk.
+    'never'  - leave everything to the OS.
+"""
+
+import csv
+import logging
+import os
+import threading
+import time
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+
+FILE_PREFIX = "sensor_data_"
+
+# Bin ID of single-port gateways, also assumed for rows written before
+# multi-bin support (files without a 'bin_id' column).
+DEFAULT_BIN_ID = "1"
+
+# Column order of the monthly CSV files. 'bin_id' is last so files written
+# before multi-bin support keep their original layout.
+CSV_FIELDS = ["timestamp", "distance_cm", "temperature_c", "humidity_pct", "bin_id"]
+
+FLUSH_MAX_ROWS = 500
+FLUSH_MAX_DELAY_S = 2.0
+FSYNC_POLICY = "rotate"
+FSYNC_POLICIES = ("always", "rotate", "never")
+
+log = logging.getLogger(__name__)
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+# ==========================================
+# HELPER FUNCTIONS
+# ==========================================
+
+def get_month_csv_path(data_dir, month):
+    """
+    Returns the path of a month's CSV file, e.g. .../sensor_data_2023-11.csv
+    """
+    return os.path.join(data_dir, f"{FILE_PREFIX}{month}.csv")
+
+def read_csv_header(csv_path):
+    """
+    Returns the header row of an existing CSV file, or None if it is missing/empty.
+    """
+    if not os.path.isfile(csv_path):
+        return None
+    with open(csv_path, newline='') as file:
+        return next(csv.reader(file), None)
+
+def file_lock(csv_path):
+    """
+    In-process lock of one month file: held by a BufferedCsvWriter while the
+    file is open and by parquet_store.compact_month() while it compacts and
+    retires the file, so a late row never lands in a file being compacted.
+    """
+    key = os.path.abspath(csv_path)
+    with _file_locks_guard:
+        return _file_locks.setdefault(key, threading.Lock())
+
+# ==========================================
+# WRITER
+# ==========================================
+
+class BufferedCsvWriter:
+    """
+    Long-lived, batching writer for the monthly CSV files.
+
+    Rows are routed to a month by their own 'timestamp' ('YYYY-MM-DD ...'),
+    so a batch spanning midnight at the month end rotates cleanly.
+    Not thread-safe: call it from one thread (or one event loop).
+
+    'on_rotate(closed_month, new_month)' is called after a month file has
+    been closed, e.g. to compact the finished month (see parquet_store.py).
+    Rows of a month whose file is being compacted stay buffered until the
+    next flush after it, and then start a new file for that month.
+    'on_flush(rows, seconds)' is called after every batch write (metrics).
+    """
+
+    def __init__(self, data_dir, max_rows=FLUSH_MAX_ROWS, max_delay_s=FLUSH_MAX_DELAY_S, fsync=FSYNC_POLICY,
+                 on_rotate=None, on_flush=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.data_dir = data_dir
+        self.max_rows = max_rows
+        self.max_delay_s = max_delay_s
+        self.fsync = fsync
+        self.on_rotate = on_rotate
+        self.on_flush = on_flush
+
+        self.rows_written = 0
+        self.flushes = 0
+        self.rotations = 0
+
+        self._buffer = []
+        self._oldest = None
+        self._file = None
+        self._month = None
+        self._fields = None
+        self._writer = None
+        self._lock = None
+        self._path = None
+        self._saved_size = 0     # Size of the open file after the last successful flush
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    @property
+    def pending(self):
+        """Number of rows buffered in memory (i.e. at risk on a crash)."""
+        return len(self._buffer)
+
+    def write(self, data):
+        """
+        Buffers one reading (a dict with at least 'timestamp').
+        Flushes immediately if the buffer is full.
+        """
+        if not self._buffer:
+            self._oldest = time.monotonic()
+        self._buffer.append(data)
+        if len(self._buffer) >= self.max_rows:
+            self.flush()
+
+    def write_many(self, rows):
+        """
+        Buffers a batch of readings (see write()).
+        """
+        if not rows:
+            return
+        if not self._buffer:
+            self._oldest = time.monotonic()
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.max_rows:
+            self.flush()
+
+    def flush_if_due(self):
+        """
+        Flushes if the oldest buffered row has waited 'max_delay_s'.
+        Call periodically (e.g. once per second).
+        """
+        if self._buffer and time.monotonic() - self._oldest >= self.max_delay_s:
+            self.flush()
+
+    def flush(self, wait=False):
+        """
+        Writes the buffered rows. Rows of a month being compacted stay
+        buffered for the next flush, unless 'wait' (used by close()).
+
+        The buffer is only cleared once the write succeeded: after an IO
+        error the month file is cut back to its size after the last
+        successful flush and its rows stay buffered, so the next flush
+        writes every row once. Rows of a month file closed before the
+        error are kept in that file.
+        """
+        if not self._buffer:
+            return
+        start = time.perf_counter()
+        rows = self._buffer
+        waiting = []     # Positions of rows of a month being compacted
+        unsaved = []     # ...of rows written to the open file since its last flush
+        i = 0
+        try:
+            for i, data in enumerate(rows):
+                month = str(data['timestamp'])[:7]
+                if month != self._month:
+                    if not self._open_month(month, wait):
+                        waiting.append(i)
+                        continue
+                    unsaved = []     # The previous file was closed (flushed)
+                self._writer.writerow(data)
+                unsaved.append(i)
+            if unsaved:
+                self._file.flush()
+                if self.fsync == "always":
+                    os.fsync(self._file.fileno())
+                self._saved_size = os.fstat(self._file.fileno()).st_size
+        except BaseException:
+            retry = set(waiting) | set(unsaved)
+            self._buffer = [data for k, data in enumerate(rows) if k in retry or k >= i]
+            self.rows_written += len(rows) - len(self._buffer)
+            if unsaved:
+                self._discard_unsaved()
+            self._oldest = time.monotonic()      # Retry after 'max_delay_s', not on every tick
+            raise
+
+        self._buffer = [rows[k] for k in waiting]
+        if waiting:
+            self._oldest = time.monotonic()
+        written = len(rows) - len(waiting)
+        if not written:
+            return
+        self.rows_written += written
+        self.flushes += 1
+        if self.on_flush is not None:
+            self.on_flush(written, time.perf_counter() - start)
+
+    def close(self):
+        self.flush(wait=True)
+        self._close_file()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open_month(self, month, wait=False):
+        """
+        Switches to the month's file; False if it is being compacted.
+        """
+        csv_path = get_month_csv_path(self.data_dir, month)
+        lock = file_lock(csv_path)
+        if not lock.acquire(blocking=wait):
+            return False
+        closed_month = self._month
+        try:
+            if self._file is not None:
+                self._close_file()
+                self.rotations += 1
+                if self.on_rotate is not None:
+                    self.on_rotate(closed_month, month)
+            header = read_csv_header(csv_path)
+            self._file = open(csv_path, mode='a', newline='')
+        except BaseException:
+            lock.release()
+            raise
+        self._lock = lock
+        # Follow the header already in the file so legacy files without a
+        # 'bin_id' column stay readable.
+        self._fields = header or CSV_FIELDS
+        self._writer = csv.DictWriter(self._file, fieldnames=self._fields, extrasaction='ignore')
+        self._path = csv_path
+        self._month = month
+        if header is None:
+            self._writer.writeheader()
+            self._file.flush()
+            log.info("[DATA] Created new log file: %s", csv_path)
+        self._saved_size = os.fstat(self._file.fileno()).st_size
+        return True
+
+    def _discard_unsaved(self):
+        """
+        After a failed write: closes the month file (if still open) and cuts
+        it back to its size after the last successful flush.
+        """
+        lock = self._lock if self._file is not None else file_lock(self._path)
+        if self._file is None:
+            lock.acquire()       # Closed by a failed rotation: keep compaction out
+        try:
+            if self._file is not None:
+                try:
+                    self._file.close()
+                except OSError:
+                    pass
+            os.truncate(self._path, self._saved_size)
+        except OSError as e:
+            log.error("[DATA] Cannot cut back %s after a failed write: %s", self._path, e)
+        finally:
+            self._file = None
+            self._month = None
+            lock.release()
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
+        finally:
+            self._file = None
+            self._month = None
+            self._lock.release()
@@ -1,18 +1,32 @@
+import argparse
 import serial
 import json
+import logging
+import socket
 import time
-import csv
 import os
+import sys
 import paho.mqtt.client as mqtt
 from datetime import datetime
 
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from edge_gateway.csv_writer import BufferedCsvWriter, DEFAULT_BIN_ID, get_month_csv_path
+from edge_gateway.metrics import MetricsPublisher, MetricsRegistry, MetricsServer
+from edge_gateway.outbox import BATCH_MAX_MESSAGES as OUTBOX_BATCH_MESSAGES, OUTBOX_DIR, Outbox, OutboxSender
+from edge_gateway.reading_filter import DEADBAND, KEEP, ReadingFilter, gateway_settings, record_settings
+from edge_gateway.telemetry_frame import TelemetryDecoder
+
 # ==========================================
 # CONFIGURATION
 # ==========================================
 
 # --- SERIAL SETTINGS ---
 # Windows: 'COM3' etc. | Linux/Mac: '/dev/ttyUSB0'
-SERIAL_PORT = 'COM3' 
+SERIAL_PORT = 'COM3'
 BAUD_RATE = 9600
 
 # --- DATA STORAGE SETTINGS ---
@@ -28,8 +42,9 @@ os.makedirs(DATA_DIR, exist_ok=True)
 # OPTION 1: Public Mosquitto (Testing)
 MQTT_BROKER = "test.mosquitto.org"
 MQTT_PORT = 1883
-MQTT_TOPIC = "bioeconomy/textile_bin/1"
-ACCESS_TOKEN = None 
+MQTT_TOPIC_PREFIX = "bioeconomy/textile_bin"
+MQTT_TOPIC = f"{MQTT_TOPIC_PREFIX}/{DEFAULT_BIN_ID}"
+ACCESS_TOKEN = None
 
 # OPTION 2: ThingsBoard (Production)
 # MQTT_BROKER = "demo.thingsboard.io"
@@ -37,87 +52,310 @@ ACCESS_TOKEN = None
 # MQTT_TOPIC = "v1/devices/me/telemetry"
 # ACCESS_TOKEN = "YOUR_ACCESS_TOKEN_HERE"
 
+# --- LOGGING & METRICS ---
+LOG_LEVEL = "INFO"                 # "DEBUG" logs every reading (slow at high rates)
+LOG_FORMAT = "%(asctime)s %(message)s"
+METRICS_HOST = "127.0.0.1"         # Local only; scrape http://127.0.0.1:9108/metrics
+METRICS_PORT = 9108                # 0 = no HTTP endpoint
+METRICS_PUBLISH_INTERVAL_S = 0     # > 0: also publish a JSON snapshot over MQTT
+METRICS_TOPIC = f"{MQTT_TOPIC_PREFIX}/_metrics/{socket.gethostname()}"  # Not matched by '<prefix>/+'
+
+# Reading filter settings, retained, for the central ingest (mqtt_ingest.py)
+FILTER_TOPIC = f"{MQTT_TOPIC_PREFIX}/_filter/{socket.gethostname()}"
+
+log = logging.getLogger(__name__)
+
 # ==========================================
 # HELPER FUNCTIONS
 # ==========================================
 
-def get_current_csv_path():
+def get_current_csv_path(data_dir=DATA_DIR):
     """
     Returns the path for the current month's CSV file.
     Example: .../edge_gateway/data/sensor_data_2023-11.csv
     """
     current_month = datetime.now().strftime('%Y-%m')
-    filename = f"sensor_data_{current_month}.csv"
-    return os.path.join(DATA_DIR, filename)
+    return get_month_csv_path(data_dir, current_month)
+
+def get_topic(bin_id):
+    """
+    Returns the MQTT topic of a bin, e.g. 'bioeconomy/textile_bin/TX-105'.
+    """
+    return f"{MQTT_TOPIC_PREFIX}/{bin_id}"
+
+def parse_line(raw, bin_id=DEFAULT_BIN_ID):
+    """
+    Decodes one JSON line (bytes or str) sent by the firmware and stamps it
+    with the reception time and the bin ID.
+
+    Returns:
+        dict: The reading, or None if the line is partial/garbled.
+    """
+    try:
+        data = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    return stamp_reading(data, bin_id)
+
+def stamp_reading(data, bin_id=DEFAULT_BIN_ID):
+    """
+    Adds the reception time and the bin ID to a decoded reading (JSON line
+    or binary frame, see telemetry_frame.py).
+    """
+    data['timestamp'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    data['bin_id'] = bin_id
+    return data
+
+def decode_items(items, bin_id=DEFAULT_BIN_ID):
+    """
+    Turns TelemetryDecoder items into stamped readings.
+
+    Returns:
+        (readings, parse_errors)
+    """
+    readings, errors = [], 0
+    for kind, value in items:
+        data = parse_line(value, bin_id) if kind == 'json' else stamp_reading(value, bin_id)
+        if data is None:
+            errors += 1
+        else:
+            readings.append(data)
+    return readings, errors
+
+def setup_logging(level=LOG_LEVEL):
+    logging.basicConfig(level=getattr(logging, str(level).upper()), format=LOG_FORMAT, datefmt='%Y-%m-%d %H:%M:%S')
 
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
-        print(f"[MQTT] Connected to Broker: {MQTT_BROKER}")
+        log.info("[MQTT] Connected to Broker: %s", MQTT_BROKER)
     else:
-        print(f"[MQTT] Connection Failed. Return code: {rc}")
+        log.warning("[MQTT] Connection Failed. Return code: %s", rc)
+
+def create_mqtt_client(filter_settings=None):
+    """
+    Creates the MQTT client and starts its network loop in the background.
+    The connection is made by the loop, which keeps retrying (with backoff)
+    while the broker is unreachable, also at startup.
+
+    'filter_settings' (reading_filter.gateway_settings()) are published
+    retained to FILTER_TOPIC on every connect, so a central ingest service
+    refills the readings this gateway did not send, also if it subscribes
+    later.
+    """
+    client = mqtt.Client()
+    if ACCESS_TOKEN:
+        client.username_pw_set(ACCESS_TOKEN)
+
+    def connected(client, userdata, flags, rc):
+        on_connect(client, userdata, flags, rc)
+        if rc == 0 and filter_settings is not None:
+            client.publish(FILTER_TOPIC, json.dumps(filter_settings), qos=1, retain=True)
+    client.on_connect = connected
+    client.reconnect_delay_set(min_delay=1, max_delay=60)
+    client.max_inflight_messages_set(OUTBOX_BATCH_MESSAGES)   # a whole outbox batch in flight
+
+    try:
+        log.info("[MQTT] Connecting to %s...", MQTT_BROKER)
+        client.connect_async(MQTT_BROKER, MQTT_PORT, 60)
+        client.loop_start()
+    except Exception as e:
+        log.error("[MQTT] Error: %s", e)
+    return client
+
+def create_outbox(client, data_dir=DATA_DIR):
+    """
+    Persistent outbox in front of the MQTT client: messages are written to
+    disk first and sent by a background thread (see outbox.py).
+
+    Returns:
+        (Outbox, OutboxSender): the sender is already running.
+    """
+    outbox = Outbox(os.path.join(data_dir, OUTBOX_DIR))
+    sender = OutboxSender(outbox.directory, client, wake_event=outbox.flushed).start()
+    return outbox, sender
+
+# ==========================================
+# METRICS
+# ==========================================
+
+class GatewayStats:
+    """
+    Plain counters of the read loop. The metrics read them at scrape time,
+    so counting costs one integer addition.
+    """
+
+    def __init__(self):
+        self.messages = 0
+        self.parse_errors = 0
+        self.errors = 0
+        self.bytes_read = 0
+
+class GatewayMetrics:
+    """
+    The gateway's metrics registry: counters of 'stats' (GatewayStats or
+    AsyncGateway) and of the reading filter, latency histograms fed by the
+    storage/outbox hooks, and queue depths read from the writers at scrape
+    time.
+    """
+
+    def __init__(self, stats, storage, outbox=None, sender=None, decoders=lambda: (), reading_filter=None):
+        self.registry = registry = MetricsRegistry()
+        registry.counter("gateway_messages_total", "Readings received", fn=lambda: stats.messages)
+        registry.counter("gateway_parse_errors_total", "Garbled JSON lines", fn=lambda: stats.parse_errors)
+        registry.counter("gateway_errors_total", "Exceptions while handling readings", fn=lambda: stats.errors)
+        registry.counter("gateway_serial_bytes_total", "Bytes read from the serial ports", fn=lambda: stats.bytes_read)
+        registry.counter("gateway_frames_total", "Binary frames decoded",
+                         fn=lambda: sum(d.frames for d in decoders()))
+        registry.counter("gateway_frames_lost_total", "Binary frames lost (sequence gaps)",
+                         fn=lambda: sum(d.lost_frames for d in decoders()))
+        registry.counter("gateway_frame_crc_errors_total", "Binary frames with a bad CRC",
+                         fn=lambda: sum(d.crc_errors for d in decoders()))
+        if reading_filter is not None:
+            registry.counter("gateway_readings_invalid_total", "Readings dropped as invalid (no echo, out of range)",
+                             fn=lambda: reading_filter.invalid)
+            registry.counter("gateway_readings_env_cleared_total", "Readings stored without temperature/humidity",
+                             fn=lambda: reading_filter.env_cleared)
+            registry.counter("gateway_readings_duplicate_total", "Readings dropped as duplicates",
+                             fn=lambda: reading_filter.duplicates)
+            registry.counter("gateway_readings_suppressed_total", "Readings within the deadband (not stored)",
+                             fn=lambda: reading_filter.suppressed)
+            registry.counter("gateway_readings_heartbeat_total", "Readings stored only because of the heartbeat",
+                             fn=lambda: reading_filter.heartbeats)
+        self.read_seconds = registry.histogram("gateway_read_seconds", "Decoding and handling of one serial read")
+
+        csv_flush = registry.histogram("gateway_csv_flush_seconds", "CSV batch write")
+        storage.on_flush = lambda rows, seconds: csv_flush.observe(seconds)
+        registry.counter("gateway_csv_rows_total", "Rows written to the CSV files", fn=lambda: storage.rows_written)
+        registry.counter("gateway_csv_rotations_total", "Monthly CSV file rotations", fn=lambda: storage.rotations)
+        registry.gauge("gateway_csv_pending_rows", "Rows buffered for the next CSV write", fn=lambda: storage.pending)
+
+        if outbox is not None:
+            outbox_flush = registry.histogram("gateway_outbox_flush_seconds", "Outbox batch write")
+            outbox.on_flush = lambda messages, seconds: outbox_flush.observe(seconds)
+            registry.gauge("gateway_outbox_pending_messages", "Messages buffered for the next outbox write",
+                           fn=lambda: outbox.pending)
+        if sender is not None:
+            publish = registry.histogram("gateway_publish_seconds", "MQTT batch publish until all acknowledged")
+            sender.on_batch = lambda messages, seconds: publish.observe(seconds)
+            registry.counter("gateway_published_total", "Messages acknowledged by the broker",
+                             fn=lambda: sender.published)
+            registry.counter("gateway_publish_retries_total", "Failed batch publishes", fn=lambda: sender.retries)
+            registry.gauge("gateway_outbox_backlog_bytes", "Outbox bytes not yet acknowledged",
+                           fn=sender.backlog_bytes)
+
+def start_metrics_server(registry, host=METRICS_HOST, port=METRICS_PORT):
+    """
+    Starts the HTTP endpoint; returns None if disabled (port 0) or the port
+    is taken (the gateway keeps running without it).
+    """
+    if not port:
+        return None
+    try:
+        server = MetricsServer(registry, host, port).start()
+    except OSError as e:
+        log.warning("[METRICS] Cannot listen on %s:%s (%s), endpoint disabled", host, port, e)
+        return None
+    log.info("[METRICS] Serving %s", server.url)
+    return server
+
+def create_metrics_publisher(registry, client, interval_s=METRICS_PUBLISH_INTERVAL_S):
+    if client is None or not interval_s:
+        return None
+    return MetricsPublisher(registry, client, METRICS_TOPIC, interval_s)
 
 # ==========================================
 # MAIN PROGRAM
 # ==========================================
 
-client = mqtt.Client()
-if ACCESS_TOKEN:
-    client.username_pw_set(ACCESS_TOKEN)
-client.on_connect = on_connect
-
-try:
-    print(f"[MQTT] Connecting to {MQTT_BROKER}...")
-    client.connect(MQTT_BROKER, MQTT_PORT, 60)
-    client.loop_start()
-except Exception as e:
-    print(f"[MQTT] Error: {e}")
-
-try:
-    ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-    print(f"[SERIAL] Listening on {SERIAL_PORT}...")
-    print(f"[DATA] Saving data to folder: {DATA_DIR}")
-    
-    while True:
-        if ser.in_waiting > 0:
+def parse_args():
+    parser = argparse.ArgumentParser(description="Single-port edge gateway")
+    parser.add_argument('--no-filter', action='store_true',
+                        help="Store every reading as received (no validation, duplicate removal or deadband)")
+    parser.add_argument('--no-deadband', action='store_true',
+                        help="Validate and drop duplicates, but store every valid reading")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    setup_logging()
+    reading_filter = None   # Validation, duplicates, deadband (see reading_filter.py)
+    if not args.no_filter:
+        reading_filter = ReadingFilter(None if args.no_deadband else DEADBAND)
+    # Also without the deadband: ends the period of an earlier filtering run
+    filter_settings = gateway_settings([DEFAULT_BIN_ID], reading_filter and reading_filter.deadband)
+    record_settings(DATA_DIR, filter_settings)
+    client = create_mqtt_client(filter_settings)
+    outbox, sender = create_outbox(client)
+    storage = BufferedCsvWriter(DATA_DIR)
+    decoder = TelemetryDecoder()   # JSON lines and binary frames, auto-detected
+    stats = GatewayStats()
+    metrics = GatewayMetrics(stats, storage, outbox, sender, decoders=lambda: (decoder,),
+                             reading_filter=reading_filter)
+    metrics_server = start_metrics_server(metrics.registry)
+    publisher = create_metrics_publisher(metrics.registry, client)
+    lost_reported = 0
+    ser = None
+
+    try:
+        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
+        log.info("[SERIAL] Listening on %s...", SERIAL_PORT)
+        log.info("[DATA] Saving data to folder: %s", DATA_DIR)
+
+        while True:
+            # read() blocks for up to 'timeout' seconds until the first byte,
+            # so the loop sleeps in the driver instead of spinning on in_waiting.
+            raw = ser.read(max(1, ser.in_waiting))
+            storage.flush_if_due()
+            outbox.flush_if_due()
+            if publisher is not None:
+                publisher.publish_if_due()
+            if not raw:
+                continue
+            start = time.perf_counter()
+            stats.bytes_read += len(raw)
             try:
-                # 1. Read & Parse
-                line = ser.readline().decode('utf-8').strip()
-                data = json.loads(line)
-                
-                # Add Timestamp
-                current_time = time.strftime('%Y-%m-%d %H:%M:%S')
-                data['timestamp'] = current_time
-                
-                print(f"Received: {data}")
-                
-                # 2. Publish to Cloud
-                client.publish(MQTT_TOPIC, json.dumps(data))
-                
-                # 3. Save to Local Storage (Monthly Rotation)
-                csv_path = get_current_csv_path()
-                file_exists = os.path.isfile(csv_path)
-                
-                with open(csv_path, mode='a', newline='') as file:
-                    writer = csv.writer(file)
-                    # Write headers only if file is new
-                    if not file_exists:
-                        writer.writerow(["timestamp", "distance_cm", "temperature_c", "humidity_pct"])
-                        print(f"[DATA] Created new log file: {csv_path}")
-                    
-                    writer.writerow([
-                        data['timestamp'], 
-                        data.get('distance_cm'), 
-                        data.get('temperature_c'), 
-                        data.get('humidity_pct')
-                    ])
-                
-            except json.JSONDecodeError:
-                pass # Ignore partial lines
+                # 1. Read & Parse (partial lines/frames wait for the next read)
+                readings, errors = decode_items(decoder.feed(raw))
+                stats.parse_errors += errors
+
+                for data in readings:
+                    stats.messages += 1
+                    log.debug("Received: %s", data)
+                    if reading_filter is not None and reading_filter.check(DEFAULT_BIN_ID, data) != KEEP:
+                        continue   # Invalid, duplicate or within the deadband
+
+                    # 2. Publish to Cloud (via the on-disk outbox)
+                    outbox.append(MQTT_TOPIC, json.dumps(data))
+
+                    # 3. Save to Local Storage (Buffered, Monthly Rotation)
+                    storage.write(data)
+
+                if decoder.lost_frames > lost_reported:
+                    # Gap in the frame sequence numbers: readings lost on the wire
+                    log.warning("[SERIAL] %d binary frames lost so far, %d CRC errors",
+                                decoder.lost_frames, decoder.crc_errors)
+                    lost_reported = decoder.lost_frames
+
             except Exception as e:
-                print(f"[ERROR] {e}")
-                
-except KeyboardInterrupt:
-    print("\n[SYSTEM] Stopping gateway...")
-    client.loop_stop()
-    if 'ser' in locals() and ser.is_open:
-        ser.close()
\ No newline at end of file
+                stats.errors += 1
+                log.error("[ERROR] %s", e, exc_info=log.isEnabledFor(logging.DEBUG))
+            metrics.read_seconds.observe(time.perf_counter() - start)
+
+    except KeyboardInterrupt:
+        log.info("[SYSTEM] Stopping gateway...")
+    finally:
+        # Also on a fatal error (e.g. the serial port failing), so buffered
+        # rows reach the CSV and the outbox before the process exits.
+        storage.close()
+        outbox.close()
+        sender.stop()
+        client.loop_stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if ser is not None and ser.is_open:
+            ser.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Incremental Data Lake Loader
+
+Keeps the whole sensor history in memory and, on refresh(), parses only the
+bytes appended to the monthly CSV files since the last call. Derived columns
+(e.g. fill_level_pct) are computed for the new rows only, and rows are
+appended into pre-allocated column arrays that grow by doubling, so the cost
+of a refresh is proportional to the new data, not to the total history.
+
+A full reload only happens when history changes in a non-append way: a CSV
+shrinks or is replaced, or the Parquet lake changes (monthly compaction).
+
+File tracking and CSV parsing are shared with every other reader through
+the lake index (lake_query.py): the loader only remembers how far into
+each indexed file it has read.
+
+bin_frame() returns one bin's rows through a per-bin row index (the bin's
+partition of the in-memory store), built on first use and extended with
+each refresh, so drilling into a bin never filters the whole frame.
+"""
+
+import glob
+import os
+import sys
+import threading
+import numpy as np
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from edge_gateway.lake_query import get_lake_index
+from edge_gateway.parquet_store import ALL_COLUMNS, DATA_DIR, get_lake_dir, read_lake
+from edge_gateway.reading_filter import SETTINGS_FILE as FILTER_SETTINGS_FILE, HoldReconstructor
+
+INITIAL_CAPACITY = 1024
+
+# ==========================================
+# COLUMN STORE
+# ==========================================
+
+class _GrowableFrame:
+    """
+    Column arrays with spare capacity. Appending copies only the new rows;
+    frame() returns a DataFrame view of the filled part.
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.size = 0
+
+    def append(self, df):
+        n = len(df)
+        if n == 0:
+            return
+        if not self.columns:
+            capacity = max(INITIAL_CAPACITY, 2 * n)
+            self.columns = {c: np.empty(capacity, dtype=df[c].to_numpy().dtype) for c in df.columns}
+        needed = self.size + n
+        capacity = len(next(iter(self.columns.values())))
+        if needed > capacity:
+            capacity = max(needed, 2 * capacity)
+            for c, arr in self.columns.items():
+                grown = np.empty(capacity, dtype=arr.dtype)
+                grown[:self.size] = arr[:self.size]
+                self.columns[c] = grown
+        for c, arr in self.columns.items():
+            arr[self.size:needed] = df[c].to_numpy()
+        self.size = needed
+
+    def last(self, column):
+        return self.columns[column][self.size - 1] if self.size else None
+
+    def sort(self, column):
+        # New arrays rather than in-place: frames handed out earlier stay valid
+        order = np.argsort(self.columns[column][:self.size], kind='stable')
+        for c, arr in self.columns.items():
+            sorted_arr = np.empty_like(arr)
+            sorted_arr[:self.size] = arr[:self.size][order]
+            self.columns[c] = sorted_arr
+
+    def frame(self):
+        return pd.DataFrame({c: arr[:self.size] for c, arr in self.columns.items()}, copy=False)
+
+    def take(self, rows):
+        return pd.DataFrame({c: arr[rows] for c, arr in self.columns.items()}, copy=False)
+
+class _BinRows:
+    """
+    Row numbers of every bin in the column store, one growable array per
+    bin (rows are appended in time order, so each array stays sorted).
+    """
+
+    def __init__(self):
+        self.rows = {}               # bin_id -> [array, size]
+
+    def add(self, bin_ids, first_row):
+        codes, names = pd.factorize(bin_ids)
+        order = np.argsort(codes, kind='stable') + first_row
+        bounds = np.r_[0, np.cumsum(np.bincount(codes, minlength=len(names)))]
+        for i, bin_id in enumerate(names):
+            self._extend(bin_id, order[bounds[i]:bounds[i + 1]])
+
+    def _extend(self, bin_id, rows):
+        entry = self.rows.get(bin_id)
+        if entry is None:
+            entry = self.rows[bin_id] = [np.empty(2 * len(rows), dtype=np.int64), 0]
+        arr, size = entry
+        needed = size + len(rows)
+        if needed > len(arr):
+            grown = np.empty(max(needed, 2 * len(arr)), dtype=np.int64)
+            grown[:size] = arr[:size]
+            entry[0] = arr = grown
+        arr[size:needed] = rows
+        entry[1] = needed
+
+    def get(self, bin_id):
+        entry = self.rows.get(bin_id)
+        return entry[0][:entry[1]] if entry else np.empty(0, dtype=np.int64)
+
+# ==========================================
+# LOADER
+# ==========================================
+
+class IncrementalLoader:
+    """
+    Incrementally maintained, timestamp-sorted frame of the whole data lake.
+
+    Args:
+        data_dir (str): Folder with sensor_data_*.csv (and parquet/).
+        derive (callable): Optional fn(df) -> df adding derived columns.
+            It is applied to each batch of new rows only.
+        reconstruct (bool): Refill the readings a deadband-filtering
+            gateway did not store (reading_filter.py, if the gateway wrote
+            its settings), before 'derive'. The held copies of a batch are
+            never older than the previous batch, so they append in order.
+
+    Listeners (add_listener) receive every batch of new rows as
+    fn(new_rows, reloaded), so derived indexes can be maintained
+    incrementally too; 'reloaded' means: drop your state, history restarts.
+
+    Thread-safe: one instance can be shared by all dashboard sessions.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, derive=None, reconstruct=True):
+        self.data_dir = data_dir
+        self.derive = derive
+        self.reconstruct = reconstruct
+        self.index = get_lake_index(data_dir)
+        self.last_new_rows = 0
+        self.full_reloads = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._store = _GrowableFrame()
+        self._files = {}             # path -> {'offset', 'inode'}
+        self._lake_signature = None
+        self._frame = None
+        self._bin_rows = None        # Built by the first bin_frame() call
+        self._reloading = True
+        self._filter_settings = self._settings_signature()
+        self._reconstructor = HoldReconstructor.from_data_dir(self.data_dir) if self.reconstruct else None
+
+    @property
+    def file_count(self):
+        return len(self._files) + (len(self._lake_signature) if self._lake_signature else 0)
+
+    def add_listener(self, listener):
+        """
+        Registers fn(new_rows, reloaded). Data already loaded is passed
+        straight away as one reloaded batch.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            if self._frame is not None:
+                listener(self._frame, True)
+
+    def bin_frame(self, bin_id):
+        """
+        Time-ordered rows of one bin, as of the last refresh (None if the
+        lake is empty). Costs in proportion to that bin's rows only.
+        """
+        with self._lock:
+            if self._frame is None:
+                return None
+            if self._bin_rows is None:
+                self._bin_rows = _BinRows()
+                self._bin_rows.add(self._store.columns['bin_id'][:self._store.size], 0)
+            return self._store.take(self._bin_rows.get(bin_id))
+
+    def refresh(self):
+        """
+        Picks up new data and returns the up-to-date frame (None if the lake is empty).
+        """
+        with self._lock:
+            self.index.refresh()
+            indexed = self.index.snapshot()
+            lake_signature = self._scan_lake()
+            if (lake_signature != self._lake_signature or self._history_rewritten(indexed)
+                    or self._settings_signature() != self._filter_settings):
+                self._full_reload(lake_signature, indexed)
+            else:
+                self._append(self._read_csv_tails(indexed))
+            return self._frame
+
+    # --- change detection ---
+
+    def _scan_lake(self):
+        files = glob.glob(os.path.join(get_lake_dir(self.data_dir), "bin_id=*", "month=*", "*.parquet"))
+        return frozenset((f, os.stat(f).st_mtime_ns) for f in files)
+
+    def _settings_signature(self):
+        # The gateway's filter settings (mtime), None without them
+        try:
+            return os.stat(os.path.join(self.data_dir, FILTER_SETTINGS_FILE)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _history_rewritten(self, indexed):
+        """
+        True if a known CSV vanished, shrank or was replaced by another file.
+        """
+        for path, state in self._files.items():
+            current = indexed.get(path)
+            if current is None or current[0] != state['inode'] or current[2] < state['offset']:
+                return True
+        return False
+
+    # --- reading ---
+
+    def _full_reload(self, lake_signature, indexed):
+        self._reset()
+        self.full_reloads += 1
+        self._lake_signature = lake_signature
+        frames = []
+        lake_df = read_lake(self.data_dir) if lake_signature else None
+        if lake_df is not None and len(lake_df):
+            frames.append(lake_df)
+        frames.extend(self._read_csv_tails(indexed))
+        self._append(frames)
+
+    def _read_csv_tails(self, indexed):
+        """
+        Reads the lines indexed since the last call (the index only covers
+        complete lines, a writer mid-flush is picked up next time).
+        """
+        frames = []
+        for path, (inode, data_start, size) in sorted(indexed.items()):
+            state = self._files.setdefault(path, {'offset': data_start, 'inode': inode})
+            if size > state['offset']:
+                frames.append(self.index.read_range(path, state['offset'], size, ALL_COLUMNS))
+                state['offset'] = size
+        return frames
+
+    def _append(self, frames):
+        frames = [f for f in frames if len(f)]
+        self.last_new_rows = sum(len(f) for f in frames)
+        if not frames:
+            if self._reloading:
+                self._notify(self._store.frame()[:0] if self._store.columns else None)
+            return
+        new = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        new = new.sort_values('timestamp', kind='stable')
+        if self._reconstructor is not None:
+            new = self._reconstructor.expand(new, reset=self._reloading)
+        if self.derive is not None:
+            new = self.derive(new)
+
+        last_ts = self._store.last('timestamp')
+        first_row = self._store.size
+        self._store.append(new)
+        # Late rows (e.g. another bin's file flushed later): restore order
+        if last_ts is not None and new['timestamp'].iloc[0] < last_ts:
+            self._store.sort('timestamp')
+            self._bin_rows = None        # Row numbers moved: rebuilt on next use
+        elif self._bin_rows is not None:
+            self._bin_rows.add(new['bin_id'].to_numpy(), first_row)
+        self._frame = self._store.frame()
+        self._notify(new)
+
+    def _notify(self, new_rows):
+        for listener in self._listeners:
+            listener(new_rows, self._reloading)
+        self._reloading = False
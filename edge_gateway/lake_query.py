@@ -0,0 +1,386 @@
+"""
+Data Lake Query API
+
+One read path for everything that loads sensor history (dashboard loader,
+predictions, emptying-event index, benchmarks):
+
+    query(data_dir, bins=None, start=None, end=None, columns=ALL_COLUMNS, resolution=None)
+
+Compacted months come from the Parquet lake (partition and row-group
+pruning, see parquet_store.read_lake). The live monthly CSVs are covered by
+a small in-process index that is built on first use and then only extended
+with the lines appended since the previous query:
+
+    per file    header, bytes indexed, min/max timestamp
+    per block   (~BLOCK_BYTES of complete lines) byte range, min/max timestamp
+    per bin     rows and min/max timestamp in each block
+
+A query skips files whose time range or bins do not match and, inside a
+file, reads only the blocks that hold the requested bins in the requested
+time range (seek + read of the byte ranges, consecutive blocks in one
+read). Only those bytes are parsed.
+
+'resolution' ('hour' or 'day', as in rollups.py) returns per-bin means per
+time bucket instead of the raw rows.
+
+Rows stored by a gateway with deadband compression (the periods it
+recorded in reading_filter.SETTINGS_FILE) are followed by the readings it
+did not store (reading_filter.HoldReconstructor), so every reader sees the
+same full-rate history: rows up to one hold before 'start' are read for
+that, and copies run up to the lake's latest timestamp. Rows outside those
+periods are returned as stored. reconstruct=False returns the stored rows
+only.
+"""
+
+import io
+import os
+import sys
+import threading
+import numpy as np
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from edge_gateway.csv_writer import DEFAULT_BIN_ID
+from edge_gateway.parquet_store import (
+    ALL_COLUMNS, DATA_DIR, MEASUREMENT_COLUMNS, TIMESTAMP_FORMAT, list_csv_months, normalize_frame, read_lake,
+    row_mask,
+)
+from edge_gateway.reading_filter import HoldReconstructor
+from edge_gateway.rollups import RESOLUTIONS
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+
+BLOCK_BYTES = 64 * 1024        # Index granularity; a short last block is re-indexed as the file grows
+
+_NAT = np.iinfo(np.int64).min
+
+def _ns(value):
+    return None if value is None else pd.Timestamp(value).value
+
+# ==========================================
+# PER-FILE INDEX
+# ==========================================
+
+class CsvFileIndex:
+    """
+    Block index of one monthly CSV file. update() indexes the complete
+    lines appended since the last call; ranges() answers which byte ranges
+    can hold rows of the given bins/time range.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.inode = None
+        self.header = None
+        self.data_start = 0            # First byte after the header
+        self.size = 0                  # Bytes indexed (always ends at a line end)
+        self.rows = 0
+        self.bin_names = []            # bin code -> bin ID
+        self._bin_codes = {}
+        self._blocks = {k: np.empty(0, dtype=np.int64) for k in ('start', 'end', 'min', 'max', 'rows')}
+        self._entries = {k: np.empty(0, dtype=np.int64) for k in ('block', 'bin', 'rows', 'min', 'max')}
+
+    @property
+    def blocks(self):
+        return len(self._blocks['start'])
+
+    @property
+    def min_timestamp(self):
+        valid = self._blocks['min'][self._blocks['rows'] > 0]
+        return pd.Timestamp(valid.min()) if len(valid) else None
+
+    @property
+    def max_timestamp(self):
+        valid = self._blocks['max'][self._blocks['rows'] > 0]
+        return pd.Timestamp(valid.max()) if len(valid) else None
+
+    def update(self):
+        """
+        Indexes newly appended lines.
+
+        Returns:
+            bool: False if the file was replaced or shrank (the index is
+            stale, build a new one).
+        """
+        st = os.stat(self.path)
+        if self.inode is not None and (st.st_ino != self.inode or st.st_size < self.size):
+            return False
+        self.inode = st.st_ino
+        if st.st_size == self.size:
+            return True
+
+        # A short last block is indexed again together with the new lines,
+        # so frequent refreshes do not leave thousands of tiny blocks.
+        start = self.size
+        if self.blocks and self._blocks['end'][-1] - self._blocks['start'][-1] < BLOCK_BYTES:
+            start = int(self._blocks['start'][-1])
+            self._drop_last_block()
+
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            chunk = f.read(st.st_size - start)
+        chunk = chunk[:chunk.rfind(b'\n') + 1]          # complete lines only
+        if not chunk:
+            return True
+        if self.header is None:
+            header_end = chunk.index(b'\n') + 1
+            self.header = chunk[:header_end].decode('utf-8').strip().split(',')
+            self.data_start = start = header_end
+            chunk = chunk[header_end:]
+        if chunk:
+            self._index_chunk(chunk, start)
+        self.size = start + len(chunk)
+        return True
+
+    def _drop_last_block(self):
+        last = self.blocks - 1
+        self.rows -= int(self._blocks['rows'][last])
+        self._blocks = {k: v[:last] for k, v in self._blocks.items()}
+        keep = self._entries['block'] < last
+        self._entries = {k: v[keep] for k, v in self._entries.items()}
+
+    def _index_chunk(self, chunk, offset):
+        line_ends = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord('\n')) + 1
+
+        # Block boundaries: the first line end at or after every BLOCK_BYTES
+        targets = np.searchsorted(line_ends, np.arange(BLOCK_BYTES, len(chunk), BLOCK_BYTES))
+        cuts = np.unique(line_ends[np.minimum(targets, len(line_ends) - 1)])
+        block_ends = np.union1d(cuts, [len(chunk)])
+        row_block = np.searchsorted(block_ends, line_ends, side='left')
+
+        usecols = [c for c in ('timestamp', 'bin_id') if c in self.header]
+        df = pd.read_csv(io.BytesIO(chunk), header=None, names=self.header, usecols=usecols,
+                         dtype={'bin_id': str}, skip_blank_lines=False)
+        ts = pd.to_datetime(df['timestamp'], format=TIMESTAMP_FORMAT, errors='coerce')
+        ts = ts.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        bins = df['bin_id'].fillna(DEFAULT_BIN_ID) if 'bin_id' in df else pd.Series(DEFAULT_BIN_ID, index=df.index)
+        codes, names = pd.factorize(bins)
+        mapping = np.array([self._bin_codes.setdefault(b, len(self._bin_codes)) for b in names], dtype=np.int64)
+        if len(self.bin_names) < len(self._bin_codes):
+            self.bin_names = list(self._bin_codes)
+
+        valid = ts != _NAT
+        block, ts = row_block[valid], ts[valid]
+        n_blocks = len(block_ends)
+        block_min = np.full(n_blocks, np.iinfo(np.int64).max)
+        block_max = np.full(n_blocks, _NAT)
+        np.minimum.at(block_min, block, ts)
+        np.maximum.at(block_max, block, ts)
+
+        first_block = self.blocks
+        rows = pd.DataFrame({'block': block + first_block, 'bin': mapping[codes[valid]], 'ts': ts})
+        per_entry = rows.groupby(['block', 'bin'])['ts'].agg(['size', 'min', 'max']).reset_index()
+
+        new_blocks = {
+            'start': np.r_[0, block_ends[:-1]] + offset, 'end': block_ends + offset,
+            'min': block_min, 'max': block_max, 'rows': np.bincount(block, minlength=n_blocks),
+        }
+        new_entries = {'block': per_entry['block'], 'bin': per_entry['bin'], 'rows': per_entry['size'],
+                       'min': per_entry['min'], 'max': per_entry['max']}
+        self._blocks = {k: np.concatenate([v, np.asarray(new_blocks[k], dtype=np.int64)]) for k, v in self._blocks.items()}
+        self._entries = {k: np.concatenate([v, np.asarray(new_entries[k], dtype=np.int64)]) for k, v in self._entries.items()}
+        self.rows += int(valid.sum())
+
+    def ranges(self, bins=None, start=None, end=None):
+        """
+        Byte ranges [(start, end), ...] that can hold matching rows
+        (consecutive blocks merged). Timestamps in ns or None.
+        """
+        if bins is None:
+            match = self._blocks['rows'] > 0
+            low, high = self._blocks['min'], self._blocks['max']
+            selected = np.arange(self.blocks)
+        else:
+            codes = [self._bin_codes[b] for b in map(str, bins) if b in self._bin_codes]
+            match = np.isin(self._entries['bin'], codes)
+            low, high = self._entries['min'], self._entries['max']
+            selected = self._entries['block']
+        if start is not None:
+            match &= high >= start
+        if end is not None:
+            match &= low < end
+
+        blocks = np.unique(selected[match])
+        if not len(blocks):
+            return []
+        # Runs of consecutive blocks become one read
+        breaks = np.flatnonzero(np.diff(blocks) != 1)
+        run_first = blocks[np.r_[0, breaks + 1]]
+        run_last = blocks[np.r_[breaks, len(blocks) - 1]]
+        return list(zip(self._blocks['start'][run_first].tolist(), self._blocks['end'][run_last].tolist()))
+
+    def read(self, ranges, columns=ALL_COLUMNS):
+        """
+        Parses the given byte ranges (complete lines) into a normalized frame.
+        """
+        with open(self.path, 'rb') as f:
+            parts = []
+            for start, end in ranges:
+                f.seek(start)
+                parts.append(f.read(end - start))
+        data = b''.join(parts)
+        usecols = [c for c in columns if c in self.header]
+        if not data:
+            return normalize_frame(pd.DataFrame({c: pd.Series(dtype=object) for c in columns}), columns)
+        df = pd.read_csv(io.BytesIO(data), header=None, names=self.header, usecols=usecols, dtype={'bin_id': str})
+        if 'bin_id' in columns and 'bin_id' not in df:
+            df['bin_id'] = DEFAULT_BIN_ID
+        return normalize_frame(df, columns)
+
+# ==========================================
+# LAKE INDEX
+# ==========================================
+
+class LakeIndex:
+    """
+    Index of all live CSV files of one data folder plus the query API.
+    Thread-safe; use get_lake_index() to share one instance per folder.
+    """
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self.files = {}                # path -> CsvFileIndex
+        self.bytes_read = 0            # CSV bytes parsed by queries (not counting indexing)
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        """
+        Brings the index up to date: new files, appended lines, replaced or
+        removed (e.g. compacted) files.
+        """
+        with self._lock:
+            paths = set(list_csv_months(self.data_dir).values())
+            for path in set(self.files) - paths:
+                del self.files[path]
+            for path in sorted(paths):
+                index = self.files.get(path)
+                try:
+                    if index is None or not index.update():
+                        index = self.files[path] = CsvFileIndex(path)
+                        index.update()
+                except FileNotFoundError:
+                    self.files.pop(path, None)      # compacted between listing and reading
+
+    def snapshot(self):
+        """
+        {path: (inode, data_start, size)} of the indexed files, for readers
+        that follow the files themselves (IncrementalLoader).
+        """
+        with self._lock:
+            return {p: (f.inode, f.data_start, f.size) for p, f in self.files.items() if f.header is not None}
+
+    def read_range(self, path, start, end, columns=ALL_COLUMNS):
+        with self._lock:
+            index = self.files[path]
+        self.bytes_read += end - start
+        return index.read([(start, end)], columns)
+
+    def query(self, bins=None, start=None, end=None, columns=ALL_COLUMNS, resolution=None, refresh=True,
+              reconstruct=True):
+        """
+        Sensor data of the given bins in [start, end), sorted by timestamp.
+
+        Args:
+            bins (list): Only these bin IDs (default: all).
+            start, end: Optional time range [start, end).
+            columns (list): Columns to return ('timestamp' is always included).
+            resolution (str): None for raw rows, or a rollups.RESOLUTIONS key
+                ('hour', 'day') for per-bin bucket means.
+            reconstruct (bool): Refill readings suppressed by the gateway's
+                deadband (see module docstring).
+
+        Returns:
+            pd.DataFrame or None if the folder holds no data at all.
+        """
+        if resolution is not None and resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be None or one of {list(RESOLUTIONS)}, got {resolution!r}")
+        columns = list(dict.fromkeys(["timestamp"] + list(columns)))
+        if resolution is not None and 'bin_id' not in columns:
+            columns.append('bin_id')
+        read_columns = list(dict.fromkeys(columns + ["bin_id"]))
+        if refresh:
+            self.refresh()
+        reconstructor = HoldReconstructor.from_data_dir(self.data_dir) if reconstruct else None
+        out_columns, read_start = columns, start
+        if reconstructor is not None:
+            columns = read_columns
+            if start is not None:
+                read_start = pd.Timestamp(start) - pd.Timedelta(reconstructor.max_hold_ns, 'ns')
+
+        frames = []
+        lake_df = read_lake(self.data_dir, bins, read_start, end, columns)
+        if lake_df is not None:
+            frames.append(lake_df)
+
+        start_ns, end_ns = _ns(read_start), _ns(end)
+        with self._lock:
+            files = [f for _, f in sorted(self.files.items()) if f.header is not None]
+        for index in files:
+            ranges = index.ranges(bins, start_ns, end_ns)
+            if not ranges:
+                continue
+            self.bytes_read += sum(e - s for s, e in ranges)
+            df = index.read(ranges, read_columns)
+            frames.append(df.loc[row_mask(df, bins, read_start, end), columns])
+
+        if not frames and not files:
+            return None
+        if not frames:
+            return normalize_frame(pd.DataFrame({c: pd.Series(dtype=object) for c in out_columns}), out_columns)
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        if reconstructor is not None and len(df):
+            df = reconstructor.expand(df, self._frontier(df, files, end))
+            if start is not None:
+                df = df[df['timestamp'] >= pd.Timestamp(start)].reset_index(drop=True)
+            df = df[out_columns]
+        if resolution is not None:
+            df = downsample(df, resolution)
+        return df
+
+    @staticmethod
+    def _frontier(df, files, end=None):
+        # Latest time the lake covers (the live CSVs hold the newest rows), before 'end'
+        latest = [df['timestamp'].iloc[-1]] + [f.max_timestamp for f in files if f.max_timestamp is not None]
+        frontier = max(latest)
+        if end is not None:
+            frontier = min(frontier, pd.Timestamp(end) - pd.Timedelta(1, 'ns'))
+        return frontier
+
+def downsample(df, resolution):
+    """
+    Per-bin means per time bucket; 'timestamp' is the bucket start.
+    """
+    values = [c for c in df.columns if c in MEASUREMENT_COLUMNS or c == 'fill_level_pct']
+    bucket = df['timestamp'].dt.floor(RESOLUTIONS[resolution])
+    out = df.groupby(['bin_id', bucket], sort=False)[values].mean().reset_index()
+    return out.sort_values('timestamp', kind='stable').reset_index(drop=True)[list(df.columns)]
+
+# ==========================================
+# SHARED INSTANCES
+# ==========================================
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_lake_index(data_dir=DATA_DIR):
+    """
+    The process-wide LakeIndex of a data folder (built on first use).
+    """
+    key = os.path.abspath(data_dir)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = LakeIndex(data_dir)
+        return _indexes[key]
+
+def query(data_dir=DATA_DIR, bins=None, start=None, end=None, columns=ALL_COLUMNS, resolution=None, reconstruct=True):
+    """
+    Shortcut for get_lake_index(data_dir).query(...).
+    """
+    return get_lake_index(data_dir).query(bins, start, end, columns, resolution, reconstruct=reconstruct)
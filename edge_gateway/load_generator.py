@@ -0,0 +1,221 @@
+"""
+Gateway Load Generator
+
+Proves the throughput of the multi-bin gateway without hardware: creates one
+pseudo-terminal per simulated bin, starts async_gateway.py on the slave ends
+and replays the firmware's JSON line format (or, with --binary, its binary
+frames, see telemetry_frame.py) into the master ends.
+
+Reports end-to-end throughput (messages persisted to the CSV data lake per
+second) and the gateway's CPU usage both while idle and under load.
+
+Usage (Linux/Mac only, needs pseudo-terminals):
+    python edge_gateway/load_generator.py --bins 200 --messages 100
+    python edge_gateway/load_generator.py --bins 500 --messages 20 --rate 2000
+    python edge_gateway/load_generator.py --bins 200 --messages 100 --binary
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tty
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(SCRIPT_DIR, '..')))
+
+from edge_gateway.telemetry_frame import encode_frame
+
+GATEWAY_SCRIPT = os.path.join(SCRIPT_DIR, "async_gateway.py")
+
+IDLE_SECONDS = 3
+READY_TIMEOUT_S = 30
+DRAIN_TIMEOUT_S = 120
+
+# ==========================================
+# HELPERS
+# ==========================================
+
+def firmware_line(rng):
+    """
+    One reading in the exact format printed by firmware.ino (Serial.print of
+    a float gives two decimals, Serial.println ends with CRLF).
+    """
+    distance = rng.uniform(5, 100)
+    temperature = rng.uniform(15, 25)
+    humidity = rng.uniform(40, 60)
+    return (f'{{"distance_cm": {distance:.2f}, "temperature_c": {temperature:.2f}, '
+            f'"humidity_pct": {humidity:.2f}}}\r\n').encode('ascii')
+
+def firmware_frame(rng, device, seq):
+    """
+    One reading as the binary frame sent by firmware.ino with TELEMETRY_BINARY.
+    """
+    return encode_frame(device, seq, rng.uniform(5, 100), rng.uniform(15, 25), rng.uniform(40, 60))
+
+def open_ptys(count):
+    """
+    Returns a list of (master_fd, slave_fd, slave_path). The slave stays open
+    here as well, so the pty survives the gateway reopening it.
+    """
+    ptys = []
+    for _ in range(count):
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        ptys.append((master, slave, os.ttyname(slave)))
+    return ptys
+
+def read_process_cpu(pid):
+    """
+    CPU seconds (user + system) used so far by a process, read from /proc.
+    Returns None where /proc is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def count_persisted_rows(data_dir):
+    rows = 0
+    for path in glob.glob(os.path.join(data_dir, "sensor_data_*.csv")):
+        with open(path, 'rb') as f:
+            rows += max(sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b'')) - 1, 0)
+    return rows
+
+def start_gateway(ports, data_dir):
+    ports_file = os.path.join(data_dir, "ports.json")
+    with open(ports_file, 'w') as f:
+        json.dump(ports, f)
+
+    # --no-filter: every reading sent must be persisted (the deadband and
+    # duplicate removal would drop some of the random readings)
+    proc = subprocess.Popen(
+        [sys.executable, '-u', GATEWAY_SCRIPT, '--no-mqtt', '--no-filter', '--data-dir', data_dir,
+         '--ports-file', ports_file],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+
+    ready = threading.Event()
+    def pump_output():
+        for line in proc.stdout:
+            if "[GATEWAY] Ready" in line:
+                print(f"  gateway: {line.strip()}")
+                ready.set()
+            elif "[ERROR]" in line or line.startswith("Traceback"):
+                print(f"  gateway: {line.rstrip()}")
+        ready.set()
+    threading.Thread(target=pump_output, daemon=True).start()
+
+    if not ready.wait(READY_TIMEOUT_S) or proc.poll() is not None:
+        proc.kill()
+        raise SystemExit("[ERROR] Gateway did not start")
+    return proc
+
+# ==========================================
+# MAIN PROGRAM
+# ==========================================
+
+def run_load_test(bins, messages, rate=None, data_dir=None, seed=42, binary=False):
+    """
+    Sends 'messages' readings to each of 'bins' simulated bins and returns a
+    dict of throughput and CPU figures.
+
+    Args:
+        rate (float): Total messages per second across all bins, or None for
+            an unthrottled burst (measures peak throughput).
+        binary (bool): Send binary frames instead of JSON lines.
+    """
+    rng = random.Random(seed)
+    data_dir = data_dir or tempfile.mkdtemp(prefix="gateway_load_")
+    os.makedirs(data_dir, exist_ok=True)
+
+    ptys = open_ptys(bins)
+    ports = {f"LOAD-{i:04d}": path for i, (_, _, path) in enumerate(ptys)}
+    proc = start_gateway(ports, data_dir)
+
+    try:
+        # 1. Idle phase: the gateway should not burn CPU while nothing arrives
+        cpu_before = read_process_cpu(proc.pid)
+        time.sleep(IDLE_SECONDS)
+        cpu_idle = read_process_cpu(proc.pid)
+
+        # 2. Load phase
+        total = bins * messages
+        interval = bins / rate if rate else 0
+        start = time.perf_counter()
+        sent_bytes = 0
+        for round_no in range(messages):
+            for device, (master, _, _) in enumerate(ptys):
+                payload = firmware_frame(rng, device, round_no) if binary else firmware_line(rng)
+                sent_bytes += os.write(master, payload)
+            if interval:
+                delay = start + (round_no + 1) * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        sent_time = time.perf_counter() - start
+
+        # 3. Wait until every reading is persisted
+        persisted = 0
+        deadline = time.perf_counter() + DRAIN_TIMEOUT_S
+        while time.perf_counter() < deadline:
+            persisted = count_persisted_rows(data_dir)
+            if persisted >= total or proc.poll() is not None:
+                break
+            time.sleep(0.1)
+        elapsed = time.perf_counter() - start
+        cpu_load = read_process_cpu(proc.pid)
+    finally:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        for master, slave, _ in ptys:
+            os.close(master)
+            os.close(slave)
+
+    result = {
+        "bins": bins,
+        "messages_sent": total,
+        "messages_persisted": persisted,
+        "format": "binary" if binary else "json",
+        "bytes_per_message": round(sent_bytes / total, 1),
+        "send_seconds": round(sent_time, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_msg_s": round(persisted / elapsed, 1) if elapsed else None,
+        "data_dir": data_dir,
+    }
+    if cpu_before is not None:
+        result["idle_cpu_pct"] = round(100 * (cpu_idle - cpu_before) / IDLE_SECONDS, 2)
+        result["load_cpu_pct"] = round(100 * (cpu_load - cpu_idle) / elapsed, 1)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay firmware traffic into the multi-bin gateway over ptys")
+    parser.add_argument('--bins', type=int, default=200, help="Number of simulated bins (one pty each)")
+    parser.add_argument('--messages', type=int, default=100, help="Readings sent per bin")
+    parser.add_argument('--rate', type=float, default=None, help="Total msg/s (default: unthrottled burst)")
+    parser.add_argument('--data-dir', default=None, help="Output folder (default: a temp folder)")
+    parser.add_argument('--binary', action='store_true', help="Send binary frames instead of JSON lines")
+    args = parser.parse_args()
+
+    print(f"[LOAD] {args.bins} bins x {args.messages} messages...")
+    result = run_load_test(args.bins, args.messages, rate=args.rate, data_dir=args.data_dir, binary=args.binary)
+
+    print("--- LOAD TEST RESULT ---")
+    for key, value in result.items():
+        print(f"{key + ':':22}{value}")
+    if result["messages_persisted"] < result["messages_sent"]:
+        print("[WARNING] Not every message was persisted before the timeout.")
+
+if __name__ == "__main__":
+    main()
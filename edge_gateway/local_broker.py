@@ -0,0 +1,214 @@
+"""
+Local MQTT Broker Stand-in
+
+A minimal MQTT 3.1.1 broker (asyncio, standard library only) for testing
+the ingest service and load tests without an external broker:
+
+    - CONNECT, SUBSCRIBE/UNSUBSCRIBE with '+' and '#' wildcards, PUBLISH
+      QoS 0 and 1 (delivered to subscribers as QoS 0), PINGREQ, DISCONNECT
+    - no retained messages, sessions, will messages or authentication
+
+Backpressure: when a subscriber cannot keep up, its socket buffer fills and
+the broker stops reading from the publishers until it has drained, so a
+slow consumer slows the producers down instead of being flooded.
+
+Usage:
+    python edge_gateway/local_broker.py --port 1883
+"""
+
+import argparse
+import asyncio
+import signal
+
+# --- CONFIGURATION ---
+HOST = "127.0.0.1"
+PORT = 1883
+READ_CHUNK_BYTES = 1 << 16
+WRITE_HIGH_WATER_BYTES = 1 << 20
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+# ==========================================
+# PACKET HELPERS
+# ==========================================
+
+def encode_length(length):
+    """MQTT variable-length 'remaining length' field."""
+    out = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        out.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes(out)
+
+def publish_packet(topic, payload):
+    """PUBLISH packet (QoS 0) for a topic (str or bytes) and payload (bytes)."""
+    topic = topic.encode('utf-8') if isinstance(topic, str) else topic
+    body = len(topic).to_bytes(2, 'big') + topic + payload
+    return b'\x30' + encode_length(len(body)) + body
+
+def split_packets(buffer):
+    """
+    Splits complete packets off the front of 'buffer'.
+
+    Returns:
+        (packets, rest): list of (type, flags, body) and the unparsed tail.
+    """
+    packets = []
+    pos, size = 0, len(buffer)
+    while pos + 2 <= size:
+        length, multiplier, i = 0, 1, pos + 1
+        while True:
+            if i >= size:
+                return packets, buffer[pos:]
+            byte = buffer[i]
+            length += (byte & 0x7F) * multiplier
+            multiplier *= 128
+            i += 1
+            if not byte & 0x80:
+                break
+        if i + length > size:
+            break
+        header = buffer[pos]
+        packets.append((header >> 4, header & 0x0F, buffer[i:i + length]))
+        pos = i + length
+    return packets, buffer[pos:]
+
+def topic_matches(topic_filter, topic):
+    """MQTT wildcard match ('+' = one level, '#' = the rest)."""
+    filter_levels = topic_filter.split('/')
+    levels = topic.split('/')
+    for i, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if i >= len(levels) or (level != '+' and level != levels[i]):
+            return False
+    return len(filter_levels) == len(levels)
+
+# ==========================================
+# BROKER
+# ==========================================
+
+class LocalBroker:
+    """
+    In-memory MQTT broker: routes every PUBLISH to the matching subscribers.
+    """
+
+    def __init__(self, host=HOST, port=PORT):
+        self.host = host
+        self.port = port
+        self.messages_in = 0
+        self.messages_out = 0
+        self._subscriptions = {}     # writer -> set of topic filters
+        self._routes = {}            # topic -> list of writers (cache)
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        for writer in list(self._subscriptions):
+            writer.close()
+        await self._server.wait_closed()
+
+    def _subscribers(self, topic):
+        writers = self._routes.get(topic)
+        if writers is None:
+            writers = [w for w, filters in self._subscriptions.items()
+                       if any(topic_matches(f, topic) for f in filters)]
+            self._routes[topic] = writers
+        return writers
+
+    async def _handle_client(self, reader, writer):
+        writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER_BYTES)
+        buffer = b''
+        try:
+            while True:
+                chunk = await reader.read(READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                packets, buffer = split_packets(buffer + chunk)
+                targets = set()
+                for kind, flags, body in packets:
+                    if kind == PUBLISH:
+                        targets.update(self._on_publish(writer, flags, body))
+                    elif kind == DISCONNECT:
+                        return
+                    else:
+                        self._on_control(writer, kind, body)
+                # Backpressure: wait until slow subscribers have taken the data
+                await asyncio.gather(*(w.drain() for w in targets), return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if self._subscriptions.pop(writer, None) is not None:
+                self._routes.clear()
+            writer.close()
+
+    def _on_publish(self, writer, flags, body):
+        qos = (flags >> 1) & 0x03
+        topic_len = int.from_bytes(body[:2], 'big')
+        topic_bytes = body[2:2 + topic_len]
+        payload_at = 2 + topic_len
+        if qos:
+            writer.write(bytes([PUBACK << 4, 2]) + body[payload_at:payload_at + 2])
+            payload_at += 2
+        self.messages_in += 1
+
+        subscribers = self._subscribers(topic_bytes.decode('utf-8'))
+        if subscribers:
+            packet = publish_packet(topic_bytes, body[payload_at:])
+            for target in subscribers:
+                target.write(packet)
+            self.messages_out += len(subscribers)
+        return subscribers
+
+    def _on_control(self, writer, kind, body):
+        if kind == CONNECT:
+            writer.write(bytes([CONNACK << 4, 2, 0, 0]))
+        elif kind == PINGREQ:
+            writer.write(bytes([PINGRESP << 4, 0]))
+        elif kind in (SUBSCRIBE, UNSUBSCRIBE):
+            packet_id, pos, filters = body[:2], 2, []
+            while pos < len(body):
+                length = int.from_bytes(body[pos:pos + 2], 'big')
+                filters.append(body[pos + 2:pos + 2 + length].decode('utf-8'))
+                pos += 2 + length + (1 if kind == SUBSCRIBE else 0)   # requested QoS byte
+            current = self._subscriptions.setdefault(writer, set())
+            if kind == SUBSCRIBE:
+                current.update(filters)
+                writer.write(bytes([SUBACK << 4 | 0, 2 + len(filters)]) + packet_id + bytes(len(filters)))
+            else:
+                current.difference_update(filters)
+                writer.write(bytes([UNSUBACK << 4, 2]) + packet_id)
+            self._routes.clear()
+
+async def serve(host, port):
+    broker = await LocalBroker(host, port).start()
+    print(f"[BROKER] Listening on {broker.host}:{broker.port}")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, AttributeError):
+            pass # Windows: Ctrl+C surfaces as KeyboardInterrupt instead
+    await stop_event.wait()
+    await broker.stop()
+    print(f"[BROKER] Stopped: {broker.messages_in} messages in, {broker.messages_out} out")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Minimal local MQTT broker for testing")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
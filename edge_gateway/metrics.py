@@ -0,0 +1,235 @@
+"""
+Gateway Runtime Metrics
+
+Counters, gauges and latency histograms with no dependencies, built so the
+gateway's hot path stays as it is:
+
+    - Counters and gauges can read a value the gateway already keeps
+      (fn=lambda: gateway.messages) at scrape time: no per-message cost.
+    - Histograms are observed per batch (CSV flush, outbox flush, MQTT
+      batch, serial read), not per message: one bisect + two additions.
+
+MetricsServer serves the registry on a local HTTP port from a daemon
+thread:
+
+    GET /metrics        Prometheus text format
+    GET /metrics.json   the same as JSON (also what MetricsPublisher sends)
+
+MetricsPublisher publishes the JSON snapshot to an MQTT topic at a fixed
+interval (call publish_if_due() from the gateway's timer).
+
+Values are read without locks: a scrape taken while a histogram is being
+updated may be off by that one observation.
+"""
+
+import bisect
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+
+# Seconds; from 100 µs (one decoded chunk) to 30 s (ack timeout)
+LATENCY_BUCKETS_S = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                     0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# ==========================================
+# INSTRUMENTS
+# ==========================================
+
+class Counter:
+    """Monotonic count: inc() it, or pass fn to read an existing counter."""
+    kind = "counter"
+
+    def __init__(self, name, help_text, fn=None):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def read(self):
+        return self.fn() if self.fn is not None else self.value
+
+class Gauge(Counter):
+    """Current level (queue depth, backlog): set() it or pass fn."""
+    kind = "gauge"
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    """
+    Distribution of observed values over fixed buckets ('le' upper bounds,
+    cumulative in the Prometheus output).
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS_S):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)      # last: above every bucket
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding quantile 'q' (the maximum seen if
+        it is above every bucket); None before the first observation.
+        """
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def read(self):
+        return {"count": self.count, "sum": round(self.sum, 6), "max": round(self.max, 6),
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+# ==========================================
+# REGISTRY
+# ==========================================
+
+class MetricsRegistry:
+    """Named instruments of one process, in registration order."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, fn=None):
+        return self._add(Counter(name, help_text, fn))
+
+    def gauge(self, name, help_text, fn=None):
+        return self._add(Gauge(name, help_text, fn))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS_S):
+        return self._add(Histogram(name, help_text, buckets))
+
+    def snapshot(self):
+        """{name: value} (histograms: count/sum/max/p50/p99)."""
+        return {name: metric.read() for name, metric in self._metrics.items()}
+
+    def render_prometheus(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name} {_number(metric.read())}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets, metric.counts):
+                cumulative += count
+                lines.append(f'{metric.name}_bucket{{le="{bound:g}"}} {cumulative}')
+            lines.append(f'{metric.name}_bucket{{le="+Inf"}} {metric.count}')
+            lines.append(f"{metric.name}_sum {_number(metric.sum)}")
+            lines.append(f"{metric.name}_count {metric.count}")
+        return "\n".join(lines) + "\n"
+
+def _number(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+# ==========================================
+# HTTP ENDPOINT & PUBLISHER
+# ==========================================
+
+class MetricsServer:
+    """
+    Serves a registry over HTTP from a daemon thread. port=0 picks a free
+    port (see .port).
+    """
+
+    def __init__(self, registry, host="127.0.0.1", port=0):
+        self.registry = registry
+        self.scrapes = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == "/metrics":
+                    body, content_type = server.registry.render_prometheus(), "text/plain; version=0.0.4"
+                elif path == "/metrics.json":
+                    body, content_type = json.dumps(server.registry.snapshot()), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                server.scrapes += 1
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass                                # No access log per scrape
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.host, self.port = self._httpd.server_address[:2]
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+class MetricsPublisher:
+    """
+    Publishes the registry snapshot as JSON to 'topic' every 'interval_s'
+    (QoS 0: metrics are replaced by the next snapshot, no need to queue them).
+    """
+
+    def __init__(self, registry, client, topic, interval_s):
+        self.registry = registry
+        self.client = client
+        self.topic = topic
+        self.interval_s = interval_s
+        self.published = 0
+        self._next = time.monotonic() + interval_s
+
+    def publish_if_due(self):
+        now = time.monotonic()
+        if now < self._next:
+            return
+        self._next = now + self.interval_s
+        if self.client.is_connected():
+            payload = dict(self.registry.snapshot(), time=time.strftime('%Y-%m-%d %H:%M:%S'))
+            self.client.publish(self.topic, json.dumps(payload), qos=0)
+            self.published += 1
@@ -0,0 +1,353 @@
+"""
+MQTT Ingest Service
+
+Central alternative to the serial gateways: subscribes to the readings that
+field gateways publish (bioeconomy/textile_bin/<bin_id>) and writes them to
+the CSV data lake with the same schema, so many gateways feed one store.
+
+    - The MQTT network thread only enqueues raw messages; a worker takes them
+      off in batches, decodes each batch with a single json.loads() and hands
+      the rows to the BufferedCsvWriter in one call.
+    - Backpressure: readings are subscribed with QoS 1 and acknowledged by
+      hand. Once the queue holds 'queue_max' messages, the acknowledgements
+      are held back until the writer has drained it to half, so the broker
+      stops sending when its in-flight window is full. The network thread
+      keeps running (keepalives), and the queue stays below 'queue_max' plus
+      that window. The broker queues the rest for the session; raise its
+      limit (mosquitto: max_queued_messages), or it drops messages during a
+      long stall. QoS 0 deliveries (QoS 0 publishers, local_broker.py) have
+      no acknowledgement to hold back: for those the network thread still
+      blocks on a full queue and TCP pushes back, which drops the connection
+      if the stall outlasts the keepalive.
+    - Lag: queue depth and the time messages waited between arrival and being
+      written are reported with the throughput every STATS_INTERVAL_S.
+
+Bin ID comes from the topic; the reading's own timestamp (stamped by the
+field gateway) is kept, so late messages land in the right month.
+Messages are checked before they are stored: the timestamp must have the
+lake's format and the values pass reading_filter.validate(); anything
+else counts as a decode error and is not written.
+
+Field gateways with a deadband publish their filter settings retained to
+<prefix>/_filter/<host> (gateway.FILTER_TOPIC). The service records them in
+the lake's reading_filter.json, so readers of the central lake refill the
+readings the gateways did not send, as they do for a gateway's own folder.
+A broker without retained messages (local_broker.py) only passes them on
+while the service is subscribed: start it before the gateways.
+
+Usage:
+    python edge_gateway/mqtt_ingest.py --broker localhost --port 1883
+    python edge_gateway/local_broker.py    # broker stand-in for local testing
+"""
+
+import argparse
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+import paho.mqtt.client as mqtt
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from edge_gateway.csv_writer import BufferedCsvWriter, FLUSH_MAX_DELAY_S, FSYNC_POLICIES, FSYNC_POLICY
+from edge_gateway.gateway import DATA_DIR, MQTT_BROKER, MQTT_PORT, MQTT_TOPIC_PREFIX
+from edge_gateway.parquet_store import TIMESTAMP_FORMAT
+from edge_gateway.reading_filter import record_settings, validate
+from analytics.online_estimator import FleetEstimator
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+
+TOPIC_FILTER = f"{MQTT_TOPIC_PREFIX}/+"
+SETTINGS_TOPIC_FILTER = f"{MQTT_TOPIC_PREFIX}/_filter/+"   # Gateways' reading filter settings (retained)
+SETTINGS_PREFIX = SETTINGS_TOPIC_FILTER[:-1]
+QUEUE_MAX_MESSAGES = 50000       # Backpressure threshold (messages waiting to be written)
+BATCH_MAX_MESSAGES = 5000
+BATCH_MAX_DELAY_S = 0.2          # A partial batch is processed after this long
+FLUSH_MAX_ROWS = 20000           # CSV writer buffer (larger than the gateways')
+STATS_INTERVAL_S = 10
+ESTIMATOR_STATE_FILE = "fill_estimators.json"
+ESTIMATOR_SAVE_INTERVAL_S = 60
+
+# ==========================================
+# DECODING
+# ==========================================
+
+def bin_id_from_topic(topic):
+    return topic.rsplit('/', 1)[-1]
+
+def decode_batch(messages):
+    """
+    Decodes a batch of (topic, payload, arrival) messages into CSV rows.
+    The payloads are parsed with one json.loads() call; a batch containing a
+    broken message falls back to decoding message by message.
+
+    Returns:
+        (rows, errors)
+    """
+    try:
+        readings = json.loads(b'[' + b','.join(m[1] for m in messages) + b']')
+        if len(readings) != len(messages):
+            raise ValueError("payload count mismatch")    # e.g. a payload like '1,2'
+    except (ValueError, UnicodeDecodeError):
+        readings = []
+        for m in messages:
+            try:
+                readings.append(json.loads(m[1]))
+            except (ValueError, UnicodeDecodeError):
+                readings.append(None)
+
+    rows, errors = [], 0
+    now = None
+    timestamps = set()       # Checked in this batch (gateways stamp by the second)
+    for (topic, _, _), data in zip(messages, readings):
+        if not isinstance(data, dict) or not validate(data)[0]:
+            errors += 1
+            continue
+        if 'timestamp' not in data:
+            now = now or time.strftime(TIMESTAMP_FORMAT)
+            data['timestamp'] = now
+        elif data['timestamp'] not in timestamps:
+            if not valid_timestamp(data['timestamp']):
+                errors += 1
+                continue
+            timestamps.add(data['timestamp'])
+        data['bin_id'] = bin_id_from_topic(topic)
+        rows.append(data)
+    return rows, errors
+
+def valid_timestamp(value):
+    """
+    True if 'value' is a timestamp string in the lake's format (it names
+    the month file and must parse for every reader).
+    """
+    if not isinstance(value, str):
+        return False
+    try:
+        datetime.strptime(value, TIMESTAMP_FORMAT)
+    except ValueError:
+        return False
+    return True
+
+# ==========================================
+# INGEST SERVICE
+# ==========================================
+
+class MqttIngest:
+    """
+    Subscribes to TOPIC_FILTER and writes every reading to the data lake.
+    Call start() to connect, then run(stop_event) in the worker thread.
+    """
+
+    def __init__(self, broker=MQTT_BROKER, port=MQTT_PORT, data_dir=DATA_DIR, storage=None, estimator=None,
+                 topic_filter=TOPIC_FILTER, queue_max=QUEUE_MAX_MESSAGES):
+        self.broker = broker
+        self.port = port
+        self.data_dir = data_dir
+        self.topic_filter = topic_filter
+        self.storage = storage or BufferedCsvWriter(data_dir, max_rows=FLUSH_MAX_ROWS)
+        self.estimator = estimator
+        self.queue = queue.Queue()
+        self.queue_max = queue_max
+
+        self.messages = 0
+        self.decode_errors = 0
+        self.errors = 0                # Batches that failed to process or write
+        self.batches = 0
+        self.max_queue = 0
+        self.last_lag_s = 0.0          # Oldest message of the last batch: arrival -> written
+        self.max_lag_s = 0.0
+        self.backpressure_s = 0.0      # Time acknowledgements were held back / the network thread blocked
+        self._held_acks = []           # (mid, qos) not acknowledged because the queue is full
+        self._held_since = None
+        self._acks_lock = threading.Lock()
+        self._space = threading.Condition()
+        self._stopping = False
+
+        self.client = mqtt.Client()
+        self.client.manual_ack_set(True)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    # --- MQTT network thread ---
+
+    def start(self):
+        print(f"[MQTT] Connecting to {self.broker}:{self.port}...")
+        self.client.connect(self.broker, self.port, 60)
+        self.client.loop_start()
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            # (Re)subscribe on every connect, so a broker restart is survived
+            with self._acks_lock:
+                self._held_acks = []   # Message IDs of the old connection
+            client.subscribe([(self.topic_filter, 1), (SETTINGS_TOPIC_FILTER, 1)])
+            print(f"[MQTT] Connected to Broker: {self.broker}, subscribed to {self.topic_filter}")
+        else:
+            print(f"[MQTT] Connection Failed. Return code: {rc}")
+
+    def _on_message(self, client, userdata, msg):
+        if not msg.qos and self.queue.qsize() >= self.queue_max:
+            # Nothing to hold back: block the network thread until the writer catches up
+            start = time.monotonic()
+            with self._space:
+                self._space.wait_for(lambda: self.queue.qsize() < self.queue_max or self._stopping)
+            self.backpressure_s += time.monotonic() - start
+        self.queue.put_nowait((msg.topic, msg.payload, time.monotonic()))
+        if not msg.qos:
+            return
+        with self._acks_lock:
+            if self._held_acks or self.queue.qsize() >= self.queue_max:
+                if not self._held_acks:
+                    self._held_since = time.monotonic()
+                self._held_acks.append((msg.mid, msg.qos))
+                return
+        client.ack(msg.mid, msg.qos)
+
+    def _release_acks(self):
+        # Worker: acknowledge the held messages once the queue is down to half
+        if not self._held_acks or self.queue.qsize() >= self.queue_max // 2:
+            return
+        with self._acks_lock:
+            held, self._held_acks = self._held_acks, []
+        if held:
+            self.backpressure_s += time.monotonic() - self._held_since
+        for mid, qos in held:
+            self.client.ack(mid, qos)
+
+    # --- worker ---
+
+    def _next_batch(self):
+        try:
+            batch = [self.queue.get(timeout=BATCH_MAX_DELAY_S)]
+        except queue.Empty:
+            self._release_acks()
+            return []
+        self.max_queue = max(self.max_queue, self.queue.qsize() + 1)
+        deadline = time.monotonic() + BATCH_MAX_DELAY_S
+        while len(batch) < BATCH_MAX_MESSAGES:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(0.005)
+        with self._space:
+            self._space.notify_all()
+        self._release_acks()
+        return batch
+
+    def process(self, batch):
+        readings = [m for m in batch if not m[0].startswith(SETTINGS_PREFIX)]
+        if len(readings) < len(batch):
+            for topic, payload, _ in batch:
+                if topic.startswith(SETTINGS_PREFIX):
+                    self.record_filter_settings(payload)
+        rows, errors = decode_batch(readings) if readings else ([], 0)
+        self.storage.write_many(rows)
+        if self.estimator is not None:
+            for data in rows:
+                self.estimator.update(data['bin_id'], data['timestamp'], data.get('distance_cm'))
+        self.messages += len(rows)
+        self.decode_errors += errors
+        self.batches += 1
+        self.last_lag_s = time.monotonic() - batch[0][2]
+        self.max_lag_s = max(self.max_lag_s, self.last_lag_s)
+
+    def record_filter_settings(self, payload):
+        """
+        Records a field gateway's reading filter settings in the lake (see
+        module docstring); broken settings count as decode errors.
+        """
+        try:
+            if record_settings(self.data_dir, json.loads(payload)):
+                print(f"[DATA] Reading filter settings updated: {payload.decode('utf-8', 'replace')}")
+        except (ValueError, KeyError, TypeError, AttributeError, UnicodeDecodeError):
+            self.decode_errors += 1
+
+    def run(self, stop_event):
+        """
+        Worker loop: batches, writes, flushes on time, prints stats and
+        saves the estimator state until 'stop_event' is set.
+        """
+        last_stats = last_save = time.monotonic()
+        last_count = 0
+        while not stop_event.is_set():
+            batch = self._next_batch()
+            try:
+                if batch:
+                    self.process(batch)
+                self.storage.flush_if_due()
+            except Exception as e:
+                # One bad batch or a failed write must not stop the service
+                # (rows of a failed write stay buffered and are retried)
+                self.errors += 1
+                print(f"[ERROR] {len(batch)} messages: {e}")
+
+            now = time.monotonic()
+            if now - last_stats >= STATS_INTERVAL_S:
+                self.report_stats((self.messages - last_count) / (now - last_stats))
+                last_count, last_stats = self.messages, now
+            if self.estimator is not None and now - last_save >= ESTIMATOR_SAVE_INTERVAL_S:
+                self.estimator.save()
+                last_save = now
+        self.close()
+
+    def report_stats(self, rate):
+        print(f"[STATS] {self.messages} messages ({rate:.0f} msg/s), queue {self.queue.qsize()} "
+              f"(max {self.max_queue}), lag {self.last_lag_s * 1000:.0f} ms (max {self.max_lag_s * 1000:.0f} ms), "
+              f"backpressure {self.backpressure_s:.1f}s, {self.decode_errors} decode errors, {self.errors} errors")
+
+    def close(self):
+        with self._space:
+            self._stopping = True      # Unblocks a network thread waiting for space
+            self._space.notify_all()
+        self.client.loop_stop()
+        self.client.disconnect()
+        while not self.queue.empty():
+            self.process([self.queue.get_nowait() for _ in range(min(self.queue.qsize(), BATCH_MAX_MESSAGES))])
+        self.storage.close()
+        if self.estimator is not None:
+            self.estimator.save()
+        print(f"[SYSTEM] Ingest stopped after {self.messages} messages")
+
+# ==========================================
+# MAIN PROGRAM
+# ==========================================
+
+def main():
+    parser = argparse.ArgumentParser(description="MQTT subscriber that writes readings to the data lake")
+    parser.add_argument('--broker', default=MQTT_BROKER)
+    parser.add_argument('--port', type=int, default=MQTT_PORT)
+    parser.add_argument('--topic', default=TOPIC_FILTER, help="Topic filter to subscribe to")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Folder for the monthly CSV files")
+    parser.add_argument('--queue-max', type=int, default=QUEUE_MAX_MESSAGES, help="Backpressure threshold")
+    parser.add_argument('--flush-rows', type=int, default=FLUSH_MAX_ROWS, help="Flush the CSV buffer at this many rows")
+    parser.add_argument('--flush-delay', type=float, default=FLUSH_MAX_DELAY_S, help="Flush rows older than this (seconds)")
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default=FSYNC_POLICY, help="When to fsync the CSV files")
+    parser.add_argument('--no-estimator', action='store_true', help="Do not maintain online fill-rate estimates")
+    args = parser.parse_args()
+
+    storage = BufferedCsvWriter(args.data_dir, max_rows=args.flush_rows, max_delay_s=args.flush_delay, fsync=args.fsync)
+    estimator = None if args.no_estimator else FleetEstimator(os.path.join(args.data_dir, ESTIMATOR_STATE_FILE))
+    ingest = MqttIngest(args.broker, args.port, args.data_dir, storage=storage, estimator=estimator,
+                        topic_filter=args.topic, queue_max=args.queue_max)
+
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+
+    ingest.start()
+    print(f"[DATA] Saving data to folder: {args.data_dir}")
+    ingest.run(stop_event)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+Store-and-Forward Outbox for MQTT
+
+The gateway writes every message to a persistent on-disk outbox first; a
+background sender drains it to the broker. Readings are no longer lost when
+the broker or the network is down (also at startup) or the gateway restarts.
+
+On disk (one folder):
+    seg_<number>.log   Append-only segment files, one message per line:
+                       '<topic>\\t<payload>\\n'. A new segment is started
+                       at SEGMENT_MAX_BYTES and on every gateway start.
+    cursor.json        {"segment": n, "offset": bytes}: everything before it
+                       has been acknowledged by the broker. Written atomically.
+
+Outbox (gateway side) buffers appends and flushes them like the CSV writer
+(by size and by age). OutboxSender (background thread) reads batches from
+the cursor, publishes them with QoS 1, waits for all acknowledgements and
+only then advances the cursor and deletes finished segments. Failures are
+retried with exponential backoff. Delivery is at-least-once: a crash between
+publishing and saving the cursor resends that batch.
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from edge_gateway.csv_writer import FLUSH_MAX_DELAY_S, FSYNC_POLICIES, FSYNC_POLICY
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+
+OUTBOX_DIR = "outbox"
+SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+CURSOR_FILE = "cursor.json"
+
+FLUSH_MAX_MESSAGES = 500
+BATCH_MAX_MESSAGES = 250       # paho scans all in-flight messages on every ack: keep moderate
+BATCH_ACK_TIMEOUT_S = 30
+READ_CHUNK_BYTES = 1024 * 1024
+IDLE_POLL_S = 1.0              # Sender wake-up when nothing was flushed
+RETRY_BASE_S = 1.0
+RETRY_MAX_S = 60.0
+PUBLISH_QOS = 1
+
+_SEGMENT = re.compile(r"^seg_(\d+)\.log$")
+
+# ==========================================
+# HELPERS
+# ==========================================
+
+def segment_path(directory, number):
+    return os.path.join(directory, f"seg_{number:012d}.log")
+
+def list_segments(directory):
+    """
+    Segment numbers in the outbox folder, oldest first.
+    """
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(m.group(1)) for m in map(_SEGMENT.match, os.listdir(directory)) if m)
+
+def read_cursor(directory):
+    path = os.path.join(directory, CURSOR_FILE)
+    if not os.path.isfile(path):
+        return 0, 0
+    with open(path) as f:
+        cursor = json.load(f)
+    return cursor['segment'], cursor['offset']
+
+def write_cursor(directory, segment, offset):
+    path = os.path.join(directory, CURSOR_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"segment": segment, "offset": offset}, f)
+    os.replace(tmp_path, path)
+
+# ==========================================
+# OUTBOX (gateway side)
+# ==========================================
+
+class Outbox:
+    """
+    Append-only, segmented message log. Not thread-safe on the writing
+    side: call append()/flush() from one thread (or one event loop), like
+    BufferedCsvWriter. The sender only reads flushed, complete lines.
+    'on_flush(messages, seconds)' is called after every batch write.
+    """
+
+    def __init__(self, directory, max_messages=FLUSH_MAX_MESSAGES, max_delay_s=FLUSH_MAX_DELAY_S,
+                 fsync=FSYNC_POLICY, segment_max_bytes=SEGMENT_MAX_BYTES, on_flush=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.directory = directory
+        self.max_messages = max_messages
+        self.max_delay_s = max_delay_s
+        self.fsync = fsync
+        self.segment_max_bytes = segment_max_bytes
+        self.on_flush = on_flush
+        self.flushed = threading.Event()    # Wakes the sender
+        self.messages_written = 0
+
+        self._buffer = []
+        self._oldest = None
+        os.makedirs(directory, exist_ok=True)
+        # Always start a fresh segment: the last one may end in a torn line
+        segments = list_segments(directory)
+        self._segment = (segments[-1] if segments else read_cursor(directory)[0]) + 1
+        self._file = open(segment_path(directory, self._segment), 'ab')
+        self._size = 0
+
+    @property
+    def pending(self):
+        """Messages buffered in memory (not yet in the outbox files)."""
+        return len(self._buffer)
+
+    def append(self, topic, payload):
+        """
+        Queues one message ('payload': str or bytes without newlines).
+        """
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        if not self._buffer:
+            self._oldest = time.monotonic()
+        self._buffer.append(topic.encode('utf-8') + b'\t' + payload + b'\n')
+        if len(self._buffer) >= self.max_messages:
+            self.flush()
+
+    def flush_if_due(self):
+        if self._buffer and time.monotonic() - self._oldest >= self.max_delay_s:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        start = time.perf_counter()
+        data = b''.join(self._buffer)
+        count = len(self._buffer)
+        if self._file is None or (self._size and self._size + len(data) > self.segment_max_bytes):
+            self._rotate()
+        try:
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync == "always":
+                os.fsync(self._file.fileno())
+        except BaseException:
+            # The messages stay buffered for the next flush. Part of them may
+            # be in the segment already, ending in a torn line: leave it and
+            # retry in a new segment (the sender skips a torn last line; the
+            # complete ones are sent twice, which at-least-once allows).
+            self._abandon_file()
+            raise
+        self._buffer = []
+        self._size += len(data)
+        self.messages_written += count
+        self.flushed.set()
+        if self.on_flush is not None:
+            self.on_flush(count, time.perf_counter() - start)
+
+    def close(self):
+        self.flush()
+        self._close_file()
+
+    def _rotate(self):
+        self._close_file()
+        self._file = open(segment_path(self.directory, self._segment + 1), 'ab')
+        self._segment += 1
+        self._size = 0
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        self._file.flush()
+        if self.fsync != "never":
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+    def _abandon_file(self):
+        file, self._file = self._file, None
+        if file is not None:
+            try:
+                file.close()
+            except OSError:
+                pass
+
+# ==========================================
+# SENDER (background thread)
+# ==========================================
+
+class OutboxSender:
+    """
+    Drains an outbox folder to MQTT in batches (QoS 1), resuming from the
+    saved cursor. 'client' is a paho client with its network loop running;
+    it should allow 'batch_max' messages in flight (max_inflight_messages_set
+    before connecting, paho's default is 20), otherwise batches are
+    acknowledged only 20 messages at a time.
+
+    'on_batch(messages, seconds)' is called (from the sender thread) for
+    every acknowledged batch: publish until the last acknowledgement.
+    """
+
+    def __init__(self, directory, client, batch_max=BATCH_MAX_MESSAGES, ack_timeout_s=BATCH_ACK_TIMEOUT_S,
+                 wake_event=None, on_batch=None):
+        self.directory = directory
+        self.client = client
+        self.batch_max = batch_max
+        self.ack_timeout_s = ack_timeout_s
+        self.wake_event = wake_event or threading.Event()
+        self.on_batch = on_batch
+
+        self.published = 0
+        self.batches = 0
+        self.retries = 0
+        self.last_error = None
+        self._segment, self._offset = read_cursor(directory)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="outbox-sender", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self.wake_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def backlog_bytes(self):
+        """Bytes in the outbox not yet acknowledged by the broker."""
+        total = 0
+        for number in list_segments(self.directory):
+            if number >= self._segment:
+                total += os.path.getsize(segment_path(self.directory, number))
+        return max(total - self._offset, 0)
+
+    def run(self):
+        delay = RETRY_BASE_S
+        while not self._stop.is_set():
+            batch, end = self._read_batch()
+            if end is None:
+                self.wake_event.wait(IDLE_POLL_S)
+                self.wake_event.clear()
+                continue
+            start = time.perf_counter()
+            if self._publish(batch):
+                if self.on_batch is not None:
+                    self.on_batch(len(batch), time.perf_counter() - start)
+                self._segment, self._offset = end
+                write_cursor(self.directory, *end)
+                self.published += len(batch)
+                self.batches += 1
+                delay = RETRY_BASE_S
+            else:
+                # Broker down / no acknowledgement: keep the batch, back off
+                self.retries += 1
+                self._stop.wait(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, RETRY_MAX_S)
+
+    def _read_batch(self):
+        """
+        Up to batch_max complete messages from the cursor on.
+
+        Returns:
+            (list of (topic, payload), (segment, offset) after the batch)
+        """
+        while True:
+            segments = list_segments(self.directory)
+            if self._segment not in segments:
+                later = [s for s in segments if s > self._segment]
+                if not later:
+                    return [], None
+                self._segment, self._offset = later[0], 0
+                continue
+            with open(segment_path(self.directory, self._segment), 'rb') as f:
+                f.seek(self._offset)
+                data = chunk = f.read(READ_CHUNK_BYTES)
+                while chunk and b'\n' not in chunk:
+                    # A message longer than a chunk: read on to its end (or the end of the file)
+                    chunk = f.read(READ_CHUNK_BYTES)
+                    data += chunk
+            lines = data.split(b'\n')[:-1][:self.batch_max]     # complete lines only
+            if lines:
+                consumed = sum(len(line) for line in lines) + len(lines)
+                batch = [tuple(line.split(b'\t', 1)) for line in lines if b'\t' in line]
+                return batch, (self._segment, self._offset + consumed)
+
+            if self._segment == segments[-1]:
+                return [], None                     # active segment, nothing new yet
+            # Finished segment read to its end, all sent (a torn last line is skipped): move on
+            os.remove(segment_path(self.directory, self._segment))
+            self._segment, self._offset = self._segment + 1, 0
+            write_cursor(self.directory, self._segment, self._offset)
+
+    def _publish(self, batch):
+        if not self.client.is_connected():
+            self.last_error = "not connected"
+            return False
+        infos = []
+        for topic, payload in batch:
+            info = self.client.publish(topic.decode('utf-8'), payload, qos=PUBLISH_QOS)
+            if info.rc != 0:
+                self.last_error = f"publish rc={info.rc}"
+                return False
+            infos.append(info)
+        # Acknowledgements arrive in order: wait for the last one, then check all
+        deadline = time.monotonic() + self.ack_timeout_s
+        for info in (infos[-1], *infos) if infos else ():
+            if info.is_published():
+                continue
+            try:
+                info.wait_for_publish(max(deadline - time.monotonic(), 0))
+            except (RuntimeError, ValueError) as e:
+                self.last_error = str(e)
+                return False
+            if not info.is_published():
+                self.last_error = "acknowledgement timeout"
+                return False
+        return True
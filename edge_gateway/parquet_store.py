@@ -0,0 +1,343 @@
+"""
+Columnar (Parquet) Data Lake
+
+Closed months of the CSV data lake are compacted into typed Parquet files,
+partitioned by bin and month (Hive layout):
+
+    data/parquet/bin_id=TX-105/month=2025-10/part-0.parquet
+
+Timestamps are stored as real timestamps and measurements as float32, so
+readers skip CSV parsing and datetime conversion entirely, read only the
+columns they need and prune partitions/row groups by bin and time range.
+
+The month that is still being written stays in CSV. Compacted CSVs are
+renamed to '*.csv.compacted', so every remaining 'sensor_data_*.csv' is
+live data and readers (edge_gateway/lake_query.py) simply merge both sources.
+
+Usage:
+    python edge_gateway/parquet_store.py                    # compact closed months
+    python edge_gateway/parquet_store.py --delete-csv       # ...and remove the CSVs afterwards
+"""
+
+import argparse
+import glob
+import io
+import os
+import sys
+from datetime import datetime
+import pandas as pd
+
+# --- PATH CONFIGURATION ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from edge_gateway.csv_writer import DEFAULT_BIN_ID, FILE_PREFIX, file_lock, get_month_csv_path, read_csv_header
+from edge_gateway.reading_filter import HoldReconstructor
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+
+DATA_DIR = os.path.join(current_dir, "data")
+LAKE_SUBDIR = "parquet"
+EXPORT_CHUNK_ROWS = 100_000       # Rows per chunk when streaming the lake (export)
+COMPACTED_SUFFIX = ".compacted"   # Compacted CSVs are kept as sensor_data_YYYY-MM.csv.compacted
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+MEASUREMENT_COLUMNS = ["distance_cm", "temperature_c", "humidity_pct"]
+ALL_COLUMNS = ["timestamp"] + MEASUREMENT_COLUMNS + ["bin_id"]
+
+# ==========================================
+# HELPER FUNCTIONS
+# ==========================================
+
+def get_lake_dir(data_dir=DATA_DIR):
+    return os.path.join(data_dir, LAKE_SUBDIR)
+
+def list_csv_months(data_dir=DATA_DIR):
+    """
+    Returns {month: path} of the monthly CSV files, e.g. {'2025-10': '.../sensor_data_2025-10.csv'}.
+    """
+    months = {}
+    for path in glob.glob(os.path.join(data_dir, f"{FILE_PREFIX}*.csv")):
+        month = os.path.basename(path)[len(FILE_PREFIX):-len(".csv")]
+        months[month] = path
+    return months
+
+def _month_range(start=None, end=None):
+    start_month = pd.Timestamp(start).strftime('%Y-%m') if start is not None else None
+    end_month = pd.Timestamp(end).strftime('%Y-%m') if end is not None else None
+    return start_month, end_month
+
+def normalize_frame(df, columns):
+    """
+    Gives frames from CSV and Parquet the same dtypes and column order.
+    """
+    if 'timestamp' in df and not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format=TIMESTAMP_FORMAT)
+    for col in MEASUREMENT_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype('float32')
+    if 'bin_id' in df:
+        df['bin_id'] = df['bin_id'].astype(str)
+    return df[[c for c in columns if c in df]]
+
+def read_sensor_csv(csv_path, columns=ALL_COLUMNS):
+    """
+    Reads one monthly CSV file with explicit dtypes.
+    Files written before multi-bin support get bin_id = DEFAULT_BIN_ID.
+    """
+    header = read_csv_header(csv_path) or []
+    usecols = [c for c in columns if c in header]
+    df = pd.read_csv(csv_path, usecols=usecols, dtype={'bin_id': str}, engine='c')
+    if 'bin_id' in columns and 'bin_id' not in df:
+        df['bin_id'] = DEFAULT_BIN_ID
+    return normalize_frame(df, columns)
+
+# ==========================================
+# WRITE / COMPACT
+# ==========================================
+
+def write_partitions(df, data_dir=DATA_DIR, basename="part-{i}.parquet", replace=True):
+    """
+    Writes a frame (timestamp, measurements, bin_id) into bin/month partitions.
+
+    Args:
+        replace (bool): Delete the existing files of every partition written
+            (idempotent compaction). Use False plus a unique 'basename' to add
+            files to partitions, e.g. when writing in chunks.
+    """
+    if not HAS_PYARROW:
+        raise RuntimeError("pyarrow is required for Parquet storage (pip install pyarrow)")
+
+    df = normalize_frame(df.copy(), ALL_COLUMNS)
+    df['month'] = df['timestamp'].dt.strftime('%Y-%m')
+    # Time-ordered files give tight row-group statistics for predicate pushdown
+    df = df.sort_values(['bin_id', 'timestamp'], kind='stable')
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(
+        table,
+        root_path=get_lake_dir(data_dir),
+        partition_cols=['bin_id', 'month'],
+        basename_template=basename,
+        existing_data_behavior='delete_matching' if replace else 'overwrite_or_ignore',
+    )
+    return len(df)
+
+def compact_month(data_dir, month, delete_csv=False):
+    """
+    Converts one monthly CSV into Parquet partitions. The CSV is then renamed
+    to '*.csv.compacted' (or deleted), so readers never count it twice.
+
+    Holds the month file's lock, so a BufferedCsvWriter in this process
+    buffers late rows meanwhile and writes them to a new file afterwards.
+    Safe to re-run after a crash between writing and renaming: rows already
+    in the lake are merged without duplicates.
+    """
+    csv_path = get_month_csv_path(data_dir, month)
+    with file_lock(csv_path):
+        if not os.path.isfile(csv_path):
+            return 0
+
+        df = read_sensor_csv(csv_path)
+        # Late rows for an already compacted month: merge with what is there,
+        # because writing replaces the month's partitions.
+        month_start = pd.Timestamp(f"{month}-01")
+        existing = read_lake(data_dir, bins=df['bin_id'].unique(), start=month_start,
+                             end=month_start + pd.offsets.MonthBegin(1))
+        if existing is not None and len(existing):
+            df = pd.concat([existing, df], ignore_index=True)
+            df = df.drop_duplicates(subset=['bin_id', 'timestamp'], keep='last')
+
+        rows = write_partitions(df, data_dir)
+        if delete_csv:
+            os.remove(csv_path)
+        else:
+            os.replace(csv_path, csv_path + COMPACTED_SUFFIX)
+    print(f"[DATA] Compacted {rows} rows of {month} into {get_lake_dir(data_dir)}")
+    return rows
+
+def compact_closed_months(data_dir=DATA_DIR, include_current=False, delete_csv=False):
+    """
+    Compacts every monthly CSV except the current (still open) month.
+    """
+    current_month = datetime.now().strftime('%Y-%m')
+    total = 0
+    for month in sorted(list_csv_months(data_dir)):
+        if month < current_month or include_current:
+            total += compact_month(data_dir, month, delete_csv=delete_csv)
+    return total
+
+# ==========================================
+# READ
+# ==========================================
+
+def read_lake(data_dir=DATA_DIR, bins=None, start=None, end=None, columns=ALL_COLUMNS):
+    """
+    Reads the Parquet partitions with column projection and predicate
+    pushdown. Only matching bin/month directories are opened and row
+    groups outside [start, end) are skipped.
+
+    Returns:
+        pd.DataFrame or None if there is no Parquet data.
+    """
+    scan = _lake_scan(data_dir, bins, start, end)
+    if scan is None:
+        return None
+    dataset, expression = scan
+    table = dataset.to_table(columns=list(columns), filter=expression)
+    return normalize_frame(table.to_pandas(), columns)
+
+def _lake_scan(data_dir, bins=None, start=None, end=None):
+    """
+    (dataset, filter expression) of the Parquet lake, or None if there is none.
+    """
+    lake_dir = get_lake_dir(data_dir)
+    if not HAS_PYARROW or not os.path.isdir(lake_dir):
+        return None
+
+    partitioning = ds.partitioning(pa.schema([('bin_id', pa.string()), ('month', pa.string())]), flavor='hive')
+    dataset = ds.dataset(lake_dir, format='parquet', partitioning=partitioning)
+
+    start_month, end_month = _month_range(start, end)
+    conditions = []
+    if bins is not None:
+        conditions.append(ds.field('bin_id').isin([str(b) for b in bins]))
+    if start is not None:
+        conditions.append(ds.field('month') >= start_month)
+        conditions.append(ds.field('timestamp') >= pd.Timestamp(start))
+    if end is not None:
+        conditions.append(ds.field('month') <= end_month)
+        conditions.append(ds.field('timestamp') < pd.Timestamp(end))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return dataset, expression
+
+def _csv_months_in_range(data_dir, start=None, end=None):
+    start_month, end_month = _month_range(start, end)
+    for month, path in sorted(list_csv_months(data_dir).items()):
+        if (start_month and month < start_month) or (end_month and month > end_month):
+            continue
+        yield month, path
+
+def row_mask(df, bins=None, start=None, end=None):
+    mask = pd.Series(True, index=df.index)
+    if bins is not None:
+        mask &= df['bin_id'].isin([str(b) for b in bins])
+    if start is not None:
+        mask &= df['timestamp'] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df['timestamp'] < pd.Timestamp(end)
+    return mask
+
+def iter_sensor_data(data_dir=DATA_DIR, bins=None, start=None, end=None, columns=ALL_COLUMNS,
+                     chunk_rows=EXPORT_CHUNK_ROWS, reconstruct=True):
+    """
+    Same rows as lake_query.query(), but yielded as frames of at most
+    'chunk_rows' stored rows (Parquet batches first, then the CSVs month by
+    month), so memory stays bounded however large the selection is. Rows
+    are not globally sorted. As in query(), readings suppressed by the
+    gateway's deadband are refilled unless reconstruct=False; the copies
+    after each bin's last row come in a final frame.
+    """
+    columns = list(dict.fromkeys(["timestamp"] + list(columns)))
+    reconstructor = HoldReconstructor.from_data_dir(data_dir) if reconstruct else None
+    if reconstructor is None:
+        yield from _iter_stored(data_dir, bins, start, end, columns, chunk_rows)
+        return
+
+    def selected(df):
+        if df is not None and start is not None:
+            df = df[df['timestamp'] >= pd.Timestamp(start)]
+        return df[columns] if df is not None and len(df) else None
+
+    read_start = None if start is None else pd.Timestamp(start) - pd.Timedelta(reconstructor.max_hold_ns, 'ns')
+    read_columns = list(dict.fromkeys(columns + ["bin_id"]))
+    latest = None
+    for df in _iter_stored(data_dir, bins, read_start, end, read_columns, chunk_rows):
+        chunk_latest = df['timestamp'].max()
+        latest = chunk_latest if latest is None else max(latest, chunk_latest)
+        df = selected(reconstructor.expand(df, frontier=None))
+        if df is not None:
+            yield df
+    if latest is not None:
+        df = selected(reconstructor.finish(latest))
+        if df is not None:
+            yield df
+
+def _iter_stored(data_dir, bins, start, end, columns, chunk_rows):
+    # The stored rows of iter_sensor_data(), chunk by chunk
+    scan = _lake_scan(data_dir, bins, start, end)
+    if scan is not None:
+        dataset, expression = scan
+        for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=chunk_rows):
+            if batch.num_rows:
+                yield normalize_frame(batch.to_pandas(), columns)
+
+    csv_columns = list(dict.fromkeys(columns + ["bin_id"]))
+    for month, path in _csv_months_in_range(data_dir, start, end):
+        header = read_csv_header(path) or []
+        usecols = [c for c in csv_columns if c in header]
+        for df in pd.read_csv(path, usecols=usecols, dtype={'bin_id': str}, chunksize=chunk_rows):
+            if 'bin_id' not in df:
+                df['bin_id'] = DEFAULT_BIN_ID
+            df = normalize_frame(df, csv_columns)
+            df = df.loc[row_mask(df, bins, start, end), columns]
+            if len(df):
+                yield df
+
+def _csv_bytes(df):
+    """
+    CSV rows (no header) in the gateway format; pyarrow's writer when available.
+    """
+    if not HAS_PYARROW:
+        return df.to_csv(index=False, header=False, date_format=TIMESTAMP_FORMAT).encode('utf-8')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    seconds = table.column('timestamp').cast(pa.timestamp('s'), safe=False)
+    table = table.set_column(table.schema.get_field_index('timestamp'), 'timestamp', seconds)
+    buffer = io.BytesIO()
+    pa_csv.write_csv(table, buffer, pa_csv.WriteOptions(include_header=False, quoting_style='none'))
+    return buffer.getvalue()
+
+def export_csv(out, data_dir=DATA_DIR, bins=None, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Streams a selection of the data lake as CSV (gateway format) into the
+    binary file object 'out', one chunk at a time.
+
+    Returns:
+        int: Rows written.
+    """
+    out.write((",".join(ALL_COLUMNS) + "\n").encode('utf-8'))
+    rows = 0
+    for chunk in iter_sensor_data(data_dir, bins, start, end, chunk_rows=chunk_rows):
+        out.write(_csv_bytes(chunk))
+        rows += len(chunk)
+    return rows
+
+# ==========================================
+# MAIN PROGRAM
+# ==========================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact monthly sensor CSV files into partitioned Parquet")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Folder with sensor_data_*.csv")
+    parser.add_argument('--include-current', action='store_true', help="Also compact the current (open) month")
+    parser.add_argument('--delete-csv', action='store_true', help="Delete CSVs instead of renaming to *.csv.compacted")
+    args = parser.parse_args()
+
+    if not HAS_PYARROW:
+        raise SystemExit("[ERROR] pyarrow is not installed (pip install pyarrow)")
+    rows = compact_closed_months(args.data_dir, include_current=args.include_current, delete_csv=args.delete_csv)
+    print(f"[SUCCESS] Compacted {rows} rows in total.")
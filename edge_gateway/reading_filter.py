@@ -0,0 +1,415 @@
+"""
+Gateway Reading Filter
+
+Cleans and thins the readings in the gateway, before they are stored in
+the CSV data lake and published over MQTT. The firmware sends a reading
+every SAMPLE_INTERVAL_S whether or not anything changed; for a fleet most
+of those readings repeat the previous one within the sensor noise.
+
+    1. Validation  The distance must be a number between MIN_DISTANCE_CM
+                   and MAX_DISTANCE_CM (exclusive): 0 means no echo came
+                   back (firmware) and 400 a lost echo, so such readings
+                   are dropped. Missing or out-of-range temperature/
+                   humidity, and the firmware's 0.0/0.0 "DHT failed" pair,
+                   are stored as empty; the distance is kept.
+    2. Duplicates  A reading identical to the bin's previous one (same
+                   timestamp and values, e.g. a line sent twice) is dropped.
+    3. Deadband    A valid reading is kept only if a value moved more than
+                   its DEADBAND from the bin's last kept reading, the
+                   temperature/humidity appeared or disappeared, or
+                   HEARTBEAT_S has passed since the last kept reading.
+
+Reconstruction: holding each kept reading until the next one gives every
+suppressed reading within the deadband of its true value. Because of the
+heartbeat, a silence longer than HEARTBEAT_S plus HOLD_SLACK intervals
+means the readings were lost, not suppressed. On every start the gateway
+records its settings in SETTINGS_FILE in the data folder: a period per
+gateway (its bins, from its start time until a gateway of the same host
+starts without the deadband). The shared read path (lake_query.query,
+parquet_store.iter_sensor_data, IncrementalLoader) refills the suppressed
+readings with HoldReconstructor, only for rows inside such a period, so
+data stored unfiltered (older data, --no-filter, --no-deadband) keeps its
+gaps.
+
+check() costs about a microsecond per reading; see
+benchmarks/bench_reading_filter.py for the reduction on generated data.
+"""
+
+import json
+import math
+import os
+import socket
+import time
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+
+MIN_DISTANCE_CM = 0.0          # Exclusive: the firmware sends 0 when no echo came back
+MAX_DISTANCE_CM = 400.0        # Lost echo / beyond the sensor's range
+TEMP_RANGE_C = (-40.0, 80.0)   # DHT22
+HUMIDITY_RANGE_PCT = (0.0, 100.0)
+
+# About the sensors' accuracy (HC-SR04, DHT22); tighter bands mostly keep noise
+DEADBAND = {"distance_cm": 2.0, "temperature_c": 1.5, "humidity_pct": 8.0}
+HEARTBEAT_S = 6 * 3600         # Keep at least one reading per bin this often
+SAMPLE_INTERVAL_S = 3600       # Firmware: one reading per hour
+HOLD_SLACK = 0.5               # A reading is held for at most heartbeat + this many intervals
+
+SETTINGS_FILE = "reading_filter.json"
+
+# check() results
+DROP, HOLD, KEEP = "drop", "hold", "keep"
+
+# ==========================================
+# VALIDATION
+# ==========================================
+
+def _number(value):
+    # float, or None for missing/non-numeric/NaN/inf values
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+def validate(data):
+    """
+    Cleans one reading in place (see module docstring).
+
+    Returns:
+        (valid, env_cleared): valid is False if the reading must be dropped;
+        env_cleared if temperature/humidity were set to None.
+    """
+    distance = _number(data.get('distance_cm'))
+    if distance is None or not MIN_DISTANCE_CM < distance < MAX_DISTANCE_CM:
+        return False, False
+    data['distance_cm'] = distance
+
+    temperature = _number(data.get('temperature_c'))
+    humidity = _number(data.get('humidity_pct'))
+    sent = temperature is not None or humidity is not None
+    env_ok = (temperature is not None and humidity is not None
+              and TEMP_RANGE_C[0] <= temperature <= TEMP_RANGE_C[1]
+              and HUMIDITY_RANGE_PCT[0] <= humidity <= HUMIDITY_RANGE_PCT[1]
+              and not (temperature == 0 and humidity == 0))       # firmware.ino: DHT read failed
+    if not env_ok:
+        temperature = humidity = None
+    data['temperature_c'] = temperature
+    data['humidity_pct'] = humidity
+    return True, sent and not env_ok
+
+# ==========================================
+# FILTER (gateway side)
+# ==========================================
+
+class ReadingFilter:
+    """
+    Validation, duplicate removal and deadband compression of the readings
+    of any number of bins. Not thread-safe: call it from the gateway's
+    read loop (one thread or event loop).
+
+    Args:
+        deadband (dict): Column -> allowed change; None keeps every valid,
+            non-duplicate reading (no compression).
+        heartbeat_s (float): Longest time between kept readings of a bin.
+
+    Counters: received, invalid, env_cleared, duplicates, suppressed,
+    heartbeats (kept only because of the heartbeat), kept.
+    """
+
+    def __init__(self, deadband=DEADBAND, heartbeat_s=HEARTBEAT_S):
+        self.deadband = dict(deadband) if deadband is not None else None
+        self.heartbeat_s = heartbeat_s
+        self.received = 0
+        self.invalid = 0
+        self.env_cleared = 0
+        self.duplicates = 0
+        self.suppressed = 0
+        self.heartbeats = 0
+        self.kept = 0
+        self._bins = {}          # bin_id -> [last received key, kept values, kept at]
+
+    def check(self, bin_id, data, now=None):
+        """
+        Validates 'data' in place and decides what to do with it:
+        DROP (invalid or duplicate), HOLD (valid, within the deadband: do
+        not store or publish) or KEEP.
+        'now' is the reception time in seconds (default: time.time()).
+        """
+        self.received += 1
+        valid, cleared = validate(data)
+        if not valid:
+            self.invalid += 1
+            return DROP
+        if cleared:
+            self.env_cleared += 1
+
+        values = (data['distance_cm'], data['temperature_c'], data['humidity_pct'])
+        key = (data.get('timestamp'), values)
+        state = self._bins.get(bin_id)
+        if state is not None and state[0] == key:
+            self.duplicates += 1
+            return DROP
+        now = time.time() if now is None else now
+        if state is None:
+            self._bins[bin_id] = [key, values, now]
+            self.kept += 1
+            return KEEP
+        state[0] = key
+
+        if self.deadband is not None and not self._changed(values, state[1]):
+            if now - state[2] < self.heartbeat_s:
+                self.suppressed += 1
+                return HOLD
+            self.heartbeats += 1
+        state[1], state[2] = values, now
+        self.kept += 1
+        return KEEP
+
+    def _changed(self, values, kept):
+        deadband = self.deadband
+        if abs(values[0] - kept[0]) > deadband['distance_cm']:
+            return True
+        if (values[1] is None) != (kept[1] is None):
+            return True
+        return values[1] is not None and (abs(values[1] - kept[1]) > deadband['temperature_c']
+                                          or abs(values[2] - kept[2]) > deadband['humidity_pct'])
+
+    def settings(self, bins, sample_interval_s=SAMPLE_INTERVAL_S, source=None, start=None):
+        return gateway_settings(bins, self.deadband, self.heartbeat_s, sample_interval_s, source, start)
+
+    def save_settings(self, data_dir, bins, sample_interval_s=SAMPLE_INTERVAL_S):
+        """
+        Records the settings next to the data, for HoldReconstructor.from_data_dir().
+        """
+        return record_settings(data_dir, self.settings(bins, sample_interval_s))
+
+# ==========================================
+# SETTINGS
+# ==========================================
+
+def gateway_settings(bins, deadband=DEADBAND, heartbeat_s=HEARTBEAT_S, sample_interval_s=SAMPLE_INTERVAL_S,
+                     source=None, start=None):
+    """
+    What a gateway records when it starts: its host ('source'), the bins
+    it serves, its start time (same clock and format as the readings'
+    timestamps) and its filter settings. deadband=None: the gateway stores
+    every reading (--no-deadband, --no-filter).
+    """
+    return {"source": source or socket.gethostname(), "bins": sorted(str(b) for b in bins),
+            "start": start or time.strftime('%Y-%m-%d %H:%M:%S'), "sample_interval_s": sample_interval_s,
+            "heartbeat_s": heartbeat_s, "deadband": dict(deadband) if deadband is not None else None}
+
+def load_settings(data_dir):
+    """
+    The filter periods recorded in a data folder ([] if none).
+    """
+    try:
+        with open(os.path.join(data_dir, SETTINGS_FILE)) as f:
+            periods = json.load(f)["periods"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return []
+    return periods if isinstance(periods, list) else []
+
+def record_settings(data_dir, settings):
+    """
+    Adds a gateway start (gateway_settings()) to SETTINGS_FILE: the open
+    period of the same source ends at settings['start'], and a new one
+    starts there if the deadband is on. A restart with unchanged settings
+    continues the open period.
+
+    Returns:
+        bool: True if the file changed.
+
+    Raises:
+        KeyError, ValueError: 'settings' are incomplete (e.g. received
+        over MQTT from another version).
+    """
+    _ns(settings["start"])
+    periods = load_settings(data_dir)
+    changed = False
+    for period in periods:
+        if period.get("source") != settings["source"] or period.get("end") is not None:
+            continue
+        if settings["start"] < period["start"]:
+            return False     # Older than the open period: re-delivered
+        if settings["deadband"] is not None and all(period.get(k) == settings[k] for k in _PERIOD_KEYS):
+            return False
+        period["end"] = settings["start"]
+        changed = True
+    if settings["deadband"] is not None:
+        periods.append(dict(settings, end=None))
+        changed = True
+    if not changed:
+        return False
+    os.makedirs(data_dir, exist_ok=True)
+    tmp_path = os.path.join(data_dir, SETTINGS_FILE + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump({"periods": periods}, f, indent=1)
+    os.replace(tmp_path, os.path.join(data_dir, SETTINGS_FILE))
+    return True
+
+_PERIOD_KEYS = ("bins", "sample_interval_s", "heartbeat_s", "deadband")
+
+# ==========================================
+# RECONSTRUCTION (reader side)
+# ==========================================
+
+class HoldReconstructor:
+    """
+    Refills the readings a deadband filter suppressed, in time order: after
+    each stored reading of a bin, a copy of it every sample_interval_s until
+    half an interval before the bin's next stored reading, for at most
+    heartbeat + HOLD_SLACK intervals (longer silences are outages and stay
+    gaps), and only before the 'frontier' (the latest time the lake covers;
+    a bin's reading of that time may not be written yet).
+
+    'periods' (record_settings() entries) limits this to the rows a
+    filtering gateway stored: a row gets copies only if its bin and
+    timestamp fall in a period, with that period's interval and heartbeat,
+    and none at or after the period's end. None treats every row as
+    filtered with the given interval and heartbeat.
+
+    expand() takes batches in time order (e.g. the IncrementalLoader's new
+    rows) and remembers the last row of every bin and how many copies of it
+    were emitted, so a copy is emitted exactly once, in the batch whose
+    frontier passes it: no copy is older than the previous frontier. (A
+    copy emitted live stays if the bin's next reading then arrives less
+    than half an interval after it, where a one-shot expand() would not
+    have emitted it; with regular readings this does not happen.)
+    reset=True starts over (full reload). For batches of a bin that are
+    not in time order across bins (iter_sensor_data), pass frontier=None
+    and get the copies after each bin's last row from finish().
+    """
+
+    def __init__(self, sample_interval_s=SAMPLE_INTERVAL_S, heartbeat_s=HEARTBEAT_S, periods=None):
+        self.interval_ns = int(sample_interval_s * 1e9)
+        self.max_hold_ns = int((heartbeat_s + HOLD_SLACK * sample_interval_s) * 1e9)
+        self.periods = None
+        if periods is not None:
+            self.periods = []
+            for p in periods:
+                interval_ns = int(p["sample_interval_s"] * 1e9)
+                max_hold_ns = int((p["heartbeat_s"] + HOLD_SLACK * p["sample_interval_s"]) * 1e9)
+                end = _NEVER if p.get("end") is None else _ns(p["end"])
+                self.periods.append((p.get("bins"), _ns(p["start"]), end, interval_ns, max_hold_ns))
+            # How far back a reader must look for a row still held at its start
+            self.max_hold_ns = max((p[4] for p in self.periods), default=0)
+        self.rows_added = 0
+        self._last = None        # Last row of each bin seen so far
+        self._emitted = None     # ...and the copies of it emitted so far
+        self._frontier = None
+
+    @classmethod
+    def from_data_dir(cls, data_dir):
+        """
+        Reconstructor for the filter periods recorded in a data folder, or
+        None if no filtering gateway ever wrote there (nothing to refill).
+        """
+        try:
+            periods = load_settings(data_dir)
+            return cls(periods=periods) if periods else None
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def expand(self, df, frontier='auto', reset=False):
+        """
+        Returns 'df' plus the held readings, sorted by timestamp.
+
+        frontier: copies before this time (Timestamp or ns); 'auto' = the
+            latest timestamp seen so far, None = none after a bin's last row.
+        """
+        if reset:
+            self._last = self._emitted = self._frontier = None
+        if df is None or not len(df):
+            return df
+        if frontier is not None:
+            frontier = _ns(df['timestamp'].max()) if isinstance(frontier, str) else _ns(frontier)
+            if self._frontier is not None:
+                frontier = max(frontier, self._frontier)
+            self._frontier = frontier
+
+        rows = df if self._last is None else pd.concat([self._last, df], ignore_index=True)
+        done = np.zeros(len(rows), dtype=np.int64)
+        if self._last is not None:
+            done[:len(self._last)] = self._emitted
+        ts = rows['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        codes, uniques = pd.factorize(rows['bin_id'])
+        order = np.lexsort((ts, codes))
+        ts, codes, done = ts[order], codes[order], done[order]
+        interval, limit = self._hold(ts, codes, uniques)
+
+        last = np.r_[codes[1:] != codes[:-1], True]
+        upto = np.empty_like(ts)
+        upto[:-1] = ts[1:] - interval[:-1] // 2
+        upto[last] = ts[last] if frontier is None else frontier - 1
+        count = self._count(ts, upto, interval, limit)
+        self._last = rows.iloc[order[last]].reset_index(drop=True)
+        self._emitted = np.maximum(count, done)[last]
+        held = self._held(rows, order, ts, done, count, interval)
+        if held is None:
+            return df
+        out = pd.concat([df, held], ignore_index=True)
+        return out.sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+    def finish(self, frontier):
+        """
+        The copies still due after each bin's last row up to 'frontier'
+        (after expand(..., frontier=None)); None if there are none.
+        """
+        if self._last is None:
+            return None
+        ts = self._last['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        codes, uniques = pd.factorize(self._last['bin_id'])
+        interval, limit = self._hold(ts, codes, uniques)
+        count = self._count(ts, np.full_like(ts, _ns(frontier) - 1), interval, limit)
+        held = self._held(self._last, np.arange(len(ts)), ts, self._emitted, count, interval)
+        self._emitted = np.maximum(count, self._emitted)
+        return held
+
+    def _hold(self, ts, codes, uniques):
+        # Per row: copy interval and the latest time a copy may have (ts: no copies)
+        if self.periods is None:
+            return np.full_like(ts, self.interval_ns), ts + self.max_hold_ns
+        interval = np.full_like(ts, self.interval_ns)
+        limit = ts.copy()
+        names = np.asarray(uniques).astype(str)
+        for bins, start, end, interval_ns, max_hold_ns in self.periods:
+            inside = (ts >= start) & (ts < end)
+            if bins is not None:
+                inside &= np.isin(names, [str(b) for b in bins])[codes]
+            interval[inside] = interval_ns
+            limit[inside] = np.minimum(ts[inside] + max_hold_ns, end - 1)
+        return interval, limit
+
+    @staticmethod
+    def _count(ts, upto, interval, limit):
+        # Copies after each row: every interval up to 'upto', within the hold limit
+        upto = np.minimum(upto, limit)
+        return np.maximum((upto - ts) // interval, 0)
+
+    def _held(self, rows, order, ts, done, count, interval):
+        fill = np.maximum(count - done, 0)
+        if not fill.any():
+            return None
+        step = np.arange(fill.sum()) - np.repeat(np.cumsum(fill) - fill, fill) + 1 + np.repeat(done, fill)
+        held = rows.iloc[np.repeat(order, fill)].reset_index(drop=True)
+        held['timestamp'] = (ts.repeat(fill) + step * interval.repeat(fill)).view('datetime64[ns]')
+        self.rows_added += len(held)
+        return held
+
+_NEVER = np.iinfo(np.int64).max
+
+def _ns(value):
+    return int(value) if isinstance(value, (int, np.integer)) else pd.Timestamp(value).value
+
+def reconstruct(df, sample_interval_s=SAMPLE_INTERVAL_S, heartbeat_s=HEARTBEAT_S, frontier='auto', periods=None):
+    """
+    One-shot HoldReconstructor.expand() of a whole history.
+    """
+    return HoldReconstructor(sample_interval_s, heartbeat_s, periods).expand(df, frontier)
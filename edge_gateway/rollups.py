@@ -0,0 +1,195 @@
+"""
+Rollups and Downsampling for Dashboard Charts
+
+Keeps hourly and daily min/mean/max of the measurements per bin, updated
+incrementally from the new rows of the IncrementalLoader (register
+RollupStore.on_rows as a listener). Charts ask for the resolution that fits
+their time window (choose_resolution) and get at most a few thousand points,
+so render time does not grow with the history.
+
+Per resolution the rollups are one table sorted by key = (bin code, bucket)
+holding count/sum/min/max per measurement. A refresh aggregates the new rows
+with one sort + reduceat and merges them by binary search (no loop over bins);
+a query is a binary search plus a slice.
+
+lttb_indices() does visual downsampling of raw series (Largest-Triangle-
+Three-Buckets) where the individual readings are plotted.
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+
+RESOLUTIONS = {"hour": "h", "day": "D"}   # Name -> pandas frequency, finest first
+ROLLUP_COLUMNS = ["fill_level_pct", "temperature_c", "humidity_pct"]
+MAX_CHART_POINTS = 2500
+BUCKET_BITS = 32                          # key = bin_code << BUCKET_BITS | bucket number
+
+# ==========================================
+# ROLLUP STORE
+# ==========================================
+
+def _aggregate(keys, values):
+    """
+    Groups rows by key (rows must be sorted by key): returns
+    (unique keys, {column_stat: array}). NaN values are left out of
+    count/sum/min/max.
+    """
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    stats = {}
+    for c, v in values.items():
+        valid = ~np.isnan(v)
+        stats[f"{c}_count"] = np.add.reduceat(valid.astype(np.int64), starts)
+        stats[f"{c}_sum"] = np.add.reduceat(np.where(valid, v, 0.0), starts)
+        stats[f"{c}_min"] = np.fmin.reduceat(v, starts)
+        stats[f"{c}_max"] = np.fmax.reduceat(v, starts)
+    return keys[starts], stats
+
+class RollupStore:
+    """
+    Incrementally maintained hourly/daily rollups of every bin.
+    Thread-safe: shared by all dashboard sessions.
+    """
+
+    def __init__(self, columns=ROLLUP_COLUMNS):
+        self.columns = list(columns)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._bin_codes = {}
+        self._keys = {res: np.empty(0, dtype=np.int64) for res in RESOLUTIONS}
+        self._stats = {res: {} for res in RESOLUTIONS}
+
+    def on_rows(self, new_rows, reloaded):
+        """IncrementalLoader listener."""
+        with self._lock:
+            if reloaded:
+                self.reset()
+            if new_rows is not None and len(new_rows):
+                self._update(new_rows)
+
+    def _update(self, df):
+        codes, bin_ids = pd.factorize(df['bin_id'])
+        mapping = np.array([self._bin_codes.setdefault(b, len(self._bin_codes)) for b in bin_ids], dtype=np.int64)
+        bin_part = mapping[codes] << BUCKET_BITS
+        ts = df['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+        # One sort by (bin, time) serves every resolution: coarser buckets nest finer ones
+        order = np.lexsort((ts, bin_part))
+        bin_part, ts = bin_part[order], ts[order]
+        values = {c: df[c].to_numpy(dtype=np.float64)[order] for c in self.columns if c in df}
+
+        for res, freq in RESOLUTIONS.items():
+            unit = pd.Timedelta(1, unit=freq).value
+            new_keys, new_stats = _aggregate(bin_part | (ts // unit), values)
+            self._merge(res, new_keys, new_stats)
+
+    def _merge(self, res, new_keys, new_stats):
+        keys, stats = self._keys[res], self._stats[res]
+        pos = np.searchsorted(keys, new_keys)
+        exists = np.zeros(len(new_keys), dtype=bool)
+        if len(keys):
+            exists = (pos < len(keys)) & (keys[np.minimum(pos, len(keys) - 1)] == new_keys)
+
+        # Buckets already present (the open hour/day, late rows): combine in place
+        if exists.any():
+            idx = pos[exists]
+            for name, arr in stats.items():
+                values = new_stats[name][exists]
+                if name.endswith('_min'):
+                    arr[idx] = np.fmin(arr[idx], values)
+                elif name.endswith('_max'):
+                    arr[idx] = np.fmax(arr[idx], values)
+                else:
+                    arr[idx] += values
+
+        # New buckets: inserted at their sorted position
+        fresh = ~exists
+        if fresh.any():
+            at = pos[fresh]
+            self._keys[res] = np.insert(keys, at, new_keys[fresh])
+            for name, values in new_stats.items():
+                old = stats.get(name, np.zeros(len(keys), dtype=values.dtype))
+                stats[name] = np.insert(old, at, values[fresh])
+
+    def query(self, bin_id, resolution, start=None, end=None):
+        """
+        Rollups of one bin in [start, end) at 'resolution' ("hour"/"day").
+
+        Returns:
+            pd.DataFrame with timestamp (bucket start) and <column>_mean/_min/
+            _max/_count per measurement, or None if the bin has no data.
+        """
+        unit = pd.Timedelta(1, unit=RESOLUTIONS[resolution]).value
+        with self._lock:
+            code = self._bin_codes.get(bin_id)
+            if code is None:
+                return None
+            keys, stats = self._keys[resolution], self._stats[resolution]
+            first = code << BUCKET_BITS
+            lo = first + (pd.Timestamp(start).value // unit if start is not None else 0)
+            hi = first + (-(-pd.Timestamp(end).value // unit) if end is not None else 1 << BUCKET_BITS)
+            lo, hi = np.searchsorted(keys, [lo, hi])
+            if lo == hi:
+                return None
+
+            buckets = (keys[lo:hi] & ((1 << BUCKET_BITS) - 1)) * unit
+            out = {'timestamp': buckets.astype('datetime64[ns]')}
+            for c in self.columns:
+                if f"{c}_count" not in stats:
+                    continue
+                count = stats[f"{c}_count"][lo:hi].copy()
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    out[f"{c}_mean"] = stats[f"{c}_sum"][lo:hi] / count
+                out[f"{c}_min"] = stats[f"{c}_min"][lo:hi].copy()
+                out[f"{c}_max"] = stats[f"{c}_max"][lo:hi].copy()
+                out[f"{c}_count"] = count
+        return pd.DataFrame(out)
+
+# ==========================================
+# RESOLUTION / DOWNSAMPLING
+# ==========================================
+
+def choose_resolution(window, raw_points, max_points=MAX_CHART_POINTS):
+    """
+    Finest resolution that shows 'window' (timedelta) in at most 'max_points'
+    points: "raw" if the raw rows fit, else "hour" or "day".
+    """
+    if raw_points <= max_points:
+        return "raw"
+    for res, freq in RESOLUTIONS.items():
+        if window / pd.Timedelta(1, unit=freq) <= max_points:
+            return res
+    return list(RESOLUTIONS)[-1]
+
+def lttb_indices(x, y, n_out=MAX_CHART_POINTS):
+    """
+    Largest-Triangle-Three-Buckets: indices of 'n_out' points that keep the
+    visual shape of the series (peaks and dips survive, unlike plain decimation).
+    'x' may be datetime64. Returns all indices if the series is short enough.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.view(np.int64)
+    x = x.astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # First and last point are kept; the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        # Point of this bucket forming the largest triangle with the previous
+        # pick and the average of the next bucket
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
@@ -0,0 +1,213 @@
+"""
+Binary Telemetry Frames
+
+Optional compact alternative to the firmware's JSON lines (TELEMETRY_BINARY
+in firmware.ino). One reading = one fixed 16-byte frame, little-endian:
+
+    offset  size  field
+    0       2     sync bytes 0xB1 0x7E (never valid in ASCII JSON)
+    2       1     version (1)
+    3       1     flags (bit 0: DHT read failed -> no temperature/humidity)
+    4       2     device (bin) number
+    6       2     sequence number (+1 per reading, wraps at 65536, 0 after boot)
+    8       2     distance, 0.01 cm
+    10      2     temperature, 0.01 C (signed)
+    12      2     humidity, 0.01 %
+    14      2     CRC-16/CCITT-FALSE of bytes 0-13
+
+16 bytes instead of ~72 for the JSON line: ~17 ms instead of ~75 ms on the
+wire at 9600 baud.
+
+TelemetryDecoder splits a serial byte stream into JSON lines and binary
+frames (auto-detected, so JSON devices keep working), decodes runs of
+frames in bulk with NumPy (including the CRC check) and counts frames lost
+in transit from gaps in the sequence numbers.
+"""
+
+import struct
+import numpy as np
+
+# ==========================================
+# FRAME FORMAT
+# ==========================================
+
+SYNC = b'\xb1\x7e'
+VERSION = 1
+FRAME_SIZE = 16
+FLAG_NO_ENV = 0x01
+MAX_LINE_BYTES = 1024          # Drop garbage that never ends with a newline
+
+FRAME_STRUCT = struct.Struct('<2sBBHHHhHH')
+FRAME_DTYPE = np.dtype([
+    ('sync', 'S2'), ('version', 'u1'), ('flags', 'u1'), ('device', '<u2'), ('seq', '<u2'),
+    ('distance', '<u2'), ('temperature', '<i2'), ('humidity', '<u2'), ('crc', '<u2'),
+])
+
+def _crc_table():
+    table = np.zeros(256, dtype=np.uint16)
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[i] = crc & 0xFFFF
+    return table
+
+CRC_TABLE = _crc_table()
+_CRC_LIST = CRC_TABLE.tolist()
+
+def crc16(data):
+    """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF), as in the firmware."""
+    crc = 0xFFFF
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC_LIST[((crc >> 8) ^ byte) & 0xFF]
+    return crc
+
+def crc16_rows(rows):
+    """
+    CRC of every row of a (n, k) uint8 array at once (one table lookup per
+    byte column instead of per byte).
+    """
+    crc = np.full(len(rows), 0xFFFF, dtype=np.uint16)
+    for column in rows.T:
+        crc = (crc << 8) ^ CRC_TABLE[(crc >> 8) ^ column]
+    return crc
+
+def encode_frame(device, seq, distance_cm, temperature_c=None, humidity_pct=None):
+    """
+    Builds one frame (what the firmware sends); used by tests and the load
+    generator. Missing temperature/humidity set FLAG_NO_ENV.
+    """
+    no_env = temperature_c is None or humidity_pct is None
+    body = FRAME_STRUCT.pack(
+        SYNC, VERSION, FLAG_NO_ENV if no_env else 0, device, seq & 0xFFFF,
+        int(round(distance_cm * 100)), 0 if no_env else int(round(temperature_c * 100)),
+        0 if no_env else int(round(humidity_pct * 100)), 0)
+    return body[:-2] + struct.pack('<H', crc16(body[:-2]))
+
+def decode_frames(data):
+    """
+    Decodes consecutive frames (len(data) must be a multiple of FRAME_SIZE).
+
+    Returns:
+        (valid, frames): boolean mask of frames with correct sync, version
+        and CRC, and the structured array of all frames.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, FRAME_SIZE)
+    frames = raw.view(FRAME_DTYPE).ravel()
+    valid = ((frames['sync'] == SYNC) & (frames['version'] == VERSION)
+             & (crc16_rows(raw[:, :FRAME_SIZE - 2]) == frames['crc']))
+    return valid, frames
+
+def frames_to_readings(frames):
+    """
+    Structured frames -> list of reading dicts (same keys as the JSON lines,
+    plus 'seq').
+    """
+    no_env = (frames['flags'] & FLAG_NO_ENV).astype(bool)
+    distance = (frames['distance'] / 100).tolist()
+    temperature = np.where(no_env, np.nan, frames['temperature'] / 100).tolist()
+    humidity = np.where(no_env, np.nan, frames['humidity'] / 100).tolist()
+    seq = frames['seq'].tolist()
+    return [{"distance_cm": d, "temperature_c": None if t != t else t,
+             "humidity_pct": None if h != h else h, "seq": s}
+            for d, t, h, s in zip(distance, temperature, humidity, seq)]
+
+# ==========================================
+# STREAM DECODER
+# ==========================================
+
+class TelemetryDecoder:
+    """
+    Splits the byte stream of one serial port into JSON lines and binary
+    frames. Keep one instance per port (it holds the partial data and the
+    sequence state).
+
+    feed() returns a list of items, each either ('json', line_bytes) or
+    ('frame', reading_dict). Counters: frames, crc_errors, lost_frames,
+    duplicate_frames, resets, discarded_bytes.
+    """
+
+    def __init__(self):
+        self._buffer = b''
+        self._binary = False        # Last good item was a frame (resync by sync bytes)
+        self._last_seq = None
+        self.frames = 0
+        self.crc_errors = 0
+        self.lost_frames = 0
+        self.duplicate_frames = 0
+        self.resets = 0
+        self.discarded_bytes = 0
+
+    def feed(self, chunk):
+        buf = self._buffer + chunk
+        items = []
+        pos, size = 0, len(buf)
+        while pos < size:
+            if buf.startswith(SYNC, pos):
+                if size - pos < FRAME_SIZE:
+                    break                                   # wait for the rest of the frame
+                pos = self._take_frames(buf, pos, items)
+                continue
+
+            if self._binary:
+                # Between frames: skip noise up to the next sync bytes. Frame
+                # payloads may contain '{' and '\n', so only a whole JSON line
+                # with no sync bytes in sight means the device went back to JSON.
+                nxt = buf.find(SYNC, pos + 1)
+                if nxt != -1:
+                    self.discarded_bytes += nxt - pos
+                    pos = nxt
+                    continue
+                text = buf.find(b'{', pos)
+                if text != -1 and buf.find(b'\n', text) != -1:
+                    self._binary = False
+                    self.discarded_bytes += text - pos
+                    pos = text
+                    continue
+                break                                       # wait for more data
+
+
+            end = buf.find(b'\n', pos)
+            if end == -1:
+                break
+            line = buf[pos:end]
+            if line.strip():
+                items.append(('json', line))
+            pos = end + 1
+
+        self._buffer = buf[pos:]
+        if len(self._buffer) > MAX_LINE_BYTES:
+            self.discarded_bytes += len(self._buffer)
+            self._buffer = b''
+        return items
+
+    def _take_frames(self, buf, pos, items):
+        """
+        Decodes the run of whole frames starting at 'pos' in one NumPy pass;
+        stops at the first invalid frame. Returns the new position.
+        """
+        count = (len(buf) - pos) // FRAME_SIZE
+        valid, frames = decode_frames(buf[pos:pos + count * FRAME_SIZE])
+        good = count if valid.all() else int(np.argmin(valid))
+        if good:
+            frames = frames[:good]
+            self._track_sequence(frames['seq'])
+            items.extend(('frame', r) for r in frames_to_readings(frames))
+            self.frames += good
+            self._binary = True
+        if good < count:
+            # Corrupted frame: skip its sync bytes and resynchronize
+            self.crc_errors += 1
+            self.discarded_bytes += 2
+            return pos + good * FRAME_SIZE + 2
+        return pos + good * FRAME_SIZE
+
+    def _track_sequence(self, seq):
+        seq = seq.astype(np.int64)
+        prev = np.r_[self._last_seq if self._last_seq is not None else seq[0] - 1, seq[:-1]]
+        step = (seq - prev) % 65536
+        reset = (seq == 0) & (step != 1)            # device rebooted: not a loss
+        self.resets += int(reset.sum())
+        self.duplicate_frames += int((step == 0).sum())
+        self.lost_frames += int(np.where(reset | (step == 0), 0, step - 1).sum())
+        self._last_seq = int(seq[-1])
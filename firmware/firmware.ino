@@ -9,7 +9,7 @@
  * 1. Wake up from deep sleep.
  * 2. Measure fill level and environment data.
  * 3. Show status via LEDs briefly (Visual feedback).
- * 4. Send data via Serial (JSON) to Edge Gateway.
+ * 4. Send data via Serial (JSON, or a 16-byte binary frame) to Edge Gateway.
  * 5. Turn off peripherals to save power.
  * 6. Sleep for 1 hour.
  * * Libraries required: 
@@ -29,8 +29,20 @@
 #define LED_YELLOW 9
 #define LED_RED 8
 
+// Telemetry format: 0 = JSON line (default), 1 = compact binary frame.
+// The gateway detects the format automatically (edge_gateway/telemetry_frame.py).
+#define TELEMETRY_BINARY 0
+#define DEVICE_ID 105          // Bin number carried in binary frames
+
 // Constants
 const int SLEEP_CYCLES_PER_HOUR = 450; // 8s * 450 = 3600s = 1 hour
+const int LED_FEEDBACK_MS = 200;       // How long the status LED stays on after sending
+
+// Binary frame layout (little-endian, 16 bytes):
+// sync B1 7E | version | flags | device | sequence | distance 0.01cm | temp 0.01C | hum 0.01% | CRC-16
+const byte FRAME_VERSION = 1;
+const byte FLAG_NO_ENV = 0x01;         // DHT read failed
+uint16_t frameSequence = 0;            // RAM survives powerDown; restarts at 0 after a reset
 
 DHT dht(DHTPIN, DHTTYPE);
 
@@ -45,6 +57,38 @@ long readUltrasonicDistance(int triggerPin, int echoPin) {
   return pulseIn(echoPin, HIGH);
 }
 
+uint16_t crc16(const byte *data, byte length) {
+  // CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF)
+  uint16_t crc = 0xFFFF;
+  for (byte i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (byte bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void putUint16(byte *buf, uint16_t value) {
+  buf[0] = value & 0xFF;
+  buf[1] = value >> 8;
+}
+
+void sendBinaryFrame(float distance, float temperature, float humidity, bool envValid) {
+  byte frame[16];
+  frame[0] = 0xB1;
+  frame[1] = 0x7E;
+  frame[2] = FRAME_VERSION;
+  frame[3] = envValid ? 0 : FLAG_NO_ENV;
+  putUint16(frame + 4, DEVICE_ID);
+  putUint16(frame + 6, frameSequence++);
+  putUint16(frame + 8, (uint16_t)(distance * 100 + 0.5));
+  putUint16(frame + 10, (uint16_t)(int16_t)lround(envValid ? temperature * 100 : 0));
+  putUint16(frame + 12, (uint16_t)lround(envValid ? humidity * 100 : 0));
+  putUint16(frame + 14, crc16(frame, 14));
+  Serial.write(frame, sizeof(frame));
+}
+
 void setup() {
   // Initialize Serial for Edge Gateway communication
   Serial.begin(9600);
@@ -89,7 +133,8 @@ void loop() {
   float temperature = dht.readTemperature();
 
   // Check if DHT reading failed
-  if (isnan(humidity) || isnan(temperature)) {
+  bool envValid = !(isnan(humidity) || isnan(temperature));
+  if (!envValid) {
     humidity = 0.0;
     temperature = 0.0;
   }
@@ -113,6 +158,10 @@ void loop() {
 
   // --- PHASE 3: DATA TRANSMISSION ---
   
+#if TELEMETRY_BINARY
+  // 16 bytes instead of ~72: ~17 ms on the wire at 9600 baud instead of ~75 ms
+  sendBinaryFrame(avgDistance, temperature, humidity, envValid);
+#else
   // Send JSON object to Python Gateway
   // Format: {"d": distance, "t": temp, "h": hum}
   Serial.print("{\"distance_cm\": ");
@@ -122,10 +171,12 @@ void loop() {
   Serial.print(", \"humidity_pct\": ");
   Serial.print(humidity);
   Serial.println("}");
+#endif
 
-  // Use a short delay to ensure Serial buffer is flushed (sent out) 
-  // before going to sleep.
-  delay(1000); 
+  // Wait until the Serial buffer has actually been sent out (instead of a
+  // fixed 1 s delay), then keep the LED on just long enough to be seen.
+  Serial.flush();
+  delay(LED_FEEDBACK_MS);
 
   // --- PHASE 4: PREPARE FOR SLEEP ---
   
@@ -0,0 +1,23 @@
+import glob
+import os
+import pandas as pd
+
+from analytics.backtest import load_history, run_backtest, score
+from analytics.generate_mock_data import generate_synthetic_data
+
+def make_lake(path):
+    generate_synthetic_data("csv", num_bins=4, days=90, interval_minutes=60, output_dir=str(path))
+    return sorted(glob.glob(os.path.join(str(path), "sensor_data_*.csv")))
+
+def test_missing_reading_is_ignored(tmp_path):
+    files = make_lake(tmp_path)
+    expected = score(run_backtest(load_history(str(tmp_path)), workers=1))
+    assert (expected['coverage'] > 0.5).all()
+
+    # A reading without a distance for the first bin: must not affect any bin
+    first = pd.read_csv(files[0], nrows=1)
+    with open(files[0], 'a') as f:
+        f.write(f"{first['timestamp'].iloc[0]},,20.0,50.0,{first['bin_id'].iloc[0]}\n")
+    history = load_history(str(tmp_path))
+    assert not pd.isna(history[1]).any()
+    pd.testing.assert_frame_equal(score(run_backtest(history, workers=1)), expected)
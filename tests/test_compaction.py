@@ -0,0 +1,86 @@
+import asyncio
+import os
+import time
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from edge_gateway.csv_writer import BufferedCsvWriter, file_lock, get_month_csv_path
+from edge_gateway.parquet_store import COMPACTED_SUFFIX, compact_month, read_lake, read_sensor_csv, write_partitions
+
+OCTOBER = (pd.Timestamp("2025-10-01"), pd.Timestamp("2025-11-01"))
+
+def row(timestamp):
+    return {'timestamp': timestamp, 'distance_cm': 10.0, 'temperature_c': 20.0,
+            'humidity_pct': 50.0, 'bin_id': 'bin_01'}
+
+def test_late_row_waits_for_compaction(tmp_path):
+    data_dir = str(tmp_path)
+    csv_path = get_month_csv_path(data_dir, '2025-10')
+    with BufferedCsvWriter(data_dir) as writer:
+        writer.write_many([row('2025-10-31 23:59:00'), row('2025-11-01 00:00:00')])
+        writer.flush()
+
+        # Late October row while October is being compacted: stays buffered
+        with file_lock(csv_path):
+            writer.write_many([row('2025-10-31 23:59:30'), row('2025-11-01 00:01:00')])
+            writer.flush()
+            assert writer.pending == 1
+        assert compact_month(data_dir, '2025-10') == 1
+
+        # ... and then starts a new file, merged by the next compaction
+        writer.flush()
+        assert writer.pending == 0
+        assert len(read_sensor_csv(csv_path)) == 1
+    assert compact_month(data_dir, '2025-10') == 2
+    assert os.path.isfile(csv_path + COMPACTED_SUFFIX)
+
+def test_waiting_row_is_retried_after_the_flush_delay(tmp_path):
+    data_dir = str(tmp_path)
+    with BufferedCsvWriter(data_dir, max_delay_s=0.2) as writer:
+        writer.write_many([row('2025-10-31 23:59:00'), row('2025-11-01 00:00:00')])
+        writer.flush()
+        with file_lock(get_month_csv_path(data_dir, '2025-10')):
+            writer.write(row('2025-10-31 23:59:30'))
+            time.sleep(0.3)
+            writer.flush_if_due()
+            assert writer.pending == 1
+
+            tries = []
+            open_month = writer._open_month
+            writer._open_month = lambda *args: tries.append(args) or open_month(*args)
+            writer.flush_if_due()         # Not on every tick
+            assert tries == []
+            time.sleep(0.3)
+            writer.flush_if_due()
+            assert len(tries) == 1 and writer.pending == 1
+    assert len(read_sensor_csv(get_month_csv_path(data_dir, '2025-10'))) == 2
+
+def test_rerun_after_crash_does_not_duplicate(tmp_path):
+    data_dir = str(tmp_path)
+    with BufferedCsvWriter(data_dir) as writer:
+        writer.write_many([row('2025-10-01 00:00:00'), row('2025-10-01 01:00:00')])
+
+    # Crash after writing the partitions, before retiring the CSV
+    csv_path = get_month_csv_path(data_dir, '2025-10')
+    write_partitions(read_sensor_csv(csv_path), data_dir)
+    assert compact_month(data_dir, '2025-10') == 2
+    assert len(read_lake(data_dir, start=OCTOBER[0], end=OCTOBER[1])) == 2
+
+def test_late_rows_do_not_recompact_the_month(tmp_path, monkeypatch):
+    from edge_gateway import async_gateway
+    compacted = []
+    monkeypatch.setattr(async_gateway, "compact_month", lambda data_dir, month: compacted.append(month))
+
+    async def run():
+        with BufferedCsvWriter(str(tmp_path)) as writer:
+            async_gateway.AsyncGateway({}, str(tmp_path), storage=writer, compact=True)
+            # A device with a slow clock keeps sending October rows in November
+            for minute in range(3):
+                writer.write_many([row(f'2025-10-31 23:5{minute}:00'), row(f'2025-11-01 00:0{minute}:00')])
+                writer.flush()
+            await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert compacted == ['2025-10']
@@ -0,0 +1,15 @@
+from analytics.compute_worker import ComputeWorker, ResultCache
+from analytics.generate_mock_data import generate_synthetic_data
+
+def test_version_changes_across_restarts(tmp_path):
+    generate_synthetic_data("csv", num_bins=2, days=7, interval_minutes=60, output_dir=str(tmp_path))
+    worker = ComputeWorker(str(tmp_path))
+    first = worker.run_once()["version"]
+    assert worker.run_once()["version"] == first   # No new rows: same tables
+    cache = ResultCache(worker.cache_dir)
+    assert cache.read()["manifest"]["version"] == first
+
+    # A restarted worker starts over: its tables must not reuse the version
+    restarted = ComputeWorker(str(tmp_path)).run_once()["version"]
+    assert restarted != first
+    assert cache.read()["manifest"]["version"] == restarted
@@ -0,0 +1,49 @@
+import os
+import pytest
+
+from edge_gateway.csv_writer import BufferedCsvWriter
+from edge_gateway.parquet_store import read_sensor_csv
+
+def row(timestamp):
+    return {'timestamp': timestamp, 'distance_cm': 10.0, 'temperature_c': 20.0,
+            'humidity_pct': 50.0, 'bin_id': 'bin_01'}
+
+def test_failed_flush_keeps_rows(tmp_path, monkeypatch):
+    writer = BufferedCsvWriter(str(tmp_path), fsync="always")
+    writer.write_many([row('2025-10-01 00:00:00'), row('2025-10-01 01:00:00')])
+
+    def disk_full(fd):
+        raise OSError(28, "No space left on device")
+    with monkeypatch.context() as patch:
+        patch.setattr(os, "fsync", disk_full)
+        with pytest.raises(OSError):
+            writer.flush()
+    assert writer.pending == 2
+    assert writer.rows_written == 0
+
+    writer.close()
+    assert writer.pending == 0
+    df = read_sensor_csv(os.path.join(str(tmp_path), "sensor_data_2025-10.csv"))
+    assert len(df) == 2   # Retried once, not appended twice
+
+def test_retry_after_partial_write_does_not_duplicate(tmp_path, monkeypatch):
+    writer = BufferedCsvWriter(str(tmp_path), fsync="always")
+    writer.write_many([row('2025-10-01 00:00:00')])
+    writer.flush()
+    # Rows written, then the sync fails: the file is cut back, the rows retried
+    writer.write_many([row('2025-10-01 01:00:00'), row('2025-10-01 02:00:00'), row('2025-11-01 00:00:00')])
+
+    def disk_full(fd):
+        raise OSError(28, "No space left on device")
+    with monkeypatch.context() as patch:
+        patch.setattr(os, "fsync", disk_full)
+        with pytest.raises(OSError):
+            writer.flush()
+    assert writer.pending == 3
+
+    writer.close()
+    october = read_sensor_csv(os.path.join(str(tmp_path), "sensor_data_2025-10.csv"))
+    november = read_sensor_csv(os.path.join(str(tmp_path), "sensor_data_2025-11.csv"))
+    assert october['timestamp'].astype(str).tolist() == [
+        '2025-10-01 00:00:00', '2025-10-01 01:00:00', '2025-10-01 02:00:00']
+    assert len(november) == 1
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from analytics.fleet_prediction import predict_fleet
+
+def make_fleet(hours=48):
+    timestamps = pd.date_range("2025-10-01", periods=hours, freq="h")
+    return pd.concat([pd.DataFrame({'timestamp': timestamps, 'distance_cm': np.linspace(90, 90 - rate * hours, hours),
+                                    'bin_id': bin_id})
+                      for bin_id, rate in (("bin_01", 0.5), ("bin_02", 1.0))], ignore_index=True)
+
+def test_missing_values_are_ignored():
+    df = make_fleet()
+    expected = predict_fleet(df)
+    assert expected['fill_rate'].notna().all()
+
+    broken = df.copy()
+    broken.loc[10, 'distance_cm'] = np.nan
+    broken.loc[60, 'timestamp'] = pd.NaT
+    result = predict_fleet(broken)
+    pd.testing.assert_frame_equal(result, predict_fleet(df.drop([10, 60])))
+    assert result['fill_rate'].notna().all()
+    assert result['predicted_full'].notna().all()
@@ -0,0 +1,48 @@
+import json
+import time
+from types import SimpleNamespace
+
+from analytics.online_estimator import FleetEstimator
+from edge_gateway.mqtt_ingest import MqttIngest
+from edge_gateway.parquet_store import read_sensor_csv
+
+def message(mid, qos=1):
+    payload = json.dumps({"timestamp": f"2025-10-01 00:00:{mid:02d}", "distance_cm": 50.0})
+    return SimpleNamespace(topic="bioeconomy/textile_bin/bin_01", payload=payload.encode(), qos=qos, mid=mid)
+
+def test_full_queue_holds_acknowledgements_instead_of_blocking(tmp_path):
+    ingest = MqttIngest(data_dir=str(tmp_path), queue_max=4)
+    acked = []
+    ingest.client.ack = lambda mid, qos: acked.append(mid)
+
+    # Called on the network thread: must never block
+    for mid in range(1, 7):
+        ingest._on_message(ingest.client, None, message(mid))
+    assert acked == [1, 2, 3]
+    assert ingest.queue.qsize() == 6
+
+    ingest.process(ingest._next_batch())       # Writer catches up: the held ones are acknowledged
+    assert acked == [1, 2, 3, 4, 5, 6]
+    assert ingest.backpressure_s > 0
+    ingest.storage.close()
+    assert len(read_sensor_csv(str(tmp_path / "sensor_data_2025-10.csv"))) == 6
+
+def test_malformed_messages_are_counted_and_not_stored(tmp_path):
+    ingest = MqttIngest(data_dir=str(tmp_path), estimator=FleetEstimator())
+    received = time.monotonic()
+    payloads = [
+        {"timestamp": "2025-10-01T00:00:00", "distance_cm": 50.0},     # ISO timestamp: not the lake's format
+        {"timestamp": "2025-10-01 00:00:01", "distance_cm": "far"},
+        {"timestamp": 1759276800, "distance_cm": 50.0},
+        [50.0],
+        {"timestamp": "2025-10-01 00:00:02", "distance_cm": 50.0},
+    ]
+    batch = [("bioeconomy/textile_bin/bin_01", json.dumps(p).encode(), received) for p in payloads]
+    batch.append(("bioeconomy/textile_bin/bin_01", b"{not json", received))
+    ingest.process(batch)
+    assert (ingest.messages, ingest.decode_errors) == (1, 5)
+    assert ingest.estimator.bins["bin_01"].n == 1
+
+    ingest.storage.close()
+    stored = read_sensor_csv(str(tmp_path / "sensor_data_2025-10.csv"))
+    assert stored['timestamp'].astype(str).tolist() == ["2025-10-01 00:00:02"]
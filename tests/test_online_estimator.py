@@ -0,0 +1,69 @@
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.online_estimator import TIMESTAMP_FORMAT, FleetEstimator
+from analytics.predict_emptying import analyze_data
+
+def make_readings(days=(12, 9), seed=0):
+    """
+    One bin, hourly: a cycle filling up, emptied, then a second cycle.
+    """
+    rng = np.random.default_rng(seed)
+    fills = []
+    for n_days in days:
+        hours = n_days * 24
+        fills.append(np.r_[[1.0, 2.0], np.linspace(10, 90, hours - 2) + rng.normal(0, 1.0, hours - 2)])
+    fill = np.clip(np.concatenate(fills), 0, 100)
+    timestamps = pd.date_range("2025-03-01", periods=len(fill), freq="h")
+    return pd.DataFrame({"timestamp": timestamps, "distance_cm": 100 - fill})
+
+def feed(estimator, df, bin_id="TX-105"):
+    for ts, distance in zip(df['timestamp'].dt.strftime(TIMESTAMP_FORMAT), df['distance_cm']):
+        estimator.update(bin_id, ts, distance)
+
+def reference(df):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return analyze_data(df.copy())
+
+def test_matches_analyze_data():
+    df = make_readings()
+    estimator = FleetEstimator()
+    feed(estimator, df)
+    expected = reference(df)
+    prediction = estimator.prediction("TX-105")
+    assert prediction["cycle_start"] == expected["cycle_start"]
+    assert prediction["current_fill"] == pytest.approx(expected["current_fill"])
+    assert prediction["fill_rate"] == pytest.approx(expected["fill_rate"], rel=1e-9)
+    assert prediction["intercept"] == pytest.approx(expected["intercept"], rel=1e-9)
+    assert prediction["days_left"] == pytest.approx(expected["days_left"], rel=1e-9)
+
+def test_cycle_resets_on_emptying():
+    df = make_readings()
+    first_cycle = df.iloc[:12 * 24]
+    estimator = FleetEstimator()
+    feed(estimator, first_cycle)
+    assert estimator.prediction("TX-105")["cycle_start"] == df['timestamp'].iloc[1]
+
+    feed(estimator, df.iloc[12 * 24:])
+    prediction = estimator.prediction("TX-105")
+    # Second confirmed-low reading of the new cycle (1 %, 2 %) starts it
+    assert prediction["cycle_start"] == df['timestamp'].iloc[12 * 24 + 1]
+    assert prediction["n_points"] == 9 * 24 - 1
+
+def test_state_round_trip(tmp_path):
+    df = make_readings()
+    path = str(tmp_path / "fill_estimators.json")
+    estimator = FleetEstimator(path)
+    feed(estimator, df.iloc[:250])
+    feed(estimator, df.iloc[:100], bin_id="TX-106")
+    estimator.save()
+
+    restored = FleetEstimator(path)
+    pd.testing.assert_frame_equal(restored.predictions(), estimator.predictions())
+    # Both continue identically
+    feed(estimator, df.iloc[250:])
+    feed(restored, df.iloc[250:])
+    pd.testing.assert_frame_equal(restored.predictions(), estimator.predictions())
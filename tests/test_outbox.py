@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+from edge_gateway import outbox as outbox_module
+from edge_gateway.outbox import Outbox, OutboxSender, list_segments, read_cursor
+
+class Delivery:
+    rc = 0
+
+    def is_published(self):
+        return True
+
+    def wait_for_publish(self, timeout=None):
+        pass
+
+class FakeClient:
+    """
+    paho stand-in: every publish is acknowledged at once while connected.
+    """
+
+    def __init__(self, connected=True):
+        self.connected = connected
+        self.received = []
+
+    def is_connected(self):
+        return self.connected
+
+    def publish(self, topic, payload, qos=0):
+        self.received.append(payload.decode('utf-8'))
+        return Delivery()
+
+def write(directory, payloads):
+    outbox = Outbox(directory)
+    for payload in payloads:
+        outbox.append("bioeconomy/textile_bin/bin_01", payload)
+    outbox.close()
+
+def drain(directory, client, until, timeout=10):
+    sender = OutboxSender(directory, client, batch_max=10).start()
+    deadline = time.monotonic() + timeout
+    while not until(sender) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    sender.stop()
+    return sender
+
+def test_restart_resumes_at_least_once_without_loss(tmp_path, monkeypatch):
+    monkeypatch.setattr(outbox_module, "RETRY_BASE_S", 0.01)
+    monkeypatch.setattr(outbox_module, "IDLE_POLL_S", 0.01)
+    directory = str(tmp_path)
+    write(directory, [f'{{"n": {n}}}' for n in range(25)])
+
+    # Broker down: nothing is sent, nothing is lost
+    sender = drain(directory, FakeClient(connected=False), until=lambda s: s.retries >= 3)
+    assert sender.published == 0
+    assert read_cursor(directory) == (0, 0)
+
+    # Crash after publishing a batch, before saving the cursor
+    client = FakeClient()
+    crashed = OutboxSender(directory, client, batch_max=10)
+    batch, _ = crashed._read_batch()
+    assert crashed._publish(batch)
+
+    # Restarted gateway appends more; the new sender resends the unacknowledged batch
+    write(directory, [f'{{"n": {n}}}' for n in range(25, 30)])
+    drain(directory, client, until=lambda s: s.published >= 30)
+    assert client.received[:10] == client.received[10:20]
+    assert client.received[10:] == [f'{{"n": {n}}}' for n in range(30)]
+    assert list_segments(directory)[0] == read_cursor(directory)[0]
+
+def test_message_longer_than_a_read_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(outbox_module, "READ_CHUNK_BYTES", 64)
+    directory = str(tmp_path)
+    payloads = ['{"n": 0}', '{"note": "' + "x" * 500 + '"}', '{"n": 2}']
+    write(directory, payloads)
+    write(directory, ['{"n": 3}'])         # The first segment is finished
+
+    client = FakeClient()
+    drain(directory, client, until=lambda s: s.published >= 4)
+    assert client.received == payloads + ['{"n": 3}']
+
+class FullDisk:
+    """
+    Segment file stand-in: writes part of the data, then fails.
+    """
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, data):
+        self.file.write(data[:len(data) // 2 + 3])
+        raise OSError(28, "No space left on device")
+
+    def close(self):
+        self.file.close()
+
+def test_failed_write_keeps_the_messages_for_the_next_flush(tmp_path, monkeypatch):
+    monkeypatch.setattr(outbox_module, "IDLE_POLL_S", 0.01)
+    directory = str(tmp_path)
+    payloads = [f'{{"n": {n}}}' for n in range(4)]
+    outbox = Outbox(directory)
+    for payload in payloads:
+        outbox.append("bioeconomy/textile_bin/bin_01", payload)
+    outbox._file = FullDisk(outbox._file)
+    with pytest.raises(OSError):
+        outbox.flush()
+    assert outbox.pending == 4 and outbox.messages_written == 0
+
+    outbox.close()                          # Retried in a new segment
+    assert outbox.messages_written == 4
+    assert len(list_segments(directory)) == 2
+    client = FakeClient()
+    drain(directory, client, until=lambda s: s.published >= 6)
+    assert client.received == payloads[:2] + payloads  # The complete lines of the torn write, then all
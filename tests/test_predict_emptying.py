@@ -0,0 +1,15 @@
+import numpy as np
+import pandas as pd
+
+from analytics.predict_emptying import analyze_fleet
+
+def test_bin_without_indexed_start_is_analyzed():
+    timestamps = pd.date_range("2025-10-01", periods=48, freq="h")
+    df = pd.concat([pd.DataFrame({'timestamp': timestamps, 'distance_cm': np.linspace(90, 60, 48), 'bin_id': bin_id})
+                    for bin_id in ("bin_01", "bin_02")], ignore_index=True).sort_values('timestamp')
+    cycle_starts = pd.Series([timestamps[24]], index=pd.Index(["bin_01"], name='bin_id'))
+
+    result = analyze_fleet(df, cycle_starts)
+    assert list(result.index) == ["bin_01", "bin_02"]
+    assert result.loc["bin_01", 'cycle_start'] == timestamps[24]
+    assert result.loc["bin_02", 'cycle_start'] == timestamps[0]
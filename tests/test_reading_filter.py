@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from edge_gateway.csv_writer import BufferedCsvWriter
+from edge_gateway.incremental_loader import IncrementalLoader
+from edge_gateway.lake_query import query
+from edge_gateway.parquet_store import iter_sensor_data
+from edge_gateway.reading_filter import (
+    DEADBAND, HEARTBEAT_S, HOLD_SLACK, KEEP, SAMPLE_INTERVAL_S, ReadingFilter, gateway_settings, record_settings,
+)
+
+BINS = ["bin_01", "bin_02", "bin_03"]
+START = pd.Timestamp("2025-10-01")
+OUTAGE = (pd.Timestamp("2025-10-06 12:00:00"), pd.Timestamp("2025-10-07 06:00:00"))   # bin_02 sends nothing
+KEYS = ['timestamp', 'bin_id']
+VALUES = ['distance_cm', 'temperature_c', 'humidity_pct']
+
+def make_readings(days=14, seed=0):
+    """
+    Hourly readings of BINS: slowly filling, noisy, emptied once, with
+    bin_02 silent for longer than the heartbeat.
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range(START, periods=days * 24, freq="h")
+    frames = []
+    for i, bin_id in enumerate(BINS):
+        fill = np.linspace(0, 90, len(timestamps)) * (1 + i) % 90 + 5
+        frames.append(pd.DataFrame({
+            'timestamp': timestamps,
+            'distance_cm': np.round(100 - fill + rng.normal(0, 0.7, len(timestamps)), 1),
+            'temperature_c': np.round(20 + 4 * np.sin(np.arange(len(timestamps)) / 24 * 2 * np.pi), 1),
+            'humidity_pct': np.round(55 + rng.normal(0, 3, len(timestamps)), 1),
+            'bin_id': bin_id,
+        }))
+    df = pd.concat(frames).sort_values(KEYS, kind='stable').reset_index(drop=True)
+    lost = (df['bin_id'] == "bin_02") & (df['timestamp'] >= OUTAGE[0]) & (df['timestamp'] < OUTAGE[1])
+    return df[~lost].reset_index(drop=True)
+
+def store(data_dir, df, batches=1):
+    """
+    Filters 'df' like the gateway and writes the kept rows in 'batches'
+    flushes; yields after each flush.
+    """
+    record_settings(data_dir, gateway_settings(BINS, source="gw", start=str(START)))
+    reading_filter = ReadingFilter()
+    with BufferedCsvWriter(data_dir) as writer:
+        for part in np.array_split(np.arange(len(df)), batches):
+            for row in df.iloc[part].to_dict('records'):
+                data = dict(row, timestamp=str(row['timestamp']))
+                if reading_filter.check(row['bin_id'], data, now=row['timestamp'].timestamp()) == KEEP:
+                    writer.write(data)
+            writer.flush()
+            yield reading_filter
+
+def sort(df):
+    return df[KEYS + VALUES].sort_values(KEYS).reset_index(drop=True)
+
+def test_refilled_readings_are_within_the_deadband(tmp_path):
+    truth = make_readings()
+    reading_filter = list(store(str(tmp_path), truth))[-1]
+    assert reading_filter.suppressed > len(truth) / 2
+
+    stored = query(str(tmp_path), reconstruct=False)
+    assert len(stored) == reading_filter.kept
+    rebuilt = query(str(tmp_path))
+    merged = sort(rebuilt).merge(sort(truth), on=KEYS, how='left', suffixes=('', '_true'))
+    measured = merged['distance_cm_true'].notna()
+    for column in VALUES:
+        error = (merged.loc[measured, column] - merged.loc[measured, column + '_true']).abs()
+        assert error.max() <= DEADBAND[column] + 1e-4   # float32 in the lake
+    # Every measured hour is back, and nothing else but the start of the outage
+    assert measured.sum() == len(truth)
+    extra = merged.loc[~measured]
+    assert (extra['bin_id'] == "bin_02").all()
+    assert extra['timestamp'].min() >= OUTAGE[0]
+
+def test_silence_longer_than_the_heartbeat_stays_a_gap(tmp_path):
+    list(store(str(tmp_path), make_readings()))
+    rebuilt = query(str(tmp_path), bins=["bin_02"])
+    before = rebuilt[rebuilt['timestamp'] < OUTAGE[0]]['timestamp'].max()
+    inside = rebuilt[(rebuilt['timestamp'] >= OUTAGE[0]) & (rebuilt['timestamp'] < OUTAGE[1])]
+    max_hold = pd.Timedelta(seconds=HEARTBEAT_S + HOLD_SLACK * SAMPLE_INTERVAL_S)
+    assert (inside['timestamp'] <= before + max_hold).all()
+    assert inside['timestamp'].max() < OUTAGE[1] - pd.Timedelta(hours=6)
+
+def test_rows_stored_before_the_filter_are_not_refilled(tmp_path):
+    data_dir = str(tmp_path)
+    # Unfiltered history with a 5 h gap, then a filtering gateway starts
+    with BufferedCsvWriter(data_dir) as writer:
+        writer.write_many([{'timestamp': t, 'distance_cm': 50.0, 'temperature_c': 20.0, 'humidity_pct': 50.0,
+                            'bin_id': "bin_01"} for t in ("2025-09-30 10:00:00", "2025-09-30 15:00:00")])
+    list(store(data_dir, make_readings(days=2)))
+    rebuilt = query(data_dir, bins=["bin_01"], end=START)
+    assert rebuilt['timestamp'].astype(str).tolist() == ["2025-09-30 10:00:00", "2025-09-30 15:00:00"]
+
+def test_same_history_with_and_without_chunks_and_loader(tmp_path):
+    data_dir = str(tmp_path)
+    loader = IncrementalLoader(data_dir)
+    for _ in store(data_dir, make_readings(), batches=4):
+        loader.refresh()
+    expected = sort(query(data_dir))
+
+    pd.testing.assert_frame_equal(sort(pd.concat(iter_sensor_data(data_dir))), expected, check_dtype=False)
+    chunks = list(iter_sensor_data(data_dir, chunk_rows=97))
+    assert len(chunks) > 2
+    pd.testing.assert_frame_equal(sort(pd.concat(chunks)), expected, check_dtype=False)
+    pd.testing.assert_frame_equal(sort(loader.refresh()), expected, check_dtype=False)
+    assert loader.full_reloads == 1
@@ -0,0 +1,21 @@
+from analytics.report_service import MockBackend, ReportService, quantize_context
+
+def test_backend_gets_exact_values_and_cache_stops_at_thresholds():
+    sent = []
+    service = ReportService(MockBackend(lambda context: sent.append(context) or context['current_fill']),
+                            build_messages=lambda context: [])
+
+    assert service.generate({"current_fill": "81.0%"}) == "81.0%"
+    assert sent == [{"current_fill": "81.0%"}]
+    # Same bucket, same side of 80 %: cached
+    assert service.generate({"current_fill": "80.6%"}) == "81.0%"
+    # Rounds to the same 2 % step, but not above 80 % / below 50 %: not reused
+    assert service.generate({"current_fill": "79.6%"}) == "79.6%"
+    assert service.generate({"current_fill": "50.9%"}) == "50.9%"
+    assert service.generate({"current_fill": "49.9%"}) == "49.9%"
+    assert len(sent) == 4
+
+def test_quantize_context_splits_at_thresholds():
+    assert quantize_context({"temperature": "25.4 C"}) != quantize_context({"temperature": "24.6 C"})
+    assert quantize_context({"temperature": "25.4 C"}) == quantize_context({"temperature": "25.2 C"})
+    assert quantize_context({"trend": "+12.3% / day"}) == {"trend": "+12.5% / day"}
@@ -0,0 +1,51 @@
+import numpy as np
+
+from edge_gateway.telemetry_frame import FRAME_SIZE, TelemetryDecoder, crc16, crc16_rows, encode_frame
+
+def frames(seqs, device=7):
+    return b''.join(encode_frame(device, seq, 40.0 + seq % 100, 21.5, 55.25) for seq in seqs)
+
+def readings(items):
+    assert all(kind == 'frame' for kind, _ in items)
+    return [value for _, value in items]
+
+def test_crc_check_value():
+    assert crc16(b"123456789") == 0x29B1           # CRC-16/CCITT-FALSE check value
+    rows = np.frombuffer(b"123456789" * 3, dtype=np.uint8).reshape(3, 9)
+    assert crc16_rows(rows).tolist() == [0x29B1] * 3
+
+def test_frame_round_trip():
+    (reading,) = readings(TelemetryDecoder().feed(frames([3])))
+    assert reading == {"distance_cm": 43.0, "temperature_c": 21.5, "humidity_pct": 55.25, "seq": 3}
+    (reading,) = readings(TelemetryDecoder().feed(encode_frame(7, 4, 12.5)))
+    assert reading['temperature_c'] is None and reading['humidity_pct'] is None
+
+def test_corrupted_frame_is_rejected():
+    data = bytearray(frames([1, 2, 3]))
+    data[FRAME_SIZE + 9] ^= 0x10                    # Distance of the second frame
+    decoder = TelemetryDecoder()
+    assert [r['seq'] for r in readings(decoder.feed(bytes(data)))] == [1, 3]
+    assert decoder.crc_errors == 1
+    assert decoder.lost_frames == 1
+
+def test_resync_after_garbage_and_split_reads():
+    data = b'\x00\xff{noise\n' + frames([1, 2]) + b'\x13\x37' + frames([3])
+    decoder = TelemetryDecoder()
+    items = []
+    for i in range(len(data)):                       # One byte per read
+        items.extend(decoder.feed(data[i:i + 1]))
+    assert [value for kind, value in items if kind == 'json'] == [b'\x00\xff{noise']
+    assert [value['seq'] for kind, value in items if kind == 'frame'] == [1, 2, 3]
+    assert decoder.frames == 3
+    assert decoder.discarded_bytes == 2
+    assert decoder.lost_frames == 0
+
+def test_sequence_gaps_are_counted():
+    decoder = TelemetryDecoder()
+    decoder.feed(frames([65534, 65535, 0, 1]))       # Wraps: no loss
+    decoder.feed(frames([4, 4, 5]))                  # 2 lost, 1 duplicate
+    decoder.feed(frames([0, 1]))                     # Device rebooted: not a loss
+    assert decoder.frames == 9
+    assert decoder.lost_frames == 2
+    assert decoder.duplicate_frames == 1
+    assert decoder.resets == 1